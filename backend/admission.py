@@ -0,0 +1,262 @@
+"""
+Admission control for the expensive endpoints.
+
+Image preprocessing, vision analysis and the CSV / GoBD / DATEV bulk
+endpoints hold their whole payload (and for images several decoded copies of
+it) in memory.  Without a limit a burst of n8n uploads runs all at once and
+the worker is OOM-killed; with AdmissionMiddleware each request first takes
+capacity from its route's limiter:
+
+  cost       1 + Content-Length // unit_bytes slots, at most the limiter's
+             capacity (a 20 MB image takes all 4 image slots and runs alone,
+             small scans run 4 at a time).  A body without Content-Length is
+             charged the full capacity.
+  queue      Requests that do not fit wait in FIFO order (a large request at
+             the head is not overtaken by small ones, so it cannot starve).
+  429        The wait queue is full: rejected at once, before the body is
+             read.
+  503        The request waited ADMISSION_MAX_WAIT_S without being admitted.
+
+Rejections use the JSON error envelope and carry Retry-After, estimated from
+the limiter's recent service time and the work ahead in the queue (1–60 s).
+
+Limits are per worker process.  Metrics:
+
+  admission_in_flight{limiter}                  slots in use
+  admission_queue_depth{limiter}                requests waiting
+  admission_rejected_total{limiter,reason}      queue_full / timeout
+  admission_wait_seconds{limiter}               histogram, admitted requests
+
+Configuration (environment):
+  ADMISSION_IMAGE_SLOTS   (default 4; 1 slot per started 5 MiB)
+  ADMISSION_CSV_SLOTS     (default 4; 1 slot per started 2.5 MiB)
+  ADMISSION_VISION_SLOTS  (default 2; 1 slot per started 5 MiB)
+  ADMISSION_QUEUE_SIZE    (default 16 waiting requests per limiter)
+  ADMISSION_MAX_WAIT_S    (default 10)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from metrics import counter, gauge, histogram
+from models import ErrorDetail, ErrorResponse
+
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "16"))
+ADMISSION_MAX_WAIT_S = float(os.getenv("ADMISSION_MAX_WAIT_S", "10"))
+
+_MIB = 1024 * 1024
+_RETRY_AFTER_MAX_S = 60
+# Weight of the newest observation in the service-time average
+_EWMA_ALPHA = 0.2
+
+ADMISSION_IN_FLIGHT = gauge(
+    "admission_in_flight", "Admission slots in use", ("limiter",)
+)
+ADMISSION_QUEUE_DEPTH = gauge(
+    "admission_queue_depth", "Requests waiting for admission", ("limiter",)
+)
+ADMISSION_REJECTED = counter(
+    "admission_rejected_total", "Requests rejected by admission control", ("limiter", "reason")
+)
+ADMISSION_WAIT = histogram(
+    "admission_wait_seconds", "Time admitted requests waited for capacity", ("limiter",)
+)
+
+
+class Rejected(Exception):
+    """The limiter did not admit the request."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Limiter:
+    """Weighted FIFO semaphore with a bounded wait queue."""
+
+    def __init__(
+        self,
+        name: str,
+        capacity: int,
+        unit_bytes: int,
+        max_queue: int = ADMISSION_QUEUE_SIZE,
+        max_wait: float = ADMISSION_MAX_WAIT_S,
+    ) -> None:
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.unit_bytes = unit_bytes
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_use = 0
+        self._waiters: deque[tuple[int, asyncio.Future[None]]] = deque()
+        # Seconds one request holds its slots, exponentially averaged
+        self.service_time = 0.0
+        self._in_flight = ADMISSION_IN_FLIGHT.labels(name)
+        self._queue_depth = ADMISSION_QUEUE_DEPTH.labels(name)
+        self._wait = ADMISSION_WAIT.labels(name)
+
+    def cost(self, content_length: Optional[int]) -> int:
+        if content_length is None:
+            return self.capacity
+        return min(self.capacity, 1 + content_length // self.unit_bytes)
+
+    def retry_after(self) -> int:
+        """Seconds until the work ahead of a new request should have drained."""
+        queued = sum(cost for cost, _ in self._waiters)
+        backlog = (self.in_use + queued) / self.capacity
+        return max(1, min(_RETRY_AFTER_MAX_S, math.ceil(self.service_time * backlog)))
+
+    async def acquire(self, cost: int) -> None:
+        if not self._waiters and self.in_use + cost <= self.capacity:
+            self._grant(cost)
+            self._wait.observe(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            ADMISSION_REJECTED.labels(self.name, "queue_full").inc()
+            raise Rejected(429, "queue_full", self.retry_after())
+
+        start = time.perf_counter()
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        entry = (cost, future)
+        self._waiters.append(entry)
+        self._queue_depth.inc()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if future.done() and not future.cancelled():
+                # Granted in the same tick as the timeout / disconnect
+                self.release(cost)
+            else:
+                future.cancel()
+                self._waiters.remove(entry)
+                self._queue_depth.dec()
+                # The head may have been blocking smaller requests behind it
+                self._wake()
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            ADMISSION_REJECTED.labels(self.name, "timeout").inc()
+            raise Rejected(503, "timeout", self.retry_after()) from None
+        self._wait.observe(time.perf_counter() - start)
+
+    def release(self, cost: int, held: Optional[float] = None) -> None:
+        self.in_use -= cost
+        self._in_flight.dec(cost)
+        if held is not None:
+            self.service_time += _EWMA_ALPHA * (held - self.service_time)
+        self._wake()
+
+    def _grant(self, cost: int) -> None:
+        self.in_use += cost
+        self._in_flight.inc(cost)
+
+    def _wake(self) -> None:
+        # Strict FIFO: stop at the first waiter that does not fit
+        while self._waiters and self.in_use + self._waiters[0][0] <= self.capacity:
+            cost, future = self._waiters.popleft()
+            self._queue_depth.dec()
+            self._grant(cost)
+            future.set_result(None)
+
+
+LIMITERS: dict[str, Limiter] = {
+    "image": Limiter("image", int(os.getenv("ADMISSION_IMAGE_SLOTS", "4")), 5 * _MIB),
+    "csv": Limiter("csv", int(os.getenv("ADMISSION_CSV_SLOTS", "4")), 5 * _MIB // 2),
+    "vision": Limiter("vision", int(os.getenv("ADMISSION_VISION_SLOTS", "2")), 5 * _MIB),
+}
+
+# Path → limiter.  /image/preprocess-url has a small JSON body, so it costs
+# one slot although the downloaded image can be large.
+ADMISSION_ROUTES: dict[str, str] = {
+    "/image/preprocess": "image",
+    "/image/preprocess-url": "image",
+    "/vision/analyze": "vision",
+    "/api/csv/parse": "csv",
+    "/api/gobd/prepare": "csv",
+    "/api/datev/export": "csv",
+}
+
+
+def _content_length(headers: Headers) -> Optional[int]:
+    value = headers.get("content-length")
+    if value is None:
+        return None
+    try:
+        return max(0, int(value))
+    except ValueError:
+        return None
+
+
+def _rejection(scope: Scope, limiter: Limiter, rejected: Rejected) -> tuple[list, bytes]:
+    request_id = scope.get("state", {}).get("request_id", "unknown")
+    message = (
+        f"Too many concurrent '{limiter.name}' requests, retry later"
+        if rejected.reason == "queue_full"
+        else f"No '{limiter.name}' capacity within {limiter.max_wait:g}s, retry later"
+    )
+    body = ErrorResponse(
+        error=ErrorDetail(
+            code=f"HTTP_{rejected.status_code}",
+            message=message,
+            details={
+                "request_id": request_id,
+                "limiter": limiter.name,
+                "reason": rejected.reason,
+                "retry_after": rejected.retry_after,
+            },
+        )
+    ).model_dump_json().encode()
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"retry-after", str(rejected.retry_after).encode()),
+    ]
+    return headers, body
+
+
+class AdmissionMiddleware:
+    """Admits requests to ADMISSION_ROUTES through their limiter, before the body is read."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limiters: Optional[dict[str, Limiter]] = None,
+        routes: Optional[dict[str, str]] = None,
+    ) -> None:
+        self.app = app
+        self.limiters = LIMITERS if limiters is None else limiters
+        self.routes = ADMISSION_ROUTES if routes is None else routes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        name = self.routes.get(scope["path"]) if scope["type"] == "http" else None
+        if name is None or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limiters[name]
+        cost = limiter.cost(_content_length(Headers(scope=scope)))
+        try:
+            await limiter.acquire(cost)
+        except Rejected as rejected:
+            headers, body = _rejection(scope, limiter, rejected)
+            await send(
+                {"type": "http.response.start", "status": rejected.status_code, "headers": headers}
+            )
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(cost, time.perf_counter() - start)
@@ -0,0 +1,13 @@
+"""
+Performance benchmarks for the Zone 2 backend.
+
+Run from the backend directory, e.g.:
+  python -m benchmarks.suite       all endpoints, baseline regression gating
+  python -m benchmarks.loadtest    open-loop traffic mixes, saturation, loop blocking
+  python -m benchmarks.ner         NER backends
+  python -m benchmarks.responses   response rendering / binary transport
+  python -m benchmarks.compression response compression per encoding
+  python -m benchmarks.uds         per-request overhead, TCP loopback vs Unix socket
+  python -m benchmarks.middleware  request middleware overhead
+  python -m benchmarks.coldstart   worker import time, time to ready, RSS per role
+"""
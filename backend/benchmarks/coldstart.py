@@ -0,0 +1,172 @@
+"""
+Cold-start benchmark: import time, time to ready and RSS per worker role.
+
+Every run is a fresh interpreter started with `python -X importtime`, as a
+uvicorn worker would be.  It imports main, runs the application lifespan
+(start-up) and reports
+
+  import     time to `import main`
+  ready      import plus the lifespan start-up, i.e. until the worker can
+             accept requests
+  rss        resident memory at that point (VmRSS)
+  top        the packages with the highest own import time (summed over
+             their modules, from the -X importtime trace)
+
+Roles set ROUTERS for the worker (see main.py); "all" is the default
+deployment.  WARMUP is forced to "off" so the numbers show what an idle
+worker costs – pass --warmup eager to include the image backends.
+
+--budget-ms makes the run a gate: exit 1 if the median import time of any
+role exceeds it.
+
+Usage (from backend/):
+  python -m benchmarks.coldstart [--roles all,image,math,pii,gobd]
+                                 [--runs 5] [--top 8] [--budget-ms 1000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Runs in the child interpreter; prints one JSON line on stdout
+_CHILD = r"""
+import asyncio, json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+
+async def _start():
+    async with main.app.router.lifespan_context(main.app):
+        pass
+
+asyncio.run(_start())
+t2 = time.perf_counter()
+rss_kib = 0
+try:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                rss_kib = int(line.split()[1])
+except OSError:
+    pass
+print(json.dumps({"import_s": t1 - t0, "ready_s": t2 - t0, "rss_kib": rss_kib}))
+"""
+
+# "import time:  self [us] | cumulative | imported package"
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+@dataclass
+class Run:
+    import_s: float
+    ready_s: float
+    rss_kib: int
+    # top-level package → own import time in seconds
+    packages: dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class RoleResult:
+    role: str
+    import_ms: float
+    ready_ms: float
+    rss_mib: float
+    packages: list[tuple[str, float]]
+
+
+def parse_importtime(trace: str) -> dict[str, float]:
+    """Own import time per top-level package (seconds) from -X importtime output."""
+    totals: dict[str, float] = defaultdict(float)
+    for line in trace.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            package = match.group(4).split(".")[0]
+            totals[package] += int(match.group(1)) / 1e6
+    return dict(totals)
+
+
+def run_once(role: str, warmup: str) -> Run:
+    env = dict(os.environ, ROUTERS=role, WARMUP=warmup, LOG_LEVEL="WARNING")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD],
+        capture_output=True,
+        text=True,
+        cwd=BACKEND_DIR,
+        env=env,
+        check=False,
+    )
+    result_line = proc.stdout.strip().splitlines()[-1:] if proc.stdout.strip() else []
+    if proc.returncode != 0 or not result_line:
+        raise RuntimeError(f"role {role!r} failed to start:\n{proc.stderr[-2000:]}")
+    result = json.loads(result_line[0])
+    return Run(
+        import_s=result["import_s"],
+        ready_s=result["ready_s"],
+        rss_kib=result["rss_kib"],
+        packages=parse_importtime(proc.stderr),
+    )
+
+
+def measure(role: str, runs: int, warmup: str = "off", top: int = 8) -> RoleResult:
+    samples = [run_once(role, warmup) for _ in range(runs)]
+    packages: dict[str, list[float]] = defaultdict(list)
+    for sample in samples:
+        for name, seconds in sample.packages.items():
+            packages[name].append(seconds)
+    ranked = sorted(
+        ((name, statistics.median(times) * 1000) for name, times in packages.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    return RoleResult(
+        role=role,
+        import_ms=statistics.median(s.import_s for s in samples) * 1000,
+        ready_ms=statistics.median(s.ready_s for s in samples) * 1000,
+        rss_mib=statistics.median(s.rss_kib for s in samples) / 1024,
+        packages=ranked[:top],
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--roles", default="all,image,math,pii,gobd")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--warmup", choices=("off", "eager"), default="off")
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    results = [
+        measure(role.strip(), args.runs, args.warmup, args.top)
+        for role in args.roles.split(",")
+        if role.strip()
+    ]
+    print(f"{'role':<12} {'import':>10} {'ready':>10} {'rss':>9}   top packages (own import time)")
+    for r in results:
+        top = ", ".join(f"{name} {ms:.0f}" for name, ms in r.packages)
+        print(
+            f"{r.role:<12} {r.import_ms:>8.0f}ms {r.ready_ms:>8.0f}ms "
+            f"{r.rss_mib:>6.0f}MiB   {top}"
+        )
+
+    if args.budget_ms is not None:
+        over = [r for r in results if r.import_ms > args.budget_ms]
+        for r in over:
+            print(f"over budget: {r.role} imports in {r.import_ms:.0f}ms > {args.budget_ms:.0f}ms")
+        if over:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
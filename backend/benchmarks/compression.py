@@ -0,0 +1,127 @@
+"""
+Response compression benchmark: size and time per encoding.
+
+Renders the large responses (ParseResult, GoBDValidationResult, an
+ImagePreprocessResponse with a base64 PNG, the DATEV EXTF export) and
+compresses each with every available encoding at the configured levels:
+
+  ratio     compressed size / identity size
+  encode    compression time (best of --repeat; streamed in 8 KiB chunks
+            for the DATEV export, like the StreamingResponse)
+  @Mbit/s   identity transfer time minus (encode + compressed transfer time)
+            at each --links bandwidth: positive means the response reaches
+            the client sooner compressed
+
+Usage (from backend/):
+  python -m benchmarks.compression [--rows 10000] [--repeat 5] [--links 50,1000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import io
+import random
+from typing import Callable
+
+import compression
+from benchmarks.responses import _best_of, make_gobd_result, make_parse_result
+from models import DATEVExportRequest, ImageMetadata, ImagePreprocessResponse
+from rendering import ModelResponse
+
+_STREAM_CHUNK = 8192
+
+
+def make_image_response(rnd: random.Random) -> bytes:
+    """A ~1.5 MP greyscale scan as PNG, base64 in JSON (as /image/preprocess returns)."""
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        return b""
+    # Sensor noise on the paper, so the PNG is as incompressible as a real scan
+    img = Image.effect_noise((1240, 1240), 12).point(lambda v: min(255, v + 100))
+    draw = ImageDraw.Draw(img)
+    for y in range(40, 1200, 24):
+        x = 60
+        while x < 1180:
+            width = rnd.randint(8, 60)
+            draw.rectangle((x, y, x + width, y + 12), fill=rnd.randint(0, 80))
+            x += width + rnd.randint(6, 14)
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    model = ImagePreprocessResponse(
+        image_base64=base64.b64encode(buf.getvalue()).decode(),
+        metadata=ImageMetadata(
+            width=1240, height=1240, deskew_angle=0.0, processing_time_ms=0.0,
+            original_width=1240, original_height=1240,
+        ),
+    )
+    return ModelResponse(model).body
+
+
+def make_datev_export(n: int, rnd: random.Random) -> bytes:
+    from gobd_csv import _build_datev_data_row, _build_extf_header
+
+    request = DATEVExportRequest(
+        transactions=make_gobd_result(n, rnd).prepared_rows,
+        berater_nummer="1234567", mandant_nummer="12345", fiscal_year_begin="20240101",
+    )
+    lines = _build_extf_header(request, "20240601120000000")
+    lines += [_build_datev_data_row(t) for t in request.transactions]
+    return ("\r\n".join(lines) + "\r\n").encode("windows-1252", errors="replace")
+
+
+def _streamed(data: bytes, encoding: str) -> bytes:
+    encoder = compression.Encoder(encoding)
+    out = [encoder.compress(data[i:i + _STREAM_CHUNK]) for i in range(0, len(data), _STREAM_CHUNK)]
+    out.append(encoder.finish())
+    return b"".join(out)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--links", default="50,1000", help="bandwidths in Mbit/s")
+    args = parser.parse_args()
+    links = [float(v) for v in args.links.split(",")]
+
+    rnd = random.Random(42)
+    payloads: list[tuple[str, bytes, bool]] = [
+        ("ParseResult", ModelResponse(make_parse_result(args.rows, rnd)).body, False),
+        ("GoBDValidationResult", ModelResponse(make_gobd_result(args.rows, rnd)).body, False),
+        ("ImagePreprocessResponse", make_image_response(rnd), False),
+        ("DATEV export (stream)", make_datev_export(args.rows, rnd), True),
+    ]
+    print(
+        f"encodings: {', '.join(compression.ENCODINGS)}  (gzip level "
+        f"{compression.COMPRESSION_GZIP_LEVEL}, br quality {compression.COMPRESSION_BROTLI_QUALITY}, "
+        f"zstd level {compression.COMPRESSION_ZSTD_LEVEL})"
+    )
+    print(
+        f"{'payload':<26} {'encoding':<8} {'size':>10} {'ratio':>6} {'encode':>9}  "
+        + "  ".join(f"{f'@{link:g}Mbit/s':>12}" for link in links)
+    )
+    for name, data, streamed in payloads:
+        if not data:
+            print(f"{name:<26} skipped (Pillow not installed)")
+            continue
+        print(f"{name:<26} {'identity':<8} {len(data) / 1024:>7.0f}KiB {1:>6.2f}")
+        for encoding in compression.ENCODINGS:
+            fn: Callable[[], bytes] = (
+                (lambda: _streamed(data, encoding)) if streamed
+                else (lambda: compression.compress(data, encoding))
+            )
+            seconds, encoded = _best_of(args.repeat, fn)
+            saved = [
+                (len(data) - len(encoded)) * 8 / (link * 1e6) - seconds for link in links
+            ]
+            print(
+                f"{'':<26} {encoding:<8} {len(encoded) / 1024:>7.0f}KiB "
+                f"{len(encoded) / len(data):>6.3f} {seconds * 1000:>7.1f}ms  "
+                + "  ".join(f"{s * 1000:>+10.0f}ms" for s in saved)
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Synthetic workloads for the benchmark suite.
+
+All generators are deterministic for a given seed, so runs on the same
+machine measure the same input and can be compared against a baseline.
+
+  make_journal()   German bank/booking journal as CSV bytes (semicolon,
+                   "1.234,56" amounts, umlauts) in a chosen encoding
+  make_invoices()  invoice dicts for /math/validate(-batch), ~10 % with a
+                   deliberate arithmetic error
+  make_pii_texts() PII-dense Buchungstext / e-mail snippets
+  make_scan()      a skewed, noisy "scanned" A4 page as JPEG bytes
+  make_bank_and_open_items()  transactions + open invoices for /reconcile
+"""
+
+from __future__ import annotations
+
+import io
+import random
+from typing import Any
+
+from benchmarks.ner import make_texts
+
+JOURNAL_HEADER = "Datum;Belegnummer;Buchungstext;Betrag;Konto;Gegenkonto"
+
+_BOOKING_TEXTS = [
+    "Materiallieferung Baustelle Müllerstraße",
+    "Werkzeugkauf Baumarkt",
+    "Miete Büro {month}",
+    "Tankstelle Fahrzeug {plate}",
+    "Abschlag Heizungsinstallation",
+    "Kundenzahlung Rechnung {num}",
+    "Gehalt {month} Geselle",
+    "Telekommunikation Mobilfunk",
+    "Fortbildung Schweißtechnik",
+    "Entsorgung Bauschutt Container",
+]
+_MONTHS = ["Januar", "Februar", "März", "April", "Mai", "Juni"]
+_ACCOUNTS = [("4980", "1600"), ("4210", "1200"), ("4530", "1000"), ("8400", "1400")]
+
+
+def _german_amount(cents: int) -> str:
+    """-123456 → '-1.234,56'."""
+    sign = "-" if cents < 0 else ""
+    euros, rest = divmod(abs(cents), 100)
+    return f"{sign}{euros:,}".replace(",", ".") + f",{rest:02d}"
+
+
+def journal_rows(n: int, seed: int = 42) -> list[dict[str, str]]:
+    """Journal rows with sequential Belegnummern, as CSVRow-shaped dicts."""
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        konto, gegenkonto = rnd.choice(_ACCOUNTS)
+        text = rnd.choice(_BOOKING_TEXTS).format(
+            month=rnd.choice(_MONTHS),
+            plate=f"M-FR {rnd.randint(100, 9999)}",
+            num=rnd.randint(10000, 99999),
+        )
+        rows.append(
+            {
+                "datum": f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.2024",
+                "belegnummer": f"RE-{i + 1:07d}",
+                "buchungstext": text,
+                "betrag": _german_amount(rnd.randint(-250_000, 250_000) or 1),
+                "konto": konto,
+                "gegenkonto": gegenkonto,
+            }
+        )
+    return rows
+
+
+def make_journal(n: int, encoding: str = "utf-8", seed: int = 42) -> bytes:
+    """Journal of n rows as CSV bytes in the given encoding."""
+    lines = [JOURNAL_HEADER]
+    for r in journal_rows(n, seed):
+        lines.append(
+            f"{r['datum']};{r['belegnummer']};{r['buchungstext']};"
+            f"{r['betrag']};{r['konto']};{r['gegenkonto']}"
+        )
+    return ("\r\n".join(lines) + "\r\n").encode(encoding)
+
+
+def split_journal(data: bytes, max_bytes: int) -> list[bytes]:
+    """Split CSV bytes into uploads below max_bytes, repeating the header."""
+    header, _, body = data.partition(b"\r\n")
+    chunks: list[bytes] = []
+    current: list[bytes] = []
+    size = len(header) + 2
+    for line in body.split(b"\r\n"):
+        if not line:
+            continue
+        if current and size + len(line) + 2 > max_bytes:
+            chunks.append(b"\r\n".join([header, *current]) + b"\r\n")
+            current, size = [], len(header) + 2
+        current.append(line)
+        size += len(line) + 2
+    if current:
+        chunks.append(b"\r\n".join([header, *current]) + b"\r\n")
+    return chunks
+
+
+def make_invoices(n: int, max_items: int = 8, seed: int = 42) -> list[dict[str, Any]]:
+    rnd = random.Random(seed)
+    invoices = []
+    for _ in range(n):
+        items = []
+        for _ in range(rnd.randint(1, max_items)):
+            qty = rnd.choice([1, 2, 3, 5, 0.5, 2.5, 10])
+            price = round(rnd.uniform(0.5, 800), 2)
+            items.append({"qty": qty, "unit_price": price, "total": round(qty * price, 2)})
+        netto = round(sum(i["total"] for i in items), 2)
+        rate = rnd.choice([0.19, 0.19, 0.19, 0.07])
+        brutto = round(netto * (1 + rate), 2)
+        if rnd.random() < 0.1:
+            brutto = round(brutto + rnd.choice([0.05, 1.0, 9.0]), 2)
+        invoices.append({"netto": netto, "mwst_rate": rate, "brutto": brutto, "items": items})
+    return invoices
+
+
+def make_pii_texts(n: int, seed: int = 42) -> list[str]:
+    return make_texts(n, seed)
+
+
+def make_bank_and_open_items(n: int, seed: int = 42) -> dict[str, Any]:
+    """Reconcile request body: n open invoices, n payments (some with Skonto)."""
+    rnd = random.Random(seed)
+    invoices, transactions = [], []
+    for i in range(n):
+        cents = rnd.randint(5_000, 500_000)
+        number = f"RE-2024-{i + 1:06d}"
+        invoices.append(
+            {
+                "id": f"inv-{i}",
+                "rechnungsnummer": number,
+                "brutto": f"{cents / 100:.2f}",
+                "rechnungsdatum": "2024-03-01",
+                "kunde_name": f"Kunde {i}",
+            }
+        )
+        paid = cents if rnd.random() < 0.8 else round(cents * 0.98)
+        transactions.append(
+            {
+                "datum": "15.03.2024",
+                "belegnummer": f"BANK-{i:06d}",
+                "buchungstext": f"Zahlung {number} Kunde {i}",
+                "betrag": _german_amount(paid),
+                "konto": "1200",
+                "gegenkonto": "1400",
+            }
+        )
+    rnd.shuffle(transactions)
+    return {"transactions": transactions, "invoices": invoices}
+
+
+def make_scan(seed: int = 42, dpi: int = 150) -> bytes:
+    """A4 page with text lines, rotated by a small angle, with sensor noise."""
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    rnd = random.Random(seed)
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    y = dpi // 2
+    while y < height - dpi // 2:
+        x = dpi // 2
+        while x < width - dpi // 2:
+            word = rnd.randint(3, 12) * dpi // 25
+            draw.rectangle([x, y, x + word, y + dpi // 12], fill=rnd.randint(0, 60))
+            x += word + dpi // 15
+        y += dpi // 5
+    page = page.rotate(rnd.uniform(-3, 3), expand=True, fillcolor=255)
+    arr = np.asarray(page, dtype=np.int16)
+    noise = np.random.default_rng(seed).normal(0, 12, arr.shape)
+    page = Image.fromarray(np.clip(arr + noise, 0, 255).astype(np.uint8))
+    buf = io.BytesIO()
+    page.save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
@@ -0,0 +1,314 @@
+"""
+Load-test harness: n8n-like traffic mixes against the ASGI app.
+
+Open-loop load generator – requests arrive as a Poisson process at the
+offered rate whether or not earlier ones have finished, like n8n workflows
+firing independently.  Each step of --rates runs for --duration seconds and
+reports per route:
+
+  rps        completed requests per second
+  p50/p99    latency from the scheduled arrival to the full response
+  queue      latency minus the app's own X-Processing-Time-MS, i.e. time
+             spent waiting (event loop, worker accept queue, network)
+  errors     non-2xx responses and transport errors
+
+A step is saturated when the app cannot keep up: completing the step's
+arrivals takes more than 10 % longer than the arrival window (the backlog
+drains after the last arrival), or requests fail.  The highest completed rate
+over all steps is the saturation throughput.
+
+Targets:
+  default   the app in-process via httpx.ASGITransport on this event loop –
+            one worker; also measures event-loop blocking (a 10 ms ticker's
+            overshoot: total blocked time and longest stall)
+  --url     a running server, e.g. the Dockerfile command
+            (uvicorn main:app --port 8001 --workers 2), to size worker counts
+
+Usage (from backend/):
+  python -m benchmarks.loadtest [--mix n8n] [--rates 5,10,20,40]
+                                [--duration 10] [--url http://localhost:8001]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+import httpx
+
+from benchmarks import data
+
+# Route → weight; weights are relative
+MIXES: dict[str, dict[str, float]] = {
+    # Typical workflow traffic: health polling, PII scrubbing, invoice checks,
+    # occasional uploads
+    "n8n": {
+        "health": 25, "pii_sanitize": 30, "math_validate": 20,
+        "csv_parse": 10, "image_preprocess": 5, "gobd_prepare": 5, "pii_sanitize_batch": 5,
+    },
+    # Month-end: uploads overlap
+    "uploads": {"health": 20, "csv_parse": 40, "image_preprocess": 40},
+    # Mail import: PII bursts next to health checks
+    "pii_burst": {"health": 20, "pii_sanitize": 50, "pii_sanitize_batch": 30},
+}
+
+_TICK = 0.010
+_BLOCK_THRESHOLD = 0.005
+
+
+@dataclass
+class Payloads:
+    """Prebuilt request bodies, cycled through by the generator."""
+
+    journal: bytes
+    rows: list[dict[str, str]]
+    invoices: list[dict[str, Any]]
+    texts: list[str]
+    scans: list[bytes]
+
+
+def build_payloads(seed: int = 42) -> Payloads:
+    return Payloads(
+        journal=data.make_journal(2_000, "windows-1252", seed),
+        rows=data.journal_rows(500, seed),
+        invoices=data.make_invoices(200, seed=seed),
+        texts=data.make_pii_texts(1_000, seed),
+        scans=[data.make_scan(s) for s in range(3)],
+    )
+
+
+def _request(route: str, p: Payloads, rnd: random.Random) -> tuple[str, str, dict[str, Any]]:
+    if route == "health":
+        return "GET", "/health", {}
+    if route == "pii_sanitize":
+        return "POST", "/pii/sanitize", {"json": {"text": rnd.choice(p.texts)}}
+    if route == "pii_sanitize_batch":
+        start = rnd.randrange(0, len(p.texts) - 100)
+        return "POST", "/pii/sanitize-batch", {"json": {"texts": p.texts[start:start + 100]}}
+    if route == "math_validate":
+        return "POST", "/math/validate", {"json": rnd.choice(p.invoices)}
+    if route == "csv_parse":
+        return "POST", "/api/csv/parse", {"files": {"file": ("journal.csv", p.journal)}}
+    if route == "gobd_prepare":
+        return "POST", "/api/gobd/prepare", {"json": p.rows}
+    if route == "image_preprocess":
+        return "POST", "/image/preprocess", {"files": {"file": ("scan.jpg", rnd.choice(p.scans))}}
+    raise ValueError(f"unknown route {route!r}")
+
+
+@dataclass
+class RouteStats:
+    latencies: list[float] = field(default_factory=list)
+    queue: list[float] = field(default_factory=list)
+    errors: int = 0
+
+
+@dataclass
+class StepResult:
+    offered_rps: float
+    window: float
+    duration: float
+    routes: dict[str, RouteStats]
+    completed: int
+    errors: int
+    loop_blocked_s: Optional[float] = None
+    loop_max_stall_s: Optional[float] = None
+
+    @property
+    def completed_rps(self) -> float:
+        return self.completed / self.duration
+
+    @property
+    def saturated(self) -> bool:
+        return self.errors > 0 or self.duration > 1.1 * self.window
+
+
+class LoopMonitor:
+    """Measures event-loop blocking as the overshoot of a periodic ticker."""
+
+    def __init__(self) -> None:
+        self.blocked = 0.0
+        self.max_stall = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(_TICK)
+            lag = time.perf_counter() - start - _TICK
+            if lag > _BLOCK_THRESHOLD:
+                self.blocked += lag
+                self.max_stall = max(self.max_stall, lag)
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+async def run_step(
+    client: httpx.AsyncClient,
+    mix: dict[str, float],
+    rate: float,
+    duration: float,
+    payloads: Payloads,
+    seed: int = 0,
+    monitor_loop: bool = True,
+) -> StepResult:
+    """One open-loop step at the offered rate (requests/s)."""
+    rnd = random.Random(seed)
+    routes, weights = list(mix), list(mix.values())
+    stats: dict[str, RouteStats] = defaultdict(RouteStats)
+    monitor = LoopMonitor() if monitor_loop else None
+    if monitor:
+        monitor.start()
+
+    async def fire(route: str, scheduled: float) -> None:
+        method, path, kwargs = _request(route, payloads, rnd)
+        st = stats[route]
+        try:
+            resp = await client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            st.errors += 1
+            return
+        latency = time.perf_counter() - scheduled
+        if resp.status_code >= 400:
+            st.errors += 1
+            return
+        st.latencies.append(latency)
+        processing = float(resp.headers.get("X-Processing-Time-MS", 0.0)) / 1000
+        st.queue.append(max(0.0, latency - processing))
+
+    tasks: list[asyncio.Task] = []
+    start = time.perf_counter()
+    scheduled = start
+    loop = asyncio.get_running_loop()
+    while True:
+        scheduled += rnd.expovariate(rate)
+        if scheduled - start >= duration:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        route = rnd.choices(routes, weights)[0]
+        # Latency counts from the scheduled arrival: a blocked loop that
+        # dispatches late shows up as queueing, not as a lower rate
+        tasks.append(loop.create_task(fire(route, scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = max(duration, time.perf_counter() - start)
+    if monitor:
+        await monitor.stop()
+
+    return StepResult(
+        offered_rps=rate,
+        window=duration,
+        duration=elapsed,
+        routes=dict(stats),
+        completed=sum(len(s.latencies) for s in stats.values()),
+        errors=sum(s.errors for s in stats.values()),
+        loop_blocked_s=monitor.blocked if monitor else None,
+        loop_max_stall_s=monitor.max_stall if monitor else None,
+    )
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] if ordered else 0.0
+
+
+def print_step(step: StepResult) -> None:
+    mark = "  ← saturated" if step.saturated else ""
+    print(
+        f"\noffered {step.offered_rps:.1f} rps → completed {step.completed_rps:.1f} rps, "
+        f"errors {step.errors}{mark}"
+    )
+    if step.loop_blocked_s is not None:
+        print(
+            f"event loop blocked {step.loop_blocked_s * 1000:.0f}ms "
+            f"({step.loop_blocked_s / step.duration:.0%} of the step), "
+            f"longest stall {step.loop_max_stall_s * 1000:.0f}ms"
+        )
+    print(
+        f"  {'route':<20} {'n':>6} {'rps':>7} {'p50':>9} {'p99':>9} "
+        f"{'queue p50':>10} {'queue p99':>10} {'err':>5}"
+    )
+    for route, st in sorted(step.routes.items()):
+        n = len(st.latencies)
+        print(
+            f"  {route:<20} {n:>6} {n / step.duration:>7.1f} "
+            f"{_percentile(st.latencies, 0.5) * 1000:>7.1f}ms "
+            f"{_percentile(st.latencies, 0.99) * 1000:>7.1f}ms "
+            f"{statistics.median(st.queue) * 1000 if st.queue else 0.0:>8.1f}ms "
+            f"{_percentile(st.queue, 0.99) * 1000:>8.1f}ms {st.errors:>5}"
+        )
+
+
+async def run(
+    mix_name: str,
+    rates: list[float],
+    duration: float,
+    url: Optional[str],
+    report: Callable[[StepResult], None] = print_step,
+) -> list[StepResult]:
+    payloads = build_payloads()
+    if url:
+        transport: httpx.AsyncBaseTransport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=100)
+        )
+        base_url = url
+    else:
+        from main import app
+
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://loadtest"
+
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=120) as client:
+        # Warm-up: imports, caches, gazetteer
+        for route in MIXES[mix_name]:
+            method, path, kwargs = _request(route, payloads, random.Random(0))
+            await client.request(method, path, **kwargs)
+        for i, rate in enumerate(rates):
+            step = await run_step(
+                client, MIXES[mix_name], rate, duration, payloads,
+                seed=i, monitor_loop=url is None,
+            )
+            report(step)
+            results.append(step)
+
+    if results:
+        print(f"\nsaturation throughput ≈ {max(s.completed_rps for s in results):.1f} rps")
+    saturated = next((s for s in results if s.saturated), None)
+    if saturated:
+        print(f"first saturated step: offered {saturated.offered_rps:.1f} rps")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--mix", choices=sorted(MIXES), default="n8n")
+    parser.add_argument("--rates", default="5,10,20,40", help="offered requests/s per step")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per step")
+    parser.add_argument("--url", help="target a running server instead of the in-process app")
+    args = parser.parse_args()
+
+    # Per-request INFO logs would dominate an in-process run
+    logging.disable(logging.INFO)
+    asyncio.run(run(args.mix, [float(r) for r in args.rates.split(",")], args.duration, args.url))
+
+
+if __name__ == "__main__":
+    main()
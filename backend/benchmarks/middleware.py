@@ -0,0 +1,134 @@
+"""
+Request middleware overhead: BaseHTTPMiddleware vs pure ASGI.
+
+Drives a minimal FastAPI app (one JSON route, one streaming route) in-process
+through httpx.ASGITransport, bare and wrapped in
+
+  legacy   the former @app.middleware("http") request_logging_middleware
+           (Starlette BaseHTTPMiddleware: call_next task + memory stream)
+  asgi     middleware.RequestContextMiddleware
+
+and reports the mean per-request overhead over the bare app.  Logging is
+disabled so only the middleware mechanics are measured.
+
+Usage (from backend/):
+  python -m benchmarks.middleware [--requests 5000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+import uuid
+from typing import Any
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from middleware import RequestContextMiddleware
+
+logger = logging.getLogger(__name__)
+
+_ROUNDS = 5
+
+
+def _base_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping() -> dict[str, str]:
+        return {"status": "ok"}
+
+    @app.get("/stream")
+    async def stream() -> StreamingResponse:
+        async def rows() -> Any:
+            for i in range(100):
+                yield f"{i};row\r\n".encode()
+
+        return StreamingResponse(rows(), media_type="text/csv")
+
+    return app
+
+
+def _legacy_app() -> FastAPI:
+    app = _base_app()
+
+    # Request handling as in main.py before the pure-ASGI middleware
+    @app.middleware("http")
+    async def request_logging_middleware(request: Request, call_next: Any) -> Response:
+        request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
+        start = time.monotonic()
+        request.state.request_id = request_id
+        logger.info("→ %s %s  request_id=%s", request.method, request.url.path, request_id)
+        try:
+            response: Response = await call_next(request)
+        except Exception:
+            return JSONResponse(status_code=500, content={"error": "internal"})
+        duration_ms = round((time.monotonic() - start) * 1000, 2)
+        response.headers["X-Request-ID"] = request_id
+        response.headers["X-Processing-Time-MS"] = str(duration_ms)
+        logger.info("← %d %s %.1fms", response.status_code, request_id, duration_ms)
+        return response
+
+    return app
+
+
+def _asgi_app() -> FastAPI:
+    app = _base_app()
+    app.add_middleware(RequestContextMiddleware)
+    return app
+
+
+async def _time_requests(app: FastAPI, path: str, n: int) -> float:
+    """Best-of-rounds mean seconds per request."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(50):
+            await client.get(path)
+        rounds = []
+        for _ in range(_ROUNDS):
+            start = time.perf_counter()
+            for _ in range(n):
+                await client.get(path)
+            rounds.append((time.perf_counter() - start) / n)
+    return min(rounds)
+
+
+def run(n: int) -> dict[str, dict[str, float]]:
+    apps = {"bare": _base_app(), "legacy": _legacy_app(), "asgi": _asgi_app()}
+    results: dict[str, dict[str, float]] = {}
+    for path in ("/ping", "/stream"):
+        results[path] = {
+            name: asyncio.run(_time_requests(app, path, n)) for name, app in apps.items()
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=5_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    results = run(args.requests)
+    print(f"{'route':<10} {'bare':>10} {'legacy':>18} {'asgi':>18}")
+    for path, timings in results.items():
+        bare = timings["bare"]
+        cells = [f"{bare * 1e6:>8.1f}µs"]
+        for name in ("legacy", "asgi"):
+            overhead = (timings[name] - bare) * 1e6
+            cells.append(f"{timings[name] * 1e6:>8.1f}µs (+{overhead:>5.1f})")
+        print(f"{path:<10} " + " ".join(cells))
+    legacy = statistics.mean(t["legacy"] - t["bare"] for t in results.values())
+    asgi = statistics.mean(t["asgi"] - t["bare"] for t in results.values())
+    if asgi > 0:
+        print(f"\nmiddleware overhead: legacy {legacy * 1e6:.1f}µs, asgi {asgi * 1e6:.1f}µs "
+              f"({legacy / asgi:.1f}× less)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+NER backend benchmark: regex-only vs gazetteer vs spaCy.
+
+Measures throughput (texts/s) and per-text latency (p50/p99) of
+pii_sanitizer detection on synthetic Buchungstext/e-mail snippets, once per
+text (single path) and once through _detect_entities_batch (batch path).
+
+The detection cache is disabled unless --cache is given, so the numbers
+reflect raw detection cost.
+
+Usage (from backend/):
+  python -m benchmarks.ner [--texts 5000] [--model de_core_news_sm] [--cache]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+
+import pii_sanitizer
+from pii_cache import detection_cache
+from name_gazetteer import gazetteer_ner_backend
+from ner_spacy import SpacyNerBackend
+
+_TEMPLATES = [
+    "Miete Büro {month}",
+    "Gehalt {month} {first} {last}",
+    "Rechnung RE-{num} Materiallieferung",
+    "Sehr geehrter Herr {last}, anbei die Rechnung {num}.",
+    "Überweisung von {first} {last}, IBAN DE89 3704 0044 0532 0130 00",
+    "Kontakt: {first_l}.{last_l}@example.de, Tel. +49 30 {num}",
+    "werkzeugkauf baumarkt {num}",
+    "Abschlag {num} Heizungsinstallation Baustelle {last}straße",
+]
+_FIRST = ["Max", "Anna", "Thomas", "Sabine", "Jürgen", "Lena"]
+_LAST = ["Mustermann", "Müller", "Schmidt", "Weber", "Becker", "Hoffmann"]
+_MONTHS = ["Januar", "Februar", "März", "April"]
+
+
+def make_texts(n: int, seed: int = 42) -> list[str]:
+    rnd = random.Random(seed)
+    texts = []
+    for _ in range(n):
+        first, last = rnd.choice(_FIRST), rnd.choice(_LAST)
+        texts.append(
+            rnd.choice(_TEMPLATES).format(
+                month=rnd.choice(_MONTHS),
+                first=first,
+                last=last,
+                first_l=first.lower(),
+                last_l=last.lower(),
+                num=rnd.randint(1000, 99999999),
+            )
+        )
+    return texts
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def run_backend(label: str, backend, texts: list[str]) -> None:
+    pii_sanitizer.register_ner_backend(backend)
+
+    # Warm-up (model load, regex caches)
+    pii_sanitizer._detect_entities_batch(texts[:10])
+
+    latencies: list[float] = []
+    t0 = time.perf_counter()
+    for t in texts:
+        s = time.perf_counter()
+        pii_sanitizer._detect_entities(t)
+        latencies.append((time.perf_counter() - s) * 1000)
+    single_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    pii_sanitizer._detect_entities_batch(texts)
+    batch_s = time.perf_counter() - t0
+
+    print(
+        f"{label:<12} single: {len(texts) / single_s:>9.0f} texts/s  "
+        f"p50={statistics.median(latencies):.3f}ms p99={_percentile(latencies, 0.99):.3f}ms  "
+        f"| batch: {len(texts) / batch_s:>9.0f} texts/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--texts", type=int, default=5000)
+    parser.add_argument("--model", default=None, help="spaCy model (default: PII_SPACY_MODEL)")
+    parser.add_argument("--cache", action="store_true", help="keep the detection cache enabled")
+    args = parser.parse_args()
+
+    if not args.cache:
+        detection_cache.max_text_len = -1
+
+    texts = make_texts(args.texts)
+    original = pii_sanitizer._ner_backend
+    try:
+        run_backend("regex-only", None, texts)
+        run_backend("gazetteer", gazetteer_ner_backend, texts)
+        spacy_backend = SpacyNerBackend(args.model) if args.model else SpacyNerBackend()
+        spacy_backend.warm()
+        if spacy_backend._nlp is not None:
+            run_backend("spacy", spacy_backend, texts)
+        else:
+            print("spacy        skipped (spaCy or model not installed)")
+    finally:
+        pii_sanitizer.register_ner_backend(original)
+
+
+if __name__ == "__main__":
+    main()
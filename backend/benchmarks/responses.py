@@ -0,0 +1,237 @@
+"""
+Response rendering benchmark: FastAPI default path vs ModelResponse.
+
+For each JSON endpoint a representative response model is rendered twice:
+
+  before  what FastAPI does for a returned model – validate it against the
+          route's response field, serialize to Python primitives, then
+          JSONResponse (json.dumps)
+  after   ModelResponse(model) – pydantic-core writes JSON directly
+
+Both outputs are decoded and compared, so a speed-up never hides a change
+of the wire format.  If msgpack / pyarrow are installed, the binary
+encodings of transport.py are timed and sized as well.
+
+Usage (from backend/):
+  python -m benchmarks.responses [--rows 10000] [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from decimal import Decimal
+from typing import Any, Callable
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+import gobd_csv
+import math_guardrail
+import pii_sanitizer
+import reconciliation
+from models import (
+    CSVRow,
+    EntityFound,
+    GoBDTransaction,
+    GoBDValidationResult,
+    GoBDViolation,
+    LineItemResult,
+    MathValidateBatchResponse,
+    MathValidateResponse,
+    ParseResult,
+    PiiSanitizeBatchResponse,
+    PiiSanitizeResponse,
+    ReconcileMatch,
+    ReconcileResponse,
+    SanitizeMode,
+    TrafficLight,
+)
+from rendering import ModelResponse
+from transport import (
+    ARROW,
+    ARROW_AVAILABLE,
+    ARROW_TABLES,
+    MSGPACK,
+    encode_model,
+    msgpack,
+)
+
+
+def _csv_row(rnd: random.Random, i: int) -> dict[str, Any]:
+    return {
+        "datum": f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.2024",
+        "belegnummer": f"RE-{i:06d}",
+        "buchungstext": f"Rechnung {i} Materiallieferung Baustelle",
+        "betrag": Decimal(rnd.randint(-500_000, 500_000)) / 100,
+        "konto": "4980",
+        "gegenkonto": "1600",
+    }
+
+
+def make_parse_result(n: int, rnd: random.Random) -> ParseResult:
+    rows = [CSVRow(**_csv_row(rnd, i)) for i in range(n)]
+    return ParseResult(
+        rows=rows, errors=[], total_rows=n, valid_rows=n, invalid_rows=0
+    )
+
+
+def make_gobd_result(n: int, rnd: random.Random) -> GoBDValidationResult:
+    prepared = []
+    for i in range(n):
+        row = _csv_row(rnd, i)
+        prepared.append(
+            GoBDTransaction(
+                **dict(row, betrag=abs(row["betrag"])),
+                soll_haben="S" if row["betrag"] >= 0 else "H",
+                fiscal_year=2024,
+                period=int(row["datum"][3:5]),
+                created_at="2024-06-01T12:00:00+00:00",
+            )
+        )
+    violations = [
+        GoBDViolation(
+            violation_type="SEQUENCE_GAP", row_index=i, belegnummer=f"RE-{i:06d}",
+            detail="Gap in Belegnummer sequence",
+        )
+        for i in range(0, n, 50)
+    ]
+    return GoBDValidationResult(
+        valid=False,
+        violations=violations,
+        prepared_rows=prepared,
+        summary={
+            "total_entries": n,
+            "total_debit": sum((t.betrag for t in prepared), Decimal("0")),
+            "total_credit": Decimal("0"),
+            "period": "2024",
+        },
+    )
+
+
+def make_math_batch(n: int, rnd: random.Random) -> MathValidateBatchResponse:
+    results = []
+    for _ in range(n):
+        total = round(rnd.uniform(1, 900), 2)
+        results.append(
+            MathValidateResponse(
+                valid=True,
+                confidence=1.0,
+                traffic_light=TrafficLight.GREEN,
+                corrected_brutto=round(total * 1.19, 2),
+                stated_brutto=round(total * 1.19, 2),
+                delta_brutto=0.0,
+                errors=[],
+                warnings=[],
+                line_item_results=[
+                    LineItemResult(
+                        index=0, qty=1, unit_price=total, stated_total=total,
+                        computed_total=total, delta=0.0, valid=True,
+                    )
+                ],
+            )
+        )
+    return MathValidateBatchResponse(results=results, total=n, valid_count=n)
+
+
+def make_pii_batch(n: int, rnd: random.Random) -> PiiSanitizeBatchResponse:
+    results = [
+        PiiSanitizeResponse(
+            sanitized_text="Überweisung von [NAME], IBAN [IBAN]",
+            entities_found=[
+                EntityFound(type="IBAN", original="DE89370400440532013000",
+                            replacement="[IBAN]", start=28, end=55, confidence=0.99),
+            ],
+            entity_count=1,
+            mode_used=SanitizeMode.MASK,
+        )
+        for _ in range(n)
+    ]
+    return PiiSanitizeBatchResponse(results=results, entity_count=n)
+
+
+def make_reconcile(n: int, rnd: random.Random) -> ReconcileResponse:
+    matches = [
+        ReconcileMatch(
+            transaction_index=i, belegnummer=f"BANK-{i}", betrag=Decimal("119.00"),
+            invoice_id=f"inv-{i}", rechnungsnummer=f"RE-{i:06d}",
+            match_type="reference_amount", confidence=0.99, difference=Decimal("0.00"),
+            reasons=["invoice number in reference", "amount matches"],
+        )
+        for i in range(n)
+    ]
+    return ReconcileResponse(
+        matches=matches, unmatched_transactions=[], unmatched_invoices=[],
+        transaction_count=n, invoice_count=n,
+    )
+
+
+CASES: list[tuple[str, str, Callable[[int, random.Random], Any]]] = [
+    ("/api/csv/parse", "ParseResult", make_parse_result),
+    ("/api/gobd/prepare", "GoBDValidationResult", make_gobd_result),
+    ("/math/validate-batch", "MathValidateBatchResponse", make_math_batch),
+    ("/pii/sanitize-batch", "PiiSanitizeBatchResponse", make_pii_batch),
+    ("/reconcile/match", "ReconcileResponse", make_reconcile),
+]
+
+
+def _response_field(path: str):
+    for module in (gobd_csv, math_guardrail, pii_sanitizer, reconciliation):
+        for route in module.router.routes:
+            if isinstance(route, APIRoute) and route.path == path:
+                return route.response_field
+    raise LookupError(path)
+
+
+def _best_of(repeat: int, fn: Callable[[], bytes]) -> tuple[float, bytes]:
+    best, body = float("inf"), b""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        body = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, body
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    for path, name, make in CASES:
+        model = make(args.rows, rnd)
+        field = _response_field(path)
+
+        def before() -> bytes:
+            content = asyncio.run(serialize_response(field=field, response_content=model))
+            return JSONResponse(content).body
+
+        def after() -> bytes:
+            return ModelResponse(model).body
+
+        t_before, body_before = _best_of(args.repeat, before)
+        t_after, body_after = _best_of(args.repeat, after)
+        same = json.loads(body_before) == json.loads(body_after)
+        print(
+            f"{path:<22} {name:<26} before {t_before * 1000:>8.1f}ms  "
+            f"after {t_after * 1000:>7.1f}ms  ×{t_before / t_after:>4.1f}  "
+            f"{len(body_after) / 1024:>7.0f} KiB  identical={same}"
+        )
+        for label, media_type, available in (
+            ("msgpack", MSGPACK, msgpack is not None),
+            ("arrow", ARROW, ARROW_AVAILABLE and type(model) in ARROW_TABLES),
+        ):
+            if available:
+                t_bin, body = _best_of(args.repeat, lambda: encode_model(model, media_type))
+                print(
+                    f"{'':<22} {'  ' + label:<26} {'':>17}  "
+                    f"encode {t_bin * 1000:>6.1f}ms  {'':>5}  {len(body) / 1024:>7.0f} KiB"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Benchmark suite for the Zone 2 backend with baseline regression gating.
+
+Every scenario drives one endpoint in-process through TestClient (ASGI, no
+network) with synthetic data from benchmarks.data and records:
+
+  throughput    work units per second (rows, invoices, texts, images)
+  p50_ms/p99_ms per-request latency
+  peak_rss_mib  process peak RSS after the scenario (getrusage)
+
+Scales (--scale): small = 10k journal rows, medium = 100k, large = 1M.
+Journals larger than the CSV upload limit are sent in chunks below it,
+as a client would.
+
+Baselines are JSON files (default benchmarks/baselines/<scale>.json).
+--save-baseline writes the current run; otherwise the run is compared with
+the baseline and the process exits with status 1 if a scenario regressed
+by more than --threshold: lower throughput, higher p99, or higher peak RSS.
+Baselines are machine-specific – record them on the machine that gates,
+with the same --scale and --only (peak RSS accumulates over the run).
+
+Usage (from backend/):
+  python -m benchmarks.suite [--scale small] [--only csv_parse,math]
+                             [--save-baseline] [--threshold 0.25]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import platform
+import resource
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from benchmarks import data
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+SCALES: dict[str, dict[str, int]] = {
+    "small": {"rows": 10_000, "invoices": 2_000, "texts": 2_000, "scans": 3, "reconcile": 2_000},
+    "medium": {"rows": 100_000, "invoices": 20_000, "texts": 10_000, "scans": 5, "reconcile": 20_000},
+    "large": {"rows": 1_000_000, "invoices": 200_000, "texts": 50_000, "scans": 10, "reconcile": 100_000},
+}
+
+# Requests of the single-item scenarios (latency-oriented)
+_SINGLE_REQUESTS = 500
+_PREPARE_CHUNK = 10_000
+_BATCH_INVOICES = 5_000
+_BATCH_TEXTS = 1_000
+
+
+@dataclass
+class Result:
+    scenario: str
+    unit: str
+    units: int
+    requests: int
+    throughput: float
+    p50_ms: float
+    p99_ms: float
+    peak_rss_mib: float
+
+
+# A scenario yields (method, path, request kwargs, work units) tuples
+Requests = Iterator[tuple[str, str, dict[str, Any], int]]
+
+
+# ---------------------------------------------------------------------------
+# Scenarios
+# ---------------------------------------------------------------------------
+
+
+def _csv_parse(encoding: str) -> Callable[[dict[str, int]], Requests]:
+    def scenario(scale: dict[str, int]) -> Requests:
+        from gobd_csv import MAX_CSV_BYTES
+
+        journal = data.make_journal(scale["rows"], encoding)
+        # Leave room for the multipart envelope
+        for chunk in data.split_journal(journal, MAX_CSV_BYTES - 64 * 1024):
+            rows = chunk.count(b"\r\n") - 1
+            yield "POST", "/api/csv/parse", {"files": {"file": ("journal.csv", chunk)}}, rows
+
+    return scenario
+
+
+def _gobd_prepare(scale: dict[str, int]) -> Requests:
+    rows = data.journal_rows(scale["rows"])
+    for start in range(0, len(rows), _PREPARE_CHUNK):
+        chunk = rows[start:start + _PREPARE_CHUNK]
+        yield "POST", "/api/gobd/prepare", {"json": chunk}, len(chunk)
+
+
+def _math_validate(scale: dict[str, int]) -> Requests:
+    for invoice in data.make_invoices(min(scale["invoices"], _SINGLE_REQUESTS)):
+        yield "POST", "/math/validate", {"json": invoice}, 1
+
+
+def _math_validate_batch(scale: dict[str, int]) -> Requests:
+    invoices = data.make_invoices(scale["invoices"])
+    for start in range(0, len(invoices), _BATCH_INVOICES):
+        chunk = invoices[start:start + _BATCH_INVOICES]
+        yield "POST", "/math/validate-batch", {"json": {"invoices": chunk}}, len(chunk)
+
+
+def _pii_sanitize(scale: dict[str, int]) -> Requests:
+    for text in data.make_pii_texts(min(scale["texts"], _SINGLE_REQUESTS)):
+        yield "POST", "/pii/sanitize", {"json": {"text": text}}, 1
+
+
+def _pii_sanitize_batch(scale: dict[str, int]) -> Requests:
+    texts = data.make_pii_texts(scale["texts"])
+    for start in range(0, len(texts), _BATCH_TEXTS):
+        chunk = texts[start:start + _BATCH_TEXTS]
+        yield "POST", "/pii/sanitize-batch", {"json": {"texts": chunk}}, len(chunk)
+
+
+def _image_preprocess(scale: dict[str, int]) -> Requests:
+    for seed in range(scale["scans"]):
+        scan = data.make_scan(seed)
+        yield "POST", "/image/preprocess", {"files": {"file": ("scan.jpg", scan)}}, 1
+
+
+def _reconcile(scale: dict[str, int]) -> Requests:
+    body = data.make_bank_and_open_items(scale["reconcile"])
+    yield "POST", "/reconcile/match", {"json": body}, len(body["transactions"])
+
+
+SCENARIOS: dict[str, tuple[str, Callable[[dict[str, int]], Requests]]] = {
+    "csv_parse_utf8": ("rows", _csv_parse("utf-8")),
+    "csv_parse_cp1252": ("rows", _csv_parse("windows-1252")),
+    "csv_parse_utf8_bom": ("rows", _csv_parse("utf-8-sig")),
+    "gobd_prepare": ("rows", _gobd_prepare),
+    "math_validate": ("invoices", _math_validate),
+    "math_validate_batch": ("invoices", _math_validate_batch),
+    "pii_sanitize": ("texts", _pii_sanitize),
+    "pii_sanitize_batch": ("texts", _pii_sanitize_batch),
+    "image_preprocess": ("images", _image_preprocess),
+    "reconcile": ("transactions", _reconcile),
+}
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+
+def peak_rss_mib() -> float:
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def run_scenario(client: Any, name: str, scale: dict[str, int]) -> Result:
+    unit, scenario = SCENARIOS[name]
+    # Materialise the workload first so data generation is not timed
+    requests = list(scenario(scale))
+
+    # Warm-up: first request pays imports, caches, model loads
+    method, path, kwargs, _ = requests[0]
+    client.request(method, path, **kwargs)
+
+    latencies: list[float] = []
+    units = 0
+    for method, path, kwargs, n in requests:
+        start = time.perf_counter()
+        resp = client.request(method, path, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        if resp.status_code != 200:
+            raise RuntimeError(f"{name}: {path} returned {resp.status_code}: {resp.text[:200]}")
+        units += n
+
+    total = sum(latencies)
+    return Result(
+        scenario=name,
+        unit=unit,
+        units=units,
+        requests=len(requests),
+        throughput=round(units / total, 1) if total else 0.0,
+        p50_ms=round(statistics.median(latencies) * 1000, 3),
+        p99_ms=round(_percentile(latencies, 0.99) * 1000, 3),
+        peak_rss_mib=round(peak_rss_mib(), 1),
+    )
+
+
+def run_suite(scale_name: str, only: Optional[list[str]] = None) -> list[Result]:
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    names = [n for n in SCENARIOS if not only or any(n.startswith(o) for o in only)]
+    scale = SCALES[scale_name]
+    # Per-request INFO logs would dominate the timings
+    logging.disable(logging.INFO)
+    try:
+        with TestClient(app) as client:
+            return [run_scenario(client, name, scale) for name in names]
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+# ---------------------------------------------------------------------------
+# Baselines
+# ---------------------------------------------------------------------------
+
+
+def save_baseline(results: list[Result], path: Path, scale_name: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "meta": {
+            "scale": scale_name,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+        },
+        "results": {r.scenario: asdict(r) for r in results},
+    }
+    path.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+
+
+def load_baseline(path: Path) -> dict[str, dict[str, Any]]:
+    return json.loads(path.read_text(encoding="utf-8"))["results"]
+
+
+def compare(
+    results: list[Result], baseline: dict[str, dict[str, Any]], threshold: float
+) -> list[str]:
+    """Regressions beyond threshold (relative) against the baseline."""
+    regressions: list[str] = []
+    for r in results:
+        base = baseline.get(r.scenario)
+        if base is None:
+            continue
+        if r.throughput < base["throughput"] * (1 - threshold):
+            regressions.append(
+                f"{r.scenario}: throughput {r.throughput:.1f} {r.unit}/s "
+                f"< baseline {base['throughput']:.1f} (-{1 - r.throughput / base['throughput']:.0%})"
+            )
+        if r.p99_ms > base["p99_ms"] * (1 + threshold):
+            regressions.append(
+                f"{r.scenario}: p99 {r.p99_ms:.1f}ms > baseline {base['p99_ms']:.1f}ms "
+                f"(+{r.p99_ms / base['p99_ms'] - 1:.0%})"
+            )
+        if r.peak_rss_mib > base["peak_rss_mib"] * (1 + threshold):
+            regressions.append(
+                f"{r.scenario}: peak RSS {r.peak_rss_mib:.0f} MiB > baseline "
+                f"{base['peak_rss_mib']:.0f} MiB"
+            )
+    return regressions
+
+
+def _print_results(results: list[Result], baseline: dict[str, dict[str, Any]]) -> None:
+    print(
+        f"{'scenario':<22} {'throughput':>25} {'p50':>10} {'p99':>10} "
+        f"{'peak RSS':>10} {'vs baseline':>12}"
+    )
+    for r in results:
+        base = baseline.get(r.scenario)
+        change = f"{r.throughput / base['throughput'] - 1:+.0%}" if base else "–"
+        print(
+            f"{r.scenario:<22} {r.throughput:>10.1f} {r.unit + '/s':<14} "
+            f"{r.p50_ms:>8.2f}ms {r.p99_ms:>8.2f}ms {r.peak_rss_mib:>7.0f}MiB {change:>12}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--only", help="comma-separated scenario name prefixes")
+    parser.add_argument("--baseline", type=Path, help="baseline JSON path")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    path = args.baseline or BASELINE_DIR / f"{args.scale}.json"
+    results = run_suite(args.scale, args.only.split(",") if args.only else None)
+
+    if args.save_baseline:
+        _print_results(results, {})
+        save_baseline(results, path, args.scale)
+        print(f"baseline written to {path}")
+        return
+
+    baseline = load_baseline(path) if path.exists() else {}
+    _print_results(results, baseline)
+    if not baseline:
+        print(f"no baseline at {path} – run with --save-baseline to create one")
+        return
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\nno regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Listener benchmark: per-request overhead over TCP loopback vs a Unix socket.
+
+Starts `prefork.py` (one worker by default, --profile local) listening on
+both a loopback TCP port and a Unix domain socket, then sends small
+requests one at a time from a minimal HTTP/1.1 client (so the client's own
+cost stays small next to what is measured):
+
+  keep-alive   one persistent connection, as a pooling client (n8n HTTP
+               node, httpx) uses it
+  new conn     connect, request, close – clients without pooling, and the
+               cost of the connection set-up itself
+
+Endpoints: /health/live (no work: the listener and HTTP stack alone),
+/pii/sanitize and /api/validate/invoice with small payloads.  Reports p50,
+p99 and mean latency per transport and the UDS saving against TCP.
+
+Usage (from backend/):
+  python -m benchmarks.uds [--requests 3000] [--profile local] [--workers 1]
+                           [--server-arg=--h2c ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+Address = Union[str, tuple[str, int]]
+
+CASES: list[tuple[str, str, Optional[dict]]] = [
+    ("GET", "/health/live", None),
+    ("POST", "/pii/sanitize", {
+        "text": "Überweisung von Max Mustermann, IBAN DE89370400440532013000",
+        "mode": "mask",
+    }),
+    ("POST", "/api/validate/invoice", {
+        "datum": "15.03.2024",
+        "belegnummer": "RE-005",
+        "buchungstext": "Materiallieferung",
+        "betrag": "595.00",
+        "konto": "4980",
+        "gegenkonto": "1600",
+    }),
+]
+
+
+def build_request(method: str, path: str, payload: Optional[dict], keep_alive: bool) -> bytes:
+    body = json.dumps(payload).encode() if payload is not None else b""
+    lines = [
+        f"{method} {path} HTTP/1.1",
+        "Host: localhost",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    if payload is not None:
+        lines += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+
+
+def _connect(address: Address) -> socket.socket:
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.connect(address)
+    return sock
+
+
+def _exchange(sock: socket.socket, request: bytes, buffer: bytearray) -> int:
+    """Send one request and read its response; returns the status code."""
+    sock.sendall(request)
+    while b"\r\n\r\n" not in buffer:
+        chunk = sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("connection closed before the response head")
+        buffer += chunk
+    head, _, rest = bytes(buffer).partition(b"\r\n\r\n")
+    length = 0
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    while len(rest) < length:
+        chunk = sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("connection closed before the response body")
+        rest += chunk
+    buffer[:] = rest[length:]
+    return int(head.split(b" ", 2)[1])
+
+
+def measure(address: Address, request: bytes, n: int, keep_alive: bool) -> list[float]:
+    latencies = []
+    buffer = bytearray()
+    sock = _connect(address) if keep_alive else None
+    try:
+        for _ in range(n):
+            t0 = time.perf_counter()
+            if not keep_alive:
+                sock = _connect(address)
+                buffer.clear()
+            assert sock is not None
+            status = _exchange(sock, request, buffer)
+            if not keep_alive:
+                sock.close()
+            latencies.append(time.perf_counter() - t0)
+            if status != 200:
+                raise RuntimeError(f"unexpected status {status}")
+    finally:
+        if sock is not None:
+            sock.close()
+    return latencies
+
+
+def start_server(port: int, uds: str, args: argparse.Namespace) -> subprocess.Popen:
+    env = dict(os.environ, LOG_LEVEL="WARNING", WARMUP="off", PREFORK_MEMORY_REPORT_S="0")
+    proc = subprocess.Popen(
+        [sys.executable, "prefork.py", "--profile", args.profile, "--host", "127.0.0.1",
+         "--port", str(port), "--uds", uds, "--workers", str(args.workers), *args.server_arg],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    request = build_request("GET", "/health/live", None, keep_alive=False)
+    deadline = time.monotonic() + 60
+    for address in (("127.0.0.1", port), uds):
+        while True:
+            try:
+                with _connect(address) as sock:
+                    _exchange(sock, request, bytearray())
+                break
+            except OSError:
+                if proc.poll() is not None or time.monotonic() > deadline:
+                    proc.kill()
+                    raise RuntimeError(f"server did not start: {proc.communicate()[1][-2000:]}")
+                time.sleep(0.2)
+    return proc
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _summary(latencies: list[float]) -> tuple[float, float, float]:
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return statistics.median(ordered) * 1e6, p99 * 1e6, statistics.fmean(ordered) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--profile", default="local")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--server-arg", action="append", default=[],
+        help="extra prefork.py option, e.g. --server-arg=--http=h11",
+    )
+    args = parser.parse_args()
+
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        uds = os.path.join(tmp, "backend.sock")
+        proc = start_server(port, uds, args)
+        try:
+            print(
+                f"prefork.py --profile {args.profile} --workers {args.workers} "
+                f"{' '.join(args.server_arg)}  ({args.requests} sequential requests per row)"
+            )
+            print(
+                f"{'endpoint':<24} {'connection':<11} {'transport':<9} "
+                f"{'p50 µs':>8} {'p99 µs':>8} {'mean µs':>8}  {'vs tcp':>7}"
+            )
+            for method, path, payload in CASES:
+                for keep_alive in (True, False):
+                    request = build_request(method, path, payload, keep_alive)
+                    mode = "keep-alive" if keep_alive else "new conn"
+                    means: dict[str, float] = {}
+                    for transport, address in (("tcp", ("127.0.0.1", port)), ("uds", uds)):
+                        measure(address, request, min(200, args.requests), keep_alive)  # warm-up
+                        p50, p99, mean = _summary(
+                            measure(address, request, args.requests, keep_alive)
+                        )
+                        means[transport] = mean
+                        delta = (
+                            f"{(mean / means['tcp'] - 1) * 100:>+6.1f}%" if transport == "uds" else ""
+                        )
+                        print(
+                            f"{path:<24} {mode:<11} {transport:<9} "
+                            f"{p50:>8.0f} {p99:>8.0f} {mean:>8.0f}  {delta:>7}"
+                        )
+        finally:
+            proc.terminate()
+            proc.communicate(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Response compression (zstd, brotli, gzip).
+
+CompressionMiddleware is a pure ASGI middleware.  The encoding is negotiated
+from Accept-Encoding (q-values honoured; at equal q the server prefers zstd,
+then br, then gzip, which is the order of compression speed at a useful
+ratio).  zstd and brotli need their optional packages; gzip is always
+available.
+
+  Thresholds   Complete bodies below COMPRESSION_MIN_BYTES are sent as they
+               are – the framing would cost more than it saves.  Bodies of
+               COMPRESSION_OFFLOAD_BYTES and more are compressed in the thread
+               pool, so a multi-megabyte ParseResult does not stall the event
+               loop; smaller ones inline.
+  Streaming    A response that arrives in several body messages
+               (StreamingResponse, e.g. the DATEV export) is compressed
+               incrementally with a streaming encoder; Content-Length is
+               dropped and the encoded stream ends with the encoder's flush.
+  Skipped      Responses that already carry Content-Encoding, media types
+               that are compressed already (images, archives, PDF) or must
+               not be buffered (text/event-stream), 204/304 responses and
+               requests that accept no supported encoding.
+
+Compressed responses carry "Vary: Accept-Encoding".  Bytes before and after
+compression are counted per encoding:
+
+  compression_input_bytes_total{encoding}
+  compression_output_bytes_total{encoding}
+
+Configuration (environment):
+  COMPRESSION_MIN_BYTES       (default 1024)
+  COMPRESSION_OFFLOAD_BYTES   (default 262144)
+  COMPRESSION_GZIP_LEVEL      (default 6)
+  COMPRESSION_BROTLI_QUALITY  (default 4; 11 is far too slow for responses)
+  COMPRESSION_ZSTD_LEVEL      (default 3)
+
+Install (optional encodings):
+  pip install zstandard brotli
+"""
+
+from __future__ import annotations
+
+import os
+import zlib
+from typing import Any, Callable, Optional
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from metrics import counter
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_OFFLOAD_BYTES = int(os.getenv("COMPRESSION_OFFLOAD_BYTES", str(256 * 1024)))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+
+COMPRESSION_INPUT = counter(
+    "compression_input_bytes_total", "Response bytes before compression", ("encoding",)
+)
+COMPRESSION_OUTPUT = counter(
+    "compression_output_bytes_total", "Response bytes after compression", ("encoding",)
+)
+
+# Server preference at equal q
+ENCODINGS: tuple[str, ...] = tuple(
+    name
+    for name, available in (("zstd", zstandard is not None), ("br", brotli is not None), ("gzip", True))
+    if available
+)
+
+_INCOMPRESSIBLE_PREFIXES = ("image/", "video/", "audio/", "font/woff")
+_INCOMPRESSIBLE_TYPES = frozenset({
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/zstd",
+    "application/x-bzip2",
+    "application/x-7z-compressed",
+    "application/pdf",
+    "application/octet-stream",
+    "text/event-stream",
+})
+
+
+# ---------------------------------------------------------------------------
+# Encoders
+# ---------------------------------------------------------------------------
+
+
+class Encoder:
+    """Streaming encoder: compress() chunks, then finish() once."""
+
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding
+        self.compress: Callable[[bytes], bytes]
+        self.finish: Callable[[], bytes]
+        if encoding == "zstd":
+            obj: Any = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+            self.compress, self.finish = obj.compress, obj.flush
+        elif encoding == "br":
+            obj = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+            self.compress, self.finish = obj.process, obj.finish
+        elif encoding == "gzip":
+            # wbits 31: gzip container
+            obj = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.compress, self.finish = obj.compress, obj.flush
+        else:
+            raise ValueError(f"unsupported encoding {encoding!r}")
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """One-shot compression of a complete body."""
+    if encoding == "zstd":
+        # Records the content size in the frame header
+        return zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compress(data)
+    if encoding == "br":
+        return brotli.compress(data, quality=COMPRESSION_BROTLI_QUALITY)
+    encoder = Encoder(encoding)
+    return encoder.compress(data) + encoder.finish()
+
+
+def negotiate_encoding(accept_encoding: Optional[str], offered: tuple[str, ...] = ENCODINGS) -> Optional[str]:
+    """Best offered encoding for an Accept-Encoding header, None for identity."""
+    if not accept_encoding:
+        return None
+    q_values: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            q_values[name] = q
+    wildcard = q_values.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in offered:
+        q = q_values.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return not (media_type.startswith(_INCOMPRESSIBLE_PREFIXES) or media_type in _INCOMPRESSIBLE_TYPES)
+
+
+async def _run(fn: Callable[[bytes], bytes], data: bytes) -> bytes:
+    if len(data) >= COMPRESSION_OFFLOAD_BYTES:
+        return await anyio.to_thread.run_sync(fn, data)
+    return fn(data)
+
+
+# ---------------------------------------------------------------------------
+# ASGI middleware
+# ---------------------------------------------------------------------------
+
+
+class CompressionMiddleware:
+    """Compresses response bodies with the negotiated encoding."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_BYTES) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        encoder: Optional[Encoder] = None
+        passthrough = False
+        counted_in = COMPRESSION_INPUT.labels(encoding)
+        counted_out = COMPRESSION_OUTPUT.labels(encoding)
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if message["status"] in (204, 304) or not _compressible(headers):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Held back until the first body message shows the size
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            body: bytes = message.get("body", b"")
+            more_body: bool = message.get("more_body", False)
+            headers = MutableHeaders(scope=start_message)
+
+            if encoder is None and not more_body:
+                # Complete body in one message
+                if len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressed = await _run(lambda data: compress(data, encoding), body)
+                counted_in.inc(len(body))
+                counted_out.inc(len(compressed))
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(compressed))
+                headers.add_vary_header("Accept-Encoding")
+                await send(start_message)
+                await send({"type": "http.response.body", "body": compressed})
+                return
+
+            if encoder is None:
+                # Streaming response: the total size is unknown
+                encoder = Encoder(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+                await send(start_message)
+
+            chunk = await _run(encoder.compress, body) if body else b""
+            if not more_body:
+                chunk += encoder.finish()
+            counted_in.inc(len(body))
+            counted_out.inc(len(chunk))
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
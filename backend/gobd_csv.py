@@ -32,10 +32,9 @@ import io
 import logging
 import re
 from datetime import datetime, date
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal
 from typing import Any
 
-import chardet
 from fastapi import APIRouter, File, HTTPException, UploadFile, status
 from fastapi.responses import StreamingResponse
 
@@ -48,12 +47,16 @@ from models import (
     InvoiceValidateRequest,
     InvoiceValidateResponse,
     ParseResult,
+    parse_german_decimal,
 )
+from metrics import CSV_ROWS_PARSED, GOBD_VIOLATIONS
 from pii_sanitizer import _detect_entities, _make_replacement, _apply_replacements, SanitizeMode
+from rendering import ModelResponse
+from transport import NegotiatedRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api", tags=["GoBD / DATEV"])
+router = APIRouter(prefix="/api", tags=["GoBD / DATEV"], route_class=NegotiatedRoute)
 
 # ---------------------------------------------------------------------------
 # Constants
@@ -104,6 +107,9 @@ _DATEV_FORMAT_CATEGORY = 21  # Buchungsstapel
 
 def _detect_encoding(raw: bytes) -> str:
     """Use chardet to detect CSV encoding; fall back to utf-8."""
+    # Imported on first use: keeps chardet out of workers that never parse CSV
+    import chardet
+
     result = chardet.detect(raw)
     enc = result.get("encoding") or "utf-8"
     # Normalise common Windows variants
@@ -118,54 +124,6 @@ def _normalise_column(name: str) -> str:
     return COLUMN_ALIASES.get(key, name.strip())
 
 
-def _parse_german_decimal(value: str) -> Decimal:
-    """
-    Parse a German-locale or English-locale decimal string to Decimal.
-
-    Locale detection rules:
-      - If the string contains a comma AND a dot:
-          The rightmost separator is the decimal separator.
-          If comma is last → German locale: remove dots, replace comma with dot.
-          If dot is last   → English locale: remove commas (they are thousands seps).
-      - If the string contains only a comma (no dot):
-          German locale: replace comma with dot.  e.g. "123,45" → "123.45"
-      - If the string contains only a dot (no comma):
-          English locale: use as-is.  e.g. "999.99" → "999.99"
-      - If neither: plain integer string.
-
-    Examples:
-      "1.234,56"  → Decimal("1234.56")   German thousands + decimal
-      "-1.234,56" → Decimal("-1234.56")
-      "1234.56"   → Decimal("1234.56")   English locale
-      "1234,56"   → Decimal("1234.56")   German locale (no thousands sep)
-      "1,234.56"  → Decimal("1234.56")   English thousands + decimal
-    """
-    s = value.strip()
-
-    has_comma = "," in s
-    has_dot = "." in s
-
-    if has_comma and has_dot:
-        # Determine which is the decimal separator by position of last occurrence
-        last_comma = s.rfind(",")
-        last_dot = s.rfind(".")
-        if last_comma > last_dot:
-            # German: "1.234,56" — dot = thousands sep, comma = decimal sep
-            s = s.replace(".", "").replace(",", ".")
-        else:
-            # English: "1,234.56" — comma = thousands sep, dot = decimal sep
-            s = s.replace(",", "")
-    elif has_comma:
-        # Only comma present → German decimal comma, e.g. "123,45"
-        s = s.replace(",", ".")
-    # else: only dot or no separator → already English locale, use as-is
-
-    try:
-        return Decimal(s)
-    except InvalidOperation as exc:
-        raise ValueError(f"Cannot parse '{value}' as a decimal number") from exc
-
-
 def _validate_german_date(date_str: str) -> tuple[bool, str]:
     """
     Validate a date string in DD.MM.YYYY format.
@@ -267,7 +225,7 @@ def _soll_haben(betrag: Decimal) -> str:
         "Buchungstext before logging. Returns parsed rows and validation errors."
     ),
 )
-async def parse_csv(file: UploadFile = File(...)) -> ParseResult:
+async def parse_csv(file: UploadFile = File(...)) -> ModelResponse:
     # --- Read file ---
     raw = await file.read(MAX_CSV_BYTES + 1)
     if len(raw) > MAX_CSV_BYTES:
@@ -367,7 +325,7 @@ async def parse_csv(file: UploadFile = File(...)) -> ParseResult:
         betrag_decimal: Decimal | None = None
         if betrag_raw:
             try:
-                betrag_decimal = _parse_german_decimal(betrag_raw)
+                betrag_decimal = parse_german_decimal(betrag_raw)
             except ValueError as exc:
                 row_errors.append(
                     {
@@ -384,15 +342,16 @@ async def parse_csv(file: UploadFile = File(...)) -> ParseResult:
 
         # --- PII scrub Buchungstext before constructing final row ---
         # (raw buchungstext is used in the data row; logging uses scrubbed version)
-        sanitized_log_text = _sanitize_for_log(buchungstext_raw)
-        logger.debug(
-            "csv_parse row=%d datum=%s beleg=%s text=%s betrag=%s",
-            row_index,
-            datum_raw,
-            belegnummer_raw,
-            sanitized_log_text,
-            betrag_decimal,
-        )
+        # Scrubbing runs PII detection, so only pay for it when DEBUG is on
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "csv_parse row=%d datum=%s beleg=%s text=%s betrag=%s",
+                row_index,
+                datum_raw,
+                belegnummer_raw,
+                _sanitize_for_log(buchungstext_raw),
+                betrag_decimal,
+            )
 
         rows.append(
             CSVRow(
@@ -413,14 +372,18 @@ async def parse_csv(file: UploadFile = File(...)) -> ParseResult:
         len(rows),
         len(parse_errors),
     )
-
-    return ParseResult(
-        rows=rows,
-        errors=parse_errors,
-        total_rows=len(rows) + len(parse_errors),
-        valid_rows=len(rows),
-        invalid_rows=len(parse_errors),
-        encoding_detected=encoding,
+    CSV_ROWS_PARSED.labels("valid").inc(len(rows))
+    CSV_ROWS_PARSED.labels("invalid").inc(len(parse_errors))
+
+    return ModelResponse(
+        ParseResult(
+            rows=rows,
+            errors=parse_errors,
+            total_rows=len(rows) + len(parse_errors),
+            valid_rows=len(rows),
+            invalid_rows=len(parse_errors),
+            encoding_detected=encoding,
+        )
     )
 
 
@@ -440,7 +403,7 @@ async def parse_csv(file: UploadFile = File(...)) -> ParseResult:
         "requires_human_approval=true to enforce the 95/5 review model."
     ),
 )
-async def prepare_gobd(transactions: list[CSVRow]) -> GoBDValidationResult:
+async def prepare_gobd(transactions: list[CSVRow]) -> ModelResponse:
     if not transactions:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -614,13 +577,17 @@ async def prepare_gobd(transactions: list[CSVRow]) -> GoBDValidationResult:
         len(violations),
         is_valid,
     )
-
-    return GoBDValidationResult(
-        valid=is_valid,
-        violations=violations,
-        prepared_rows=prepared,
-        summary=summary,
-        requires_human_approval=True,
+    for violation in violations:
+        GOBD_VIOLATIONS.labels(violation.violation_type).inc()
+
+    return ModelResponse(
+        GoBDValidationResult(
+            valid=is_valid,
+            violations=violations,
+            prepared_rows=prepared,
+            summary=summary,
+            requires_human_approval=True,
+        )
     )
 
 
@@ -826,7 +793,7 @@ async def export_datev(request: DATEVExportRequest) -> StreamingResponse:
         "checks sequential numbering against the previous document number."
     ),
 )
-async def validate_invoice(payload: InvoiceValidateRequest) -> InvoiceValidateResponse:
+async def validate_invoice(payload: InvoiceValidateRequest) -> ModelResponse:
     errors: list[str] = []
 
     # Required field checks
@@ -874,4 +841,4 @@ async def validate_invoice(payload: InvoiceValidateRequest) -> InvoiceValidateRe
         len(errors),
     )
 
-    return InvoiceValidateResponse(valid=is_valid, errors=errors)
+    return ModelResponse(InvoiceValidateResponse(valid=is_valid, errors=errors))
@@ -0,0 +1,333 @@
+"""
+Liveness and readiness
+GET /health/live
+GET /health/ready
+
+Liveness answers from the event loop without looking at anything else: if
+it responds, the worker is alive (restart it otherwise).  Readiness reports
+the dependency probes, which never run on the request path.  A background
+task started by the application lifespan runs them every
+HEALTH_PROBE_INTERVAL_S, each with a timeout, and renders the readiness
+response once per round; a request only returns the cached bytes.
+
+  ollama     GET {OLLAMA_BASE_URL}/api/tags; degraded if VISION_MODEL is not
+             pulled.  Only when the vision router is enabled; not critical
+             (the other endpoints work without it).
+  executor   Tasks waiting for the thread pool that runs sync endpoints and
+             run_in_threadpool work.
+  memory     Available memory: the smaller of MemAvailable and the cgroup
+             limit headroom (containers).
+  disk       Free space where uploads are spooled (the temp directory) and
+             where the PII token vault lives.
+
+A critical probe that fails – or whose result is older than
+HEALTH_PROBE_TTL_S because the refresher stalled – makes /health/ready answer
+503 "not_ready"; a failing non-critical probe gives 200 "degraded".  Before
+the first round completes the answer is 503 with status "pending".  Results
+are per worker and exported as health_probe_ok{probe}.
+
+Configuration (environment):
+  HEALTH_PROBE_INTERVAL_S      (default 10)
+  HEALTH_PROBE_TIMEOUT_S       (default 2)
+  HEALTH_PROBE_TTL_S           (default 30)
+  HEALTH_MIN_MEMORY_MB         (default 256)
+  HEALTH_MIN_DISK_MB           (default 512)
+  HEALTH_MAX_EXECUTOR_WAITING  (default 64)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+import anyio.to_thread
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from metrics import gauge
+from models import LivenessResponse, ProbeStatus, ReadinessResponse
+from rendering import ModelResponse
+from token_vault import VAULT_PATH
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/health", tags=["System"])
+
+HEALTH_PROBE_INTERVAL_S = float(os.getenv("HEALTH_PROBE_INTERVAL_S", "10"))
+HEALTH_PROBE_TIMEOUT_S = float(os.getenv("HEALTH_PROBE_TIMEOUT_S", "2"))
+HEALTH_PROBE_TTL_S = float(os.getenv("HEALTH_PROBE_TTL_S", "30"))
+HEALTH_MIN_MEMORY_MB = float(os.getenv("HEALTH_MIN_MEMORY_MB", "256"))
+HEALTH_MIN_DISK_MB = float(os.getenv("HEALTH_MIN_DISK_MB", "512"))
+HEALTH_MAX_EXECUTOR_WAITING = int(os.getenv("HEALTH_MAX_EXECUTOR_WAITING", "64"))
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+VISION_MODEL = os.getenv("VISION_MODEL", "moondream")
+
+HEALTH_PROBE_OK = gauge("health_probe_ok", "1 if the last run of the probe passed", ("probe",))
+
+_MIB = 1024 * 1024
+_STARTED = time.monotonic()
+
+# A probe returns (status, detail) with status "ok", "degraded" or "fail"
+ProbeFn = Callable[[], Awaitable[tuple[str, str]]]
+
+
+# ---------------------------------------------------------------------------
+# Probes
+# ---------------------------------------------------------------------------
+
+
+async def probe_ollama() -> tuple[str, str]:
+    import httpx
+
+    async with httpx.AsyncClient(timeout=HEALTH_PROBE_TIMEOUT_S) as client:
+        resp = await client.get(f"{OLLAMA_BASE_URL}/api/tags")
+    if resp.status_code != 200:
+        return "fail", f"/api/tags answered {resp.status_code}"
+    names = [m.get("name", "") for m in resp.json().get("models", [])]
+    if not any(n == VISION_MODEL or n.startswith(f"{VISION_MODEL}:") for n in names):
+        return "degraded", f"reachable, model '{VISION_MODEL}' not pulled"
+    return "ok", f"reachable, {len(names)} model(s)"
+
+
+async def probe_executor() -> tuple[str, str]:
+    stats = anyio.to_thread.current_default_thread_limiter().statistics()
+    detail = (
+        f"{stats.borrowed_tokens}/{stats.total_tokens} threads busy, "
+        f"{stats.tasks_waiting} waiting"
+    )
+    return ("fail" if stats.tasks_waiting > HEALTH_MAX_EXECUTOR_WAITING else "ok"), detail
+
+
+def available_memory() -> Optional[int]:
+    """Bytes this process can still allocate: MemAvailable, capped by the cgroup limit."""
+    available: Optional[int] = None
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    available = int(line.split()[1]) * 1024
+                    break
+    except (OSError, ValueError, IndexError):
+        pass
+    # cgroup v2, then v1
+    for limit_file, usage_file in (
+        ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+        (
+            "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+            "/sys/fs/cgroup/memory/memory.usage_in_bytes",
+        ),
+    ):
+        try:
+            with open(limit_file) as f:
+                limit = f.read().strip()
+            with open(usage_file) as f:
+                usage = int(f.read().strip())
+        except (OSError, ValueError):
+            continue
+        # "max" (v2) or a huge number (v1) means unlimited
+        if limit.isdigit() and int(limit) < 1 << 60:
+            headroom = max(0, int(limit) - usage)
+            available = headroom if available is None else min(available, headroom)
+        break
+    return available
+
+
+async def probe_memory() -> tuple[str, str]:
+    available = await asyncio.to_thread(available_memory)
+    if available is None:
+        return "ok", "not measurable on this platform"
+    detail = f"{available / _MIB:.0f} MiB available"
+    return ("fail" if available < HEALTH_MIN_MEMORY_MB * _MIB else "ok"), detail
+
+
+def _spool_dirs() -> list[str]:
+    vault_dir = os.path.dirname(os.path.abspath(VAULT_PATH))
+    return list(dict.fromkeys([tempfile.gettempdir(), vault_dir]))
+
+
+def _free_space() -> list[tuple[str, int]]:
+    free = []
+    for path in _spool_dirs():
+        # The vault directory is created on first use
+        while not os.path.exists(path) and os.path.dirname(path) != path:
+            path = os.path.dirname(path)
+        free.append((path, shutil.disk_usage(path).free))
+    return free
+
+
+async def probe_disk() -> tuple[str, str]:
+    free = await asyncio.to_thread(_free_space)
+    low = [path for path, space in free if space < HEALTH_MIN_DISK_MB * _MIB]
+    detail = ", ".join(f"{path}: {space / _MIB:.0f} MiB free" for path, space in free)
+    return ("fail" if low else "ok"), detail
+
+
+@dataclass(frozen=True)
+class Probe:
+    name: str
+    run: ProbeFn
+    critical: bool
+
+
+def default_probes(ollama: bool) -> list[Probe]:
+    probes = [
+        Probe("executor", probe_executor, critical=True),
+        Probe("memory", probe_memory, critical=True),
+        Probe("disk", probe_disk, critical=True),
+    ]
+    if ollama:
+        probes.append(Probe("ollama", probe_ollama, critical=False))
+    return probes
+
+
+# ---------------------------------------------------------------------------
+# Background refresher and cache
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class _Cache:
+    probes: dict[str, ProbeStatus]
+    refreshed: float  # monotonic
+    status_code: int
+    body: bytes
+
+
+_probes: list[Probe] = []
+_cache: Optional[_Cache] = None
+_task: Optional[asyncio.Task[None]] = None
+
+
+async def _run_probe(probe: Probe) -> ProbeStatus:
+    start = time.perf_counter()
+    try:
+        status, detail = await asyncio.wait_for(probe.run(), HEALTH_PROBE_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        status, detail = "fail", f"timed out after {HEALTH_PROBE_TIMEOUT_S:g}s"
+    except Exception as exc:
+        status, detail = "fail", f"{type(exc).__name__}: {exc}"
+    HEALTH_PROBE_OK.labels(probe.name).set(1 if status == "ok" else 0)
+    return ProbeStatus(
+        status=status,
+        detail=detail,
+        critical=probe.critical,
+        checked_at=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        duration_ms=round((time.perf_counter() - start) * 1000, 2),
+    )
+
+
+def _overall(probes: dict[str, ProbeStatus]) -> str:
+    if any(p.critical and p.status in ("fail", "stale", "pending") for p in probes.values()):
+        return "not_ready"
+    if any(p.status != "ok" for p in probes.values()):
+        return "degraded"
+    return "ready"
+
+
+def _render(probes: dict[str, ProbeStatus], refreshed: float) -> _Cache:
+    overall = _overall(probes)
+    response = ModelResponse(ReadinessResponse(status=overall, probes=probes))
+    return _Cache(probes, refreshed, 503 if overall == "not_ready" else 200, response.body)
+
+
+async def refresh() -> None:
+    """Run every probe once (concurrently) and replace the cached response."""
+    global _cache
+    results = await asyncio.gather(*(_run_probe(p) for p in _probes))
+    previous = _cache.probes if _cache else {}
+    probes = {p.name: r for p, r in zip(_probes, results)}
+    for name, result in probes.items():
+        old = previous.get(name)
+        if old is not None and old.status != result.status:
+            logger.warning(
+                "health probe %s: %s → %s (%s)", name, old.status, result.status, result.detail
+            )
+    _cache = _render(probes, time.monotonic())
+
+
+async def _refresh_loop() -> None:
+    while True:
+        try:
+            await refresh()
+        except Exception:
+            logger.exception("health probe round failed")
+        await asyncio.sleep(HEALTH_PROBE_INTERVAL_S)
+
+
+def start(probes: list[Probe]) -> None:
+    """Start the refresher on the running loop (application lifespan)."""
+    global _task, _probes, _cache
+    _probes = probes
+    _cache = None
+    _task = asyncio.get_running_loop().create_task(_refresh_loop(), name="health-probes")
+
+
+async def stop() -> None:
+    global _task, _cache
+    _cache = None
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+
+def snapshot() -> dict[str, ProbeStatus]:
+    """Cached probe results, with results older than HEALTH_PROBE_TTL_S marked stale."""
+    if _cache is None and _task is None:
+        return {
+            "refresher": ProbeStatus(
+                status="fail", detail="health probes are not running",
+                critical=True, duration_ms=0.0,
+            )
+        }
+    if _cache is None:
+        return {
+            p.name: ProbeStatus(
+                status="pending", detail="first probe round not finished",
+                critical=p.critical, duration_ms=0.0,
+            )
+            for p in _probes
+        }
+    if time.monotonic() - _cache.refreshed <= HEALTH_PROBE_TTL_S:
+        return _cache.probes
+    return {
+        name: p.model_copy(update={"status": "stale"}) for name, p in _cache.probes.items()
+    }
+
+
+# ---------------------------------------------------------------------------
+# Endpoints
+# ---------------------------------------------------------------------------
+
+
+@router.get("/live", response_model=LivenessResponse, summary="Liveness (no dependency checks)")
+async def live() -> ModelResponse:
+    return ModelResponse(
+        LivenessResponse(status="alive", uptime_s=round(time.monotonic() - _STARTED, 1))
+    )
+
+
+@router.get(
+    "/ready",
+    response_model=ReadinessResponse,
+    summary="Readiness from cached background probes",
+    responses={503: {"model": ReadinessResponse}},
+)
+async def ready() -> Response:
+    cache = _cache
+    if cache is not None and time.monotonic() - cache.refreshed <= HEALTH_PROBE_TTL_S:
+        return Response(cache.body, status_code=cache.status_code, media_type="application/json")
+    # Rare path: no round finished yet, or the refresher stalled
+    stale = _render(snapshot(), time.monotonic())
+    return Response(stale.body, status_code=stale.status_code, media_type="application/json")
@@ -0,0 +1,474 @@
+"""
+Idempotency keys for retried POST requests.
+
+n8n retries a workflow step whose HTTP call timed out – often after the
+backend had already finished the image preprocessing or vision analysis.
+With an `Idempotency-Key` header the retry is answered from the stored
+response instead of running the work again:
+
+  replay     A completed response for (method, path, key) is sent again with
+             "Idempotent-Replayed: true".  Only if the request body (and
+             query string) is the same as the first time, ignoring the
+             multipart boundary – a reused key with a different body
+             answers 422.
+  coalesce   A duplicate that arrives while the first request is still
+             running waits for it (up to IDEMPOTENCY_WAIT_S, then 409 with
+             Retry-After) and replays its response.  If the first request
+             ends without a storable response, the next one runs instead.
+  stored     Final answers: status < 500 except 408/409/425/429.  Errors the
+             client should retry (5xx, admission 429/503) are not stored.
+             Responses over IDEMPOTENCY_MAX_RESPONSE_BYTES are not stored.
+
+Requests without the header, and GET/HEAD/OPTIONS, pass through untouched.
+
+Responses are kept per worker in a bounded LRU (entry count and bytes) for
+IDEMPOTENCY_TTL_S.  With IDEMPOTENCY_SPILL_PATH set they are also written to
+a SQLite file (off the event loop): entries evicted from memory are still
+replayed from disk, and since the file is shared, so is a retry that lands
+on another worker or arrives after a restart.  Coalescing of concurrent
+duplicates is per worker.  Metrics:
+
+  idempotency_requests_total{outcome}   executed / replayed / coalesced /
+                                        mismatch / conflict
+  idempotency_cache_bytes               memory held by stored responses
+
+Configuration (environment):
+  IDEMPOTENCY_TTL_S                 (default 86400)
+  IDEMPOTENCY_MAX_ENTRIES           (default 1000)
+  IDEMPOTENCY_MAX_BYTES             (default 64 MiB)
+  IDEMPOTENCY_MAX_RESPONSE_BYTES    (default 8 MiB)
+  IDEMPOTENCY_WAIT_S                (default 120)
+  IDEMPOTENCY_SPILL_PATH            SQLite file (default unset: memory only)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from metrics import counter, gauge
+from models import ErrorDetail, ErrorResponse
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL_S = float(os.getenv("IDEMPOTENCY_TTL_S", str(24 * 3600)))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "1000"))
+IDEMPOTENCY_MAX_BYTES = int(os.getenv("IDEMPOTENCY_MAX_BYTES", str(64 * 1024 * 1024)))
+IDEMPOTENCY_MAX_RESPONSE_BYTES = int(
+    os.getenv("IDEMPOTENCY_MAX_RESPONSE_BYTES", str(8 * 1024 * 1024))
+)
+IDEMPOTENCY_WAIT_S = float(os.getenv("IDEMPOTENCY_WAIT_S", "120"))
+IDEMPOTENCY_SPILL_PATH = os.getenv("IDEMPOTENCY_SPILL_PATH") or None
+
+IDEMPOTENCY_REQUESTS = counter(
+    "idempotency_requests_total", "Requests carrying an Idempotency-Key, by outcome", ("outcome",)
+)
+IDEMPOTENCY_CACHE_BYTES = gauge(
+    "idempotency_cache_bytes", "Memory held by stored idempotent responses"
+)
+
+_MAX_KEY_LENGTH = 255
+# Statuses the client is expected to retry: never replayed
+_NOT_STORED = frozenset({408, 409, 425, 429})
+# Rough per-entry overhead used for size accounting (CPython, 64-bit)
+_ENTRY_OVERHEAD = 400
+_PURGE_INTERVAL_SECONDS = 3600
+_BOUNDARY = re.compile(r'boundary=("?)([^";]+)\1', re.IGNORECASE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key         TEXT    PRIMARY KEY,
+    fingerprint BLOB    NOT NULL,
+    status      INTEGER NOT NULL,
+    headers     TEXT    NOT NULL,
+    body        BLOB    NOT NULL,
+    expires_at  REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_expires ON responses (expires_at);
+"""
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    fingerprint: bytes
+    status: int
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+    expires_at: float  # time.time()
+
+    @property
+    def size(self) -> int:
+        return _ENTRY_OVERHEAD + len(self.body) + sum(len(k) + len(v) for k, v in self.headers)
+
+
+# ---------------------------------------------------------------------------
+# Response cache (memory LRU, optional SQLite spill)
+# ---------------------------------------------------------------------------
+
+
+class ResponseCache:
+    """Thread-safe LRU of completed responses; get() is memory only, load()/store() hit the disk."""
+
+    def __init__(
+        self,
+        max_entries: int = IDEMPOTENCY_MAX_ENTRIES,
+        max_bytes: int = IDEMPOTENCY_MAX_BYTES,
+        spill_path: Optional[str] = IDEMPOTENCY_SPILL_PATH,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.spill_path = spill_path
+        self._data: OrderedDict[str, StoredResponse] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Separate, so disk I/O in a worker thread never blocks get() on the loop
+        self._disk_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_pid: Optional[int] = None
+        self._last_purge = 0.0
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        with self._lock:
+            stored = self._data.get(key)
+            if stored is None:
+                return None
+            if stored.expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return stored
+
+    def put(self, key: str, stored: StoredResponse) -> None:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if stored.size > self.max_bytes:
+                return
+            self._data[key] = stored
+            self._bytes += stored.size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+            IDEMPOTENCY_CACHE_BYTES.set(self._bytes)
+
+    def _remove(self, key: str) -> None:
+        self._bytes -= self._data.pop(key).size
+        IDEMPOTENCY_CACHE_BYTES.set(self._bytes)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            IDEMPOTENCY_CACHE_BYTES.set(0)
+
+    # -- disk (blocking: call from a worker thread) --------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection inherited across fork() must not be reused
+        if self._conn is not None and self._conn_pid == os.getpid():
+            return self._conn
+        assert self.spill_path is not None
+        if self.spill_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.spill_path)), exist_ok=True)
+        conn = sqlite3.connect(self.spill_path, timeout=5.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._conn = conn
+        self._conn_pid = os.getpid()
+        return conn
+
+    def load(self, key: str) -> Optional[StoredResponse]:
+        if self.spill_path is None:
+            return None
+        with self._disk_lock:
+            row = self._connection().execute(
+                "SELECT fingerprint, status, headers, body, expires_at FROM responses "
+                "WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        fingerprint, status, headers, body, expires_at = row
+        stored = StoredResponse(
+            fingerprint,
+            status,
+            [(k.encode("latin-1"), v.encode("latin-1")) for k, v in json.loads(headers)],
+            body,
+            expires_at,
+        )
+        self.put(key, stored)
+        return stored
+
+    def store(self, key: str, stored: StoredResponse) -> None:
+        if self.spill_path is None:
+            return
+        headers = json.dumps([(k.decode("latin-1"), v.decode("latin-1")) for k, v in stored.headers])
+        with self._disk_lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, stored.fingerprint, stored.status, headers, stored.body, stored.expires_at),
+            )
+            now = time.time()
+            if now - self._last_purge >= _PURGE_INTERVAL_SECONDS:
+                conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+                self._last_purge = now
+            conn.commit()
+
+    def close(self) -> None:
+        with self._disk_lock:
+            if self._conn is not None and self._conn_pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._conn_pid = None
+
+
+RESPONSE_CACHE = ResponseCache()
+
+
+# ---------------------------------------------------------------------------
+# ASGI middleware
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class _InFlight:
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class _Fingerprint:
+    """
+    Digest of the query string and request body.  Multipart boundaries are
+    left out: they are random per attempt, so a retried upload would never
+    match otherwise.
+    """
+
+    def __init__(self, scope: Scope) -> None:
+        self._hash = hashlib.blake2b(scope.get("query_string", b"") + b"\0", digest_size=16)
+        match = _BOUNDARY.search(Headers(scope=scope).get("content-type", ""))
+        self._boundary = match.group(2).encode("latin-1") if match else b""
+        self._tail = b""
+
+    def update(self, chunk: bytes) -> None:
+        if not self._boundary:
+            self._hash.update(chunk)
+            return
+        data = (self._tail + chunk).replace(self._boundary, b"")
+        # Keep what could be the start of a boundary split across chunks
+        split = max(0, len(data) - len(self._boundary) + 1)
+        self._hash.update(data[:split])
+        self._tail = data[split:]
+
+    def digest(self) -> bytes:
+        self._hash.update(self._tail)
+        self._tail = b""
+        return self._hash.digest()
+
+
+async def _read_body(receive: Receive) -> Optional[list[Message]]:
+    """All request body messages, or None if the client disconnected."""
+    messages = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            return None
+        messages.append(message)
+        if not message.get("more_body", False):
+            return messages
+
+
+def _error(
+    scope: Scope, status_code: int, message: str, retry_after: Optional[int] = None
+) -> tuple[list, bytes]:
+    request_id = scope.get("state", {}).get("request_id", "unknown")
+    body = ErrorResponse(
+        error=ErrorDetail(
+            code=f"HTTP_{status_code}", message=message, details={"request_id": request_id}
+        )
+    ).model_dump_json().encode()
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+    ]
+    if retry_after is not None:
+        headers.append((b"retry-after", str(retry_after).encode()))
+    return headers, body
+
+
+class IdempotencyMiddleware:
+    """Replays stored responses for repeated Idempotency-Keys and coalesces concurrent duplicates."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        cache: Optional[ResponseCache] = None,
+        ttl: float = IDEMPOTENCY_TTL_S,
+        max_response_bytes: int = IDEMPOTENCY_MAX_RESPONSE_BYTES,
+        wait: float = IDEMPOTENCY_WAIT_S,
+    ) -> None:
+        self.app = app
+        self.cache = RESPONSE_CACHE if cache is None else cache
+        self.ttl = ttl
+        self.max_response_bytes = max_response_bytes
+        self.wait = wait
+        self._in_flight: dict[str, _InFlight] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+        idempotency_key = Headers(scope=scope).get("idempotency-key")
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not 0 < len(idempotency_key) <= _MAX_KEY_LENGTH or not idempotency_key.isprintable():
+            await self._send_error(
+                scope, send, 400, f"Idempotency-Key must be 1-{_MAX_KEY_LENGTH} printable characters"
+            )
+            return
+
+        key = f"{scope['method']} {scope['path']} {idempotency_key}"
+        body: Optional[list[Message]] = None
+        fingerprint = b""
+        deadline = time.monotonic() + self.wait
+        while True:
+            stored = self.cache.get(key)
+            if stored is None and key not in self._in_flight and self.cache.spill_path:
+                stored = await anyio.to_thread.run_sync(self.cache.load, key)
+            flight = self._in_flight.get(key)
+            if stored is None and flight is None:
+                break
+
+            if body is None:
+                # Needed to compare with the first request, and to run it if
+                # the first one ends without a stored response
+                body = await _read_body(receive)
+                if body is None:
+                    return
+                hasher = _Fingerprint(scope)
+                for message in body:
+                    hasher.update(message.get("body", b""))
+                fingerprint = hasher.digest()
+
+            if stored is not None:
+                if stored.fingerprint != fingerprint:
+                    IDEMPOTENCY_REQUESTS.labels("mismatch").inc()
+                    await self._send_error(
+                        scope, send, 422, "Idempotency-Key was already used with a different request"
+                    )
+                    return
+                IDEMPOTENCY_REQUESTS.labels("replayed").inc()
+                await self._replay(stored, send)
+                return
+
+            assert flight is not None
+            IDEMPOTENCY_REQUESTS.labels("coalesced").inc()
+            try:
+                await asyncio.wait_for(flight.done.wait(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                IDEMPOTENCY_REQUESTS.labels("conflict").inc()
+                await self._send_error(
+                    scope, send, 409, "A request with this Idempotency-Key is still in progress",
+                    retry_after=max(1, int(self.wait // 4)),
+                )
+                return
+
+        if body is not None:
+            receive = _replay_receive(body, receive)
+        await self._execute(key, scope, receive, send)
+
+    async def _execute(self, key: str, scope: Scope, receive: Receive, send: Send) -> None:
+        flight = self._in_flight[key] = _InFlight()
+        IDEMPOTENCY_REQUESTS.labels("executed").inc()
+        hasher = _Fingerprint(scope)
+        body_complete = False
+        status = 0
+        headers: list[tuple[bytes, bytes]] = []
+        chunks: list[bytes] = []
+        size = 0
+
+        async def hashing_receive() -> Message:
+            nonlocal body_complete
+            message = await receive()
+            if message["type"] == "http.request" and not body_complete:
+                hasher.update(message.get("body", b""))
+                body_complete = not message.get("more_body", False)
+            return message
+
+        async def capturing_send(message: Message) -> None:
+            nonlocal status, headers, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size <= self.max_response_bytes:
+                    chunks.append(chunk)
+                else:
+                    chunks.clear()
+            await send(message)
+
+        try:
+            await self.app(scope, hashing_receive, capturing_send)
+            # Endpoints that answer without reading the whole body
+            while not body_complete:
+                if (await hashing_receive())["type"] != "http.request":
+                    break
+            storable = 0 < status < 500 and status not in _NOT_STORED
+            if body_complete and storable and size <= self.max_response_bytes:
+                stored = StoredResponse(
+                    hasher.digest(), status, headers, b"".join(chunks), time.time() + self.ttl
+                )
+                self.cache.put(key, stored)
+                flight.done.set()
+                if self.cache.spill_path:
+                    try:
+                        await anyio.to_thread.run_sync(self.cache.store, key, stored)
+                    except sqlite3.Error:
+                        logger.exception("idempotency spill failed for %s", key)
+        finally:
+            del self._in_flight[key]
+            flight.done.set()
+
+    @staticmethod
+    async def _replay(stored: StoredResponse, send: Send) -> None:
+        headers = [(k, v) for k, v in stored.headers if k.lower() != b"content-length"]
+        headers.append((b"content-length", str(len(stored.body)).encode()))
+        headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": stored.status, "headers": headers})
+        await send({"type": "http.response.body", "body": stored.body})
+
+    @staticmethod
+    async def _send_error(
+        scope: Scope, send: Send, status_code: int, message: str, retry_after: Optional[int] = None
+    ) -> None:
+        headers, body = _error(scope, status_code, message, retry_after)
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+def _replay_receive(messages: list[Message], receive: Receive) -> Receive:
+    """Serve an already read request body, then defer to the real receive (disconnect)."""
+    pending = list(messages)
+
+    async def replay() -> Message:
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return replay
@@ -15,6 +15,9 @@ Returns: PNG base64 + metadata (width, height, deskew_angle, processing_time_ms)
 
 OpenCV is used for deskew + CLAHE + Otsu; Pillow for I/O and fallback.
 If OpenCV is unavailable the pipeline degrades gracefully using Pillow only.
+Both are imported by load_backends() on the first image request (or by the
+startup warm-up in main.py), not when the router is imported – workers that
+never see an image do not pay for them.
 """
 
 from __future__ import annotations
@@ -24,40 +27,59 @@ import io
 import logging
 import math
 import time
-from typing import Optional
+from typing import Any, Optional
 
 import ipaddress
 import socket
+import threading
 
-import httpx
 import numpy as np
 from fastapi import APIRouter, File, HTTPException, UploadFile, status
 from fastapi.responses import JSONResponse
 
+from metrics import DESKEW_ANGLE, IMAGE_PIXELS
 from models import ImageMetadata, ImagePreprocessResponse, ImageUrlRequest
+from rendering import ModelResponse
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/image", tags=["Image Processor"])
 
 # ---------------------------------------------------------------------------
-# Optional OpenCV import (graceful degradation)
+# Lazy OpenCV / Pillow import (graceful degradation without OpenCV)
 # ---------------------------------------------------------------------------
 
-try:
-    import cv2
-    _OPENCV_AVAILABLE = True
-    logger.info("OpenCV %s available", cv2.__version__)
-except ImportError:
-    cv2 = None  # type: ignore[assignment]
-    _OPENCV_AVAILABLE = False
-    logger.warning("OpenCV not available – using Pillow-only pipeline")
-
-try:
-    from PIL import Image, ImageEnhance, ImageFilter, ImageOps
-    _PIL_AVAILABLE = True
-except ImportError as exc:
-    raise RuntimeError("Pillow is required but not installed") from exc
+cv2: Any = None
+Image: Any = None
+ImageEnhance: Any = None
+ImageFilter: Any = None
+ImageOps: Any = None
+_OPENCV_AVAILABLE = False
+_backends_loaded = False
+_backends_lock = threading.Lock()
+
+
+def load_backends() -> None:
+    """Import OpenCV and Pillow once per process; safe to call from any thread."""
+    global cv2, Image, ImageEnhance, ImageFilter, ImageOps, _OPENCV_AVAILABLE, _backends_loaded
+    if _backends_loaded:
+        return
+    with _backends_lock:
+        if _backends_loaded:
+            return
+        try:
+            from PIL import Image, ImageEnhance, ImageFilter, ImageOps
+        except ImportError as exc:
+            raise RuntimeError("Pillow is required but not installed") from exc
+        try:
+            import cv2
+            _OPENCV_AVAILABLE = True
+            logger.info("OpenCV %s available", cv2.__version__)
+        except ImportError:
+            _OPENCV_AVAILABLE = False
+            logger.warning("OpenCV not available – using Pillow-only pipeline")
+        _backends_loaded = True
+
 
 # ---------------------------------------------------------------------------
 # Constants
@@ -134,8 +156,8 @@ def _detect_skew_angle_cv(gray_np: np.ndarray) -> float:
         return 0.0
 
     angles: list[float] = []
-    for line in lines:
-        x1, y1, x2, y2 = line[0]
+    # OpenCV < 5 returns shape (N, 1, 4), OpenCV 5 (N, 4)
+    for x1, y1, x2, y2 in np.asarray(lines).reshape(-1, 4):
         if x2 == x1:
             continue  # vertical line → skip
         angle = math.degrees(math.atan2(y2 - y1, x2 - x1))
@@ -177,8 +199,9 @@ def _deskew(img: "Image.Image") -> tuple["Image.Image", float]:
         # Negligible skew
         return img, angle
 
-    # Rotate to correct (expand=True keeps full image)
-    corrected = img.rotate(-angle, resample=Image.BICUBIC, expand=True, fillcolor=(255, 255, 255))
+    # Rotate to correct (expand=True keeps full image); white in the image's mode
+    white = 255 if len(img.getbands()) == 1 else (255,) * len(img.getbands())
+    corrected = img.rotate(-angle, resample=Image.BICUBIC, expand=True, fillcolor=white)
     return corrected, angle
 
 
@@ -288,6 +311,7 @@ def _image_to_base64_png(img: "Image.Image") -> str:
 
 def _preprocess_pipeline(raw_bytes: bytes) -> ImagePreprocessResponse:
     t0 = time.monotonic()
+    load_backends()
 
     img = _load_image(raw_bytes)
     orig_w, orig_h = img.size
@@ -325,6 +349,8 @@ def _preprocess_pipeline(raw_bytes: bytes) -> ImagePreprocessResponse:
         "image_preprocess orig=%dx%d final=%dx%d angle=%.2f ms=%.1f",
         orig_w, orig_h, final_w, final_h, angle, processing_ms,
     )
+    IMAGE_PIXELS.inc(orig_w * orig_h)
+    DESKEW_ANGLE.observe(angle)
 
     return ImagePreprocessResponse(
         image_base64=image_b64,
@@ -356,7 +382,7 @@ def _preprocess_pipeline(raw_bytes: bytes) -> ImagePreprocessResponse:
         "CLAHE contrast → 300 DPI resize. Returns PNG as base64."
     ),
 )
-async def preprocess_image(file: UploadFile = File(...)) -> ImagePreprocessResponse:
+async def preprocess_image(file: UploadFile = File(...)) -> ModelResponse:
     raw = await file.read(MAX_UPLOAD_BYTES + 1)
     if len(raw) > MAX_UPLOAD_BYTES:
         raise HTTPException(
@@ -368,7 +394,7 @@ async def preprocess_image(file: UploadFile = File(...)) -> ImagePreprocessRespo
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Uploaded file is empty",
         )
-    return _preprocess_pipeline(raw)
+    return ModelResponse(_preprocess_pipeline(raw))
 
 
 @router.post(
@@ -380,10 +406,12 @@ async def preprocess_image(file: UploadFile = File(...)) -> ImagePreprocessRespo
         "preprocessing pipeline as /image/preprocess."
     ),
 )
-async def preprocess_image_url(payload: ImageUrlRequest) -> ImagePreprocessResponse:
+async def preprocess_image_url(payload: ImageUrlRequest) -> ModelResponse:
     # SSRF protection: validate URL scheme and resolve hostname to check for private IPs
     from urllib.parse import urlparse
 
+    import httpx
+
     parsed = urlparse(payload.url)
     if parsed.scheme not in ("http", "https"):
         raise HTTPException(
@@ -438,4 +466,4 @@ async def preprocess_image_url(payload: ImageUrlRequest) -> ImagePreprocessRespo
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             detail=f"Remote image exceeds {MAX_UPLOAD_BYTES // (1024*1024)} MB limit",
         )
-    return _preprocess_pipeline(raw)
+    return ModelResponse(_preprocess_pipeline(raw))
@@ -0,0 +1,255 @@
+"""
+Logging setup for the Zone 2 backend.
+
+Handlers never write from the calling thread: the root logger has a single
+QueueHandler that puts the record on a bounded in-memory queue, and a
+QueueListener thread formats it and writes it to stderr.  A log call inside
+an async handler therefore costs a queue put, not a blocking write to a pipe
+that the container runtime may be slow to drain.
+
+  Bounded queue   When LOG_QUEUE_SIZE records are waiting, new records are
+                  dropped instead of blocking the caller.  Drops are counted
+                  per level (metric log_records_dropped_total) and reported
+                  by a WARNING record once the queue has room again.
+  Formatting      The calling thread only merges msg % args and renders
+                  the traceback (as QueueHandler.prepare does), so the
+                  record shows its arguments as they were at the log call
+                  and holds no frames; JSON encoding and the write happen
+                  in the listener thread.  Guard expensive arguments with
+                  logger.isEnabledFor().
+  Request IDs     Every record carries request_id (from the request_id
+                  context variable set by middleware.RequestContextMiddleware,
+                  "-" outside a request), captured in the calling context.
+  Sampling        LOG_SAMPLE_RATES ("access=0.1,pii_sanitizer=0.05") keeps
+                  only that fraction of a hot logger's DEBUG/INFO records;
+                  WARNING and above are never sampled.
+  Format          LOG_FORMAT=json (default outside development): one JSON
+                  object per line with ts, level, logger, msg, request_id,
+                  any `extra` fields and exc for tracebacks.
+                  LOG_FORMAT=text: the classic single-line format.
+  Fork safety     A process forked after configure_logging() (prefork.py
+                  workers) gets its own queue and listener thread.
+
+Configuration (environment):
+  LOG_LEVEL         (default INFO, read by main.py)
+  LOG_FORMAT        (default json; text when ENV=development)
+  LOG_QUEUE_SIZE    (default 10000 records)
+  LOG_SAMPLE_RATES  (default unset: no sampling)
+"""
+
+from __future__ import annotations
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from metrics import LOG_RECORDS_DROPPED
+
+LOG_FORMAT = os.getenv(
+    "LOG_FORMAT",
+    "text" if os.getenv("ENV", "production").lower() == "development" else "json",
+).lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s request_id=%(request_id)s"
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+# Request ID of the request being handled ("-" outside a request)
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# LogRecord attributes that are not `extra` fields
+_RESERVED = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", (), None)).keys()
+    | {"message", "asctime", "request_id", "taskName"}
+)
+
+
+# ---------------------------------------------------------------------------
+# Formatting
+# ---------------------------------------------------------------------------
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+# ---------------------------------------------------------------------------
+# Filters (run in the calling thread, before the record is enqueued)
+# ---------------------------------------------------------------------------
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of a logger's records below WARNING."""
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+def parse_sample_rates(spec: str) -> dict[str, float]:
+    """'access=0.1, pii_sanitizer=0.05' → {'access': 0.1, 'pii_sanitizer': 0.05}."""
+    rates: dict[str, float] = {}
+    for part in spec.split(","):
+        name, sep, value = part.strip().partition("=")
+        if not sep:
+            continue
+        try:
+            rates[name.strip()] = min(1.0, max(0.0, float(value)))
+        except ValueError:
+            continue
+    return rates
+
+
+# ---------------------------------------------------------------------------
+# Queue handler
+# ---------------------------------------------------------------------------
+
+
+_EXC_FORMATTER = logging.Formatter()
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """Non-blocking QueueHandler: drops and counts records when the queue is full."""
+
+    def __init__(self, log_queue: queue.SimpleQueue, maxsize: int) -> None:
+        super().__init__(log_queue)
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self._reported = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the message and render the traceback now: arguments may be
+        # mutated after the call, and exc_info would keep the frames alive
+        # while the record waits.  Everything else is left to the listener.
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # SimpleQueue (C, lock-free put) with an approximate bound: cheaper
+        # for the caller than queue.Queue's Condition-based put_nowait
+        if self.queue.qsize() >= self.maxsize:
+            with self._lock:
+                self.dropped += 1
+            LOG_RECORDS_DROPPED.labels(record.levelname).inc()
+            return
+        self.queue.put_nowait(record)
+        if self.dropped != self._reported:
+            self._report_drops()
+
+    def _report_drops(self) -> None:
+        with self._lock:
+            count, self._reported = self.dropped - self._reported, self.dropped
+        notice = logging.LogRecord(
+            __name__, logging.WARNING, __file__, 0,
+            "log queue full: dropped %d record(s)", (count,), None,
+        )
+        notice.request_id = "-"
+        self.queue.put_nowait(notice)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[BoundedQueueHandler] = None
+
+
+def configure_logging(level: str = "INFO") -> None:
+    """Route the root logger through a bounded queue to a background writer."""
+    global _listener, _handler
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+
+    for name, rate in parse_sample_rates(LOG_SAMPLE_RATES).items():
+        target = logging.getLogger(name)
+        if not any(isinstance(f, SamplingFilter) for f in target.filters):
+            target.addFilter(SamplingFilter(rate))
+
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT))
+
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    _handler = BoundedQueueHandler(log_queue, LOG_QUEUE_SIZE)
+    _handler.addFilter(RequestIdFilter())
+    root.addHandler(_handler)
+
+    _start_listener(log_queue, stream)
+
+
+def _start_listener(log_queue: queue.SimpleQueue, *handlers: logging.Handler) -> None:
+    global _listener
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    # Flush what is still queued when the worker exits
+    atexit.register(_listener.stop)
+
+
+def flush() -> None:
+    """Write out everything queued and stop the listener (before os._exit)."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def _restart_after_fork() -> None:
+    """The listener thread does not survive fork(): start the child's own."""
+    if _listener is None or _handler is None:
+        return
+    # Records still queued in the parent are written by the parent
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    _handler.queue = log_queue
+    _handler._lock = threading.Lock()
+    _handler.dropped = _handler._reported = 0
+    _start_listener(log_queue, *_listener.handlers)
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
@@ -3,22 +3,39 @@ FreyAI Visions 95/5 Architecture – Zone 2 Backend
 FastAPI application entry point.
 
 Ports: 8001 (HTTP)
+
+Start-up is kept cheap: routers are imported only when enabled, and the heavy
+optional libraries (OpenCV/Pillow, pyarrow, httpx, chardet) are imported by
+the code that needs them, not at module load.  The image backends are warmed
+up after the worker is ready to accept requests.
+
+Configuration (environment):
+  ROUTERS  comma-separated routers this worker serves (default "all"):
+           math, pii, image, gobd, reconcile, vision.  Lets a deployment run
+           role-specific workers, e.g. ROUTERS=image for an image-only pool.
+  WARMUP   background (default): load the image backends in a thread after
+           start-up; eager: load them before the worker reports ready;
+           off: load them on the first image request.
 """
 
 from __future__ import annotations
 
+import importlib
+import importlib.util
 import logging
+import math
 import os
-import time
-import uuid
+import threading
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
+from logging_config import configure_logging
+
 # Load .env before anything else
 load_dotenv()
 
@@ -27,23 +44,49 @@ load_dotenv()
 # ---------------------------------------------------------------------------
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
-logging.basicConfig(
-    level=getattr(logging, LOG_LEVEL, logging.INFO),
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-    datefmt="%Y-%m-%dT%H:%M:%S",
-)
+configure_logging(LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
 # Router imports (after logging is configured so routers can log at import)
 # ---------------------------------------------------------------------------
 
-from gobd_csv import router as gobd_router  # noqa: E402
-from image_processor import router as image_router  # noqa: E402
-from math_guardrail import router as math_router  # noqa: E402
+import health  # noqa: E402
+import metrics  # noqa: E402
+import profiling  # noqa: E402
+from admission import AdmissionMiddleware  # noqa: E402
+from compression import CompressionMiddleware  # noqa: E402
+from idempotency import IdempotencyMiddleware  # noqa: E402
+from middleware import RequestContextMiddleware  # noqa: E402
 from models import ErrorDetail, ErrorResponse, HealthResponse  # noqa: E402
-from pii_sanitizer import router as pii_router  # noqa: E402
-from vision_analyzer import router as vision_router  # noqa: E402
+
+# Router name (ROUTERS env) → module defining `router`, in mount order
+ROUTER_MODULES: dict[str, str] = {
+    "math": "math_guardrail",
+    "pii": "pii_sanitizer",
+    "image": "image_processor",
+    "gobd": "gobd_csv",
+    "reconcile": "reconciliation",
+    "vision": "vision_analyzer",
+}
+
+
+def parse_routers(spec: str) -> list[str]:
+    """'image, vision' → ['image', 'vision']; 'all' or empty → every router."""
+    names = [n.strip().lower() for n in spec.split(",") if n.strip()]
+    if not names or "all" in names:
+        return list(ROUTER_MODULES)
+    unknown = [n for n in names if n not in ROUTER_MODULES]
+    if unknown:
+        raise ValueError(
+            f"ROUTERS: unknown router(s) {', '.join(unknown)}; "
+            f"choose from {', '.join(ROUTER_MODULES)}"
+        )
+    return [n for n in ROUTER_MODULES if n in names]
+
+
+ENABLED_ROUTERS = parse_routers(os.getenv("ROUTERS", "all"))
+WARMUP = os.getenv("WARMUP", "background").lower()
 
 # ---------------------------------------------------------------------------
 # Application version
@@ -82,27 +125,61 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     logger.info("=== %s v%s starting ===", APP_NAME, APP_VERSION)
     logger.info("CORS origins: %s", ALLOWED_ORIGINS)
     logger.info("Log level: %s", LOG_LEVEL)
+    logger.info("Routers: %s", ", ".join(ENABLED_ROUTERS))
 
-    # Warm up: import heavy modules now so first request is fast
-    try:
-        import cv2  # noqa: F401
-        logger.info("OpenCV loaded: %s", cv2.__version__)
-    except ImportError:
-        logger.warning("OpenCV not available – image pipeline uses Pillow fallback")
+    # Warm up the image backends so the first image request does not pay for
+    # the OpenCV/Pillow import; in the background unless WARMUP=eager
+    if "image" in ENABLED_ROUTERS and WARMUP != "off":
+        if WARMUP == "eager":
+            _warm_up_image_backends()
+        else:
+            threading.Thread(
+                target=_warm_up_image_backends, name="warmup", daemon=True
+            ).start()
 
-    try:
-        from PIL import Image  # noqa: F401
-        logger.info("Pillow ready")
-    except ImportError:
-        logger.error("Pillow not available – image endpoints will fail")
+    health.start(health.default_probes(ollama="vision" in ENABLED_ROUTERS))
 
     logger.info("=== Startup complete ===")
     yield
 
     # ---- Shutdown ----
+    await health.stop()
     logger.info("=== %s shutting down ===", APP_NAME)
 
 
+def _warm_up_image_backends() -> None:
+    import image_processor
+
+    try:
+        image_processor.load_backends()
+    except RuntimeError:
+        logger.error("Pillow not available – image endpoints will fail")
+
+
+def warm_shared_assets() -> None:
+    """
+    Build the read-only assets of the enabled routers now: image backends,
+    NER word lists or model, pyarrow and the strptime format cache.
+
+    prefork.py calls this in the master before forking, so the workers share
+    these pages copy-on-write instead of each loading its own copy.
+    """
+    from datetime import datetime
+
+    if "image" in ENABLED_ROUTERS:
+        _warm_up_image_backends()
+    if "pii" in ENABLED_ROUTERS:
+        import pii_sanitizer
+
+        pii_sanitizer.warm_ner_backend()
+    if {"math", "pii", "gobd"} & set(ENABLED_ROUTERS):
+        import transport
+
+        transport.pyarrow()
+    # First strptime() imports _strptime and compiles the format regex
+    datetime.strptime("01.01.2024", "%d.%m.%Y")
+
+
 # ---------------------------------------------------------------------------
 # FastAPI application
 # ---------------------------------------------------------------------------
@@ -122,6 +199,21 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# ---------------------------------------------------------------------------
+# Admission control (innermost: rejects before the body is read, and the
+# rejection still gets CORS headers, a request ID and metrics)
+# ---------------------------------------------------------------------------
+
+app.add_middleware(AdmissionMiddleware)
+
+# ---------------------------------------------------------------------------
+# Idempotency keys (outside admission: replays and coalesced duplicates take
+# no capacity; inside the request context: stored responses carry no request
+# ID or timing header, replays get fresh ones)
+# ---------------------------------------------------------------------------
+
+app.add_middleware(IdempotencyMiddleware)
+
 # ---------------------------------------------------------------------------
 # CORS Middleware
 # ---------------------------------------------------------------------------
@@ -135,72 +227,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["X-Request-ID", "X-Processing-Time-MS"],
+    expose_headers=[
+        "X-Request-ID", "X-Processing-Time-MS", "X-Profile-ID", "Retry-After",
+        "Idempotent-Replayed",
+    ],
     max_age=600,
 )
 
 # ---------------------------------------------------------------------------
-# Request logging + request-ID middleware
+# Request context (request ID, timing headers, error envelope, access log)
 # ---------------------------------------------------------------------------
 
+app.add_middleware(RequestContextMiddleware)
 
-@app.middleware("http")
-async def request_logging_middleware(request: Request, call_next) -> Response:
-    request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
-    start = time.monotonic()
-
-    # Attach request_id so downstream code can read it if needed
-    request.state.request_id = request_id
-
-    logger.info(
-        "→ %s %s  request_id=%s  client=%s",
-        request.method,
-        request.url.path,
-        request_id,
-        request.client.host if request.client else "unknown",
-    )
-
-    try:
-        response: Response = await call_next(request)
-    except Exception as exc:
-        duration_ms = round((time.monotonic() - start) * 1000, 2)
-        logger.error(
-            "← 500 %s %s  request_id=%s  %.1fms  unhandled: %s",
-            request.method,
-            request.url.path,
-            request_id,
-            duration_ms,
-            exc,
-            exc_info=True,
-        )
-        return JSONResponse(
-            status_code=500,
-            content=ErrorResponse(
-                error=ErrorDetail(
-                    code="INTERNAL_SERVER_ERROR",
-                    message="An unexpected error occurred. Please try again.",
-                    details={"request_id": request_id},
-                )
-            ).model_dump(),
-            headers={
-                "X-Request-ID": request_id,
-                "X-Processing-Time-MS": str(duration_ms),
-            },
-        )
+# ---------------------------------------------------------------------------
+# Response compression (outside the request context so error envelopes are
+# compressed too; inside metrics so response sizes are wire bytes)
+# ---------------------------------------------------------------------------
 
-    duration_ms = round((time.monotonic() - start) * 1000, 2)
-    response.headers["X-Request-ID"] = request_id
-    response.headers["X-Processing-Time-MS"] = str(duration_ms)
+app.add_middleware(CompressionMiddleware)
 
-    logger.info(
-        "← %d %s %s  request_id=%s  %.1fms",
-        response.status_code,
-        request.method,
-        request.url.path,
-        request_id,
-        duration_ms,
-    )
-    return response
+# Outermost, so error envelopes and CORS preflights are counted too
+app.add_middleware(metrics.MetricsMiddleware)
 
 
 # ---------------------------------------------------------------------------
@@ -250,23 +298,21 @@ async def custom_validation_exception_handler(
     )
 
     # Pydantic v2 error dicts may contain non-JSON-serializable objects (e.g.
-    # ValueError instances inside the 'ctx' key).  Sanitise them to strings.
+    # ValueError instances inside the 'ctx' key, or an echoed 'input' holding
+    # Infinity/NaN).  Sanitise them to strings.
+    def _json_safe(v: object) -> object:
+        if isinstance(v, float) and not math.isfinite(v):
+            return str(v)
+        if isinstance(v, dict):
+            return {str(k): _json_safe(x) for k, x in v.items()}
+        if isinstance(v, (list, tuple)):
+            return [_json_safe(x) for x in v]
+        if isinstance(v, (str, int, float, bool, type(None))):
+            return v
+        return str(v)
+
     def _sanitize_errors(errors: list) -> list:
-        safe = []
-        for err in errors:
-            safe_err = {}
-            for k, v in err.items():
-                if k == "ctx" and isinstance(v, dict):
-                    safe_err[k] = {
-                        ck: str(cv) if not isinstance(cv, (str, int, float, bool, type(None))) else cv
-                        for ck, cv in v.items()
-                    }
-                elif isinstance(v, (str, int, float, bool, list, dict, type(None))):
-                    safe_err[k] = v
-                else:
-                    safe_err[k] = str(v)
-            safe.append(safe_err)
-        return safe
+        return [_json_safe(err) for err in errors]
 
     return JSONResponse(
         status_code=422,
@@ -288,6 +334,25 @@ async def custom_validation_exception_handler(
 # ---------------------------------------------------------------------------
 
 
+# Installed image backends: checked once, they cannot change at runtime
+_IMAGE_BACKENDS = {
+    "image_processor_pil": "ok" if importlib.util.find_spec("PIL") else "unavailable",
+    "image_processor_opencv": (
+        "ok" if importlib.util.find_spec("cv2") else "unavailable (using Pillow fallback)"
+    ),
+}
+
+
+def _services() -> dict[str, str]:
+    """Enabled routers plus the cached probe results (never probes inline)."""
+    services = {ROUTER_MODULES[name]: "ok" for name in ENABLED_ROUTERS}
+    if "image" in ENABLED_ROUTERS:
+        services.update(_IMAGE_BACKENDS)
+    for name, probe in health.snapshot().items():
+        services["vision" if name == "ollama" else name] = probe.status
+    return services
+
+
 @app.get(
     "/health",
     response_model=HealthResponse,
@@ -295,28 +360,11 @@ async def custom_validation_exception_handler(
     summary="Service health check",
 )
 async def health_check() -> HealthResponse:
-    services: dict[str, str] = {
-        "math_guardrail": "ok",
-        "pii_sanitizer": "ok",
-    }
-
-    # Check image processor dependencies
-    try:
-        from PIL import Image  # noqa: F401
-        services["image_processor_pil"] = "ok"
-    except ImportError:
-        services["image_processor_pil"] = "unavailable"
-
-    try:
-        import cv2  # noqa: F401
-        services["image_processor_opencv"] = "ok"
-    except ImportError:
-        services["image_processor_opencv"] = "unavailable (using Pillow fallback)"
-
+    """Always 200 while the process serves requests; see /health/ready for readiness."""
     return HealthResponse(
         status="healthy",
         version=APP_VERSION,
-        services=services,
+        services=_services(),
     )
 
 
@@ -331,7 +379,7 @@ async def api_health_check() -> HealthResponse:
     return HealthResponse(
         status="ok",
         version=APP_VERSION,
-        services={"gobd_csv": "ok", "math_guardrail": "ok", "pii_sanitizer": "ok", "vision": "ok"},
+        services=_services(),
     )
 
 
@@ -339,11 +387,11 @@ async def api_health_check() -> HealthResponse:
 # Mount routers
 # ---------------------------------------------------------------------------
 
-app.include_router(math_router)
-app.include_router(pii_router)
-app.include_router(image_router)
-app.include_router(gobd_router)
-app.include_router(vision_router)
+for _name in ENABLED_ROUTERS:
+    app.include_router(importlib.import_module(ROUTER_MODULES[_name]).router)
+app.include_router(health.router)
+app.include_router(profiling.router)
+app.include_router(metrics.router)
 
 # ---------------------------------------------------------------------------
 # Root redirect to docs
@@ -1,45 +1,290 @@
 """
 Math Guardrail Router
 POST /math/validate
+POST /math/validate-batch
 
 Validates invoice arithmetic:
   - netto * (1 + mwst_rate) ≈ brutto
   - qty * unit_price ≈ item.total for each line item
 
+Invoices whose lines carry their own VAT rate, §13b reverse charge or a
+discount/Skonto percentage (or that state a vat_breakdown) are validated per
+VAT group instead: brutto ≈ netto + Σ round(group netto × rate), and each
+group is compared with the stated breakdown.
+
+With explain=true, failing invoices also get ranked single-field correction
+suggestions (misread line total, price, quantity, netto, brutto or VAT rate).
+
 Confidence score: 1.0 = perfect, decreases per error magnitude.
 Traffic light: >= 0.95 green, 0.80-0.94 yellow, < 0.80 red.
+
+Rounding modes (per request, field "rounding"):
+  float  binary floating point with Python round() – the original behaviour
+  cents  exact fixed-point integers with commercial rounding (ROUND_HALF_UP,
+         away from zero), as required for German invoices.  Amounts are
+         taken in cents, quantities, unit prices and VAT rates with four
+         decimals; only the final division to cents rounds.  Plain integer
+         arithmetic, no Decimal objects.
+
+The batch endpoint flattens the line items of all invoices into NumPy arrays
+and evaluates every check for the whole batch in one vectorised pass;
+per-invoice aggregates are segment sums over the flattened items.  Only the
+messages for failing checks are formatted in Python.
 """
 
 from __future__ import annotations
 
 import logging
 import math
+from typing import Any, Optional
 
+import anyio.to_thread
+import numpy as np
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 
 from models import (
     LineItem,
     LineItemResult,
+    MathValidateBatchRequest,
+    MathValidateBatchResponse,
     MathValidateRequest,
     MathValidateResponse,
+    LineKind,
+    RoundingMode,
     TrafficLight,
+    VatGroupResult,
 )
+from rendering import ModelResponse
+from transport import NegotiatedRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/math", tags=["Math Guardrail"])
+router = APIRouter(prefix="/math", tags=["Math Guardrail"], route_class=NegotiatedRoute)
 
 # Tolerance for floating-point rounding on invoice amounts (EUR cents)
 BRUTTO_TOLERANCE = 0.02
 LINE_ITEM_TOLERANCE = 0.02
 
 
+# Fixed-point scales for RoundingMode.CENTS
+CENT_SCALE = 100
+QTY_SCALE = 10_000
+PRICE_SCALE = 10_000
+RATE_SCALE = 10_000
+# qty × unit_price is scaled by QTY_SCALE × PRICE_SCALE; divide by this for cents
+_ITEM_TO_CENTS = QTY_SCALE * PRICE_SCALE // CENT_SCALE
+# |qty × unit_price| (EUR) above which the scaled product may overflow int64
+_INT64_ITEM_LIMIT = 2.0**62 / (QTY_SCALE * PRICE_SCALE)
+# Amount (EUR) above which cents × a scaled rate may overflow int64
+_INT64_AMOUNT_LIMIT = 2.0**62 / (CENT_SCALE * RATE_SCALE)
+
+
 def _round2(v: float) -> float:
     """Round to 2 decimal places (EUR cents)."""
     return round(v, 2)
 
 
+def _to_fixed(v: float, scale: int) -> int:
+    """Float input → scaled integer (exact for inputs with ≤ log10(scale) decimals)."""
+    return round(v * scale)
+
+
+def _div_half_up(num: int, den: int) -> int:
+    """num / den rounded half away from zero (ROUND_HALF_UP)."""
+    q = (abs(num) * 2 + den) // (2 * den)
+    return q if num >= 0 else -q
+
+
+def _header_totals(payload: MathValidateRequest) -> tuple[float, float]:
+    """(computed_brutto, delta_brutto) in the requested rounding mode."""
+    if payload.rounding is RoundingMode.CENTS:
+        netto_c = _to_fixed(payload.netto, CENT_SCALE)
+        vat_c = _div_half_up(netto_c * _to_fixed(payload.mwst_rate, RATE_SCALE), RATE_SCALE)
+        computed_c = netto_c + vat_c
+        delta_c = _to_fixed(payload.brutto, CENT_SCALE) - computed_c
+        return computed_c / CENT_SCALE, delta_c / CENT_SCALE
+    computed = _round2(payload.netto * (1.0 + payload.mwst_rate))
+    return computed, _round2(payload.brutto - computed)
+
+
+def _line_total_cents(item: LineItem) -> int:
+    """qty × unit_price in cents, ROUND_HALF_UP."""
+    return _div_half_up(
+        _to_fixed(item.qty, QTY_SCALE) * _to_fixed(item.unit_price, PRICE_SCALE),
+        _ITEM_TO_CENTS,
+    )
+
+
+def _line_total(item: LineItem, cents: bool) -> tuple[float, float]:
+    """(computed_total, delta) for one line item."""
+    if cents:
+        computed_c = _line_total_cents(item)
+        delta_c = _to_fixed(item.total, CENT_SCALE) - computed_c
+        return computed_c / CENT_SCALE, delta_c / CENT_SCALE
+    computed = _round2(item.qty * item.unit_price)
+    return computed, _round2(item.total - computed)
+
+
+def _items_sum(payload: MathValidateRequest) -> tuple[float, float]:
+    """(sum of line item totals, difference to netto)."""
+    if payload.rounding is RoundingMode.CENTS:
+        sum_c = sum(_to_fixed(i.total, CENT_SCALE) for i in payload.items)
+        delta_c = sum_c - _to_fixed(payload.netto, CENT_SCALE)
+        return sum_c / CENT_SCALE, delta_c / CENT_SCALE
+    sum_items = _round2(sum(i.total for i in payload.items))
+    return sum_items, _round2(sum_items - payload.netto)
+
+
+# ---------------------------------------------------------------------------
+# VAT groups (per-line rates, §13b reverse charge, discount / Skonto lines)
+# ---------------------------------------------------------------------------
+
+# Group key = rate in basis points × 2 (+1 for reverse charge, whose rate is 0);
+# sorting by key orders groups by rate.  KEY_SPAN keeps keys of different
+# invoices apart in the batch path.
+_RC_KEY = 1
+_KEY_SPAN = 2 * RATE_SCALE + 2
+
+
+def _uses_vat_groups(payload: MathValidateRequest) -> bool:
+    """True if the invoice needs per-rate validation instead of one mwst_rate."""
+    return payload.vat_breakdown is not None or any(
+        i.mwst_rate is not None or i.reverse_charge or i.percent is not None
+        for i in payload.items
+    )
+
+
+def _group_key(rate: float, reverse_charge: bool) -> int:
+    return _RC_KEY if reverse_charge else _to_fixed(rate, RATE_SCALE) * 2
+
+
+def _group_label(key: int) -> str:
+    return "§13b" if key == _RC_KEY else f"{key // 2 / 100:g} %"
+
+
+def _vat_groups(
+    payload: MathValidateRequest,
+) -> tuple[dict[int, tuple[Any, Any]], dict[int, tuple[float, float]]]:
+    """
+    Net subtotal and VAT per group, plus (computed_total, delta) of
+    percentage discount/Skonto lines keyed by item index.
+
+    Amounts are integer cents in cents mode and rounded floats otherwise.
+    """
+    cents = payload.rounding is RoundingMode.CENTS
+    keys = [
+        _group_key(
+            payload.mwst_rate if item.mwst_rate is None else item.mwst_rate,
+            item.reverse_charge,
+        )
+        for item in payload.items
+    ]
+    netto_sum: dict[int, Any] = {}
+    position_sum: dict[int, Any] = {}
+    for key, item in zip(keys, payload.items):
+        amount = _to_fixed(item.total, CENT_SCALE) if cents else item.total
+        netto_sum[key] = netto_sum.get(key, 0) + amount
+        if item.kind is LineKind.POSITION:
+            position_sum[key] = position_sum.get(key, 0) + amount
+
+    deductions: dict[int, tuple[float, float]] = {}
+    for idx, (key, item) in enumerate(zip(keys, payload.items)):
+        if item.percent is None:
+            continue
+        base = position_sum.get(key, 0)
+        if cents:
+            computed_c = -_div_half_up(base * _to_fixed(item.percent, RATE_SCALE), RATE_SCALE)
+            delta_c = _to_fixed(item.total, CENT_SCALE) - computed_c
+            deductions[idx] = (computed_c / CENT_SCALE, delta_c / CENT_SCALE)
+        else:
+            computed = -_round2(_round2(base) * item.percent)
+            deductions[idx] = (computed, _round2(item.total - computed))
+
+    groups: dict[int, tuple[Any, Any]] = {}
+    for key in sorted(netto_sum):
+        if cents:
+            netto_c = netto_sum[key]
+            groups[key] = (netto_c, _div_half_up(netto_c * (key // 2), RATE_SCALE))
+        else:
+            netto = _round2(netto_sum[key])
+            groups[key] = (netto, _round2(netto * (key // 2 / RATE_SCALE)))
+    return groups, deductions
+
+
+def _grouped_header_totals(
+    payload: MathValidateRequest, groups: dict[int, tuple[Any, Any]]
+) -> tuple[float, float, float]:
+    """(computed_brutto, delta_brutto, vat_total): brutto = netto + Σ group VAT."""
+    vat_total = sum(vat for _, vat in groups.values())
+    if payload.rounding is RoundingMode.CENTS:
+        computed_c = _to_fixed(payload.netto, CENT_SCALE) + vat_total
+        delta_c = _to_fixed(payload.brutto, CENT_SCALE) - computed_c
+        return computed_c / CENT_SCALE, delta_c / CENT_SCALE, vat_total / CENT_SCALE
+    computed = _round2(payload.netto + vat_total)
+    return computed, _round2(payload.brutto - computed), _round2(float(vat_total))
+
+
+def _validate_vat_groups(
+    payload: MathValidateRequest,
+    groups: dict[int, tuple[Any, Any]],
+    errors: list[str],
+    warnings: list[str],
+) -> list[VatGroupResult]:
+    """Compare computed groups with the stated vat_breakdown (if any)."""
+    cents = payload.rounding is RoundingMode.CENTS
+    scale = CENT_SCALE if cents else 1
+    stated: dict[int, tuple[Any, Any]] = {}
+    for entry in payload.vat_breakdown or ():
+        key = _group_key(entry.rate, entry.reverse_charge)
+        netto, vat = stated.get(key, (0, 0))
+        if cents:
+            stated[key] = (
+                netto + _to_fixed(entry.netto, CENT_SCALE),
+                vat + _to_fixed(entry.vat, CENT_SCALE),
+            )
+        else:
+            stated[key] = (netto + entry.netto, vat + entry.vat)
+
+    results: list[VatGroupResult] = []
+    for key in sorted(groups.keys() | stated.keys()):
+        netto, vat = groups.get(key, (0, 0))
+        result = VatGroupResult(
+            rate=key // 2 / RATE_SCALE,
+            reverse_charge=key == _RC_KEY,
+            netto=netto / scale,
+            vat=vat / scale,
+            valid=True,
+        )
+        results.append(result)
+        if payload.vat_breakdown is None:
+            continue
+
+        stated_netto, stated_vat = stated.get(key, (0, 0))
+        result.stated_netto = stated_netto / scale
+        result.stated_vat = stated_vat / scale
+        for what, computed_units, stated_units in (
+            ("netto", netto, stated_netto),
+            ("VAT", vat, stated_vat),
+        ):
+            if cents:
+                delta = (stated_units - computed_units) / CENT_SCALE
+            else:
+                delta = _round2(stated_units - computed_units)
+            if abs(delta) <= BRUTTO_TOLERANCE:
+                continue
+            result.valid = False
+            msg = (
+                f"VAT group {_group_label(key)}: {what} {computed_units / scale} "
+                f"but stated {stated_units / scale} (Δ {delta:+.4f})"
+            )
+            if abs(delta) > 1.0:
+                errors.append(msg)
+            else:
+                warnings.append(msg)
+    return results
+
+
 def _relative_error(stated: float, computed: float) -> float:
     """Relative error between two values; 0.0 if both are zero."""
     if computed == 0.0 and stated == 0.0:
@@ -61,17 +306,22 @@ def _validate_line_items(
     items: list[LineItem],
     errors: list[str],
     warnings: list[str],
+    cents: bool = False,
+    deductions: Optional[dict[int, tuple[float, float]]] = None,
 ) -> tuple[list[LineItemResult], float]:
     """
     Validate each line item and return (results, penalty).
     penalty accumulates per bad line (0 = all good, 1 = all bad).
+    deductions overrides (computed_total, delta) of percentage discount lines.
     """
     results: list[LineItemResult] = []
     penalty_sum = 0.0
 
     for idx, item in enumerate(items):
-        computed = _round2(item.qty * item.unit_price)
-        delta = _round2(item.total - computed)
+        if deductions and idx in deductions:
+            computed, delta = deductions[idx]
+        else:
+            computed, delta = _line_total(item, cents)
         abs_delta = abs(delta)
         valid = abs_delta <= LINE_ITEM_TOLERANCE
 
@@ -105,31 +355,29 @@ def _validate_line_items(
     return results, avg_penalty
 
 
-@router.post(
-    "/validate",
-    response_model=MathValidateResponse,
-    summary="Validate invoice arithmetic",
-    description=(
-        "Checks that netto × (1 + mwst_rate) ≈ brutto and that every "
-        "line item total matches qty × unit_price. Returns a confidence "
-        "score and traffic-light classification."
-    ),
-)
-async def validate_math(payload: MathValidateRequest) -> MathValidateResponse:
+def _validate_one(payload: MathValidateRequest) -> MathValidateResponse:
+    """All /math/validate checks for one invoice (exact Python ints in cents mode)."""
     errors: list[str] = []
     warnings: list[str] = []
 
     # -----------------------------------------------------------------------
     # 1. Validate header totals
     # -----------------------------------------------------------------------
-    computed_brutto = _round2(payload.netto * (1.0 + payload.mwst_rate))
-    delta_brutto = _round2(payload.brutto - computed_brutto)
+    grouped = _uses_vat_groups(payload)
+    if grouped:
+        groups, deductions = _vat_groups(payload)
+        computed_brutto, delta_brutto, vat_total = _grouped_header_totals(payload, groups)
+        formula = f"{payload.netto} + VAT {vat_total}"
+    else:
+        groups, deductions = {}, {}
+        computed_brutto, delta_brutto = _header_totals(payload)
+        formula = f"{payload.netto} × (1 + {payload.mwst_rate})"
     abs_delta_brutto = abs(delta_brutto)
     header_valid = abs_delta_brutto <= BRUTTO_TOLERANCE
 
     if not header_valid:
         msg = (
-            f"Brutto mismatch: {payload.netto} × (1 + {payload.mwst_rate}) "
+            f"Brutto mismatch: {formula} "
             f"= {computed_brutto} but stated {payload.brutto} "
             f"(Δ {delta_brutto:+.4f})"
         )
@@ -142,15 +390,18 @@ async def validate_math(payload: MathValidateRequest) -> MathValidateResponse:
     # 2. Validate line items
     # -----------------------------------------------------------------------
     line_results, line_penalty = _validate_line_items(
-        payload.items, errors, warnings
+        payload.items,
+        errors,
+        warnings,
+        cents=payload.rounding is RoundingMode.CENTS,
+        deductions=deductions,
     )
 
     # -----------------------------------------------------------------------
     # 3. Validate that sum of line item totals ≈ netto (if items provided)
     # -----------------------------------------------------------------------
     if payload.items:
-        sum_items = _round2(sum(i.total for i in payload.items))
-        sum_delta = _round2(sum_items - payload.netto)
+        sum_items, sum_delta = _items_sum(payload)
         if abs(sum_delta) > BRUTTO_TOLERANCE:
             msg = (
                 f"Sum of line items ({sum_items}) does not match netto "
@@ -162,7 +413,14 @@ async def validate_math(payload: MathValidateRequest) -> MathValidateResponse:
                 warnings.append(msg)
 
     # -----------------------------------------------------------------------
-    # 4. Confidence score
+    # 4. Per-rate subtotals vs stated VAT breakdown
+    # -----------------------------------------------------------------------
+    vat_groups = (
+        _validate_vat_groups(payload, groups, errors, warnings) if grouped else []
+    )
+
+    # -----------------------------------------------------------------------
+    # 5. Confidence score
     # -----------------------------------------------------------------------
     # Start at 1.0, subtract penalties
     # Header mismatch: penalty proportional to relative error, capped at 0.5
@@ -174,22 +432,23 @@ async def validate_math(payload: MathValidateRequest) -> MathValidateResponse:
     confidence = max(0.0, min(1.0, 1.0 - total_penalty))
 
     # Snap to 1.0 if everything is within tolerance
-    if header_valid and all(r.valid for r in line_results):
+    if (
+        header_valid
+        and all(r.valid for r in line_results)
+        and all(g.valid for g in vat_groups)
+    ):
         confidence = 1.0
 
     confidence = round(confidence, 4)
 
     overall_valid = len(errors) == 0
 
-    logger.info(
-        "math_validate netto=%.2f mwst=%.4f brutto=%.2f items=%d "
-        "confidence=%.4f valid=%s",
-        payload.netto,
-        payload.mwst_rate,
-        payload.brutto,
-        len(payload.items),
-        confidence,
-        overall_valid,
+    suggestions = (
+        _suggest_corrections(
+            payload, [r.computed_total for r in line_results], computed_brutto, grouped
+        )
+        if payload.explain and (errors or warnings)
+        else []
     )
 
     return MathValidateResponse(
@@ -202,4 +461,742 @@ async def validate_math(payload: MathValidateRequest) -> MathValidateResponse:
         errors=errors,
         warnings=warnings,
         line_item_results=line_results,
+        vat_groups=vat_groups,
+        suggestions=suggestions,
+    )
+
+
+@router.post(
+    "/validate",
+    response_model=MathValidateResponse,
+    summary="Validate invoice arithmetic",
+    description=(
+        "Checks that netto × (1 + mwst_rate) ≈ brutto and that every "
+        "line item total matches qty × unit_price. Returns a confidence "
+        "score and traffic-light classification."
+    ),
+)
+async def validate_math(payload: MathValidateRequest) -> ModelResponse:
+    response = _validate_one(payload)
+
+    logger.info(
+        "math_validate netto=%.2f mwst=%.4f brutto=%.2f items=%d "
+        "confidence=%.4f valid=%s",
+        payload.netto,
+        payload.mwst_rate,
+        payload.brutto,
+        len(payload.items),
+        response.confidence,
+        response.valid,
+    )
+
+    return ModelResponse(response)
+
+
+# ---------------------------------------------------------------------------
+# Error localisation (explain=true)
+# ---------------------------------------------------------------------------
+
+# Rates tried when a VAT rate itself may have been misread: current and
+# historic German rates (16 % / 5 % in H2 2020) and 0 %
+STANDARD_VAT_RATES = (0.19, 0.07, 0.16, 0.05, 0.0)
+MAX_SUGGESTIONS = 5
+
+
+def _ocr_relation(stated: int, suggested: int) -> tuple[str, float]:
+    """
+    How suggested could have been misread as stated, with a plausibility.
+
+    Both values are fixed-point integers at the same scale, so a lost
+    decimal comma is a factor of 10/100/1000 and digit errors are compared
+    on the plain digit strings.
+    """
+    a, b = abs(stated), abs(suggested)
+    if a == b:
+        return "sign lost", 0.8
+    if a and b and (a * 10 == b or a * 100 == b or a * 1000 == b or b * 10 == a
+                    or b * 100 == a or b * 1000 == a):
+        return "decimal comma misplaced", 0.9
+    sa, sb = str(a), str(b)
+    if len(sa) == len(sb):
+        diff = [k for k in range(len(sa)) if sa[k] != sb[k]]
+        if (
+            len(diff) == 2
+            and diff[1] == diff[0] + 1
+            and sa[diff[0]] == sb[diff[1]]
+            and sa[diff[1]] == sb[diff[0]]
+        ):
+            return "adjacent digits swapped", 0.9
+        if len(diff) == 1:
+            return "single digit misread", 0.7
+    elif abs(len(sa) - len(sb)) == 1:
+        short, long_ = (sa, sb) if len(sa) < len(sb) else (sb, sa)
+        if any(long_[:k] + long_[k + 1:] == short for k in range(len(long_))):
+            return "digit dropped or duplicated", 0.6
+    return "arithmetic error", 0.3
+
+
+def _suggest_corrections(
+    payload: MathValidateRequest,
+    computed_totals: list[float],
+    computed_brutto: float,
+    grouped: bool,
+) -> list[dict[str, Any]]:
+    """
+    Search for single-field corrections that explain the failing checks.
+
+    Hypotheses: one line total, unit price or quantity, netto, brutto, the
+    invoice VAT rate or one line's VAT rate was misread.  For each hypothesis
+    the corrected value follows from the discrepancy, and the residuals of
+    the line, sum and brutto checks after the correction are computed
+    algebraically – vectorised over all lines, no re-validation.  Hypotheses
+    that fix nothing or break a passing check are pruned before the
+    (per-candidate) OCR plausibility is scored.  VAT-breakdown mismatches
+    are not searched.  Returns at most MAX_SUGGESTIONS CorrectionSuggestion
+    dicts, best first.
+    """
+    items = payload.items
+    n_items = len(items)
+    qty = np.fromiter((i.qty for i in items), float, n_items)
+    price = np.fromiter((i.unit_price for i in items), float, n_items)
+    total = np.fromiter((i.total for i in items), float, n_items)
+    comp = np.asarray(computed_totals, dtype=float)
+
+    line_bad = np.abs(_round_vec(total - comp, 2)) > LINE_ITEM_TOLERANCE
+    d_sum = _round2(float(total.sum()) - payload.netto) if n_items else 0.0
+    d_head = _round2(payload.brutto - computed_brutto)
+    sum_bad = abs(d_sum) > BRUTTO_TOLERANCE
+    head_bad = abs(d_head) > BRUTTO_TOLERANCE
+    n_line_bad = int(line_bad.sum())
+    n_failing = n_line_bad + sum_bad + head_bad
+    if not n_failing:
+        return []
+
+    if grouped:
+        item_rate = np.fromiter(
+            (
+                0.0 if i.reverse_charge
+                else (i.mwst_rate if i.mwst_rate is not None else payload.mwst_rate)
+                for i in items
+            ),
+            float,
+            n_items,
+        )
+    else:
+        item_rate = np.zeros(n_items)
+
+    candidates: list[dict[str, Any]] = []
+
+    def _add(field, idx, stated, suggested, scale, fixed, reason=None, plaus=0.0):
+        if reason is None:
+            reason, plaus = _ocr_relation(_to_fixed(stated, scale), _to_fixed(suggested, scale))
+        candidates.append(
+            {
+                "field": field,
+                "item_index": idx,
+                "stated": stated,
+                "suggested": suggested,
+                "reason": reason,
+                "explains": fixed,
+                "score": round(plaus * len(fixed) / n_failing, 4),
+            }
+        )
+
+    def _fixed(idx, ok_sum, ok_head) -> Optional[list[str]]:
+        """Checks resolved, or None if a passing check would break."""
+        if (not sum_bad and not ok_sum) or (not head_bad and not ok_head):
+            return None
+        fixed = [f"line {idx}"] if idx is not None else []
+        if sum_bad and ok_sum:
+            fixed.append("sum")
+        if head_bad and ok_head:
+            fixed.append("brutto")
+        return fixed or None
+
+    # Line total misread: the computed qty × unit_price is the true value
+    bad_idx = np.flatnonzero(line_bad)
+    if bad_idx.size:
+        shift = comp[bad_idx] - total[bad_idx]
+        ok_sum = np.abs(d_sum + shift) <= BRUTTO_TOLERANCE
+        ok_head = np.abs(d_head - shift * item_rate[bad_idx]) <= BRUTTO_TOLERANCE
+        for j, s_ok, h_ok in zip(bad_idx.tolist(), ok_sum.tolist(), ok_head.tolist()):
+            fixed = _fixed(j, s_ok, h_ok)
+            if fixed:
+                _add(f"items[{j}].total", j, items[j].total, comp[j], CENT_SCALE, fixed)
+
+        # Unit price or quantity misread: the stated total is the true value
+        # (not for percentage discount lines, whose total derives from percent)
+        pos = bad_idx[[items[j].percent is None for j in bad_idx.tolist()]]
+        # A zero unit price (or a tiny qty) gives inf; the checks below then see NaN
+        with np.errstate(divide="ignore", over="ignore", invalid="ignore"):
+            new_price = _round_vec(total[pos] / qty[pos], 4)
+            new_qty = _round_vec(total[pos] / price[pos], 4)
+            price_ok = (
+                np.abs(_round_vec(qty[pos] * new_price, 2) - total[pos]) <= LINE_ITEM_TOLERANCE
+            )
+            qty_ok = (new_qty > 0) & (
+                np.abs(_round_vec(new_qty * price[pos], 2) - total[pos]) <= LINE_ITEM_TOLERANCE
+            )
+        ok_sum, ok_head = not sum_bad, not head_bad
+        for j, p, p_ok, q, q_ok in zip(
+            pos.tolist(), new_price.tolist(), price_ok.tolist(), new_qty.tolist(), qty_ok.tolist()
+        ):
+            fixed = _fixed(j, ok_sum, ok_head)
+            if fixed and p_ok:
+                _add(f"items[{j}].unit_price", j, items[j].unit_price, p, PRICE_SCALE, fixed)
+            if fixed and q_ok:
+                _add(f"items[{j}].qty", j, items[j].qty, q, QTY_SCALE, fixed)
+
+    # Netto misread: the line items (or brutto and the rate) are right
+    if n_items:
+        new_netto = _round2(float(total.sum()))
+    elif not grouped:
+        new_netto = _round2(payload.brutto / (1.0 + payload.mwst_rate))
+    else:
+        new_netto = payload.netto
+    if new_netto != payload.netto and n_line_bad == 0:
+        if grouped:
+            head = d_head - (new_netto - payload.netto)
+        else:
+            head = payload.brutto - _round2(new_netto * (1.0 + payload.mwst_rate))
+        fixed = _fixed(None, True, abs(head) <= BRUTTO_TOLERANCE)
+        if fixed:
+            _add("netto", None, payload.netto, new_netto, CENT_SCALE, fixed)
+
+    # Brutto misread
+    if head_bad:
+        _add("brutto", None, payload.brutto, computed_brutto, CENT_SCALE, ["brutto"])
+
+    # VAT rate misread: invoice rate, or one line's rate on grouped invoices
+    if head_bad and not grouped:
+        for r in STANDARD_VAT_RATES:
+            if r != payload.mwst_rate and abs(
+                payload.brutto - _round2(payload.netto * (1.0 + r))
+            ) <= BRUTTO_TOLERANCE:
+                _add("mwst_rate", None, payload.mwst_rate, r, RATE_SCALE, ["brutto"],
+                     "standard VAT rate", 0.9)
+    elif head_bad and n_items:
+        rates = np.array(STANDARD_VAT_RATES)
+        vat_shift = total[:, None] * (rates[None, :] - item_rate[:, None])
+        hit = np.abs(d_head - vat_shift) <= BRUTTO_TOLERANCE
+        hit &= rates[None, :] != item_rate[:, None]
+        for j, k in zip(*np.nonzero(hit)):
+            j, k = int(j), int(k)
+            if not items[j].reverse_charge:
+                _add(f"items[{j}].mwst_rate", j, float(item_rate[j]),
+                     STANDARD_VAT_RATES[k], RATE_SCALE, ["brutto"], "standard VAT rate", 0.9)
+
+    candidates.sort(key=lambda c: (-c["score"], c["item_index"] is None))
+    return candidates[:MAX_SUGGESTIONS]
+
+
+# ---------------------------------------------------------------------------
+# Batch validation (vectorised)
+# ---------------------------------------------------------------------------
+
+
+def _round_vec(x: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    Vectorised equivalent of Python's round(x, ndigits).
+
+    np.round scales by 10**ndigits in floating point, so 2.5 × 423.87
+    (= 1059.67499… in binary) becomes 105967.5 and rounds up, while round()
+    rounds the exact binary value down.  The rounding error of the scaling
+    is recovered exactly (Dekker TwoProduct) and used to resolve those ties.
+    From |x| × 10**ndigits ≥ 2**53 on, x has no digits beyond ndigits and is
+    returned unchanged, as round() does.
+    """
+    scale = 10.0**ndigits
+    p = x * scale
+    # Veltkamp split of x; scale is small enough that bh = scale, bl = 0
+    c = x * 134217729.0
+    hi = c - (c - x)
+    lo = x - hi
+    err = (hi * scale - p) + lo * scale
+    r = np.rint(p)
+    diff = p - r
+    r = np.where((diff == 0.5) & (err > 0.0), r + 1.0, r)
+    r = np.where((diff == -0.5) & (err < 0.0), r - 1.0, r)
+    return np.where(np.abs(p) >= 2.0**53, x, r / scale)
+
+
+def _to_fixed_vec(x: np.ndarray, scale: int) -> np.ndarray:
+    """
+    Vectorised _to_fixed (np.rint rounds half to even, like round()).
+
+    Values outside the int64 range cast to garbage; callers recompute those
+    rows with Python ints.
+    """
+    with np.errstate(invalid="ignore"):
+        return np.rint(x * scale).astype(np.int64)
+
+
+def _div_half_up_vec(num: np.ndarray, den: int) -> np.ndarray:
+    """Vectorised _div_half_up."""
+    return np.sign(num) * ((np.abs(num) * 2 + den) // (2 * den))
+
+
+def _segment_sum(values: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Per-invoice sums of flattened item values; 0.0 for invoices without items."""
+    out = np.zeros(len(counts), dtype=values.dtype)
+    nonempty = counts > 0
+    if values.size:
+        out[nonempty] = np.add.reduceat(values, starts[nonempty])
+    return out
+
+
+def _relative_error_vec(stated: np.ndarray, computed: np.ndarray) -> np.ndarray:
+    """Vectorised _relative_error."""
+    abs_computed = np.abs(computed)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rel = np.abs(stated - computed) / abs_computed
+    rel = np.where(abs_computed == 0.0, np.where(stated == 0.0, 0.0, 1.0), rel)
+    return rel
+
+
+def _lookup(sorted_keys: np.ndarray, query: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Positions of query in sorted_keys (clipped) and whether each was found."""
+    if not sorted_keys.size:
+        return np.zeros(query.size, dtype=np.int64), np.zeros(query.size, dtype=bool)
+    pos = np.minimum(np.searchsorted(sorted_keys, query), sorted_keys.size - 1)
+    return pos, sorted_keys[pos] == query
+
+
+def _vat_groups_batch(
+    invoices: list[MathValidateRequest],
+    items: list[LineItem],
+    grouped_inv: np.ndarray,
+    cents_inv: np.ndarray,
+    counts: np.ndarray,
+    inv_of_item: np.ndarray,
+    netto: np.ndarray,
+    rate: np.ndarray,
+    brutto: np.ndarray,
+    total: np.ndarray,
+    comp_brutto: np.ndarray,
+    delta_brutto: np.ndarray,
+    comp_total: np.ndarray,
+    delta_item: np.ndarray,
+) -> tuple[np.ndarray, dict[int, list[dict[str, Any]]], list[tuple[int, float, str]], np.ndarray]:
+    """
+    Vectorised _vat_groups / _grouped_header_totals / _validate_vat_groups
+    for the invoices flagged in grouped_inv.
+
+    Groups are unique (invoice, rate key) pairs over the flattened items;
+    subtotals are bincounts over the group index.  comp_brutto, delta_brutto,
+    comp_total and delta_item are updated in place.  Returns the display VAT
+    total per invoice, the vat_groups rows, the group messages (in
+    validate_math order) and a per-invoice "some group invalid" mask.
+    """
+    n = len(invoices)
+    j_idx = np.flatnonzero(np.repeat(grouped_inv, counts))
+    sel = [items[j] for j in j_idx.tolist()]
+    k = len(sel)
+    item_inv = inv_of_item[j_idx]
+    item_cents = cents_inv[item_inv]
+
+    item_rate = np.fromiter(
+        (np.nan if i.mwst_rate is None else i.mwst_rate for i in sel), dtype=np.float64, count=k
+    )
+    item_rate = np.where(np.isnan(item_rate), rate[item_inv], item_rate)
+    rc = np.fromiter((i.reverse_charge for i in sel), dtype=bool, count=k)
+    is_position = np.fromiter((i.kind is LineKind.POSITION for i in sel), dtype=bool, count=k)
+    pct = np.fromiter(
+        (np.nan if i.percent is None else i.percent for i in sel), dtype=np.float64, count=k
+    )
+
+    keys = np.where(rc, _RC_KEY, _to_fixed_vec(item_rate, RATE_SCALE) * 2)
+    g_comp, g_of_item = np.unique(item_inv * _KEY_SPAN + keys, return_inverse=True)
+    g_count = len(g_comp)
+    g_inv = g_comp // _KEY_SPAN
+    g_bp = g_comp % _KEY_SPAN // 2
+
+    tot = total[j_idx]
+    tot_c = _to_fixed_vec(tot, CENT_SCALE)
+    netto_raw = np.bincount(g_of_item, weights=tot, minlength=g_count)
+    position_raw = np.bincount(
+        g_of_item, weights=np.where(is_position, tot, 0.0), minlength=g_count
+    )
+    netto_c = np.zeros(g_count, dtype=np.int64)
+    np.add.at(netto_c, g_of_item, tot_c)
+    position_c = np.zeros(g_count, dtype=np.int64)
+    np.add.at(position_c, g_of_item, np.where(is_position, tot_c, 0))
+
+    # Percentage discount / Skonto lines
+    pj = np.flatnonzero(~np.isnan(pct))
+    if pj.size:
+        g = g_of_item[pj]
+        exp_f = -_round_vec(_round_vec(position_raw[g], 2) * pct[pj], 2)
+        exp_c = -_div_half_up_vec(position_c[g] * _to_fixed_vec(pct[pj], RATE_SCALE), RATE_SCALE)
+        c = item_cents[pj]
+        comp_total[j_idx[pj]] = np.where(c, exp_c / CENT_SCALE, exp_f)
+        delta_item[j_idx[pj]] = np.where(
+            c, (tot_c[pj] - exp_c) / CENT_SCALE, _round_vec(tot[pj] - exp_f, 2)
+        )
+
+    # Group VAT and header totals (brutto = netto + Σ group VAT)
+    netto_f = _round_vec(netto_raw, 2)
+    vat_f = _round_vec(netto_f * (g_bp / RATE_SCALE), 2)
+    vat_c = _div_half_up_vec(netto_c * g_bp, RATE_SCALE)
+    vat_total_f = np.bincount(g_inv, weights=vat_f, minlength=n)
+    vat_total_c = np.zeros(n, dtype=np.int64)
+    np.add.at(vat_total_c, g_inv, vat_c)
+
+    gi = np.flatnonzero(grouped_inv)
+    c = cents_inv[gi]
+    comp_f = _round_vec(netto[gi] + vat_total_f[gi], 2)
+    comp_c = _to_fixed_vec(netto[gi], CENT_SCALE) + vat_total_c[gi]
+    comp_brutto[gi] = np.where(c, comp_c / CENT_SCALE, comp_f)
+    delta_brutto[gi] = np.where(
+        c,
+        (_to_fixed_vec(brutto[gi], CENT_SCALE) - comp_c) / CENT_SCALE,
+        _round_vec(brutto[gi] - comp_f, 2),
+    )
+    vat_total = np.full(n, np.nan)
+    vat_total[gi] = np.where(c, vat_total_c[gi] / CENT_SCALE, _round_vec(vat_total_f[gi], 2))
+
+    # Stated breakdown, summed per (invoice, key)
+    bd_inv = grouped_inv & np.fromiter(
+        (inv.vat_breakdown is not None for inv in invoices), dtype=bool, count=n
+    )
+    entries = [
+        (idx, e) for idx in np.flatnonzero(bd_inv).tolist() for e in invoices[idx].vat_breakdown
+    ]
+    s_comp = np.fromiter(
+        (idx * _KEY_SPAN + _group_key(e.rate, e.reverse_charge) for idx, e in entries),
+        dtype=np.int64,
+        count=len(entries),
+    )
+    s_netto = np.fromiter((e.netto for _, e in entries), dtype=np.float64, count=len(entries))
+    s_vat = np.fromiter((e.vat for _, e in entries), dtype=np.float64, count=len(entries))
+    s_keys, s_of = np.unique(s_comp, return_inverse=True)
+    st_netto_f = np.bincount(s_of, weights=s_netto, minlength=len(s_keys))
+    st_vat_f = np.bincount(s_of, weights=s_vat, minlength=len(s_keys))
+    st_netto_c = np.zeros(len(s_keys), dtype=np.int64)
+    np.add.at(st_netto_c, s_of, _to_fixed_vec(s_netto, CENT_SCALE))
+    st_vat_c = np.zeros(len(s_keys), dtype=np.int64)
+    np.add.at(st_vat_c, s_of, _to_fixed_vec(s_vat, CENT_SCALE))
+
+    # Rows: union of computed and stated groups, ordered by (invoice, key)
+    rows = np.union1d(g_comp, s_keys)
+    r_inv = rows // _KEY_SPAN
+    r_key = rows % _KEY_SPAN
+    r_cents = cents_inv[r_inv]
+    gpos, has_g = _lookup(g_comp, rows)
+    spos, has_s = _lookup(s_keys, rows)
+
+    def _pick(found: np.ndarray, pos: np.ndarray, f: np.ndarray, c: np.ndarray) -> tuple:
+        units_f = np.where(found, f[pos], 0.0) if f.size else np.zeros(rows.size)
+        units_c = np.where(found, c[pos], 0) if c.size else np.zeros(rows.size, dtype=np.int64)
+        return units_f, units_c, np.where(r_cents, units_c / CENT_SCALE, units_f)
+
+    r_netto_f, r_netto_c, r_netto = _pick(has_g, gpos, netto_f, netto_c)
+    r_vat_f, r_vat_c, r_vat = _pick(has_g, gpos, vat_f, vat_c)
+    r_st_netto_f, r_st_netto_c, r_st_netto = _pick(has_s, spos, st_netto_f, st_netto_c)
+    r_st_vat_f, r_st_vat_c, r_st_vat = _pick(has_s, spos, st_vat_f, st_vat_c)
+
+    d_netto = np.where(
+        r_cents,
+        (r_st_netto_c - r_netto_c) / CENT_SCALE,
+        _round_vec(r_st_netto_f - r_netto_f, 2),
+    )
+    d_vat = np.where(
+        r_cents, (r_st_vat_c - r_vat_c) / CENT_SCALE, _round_vec(r_st_vat_f - r_vat_f, 2)
+    )
+    r_bd = bd_inv[r_inv]
+    bad_netto = r_bd & (np.abs(d_netto) > BRUTTO_TOLERANCE)
+    bad_vat = r_bd & (np.abs(d_vat) > BRUTTO_TOLERANCE)
+    r_valid = ~(bad_netto | bad_vat)
+    group_invalid = np.bincount(r_inv, weights=~r_valid, minlength=n) > 0
+
+    vat_groups: dict[int, list[dict[str, Any]]] = {}
+    messages: list[tuple[int, float, str]] = []
+    r_inv_l = r_inv.tolist()
+    r_key_l = r_key.tolist()
+    r_bd_l = r_bd.tolist()
+    r_netto_l, r_vat_l = r_netto.tolist(), r_vat.tolist()
+    r_st_netto_l, r_st_vat_l = r_st_netto.tolist(), r_st_vat.tolist()
+    r_valid_l = r_valid.tolist()
+    d_netto_l, d_vat_l = d_netto.tolist(), d_vat.tolist()
+    bad_netto_l, bad_vat_l = bad_netto.tolist(), bad_vat.tolist()
+    for r, idx in enumerate(r_inv_l):
+        key = r_key_l[r]
+        vat_groups.setdefault(idx, []).append(
+            {
+                "rate": key // 2 / RATE_SCALE,
+                "reverse_charge": key == _RC_KEY,
+                "netto": r_netto_l[r],
+                "vat": r_vat_l[r],
+                "stated_netto": r_st_netto_l[r] if r_bd_l[r] else None,
+                "stated_vat": r_st_vat_l[r] if r_bd_l[r] else None,
+                "valid": r_valid_l[r],
+            }
+        )
+        label = _group_label(key)
+        if bad_netto_l[r]:
+            messages.append(
+                (
+                    idx,
+                    abs(d_netto_l[r]),
+                    f"VAT group {label}: netto {r_netto_l[r]} "
+                    f"but stated {r_st_netto_l[r]} (Δ {d_netto_l[r]:+.4f})",
+                )
+            )
+        if bad_vat_l[r]:
+            messages.append(
+                (
+                    idx,
+                    abs(d_vat_l[r]),
+                    f"VAT group {label}: VAT {r_vat_l[r]} "
+                    f"but stated {r_st_vat_l[r]} (Δ {d_vat_l[r]:+.4f})",
+                )
+            )
+    return vat_total, vat_groups, messages, group_invalid
+
+
+def _exceeds_int64_cents(inv: MathValidateRequest) -> bool:
+    """True if a cents-mode invoice has amounts whose scaled products may overflow int64."""
+    if inv.rounding is not RoundingMode.CENTS:
+        return False
+    amount = max(inv.netto, inv.brutto, sum(abs(i.total) for i in inv.items))
+    for entry in inv.vat_breakdown or ():
+        amount = max(amount, abs(entry.netto), abs(entry.vat))
+    return amount >= _INT64_AMOUNT_LIMIT
+
+
+def _validate_batch(invoices: list[MathValidateRequest]) -> list[dict[str, Any]]:
+    """
+    Validate many invoices with the same rules as validate_math.
+    Returns one dict per invoice in the MathValidateResponse shape.
+
+    Cents-mode invoices beyond the int64 range of the vectorised path go
+    through _validate_one (Python ints) instead.
+    """
+    exact = [_exceeds_int64_cents(inv) for inv in invoices]
+    if not any(exact):
+        return _validate_batch_vec(invoices)
+    rest = [inv for inv, e in zip(invoices, exact) if not e]
+    vec = iter(_validate_batch_vec(rest) if rest else ())
+    return [
+        _validate_one(inv).model_dump() if e else next(vec)
+        for inv, e in zip(invoices, exact)
+    ]
+
+
+def _validate_batch_vec(invoices: list[MathValidateRequest]) -> list[dict[str, Any]]:
+    """Vectorised _validate_batch; every cents amount must fit the int64 scale."""
+    n = len(invoices)
+    counts = np.fromiter((len(inv.items) for inv in invoices), dtype=np.int64, count=n)
+    starts = np.zeros(n, dtype=np.int64)
+    np.cumsum(counts[:-1], out=starts[1:])
+    m = int(counts.sum())
+
+    netto = np.fromiter((inv.netto for inv in invoices), dtype=np.float64, count=n)
+    rate = np.fromiter((inv.mwst_rate for inv in invoices), dtype=np.float64, count=n)
+    brutto = np.fromiter((inv.brutto for inv in invoices), dtype=np.float64, count=n)
+
+    items = [item for inv in invoices for item in inv.items]
+    qty = np.fromiter((i.qty for i in items), dtype=np.float64, count=m)
+    price = np.fromiter((i.unit_price for i in items), dtype=np.float64, count=m)
+    total = np.fromiter((i.total for i in items), dtype=np.float64, count=m)
+    inv_of_item = np.repeat(np.arange(n), counts)
+
+    # Arithmetic: float path, then invoices in cents mode are overwritten
+    cents_inv = np.fromiter(
+        (inv.rounding is RoundingMode.CENTS for inv in invoices), dtype=bool, count=n
+    )
+    if cents_inv.all():
+        comp_brutto = delta_brutto = sum_items = sum_delta = np.zeros(n)
+        comp_total = delta_item = np.zeros(m)
+    else:
+        comp_brutto = _round_vec(netto * (1.0 + rate), 2)
+        delta_brutto = _round_vec(brutto - comp_brutto, 2)
+        comp_total = _round_vec(qty * price, 2)
+        delta_item = _round_vec(total - comp_total, 2)
+        sum_items = _round_vec(_segment_sum(total, starts, counts), 2)
+        sum_delta = _round_vec(sum_items - netto, 2)
+
+    if cents_inv.any():
+        cents_item = np.repeat(cents_inv, counts)
+        netto_c = _to_fixed_vec(netto, CENT_SCALE)
+        brutto_c = _to_fixed_vec(brutto, CENT_SCALE)
+        total_c = _to_fixed_vec(total, CENT_SCALE)
+        comp_brutto_c = netto_c + _div_half_up_vec(
+            netto_c * _to_fixed_vec(rate, RATE_SCALE), RATE_SCALE
+        )
+        comp_total_c = _div_half_up_vec(
+            _to_fixed_vec(qty, QTY_SCALE) * _to_fixed_vec(price, PRICE_SCALE),
+            _ITEM_TO_CENTS,
+        )
+        # Products beyond int64 range: exact Python ints for those few lines
+        huge = cents_item & (np.abs(qty * price) >= _INT64_ITEM_LIMIT)
+        for j in np.flatnonzero(huge).tolist():
+            comp_total_c[j] = _line_total_cents(items[j])
+        sum_c = _segment_sum(total_c, starts, counts)
+
+        comp_brutto = np.where(cents_inv, comp_brutto_c / CENT_SCALE, comp_brutto)
+        delta_brutto = np.where(cents_inv, (brutto_c - comp_brutto_c) / CENT_SCALE, delta_brutto)
+        comp_total = np.where(cents_item, comp_total_c / CENT_SCALE, comp_total)
+        delta_item = np.where(cents_item, (total_c - comp_total_c) / CENT_SCALE, delta_item)
+        sum_items = np.where(cents_inv, sum_c / CENT_SCALE, sum_items)
+        sum_delta = np.where(cents_inv, (sum_c - netto_c) / CENT_SCALE, sum_delta)
+
+    # Per-rate groups for invoices using line rates, §13b, percentages or a breakdown
+    grouped_inv = np.fromiter((_uses_vat_groups(inv) for inv in invoices), dtype=bool, count=n)
+    if grouped_inv.any():
+        vat_total, vat_groups, group_messages, group_invalid = _vat_groups_batch(
+            invoices, items, grouped_inv, cents_inv, counts, inv_of_item,
+            netto, rate, brutto, total, comp_brutto, delta_brutto, comp_total, delta_item,
+        )
+    else:
+        vat_total = np.full(n, np.nan)
+        vat_groups, group_messages = {}, []
+        group_invalid = np.zeros(n, dtype=bool)
+
+    # 1. Header totals
+    header_valid = np.abs(delta_brutto) <= BRUTTO_TOLERANCE
+
+    # 2. Line items
+    item_valid = np.abs(delta_item) <= LINE_ITEM_TOLERANCE
+    item_penalty = np.minimum(_relative_error_vec(total, comp_total), 1.0)
+
+    invalid_items = _segment_sum((~item_valid).astype(np.int64), starts, counts)
+    line_penalty = np.divide(
+        _segment_sum(item_penalty, starts, counts),
+        counts,
+        out=np.zeros(n),
+        where=counts > 0,
+    )
+
+    # 3. Sum of line items vs netto
+    sum_mismatch = (counts > 0) & (np.abs(sum_delta) > BRUTTO_TOLERANCE)
+
+    # 4. Confidence
+    header_penalty = np.minimum(_relative_error_vec(brutto, comp_brutto), 0.5)
+    confidence = np.clip(1.0 - (header_penalty * 0.5 + line_penalty * 0.5), 0.0, 1.0)
+    confidence = np.where(
+        header_valid & (invalid_items == 0) & ~group_invalid, 1.0, confidence
+    )
+    confidence = _round_vec(confidence, 4)
+
+    # Python scalars for response building (tolist() is one C loop)
+    comp_brutto_l = comp_brutto.tolist()
+    delta_brutto_l = delta_brutto.tolist()
+    comp_total_l = comp_total.tolist()
+    delta_item_l = delta_item.tolist()
+    item_valid_l = item_valid.tolist()
+    sum_items_l = sum_items.tolist()
+    sum_delta_l = sum_delta.tolist()
+    vat_total_l = vat_total.tolist()
+    grouped_l = grouped_inv.tolist()
+    confidence_l = confidence.tolist()
+
+    errors: list[list[str]] = [[] for _ in range(n)]
+    warnings: list[list[str]] = [[] for _ in range(n)]
+
+    def _report(idx: int, abs_delta: float, msg: str) -> None:
+        (errors if abs_delta > 1.0 else warnings)[idx].append(msg)
+
+    # Messages in the same order as validate_math: header, items, sum, groups
+    for idx in np.flatnonzero(~header_valid).tolist():
+        inv = invoices[idx]
+        if grouped_l[idx]:
+            formula = f"{inv.netto} + VAT {vat_total_l[idx]}"
+        else:
+            formula = f"{inv.netto} × (1 + {inv.mwst_rate})"
+        _report(
+            idx,
+            abs(delta_brutto_l[idx]),
+            f"Brutto mismatch: {formula} "
+            f"= {comp_brutto_l[idx]} but stated {inv.brutto} "
+            f"(Δ {delta_brutto_l[idx]:+.4f})",
+        )
+    for j in np.flatnonzero(~item_valid).tolist():
+        idx = int(inv_of_item[j])
+        item = items[j]
+        _report(
+            idx,
+            abs(delta_item_l[j]),
+            f"Line item {j - int(starts[idx])}: {item.qty} × {item.unit_price} "
+            f"= {comp_total_l[j]} "
+            f"but stated {item.total} (Δ {delta_item_l[j]:+.4f})",
+        )
+    for idx in np.flatnonzero(sum_mismatch).tolist():
+        _report(
+            idx,
+            abs(sum_delta_l[idx]),
+            f"Sum of line items ({sum_items_l[idx]}) does not match netto "
+            f"({invoices[idx].netto}) (Δ {sum_delta_l[idx]:+.4f})",
+        )
+    for idx, abs_delta, msg in group_messages:
+        _report(idx, abs_delta, msg)
+
+    # Plain dicts in the MathValidateResponse shape: the response_model
+    # validation below is the only model construction (done in pydantic-core)
+    results: list[dict[str, Any]] = []
+    for idx, inv in enumerate(invoices):
+        start = int(starts[idx])
+        results.append(
+            {
+                "valid": not errors[idx],
+                "confidence": confidence_l[idx],
+                "traffic_light": _traffic_light(confidence_l[idx]).value,
+                "corrected_brutto": comp_brutto_l[idx],
+                "stated_brutto": inv.brutto,
+                "delta_brutto": delta_brutto_l[idx],
+                "errors": errors[idx],
+                "warnings": warnings[idx],
+                "line_item_results": [
+                    {
+                        "index": k,
+                        "qty": item.qty,
+                        "unit_price": item.unit_price,
+                        "stated_total": item.total,
+                        "computed_total": comp_total_l[start + k],
+                        "delta": delta_item_l[start + k],
+                        "valid": item_valid_l[start + k],
+                    }
+                    for k, item in enumerate(inv.items)
+                ],
+                "vat_groups": vat_groups.get(idx, []),
+                "suggestions": (
+                    _suggest_corrections(
+                        inv,
+                        comp_total_l[start:start + len(inv.items)],
+                        comp_brutto_l[idx],
+                        grouped_l[idx],
+                    )
+                    if inv.explain and (errors[idx] or warnings[idx])
+                    else []
+                ),
+            }
+        )
+    return results
+
+
+@router.post(
+    "/validate-batch",
+    response_model=MathValidateBatchResponse,
+    summary="Validate arithmetic of many invoices in one call",
+    description=(
+        "Applies the /math/validate checks to a list of invoices using "
+        "vectorised NumPy evaluation. Returns one MathValidateResponse per "
+        "invoice, in input order."
+    ),
+)
+async def validate_math_batch(payload: MathValidateBatchRequest) -> ModelResponse:
+    # Up to 200,000 invoices of NumPy work: keep it off the event loop
+    results = await anyio.to_thread.run_sync(_validate_batch, payload.invoices)
+    valid_count = sum(1 for r in results if r["valid"])
+
+    logger.info(
+        "math_validate_batch invoices=%d valid=%d",
+        len(results),
+        valid_count,
+    )
+
+    return ModelResponse(
+        MathValidateBatchResponse.model_validate(
+            {"results": results, "total": len(results), "valid_count": valid_count}
+        )
     )
@@ -0,0 +1,400 @@
+"""
+Prometheus metrics
+GET /metrics
+
+In-process metrics in the Prometheus text exposition format (0.0.4), kept
+without the prometheus_client dependency.  Every label combination is a
+child object created once and cached, holding plain numbers (histograms: a
+fixed bucket list).  An update is one uncontended lock round-trip plus an
+addition; requests allocate nothing in the registry.
+
+HTTP metrics are recorded by MetricsMiddleware, a pure ASGI middleware, per
+route template (e.g. "/math/validate", never the raw path, so label
+cardinality stays bounded):
+
+  http_requests_total{method,route,status}
+  http_request_duration_seconds{method,route}   histogram
+  http_requests_in_flight                       gauge
+  http_request_bytes_total{route}               body bytes received
+  http_response_bytes_total{route}              body bytes sent
+
+Domain metrics are updated by the routers:
+
+  gobd_csv_rows_parsed_total{result}            valid / invalid
+  gobd_violations_total{violation_type}
+  pii_entities_detected_total{entity_type}
+  image_pixels_processed_total                  input pixels
+  image_deskew_angle_degrees                    histogram
+  vision_inference_seconds{outcome}             histogram, Ollama round-trip
+
+and by logging_config:
+
+  log_records_dropped_total{level}              records dropped, queue full
+
+Process memory is read from /proc/self/smaps_rollup at scrape time (Linux):
+
+  process_memory_bytes{kind}                    rss, pss, shared, private
+
+With prefork.py, "shared" is mostly the pages inherited from the master;
+pss (shared pages divided among the processes mapping them) is what a
+worker actually adds to the host's memory use.
+
+Metrics are per worker process; with several uvicorn workers each scrape
+sees the worker that answered it.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Optional
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+router = APIRouter(tags=["System"])
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DESKEW_BUCKETS = (-10.0, -5.0, -2.0, -1.0, -0.5, -0.1, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0)
+INFERENCE_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 60.0, 120.0)
+
+
+# ---------------------------------------------------------------------------
+# Metric types
+# ---------------------------------------------------------------------------
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _label_str(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        if not labelnames:
+            self._default = self.labels()
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: str) -> Any:
+        """Child for one label combination; created on first use, then cached."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _sorted_children(self) -> list[tuple[tuple[str, ...], Any]]:
+        with self._lock:
+            return sorted(self._children.items(), key=lambda item: item[0])
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+            *self.samples(),
+        ]
+        return "\n".join(lines) + "\n"
+
+
+class _ValueChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self) -> _ValueChild:
+        return _ValueChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_label_str(self.labelnames, values)} {_format_value(child.value)}"
+            for values, child in self._sorted_children()
+        ]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # Last slot: observations above the highest bound (+Inf bucket)
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        # Buckets are upper-inclusive ("le"), which bisect_left gives
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def samples(self) -> list[str]:
+        lines = []
+        for values, child in self._sorted_children():
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_label_str(self.labelnames, values, le)} {cumulative}"
+                )
+            labels = _label_str(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "".join(m.render() for m in self._metrics.values())
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+
+def gauge(name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))  # type: ignore[return-value]
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: tuple[str, ...] = (),
+    buckets: tuple[float, ...] = LATENCY_BUCKETS,
+) -> Histogram:
+    return REGISTRY.register(  # type: ignore[return-value]
+        Histogram(name, documentation, labelnames, buckets)
+    )
+
+
+# ---------------------------------------------------------------------------
+# Metric definitions
+# ---------------------------------------------------------------------------
+
+HTTP_REQUESTS = counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+)
+HTTP_DURATION = histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+HTTP_IN_FLIGHT = gauge("http_requests_in_flight", "HTTP requests currently being served")
+HTTP_REQUEST_BYTES = counter(
+    "http_request_bytes_total", "HTTP request body bytes received", ("route",)
+)
+HTTP_RESPONSE_BYTES = counter(
+    "http_response_bytes_total", "HTTP response body bytes sent", ("route",)
+)
+
+CSV_ROWS_PARSED = counter(
+    "gobd_csv_rows_parsed_total", "Journal CSV rows parsed", ("result",)
+)
+GOBD_VIOLATIONS = counter(
+    "gobd_violations_total", "GoBD violations found by /api/gobd/prepare", ("violation_type",)
+)
+PII_ENTITIES = counter(
+    "pii_entities_detected_total", "PII entities detected by the sanitize endpoints", ("entity_type",)
+)
+IMAGE_PIXELS = counter("image_pixels_processed_total", "Input pixels run through preprocessing")
+DESKEW_ANGLE = histogram(
+    "image_deskew_angle_degrees", "Detected skew angle of preprocessed images", buckets=DESKEW_BUCKETS
+)
+VISION_INFERENCE = histogram(
+    "vision_inference_seconds", "Vision model round-trip time", ("outcome",), INFERENCE_BUCKETS
+)
+LOG_RECORDS_DROPPED = counter(
+    "log_records_dropped_total", "Log records dropped because the log queue was full", ("level",)
+)
+PROCESS_MEMORY = gauge(
+    "process_memory_bytes", "Memory of this worker process (smaps_rollup)", ("kind",)
+)
+
+
+# ---------------------------------------------------------------------------
+# Process memory
+# ---------------------------------------------------------------------------
+
+_SMAPS_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared",
+    "Shared_Dirty": "shared",
+    "Private_Clean": "private",
+    "Private_Dirty": "private",
+}
+
+
+def process_memory(pid: int | str = "self") -> dict[str, int]:
+    """rss / pss / shared / private bytes of a process; {} where /proc is unavailable."""
+    usage: dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as rollup:
+            for line in rollup:
+                name, _, rest = line.partition(":")
+                kind = _SMAPS_FIELDS.get(name)
+                if kind is not None:
+                    usage[kind] = usage.get(kind, 0) + int(rest.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        return {}
+    return usage
+
+
+# ---------------------------------------------------------------------------
+# ASGI middleware
+# ---------------------------------------------------------------------------
+
+
+_UNMATCHED = "<unmatched>"
+_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+
+class MetricsMiddleware:
+    """Records the HTTP metrics of every request without buffering the body."""
+
+    def __init__(self, app: ASGIApp, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.app = app
+        self.clock = clock
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = self.clock()
+        status_code = 500
+        received = 0
+        sent = 0
+
+        async def receive_counted() -> Message:
+            nonlocal received
+            message = await receive()
+            received += len(message.get("body", b""))
+            return message
+
+        async def send_counted(message: Message) -> None:
+            nonlocal status_code, sent
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive_counted, send_counted)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # The router stores the matched route in the scope
+            route: Optional[str] = getattr(scope.get("route"), "path", None) or _UNMATCHED
+            method = scope["method"] if scope["method"] in _METHODS else "OTHER"
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+            HTTP_DURATION.labels(method, route).observe(self.clock() - start)
+            HTTP_REQUEST_BYTES.labels(route).inc(received)
+            HTTP_RESPONSE_BYTES.labels(route).inc(sent)
+
+
+# ---------------------------------------------------------------------------
+# Endpoint
+# ---------------------------------------------------------------------------
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    for kind, value in process_memory().items():
+        PROCESS_MEMORY.labels(kind).set(value)
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
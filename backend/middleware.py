@@ -0,0 +1,164 @@
+"""
+Request middleware for the Zone 2 backend.
+
+RequestContextMiddleware is a pure ASGI middleware.  Unlike
+@app.middleware("http") (Starlette's BaseHTTPMiddleware) it does not run the
+endpoint in a separate task behind a memory stream, so streaming responses
+such as the DATEV export pass through unbuffered and each request skips the
+task/stream setup.  Per request it
+
+  - takes X-Request-ID from the client or generates one, exposes it as
+    request.state.request_id and logging_config.request_id_var (so every
+    log record of the request carries it),
+  - adds X-Request-ID and X-Processing-Time-MS (time to the response start)
+    to the response, and X-Profile-ID when the request was profiled,
+  - turns unhandled exceptions into the JSON error envelope (500),
+  - writes one access-log line on the "access" logger after the body is
+    sent.
+
+Access logging is sampled: ACCESS_LOG_SAMPLE_RATE of the successful
+requests are logged, while errors (status >= 400) and requests slower than
+ACCESS_LOG_SLOW_MS always are.  Emission is non-blocking through the queue
+handler installed by logging_config; method, path, status, duration_ms,
+bytes and client also travel as structured fields for the JSON format.
+
+Configuration (environment):
+  ACCESS_LOG_SAMPLE_RATE  (default 1.0)
+  ACCESS_LOG_SLOW_MS      (default 1000)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import random
+import time
+import uuid
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import profiling
+from logging_config import request_id_var
+from models import ErrorDetail, ErrorResponse
+
+logger = logging.getLogger(__name__)
+access_logger = logging.getLogger("access")
+
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+ACCESS_LOG_SLOW_MS = float(os.getenv("ACCESS_LOG_SLOW_MS", "1000"))
+
+
+def _error_body(request_id: str) -> bytes:
+    return ErrorResponse(
+        error=ErrorDetail(
+            code="INTERNAL_SERVER_ERROR",
+            message="An unexpected error occurred. Please try again.",
+            details={"request_id": request_id},
+        )
+    ).model_dump_json().encode()
+
+
+class RequestContextMiddleware:
+    """Request IDs, timing headers, error envelope and sampled access log."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.monotonic()
+        request_id = Headers(scope=scope).get("x-request-id") or str(uuid.uuid4())
+        # request.state reads this dict, so handlers see request.state.request_id
+        scope.setdefault("state", {})["request_id"] = request_id
+        token = request_id_var.set(request_id)
+        profile = profiling.start_request(Request(scope))
+
+        status_code = 500
+        duration_ms = 0.0
+        response_started = False
+        sent = 0
+
+        async def send_with_headers(message: Message) -> None:
+            nonlocal status_code, duration_ms, response_started, sent
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+                duration_ms = round((time.monotonic() - start) * 1000, 2)
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = request_id
+                headers["X-Processing-Time-MS"] = str(duration_ms)
+                if profile is not None:
+                    headers["X-Profile-ID"] = request_id
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        except Exception as exc:
+            duration_ms = round((time.monotonic() - start) * 1000, 2)
+            logger.error(
+                "unhandled %s %s  %.1fms: %s",
+                scope["method"],
+                scope["path"],
+                duration_ms,
+                exc,
+                exc_info=True,
+            )
+            if response_started:
+                # Headers are out; the server can only abort the connection
+                raise
+            status_code = 500
+            body = _error_body(request_id)
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 500,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"x-request-id", request_id.encode("latin-1")),
+                        (b"x-processing-time-ms", str(duration_ms).encode()),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": body})
+            sent = len(body)
+        finally:
+            total_ms = (time.monotonic() - start) * 1000
+            if profile is not None:
+                profiling.finish_request(
+                    profile, request_id, scope["method"], scope["path"],
+                    status_code, duration_ms,
+                )
+            if (
+                status_code >= 400
+                or total_ms >= ACCESS_LOG_SLOW_MS
+                or ACCESS_LOG_SAMPLE_RATE >= 1.0
+                or random.random() < ACCESS_LOG_SAMPLE_RATE
+            ):
+                client = scope.get("client")
+                client_host = client[0] if client else "unknown"
+                access_logger.info(
+                    "%s %s %d %.1fms bytes=%d client=%s",
+                    scope["method"],
+                    scope["path"],
+                    status_code,
+                    total_ms,
+                    sent,
+                    client_host,
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status_code,
+                        "duration_ms": round(total_ms, 2),
+                        "bytes": sent,
+                        "client": client_host,
+                    },
+                )
+            request_id_var.reset(token)
@@ -5,11 +5,13 @@ Zone 2 - FreyAI Visions 95/5 Architecture
 
 from __future__ import annotations
 
-from decimal import Decimal
+import math
+from datetime import date
+from decimal import Decimal, InvalidOperation
 from enum import Enum
-from typing import Any, Optional
+from typing import Annotated, Any, Optional
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, BeforeValidator, Field, field_validator, model_validator
 
 
 # ---------------------------------------------------------------------------
@@ -17,21 +19,124 @@ from pydantic import BaseModel, Field, field_validator
 # ---------------------------------------------------------------------------
 
 
+def parse_german_decimal(value: Any) -> Decimal:
+    """
+    Parse a German-locale or English-locale amount to Decimal.
+
+    Locale detection rules:
+      - Both comma and dot present: the rightmost one is the decimal
+        separator ("1.234,56" German, "1,234.56" English).
+      - Only a comma: German decimal comma ("123,45").
+      - Only a dot, or neither: English / plain integer, used as-is.
+
+    Decimal, int and float values pass through (floats via str()).
+    """
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    s = str(value).strip()
+    has_comma = "," in s
+    has_dot = "." in s
+    if has_comma and has_dot:
+        if s.rfind(",") > s.rfind("."):
+            # German: "1.234,56" — dot = thousands sep, comma = decimal sep
+            s = s.replace(".", "").replace(",", ".")
+        else:
+            # English: "1,234.56" — comma = thousands sep, dot = decimal sep
+            s = s.replace(",", "")
+    elif has_comma:
+        s = s.replace(",", ".")
+    try:
+        return Decimal(s)
+    except InvalidOperation as exc:
+        raise ValueError(f"Cannot parse '{value}' as a decimal number") from exc
+
+
+# Decimal field that also accepts German-locale strings ("1.234,56"); the
+# parser is compiled into the pydantic-core schema of every model using it
+GermanDecimal = Annotated[Decimal, BeforeValidator(parse_german_decimal)]
+
+
 class HealthResponse(BaseModel):
     status: str
     version: str
     services: dict[str, str]
 
 
+class ProbeStatus(BaseModel):
+    status: str = Field(..., description="ok, degraded, fail, stale or pending")
+    detail: str
+    critical: bool = Field(..., description="A failing critical probe makes the worker not ready")
+    checked_at: Optional[str] = Field(None, description="ISO-8601 UTC time of the last run")
+    duration_ms: float
+
+
+class ReadinessResponse(BaseModel):
+    status: str = Field(..., description="ready, degraded or not_ready")
+    probes: dict[str, ProbeStatus]
+
+
+class LivenessResponse(BaseModel):
+    status: str
+    uptime_s: float
+
+
 # ---------------------------------------------------------------------------
 # Math Guardrail
 # ---------------------------------------------------------------------------
 
 
+class LineKind(str, Enum):
+    POSITION = "position"
+    DISCOUNT = "discount"  # Rabatt / Nachlass, reduces the net of its VAT group
+    SKONTO = "skonto"  # Skonto deducted on the invoice itself
+
+
 class LineItem(BaseModel):
     qty: float = Field(..., gt=0, description="Quantity (must be positive)")
     unit_price: float = Field(..., description="Price per unit (net)")
     total: float = Field(..., description="Line total as stated on document")
+    mwst_rate: Optional[float] = Field(
+        None,
+        ge=0.0,
+        le=1.0,
+        description="VAT rate of this line; defaults to the invoice mwst_rate",
+    )
+    reverse_charge: bool = Field(
+        False, description="§13b UStG line: recipient owes the VAT, none charged here"
+    )
+    kind: LineKind = LineKind.POSITION
+    percent: Optional[float] = Field(
+        None,
+        gt=0.0,
+        le=1.0,
+        description=(
+            "Discount/Skonto rate as decimal of the positions in the same VAT "
+            "group; the line total is then checked against it"
+        ),
+    )
+
+    @model_validator(mode="after")
+    def deductions_are_negative(self) -> "LineItem":
+        if self.kind is LineKind.POSITION:
+            if self.percent is not None:
+                raise ValueError("percent is only allowed on discount/skonto lines")
+        elif self.total > 0 or self.unit_price > 0:
+            raise ValueError(f"{self.kind.value} lines must have a negative amount")
+        return self
+
+
+class VatBreakdownEntry(BaseModel):
+    rate: float = Field(..., ge=0.0, le=1.0, description="VAT rate as decimal")
+    reverse_charge: bool = Field(False, description="§13b group (no VAT charged)")
+    netto: float = Field(..., description="Stated net subtotal of this rate")
+    vat: float = Field(..., description="Stated VAT amount of this rate")
+
+
+class RoundingMode(str, Enum):
+    FLOAT = "float"  # binary floating point, Python round() (legacy behaviour)
+    CENTS = "cents"  # exact integer-cent arithmetic, ROUND_HALF_UP
 
 
 class MathValidateRequest(BaseModel):
@@ -44,6 +149,21 @@ class MathValidateRequest(BaseModel):
     )
     brutto: float = Field(..., description="Gross amount (including VAT)")
     items: list[LineItem] = Field(default_factory=list, description="Individual line items")
+    rounding: RoundingMode = Field(
+        RoundingMode.FLOAT,
+        description=(
+            "'cents' computes in integer cents with commercial rounding "
+            "(ROUND_HALF_UP), as on German invoices"
+        ),
+    )
+    vat_breakdown: Optional[list[VatBreakdownEntry]] = Field(
+        None, description="Per-rate subtotals as stated on the invoice"
+    )
+    explain: bool = Field(
+        False,
+        description="If checks fail, search for single-field corrections "
+        "(OCR misreads) that explain the discrepancy",
+    )
 
     @field_validator("brutto", "netto")
     @classmethod
@@ -52,6 +172,18 @@ class MathValidateRequest(BaseModel):
             raise ValueError("Amount must be non-negative")
         return v
 
+    @model_validator(mode="after")
+    def amounts_must_be_finite(self) -> "MathValidateRequest":
+        # Infinity/NaN have no cent value and no correction explains them
+        values = [self.netto, self.brutto, self.mwst_rate]
+        for item in self.items:
+            values += (item.qty, item.unit_price, item.total)
+        for entry in self.vat_breakdown or ():
+            values += (entry.netto, entry.vat)
+        if not all(math.isfinite(v) for v in values):
+            raise ValueError("Amounts must be finite numbers")
+        return self
+
 
 class TrafficLight(str, Enum):
     GREEN = "green"
@@ -69,6 +201,26 @@ class LineItemResult(BaseModel):
     valid: bool
 
 
+class VatGroupResult(BaseModel):
+    rate: float
+    reverse_charge: bool
+    netto: float
+    vat: float
+    stated_netto: Optional[float] = None
+    stated_vat: Optional[float] = None
+    valid: bool
+
+
+class CorrectionSuggestion(BaseModel):
+    field: str = Field(..., description="Corrected field, e.g. 'items[3].total' or 'mwst_rate'")
+    item_index: Optional[int] = None
+    stated: float
+    suggested: float
+    reason: str = Field(..., description="Likely cause, e.g. 'adjacent digits swapped'")
+    explains: list[str] = Field(..., description="Failing checks resolved by this correction")
+    score: float = Field(..., ge=0.0, le=1.0)
+
+
 class MathValidateResponse(BaseModel):
     valid: bool
     confidence: float = Field(..., ge=0.0, le=1.0)
@@ -79,6 +231,28 @@ class MathValidateResponse(BaseModel):
     errors: list[str]
     warnings: list[str]
     line_item_results: list[LineItemResult]
+    vat_groups: list[VatGroupResult] = Field(
+        default_factory=list,
+        description="Per-rate subtotals; filled when lines carry own rates, "
+        "reverse charge or discount percentages, or a breakdown is stated",
+    )
+    suggestions: list[CorrectionSuggestion] = Field(
+        default_factory=list, description="Ranked corrections (explain=true only)"
+    )
+
+
+class MathValidateBatchRequest(BaseModel):
+    invoices: list[MathValidateRequest] = Field(
+        ..., min_length=1, max_length=200_000, description="Invoices to validate"
+    )
+
+
+class MathValidateBatchResponse(BaseModel):
+    results: list[MathValidateResponse] = Field(
+        ..., description="One result per invoice, in input order"
+    )
+    total: int
+    valid_count: int
 
 
 # ---------------------------------------------------------------------------
@@ -95,6 +269,19 @@ class SanitizeMode(str, Enum):
 class PiiSanitizeRequest(BaseModel):
     text: str = Field(..., min_length=1, description="Text to sanitize")
     mode: SanitizeMode = Field(SanitizeMode.MASK, description="Sanitization mode")
+    tenant_id: str = Field(
+        "default",
+        min_length=1,
+        max_length=64,
+        description="Tenant namespace for TOKENIZE mode; tokens only resolve within it",
+    )
+    validated_only: bool = Field(
+        False,
+        description=(
+            "Only sanitize IBAN / tax-ID candidates that pass checksum validation "
+            "(keeps invoice numbers and references intact)"
+        ),
+    )
 
 
 class EntityFound(BaseModel):
@@ -103,6 +290,12 @@ class EntityFound(BaseModel):
     replacement: str = Field(..., description="Replacement value applied")
     start: int = Field(..., description="Start character position in original text")
     end: int = Field(..., description="End character position in original text")
+    confidence: float = Field(
+        1.0,
+        ge=0.0,
+        le=1.0,
+        description="Checksum-based confidence for IBAN / TAX_ID; 1.0 for pattern-only types",
+    )
 
 
 class PiiSanitizeResponse(BaseModel):
@@ -112,6 +305,54 @@ class PiiSanitizeResponse(BaseModel):
     mode_used: SanitizeMode
 
 
+class PiiSanitizeBatchRequest(BaseModel):
+    texts: list[str] = Field(
+        ..., min_length=1, max_length=1_000, description="Texts to sanitize"
+    )
+    mode: SanitizeMode = Field(SanitizeMode.MASK, description="Sanitization mode")
+    tenant_id: str = Field("default", min_length=1, max_length=64)
+    validated_only: bool = Field(False, description="See PiiSanitizeRequest.validated_only")
+
+
+class PiiSanitizeBatchResponse(BaseModel):
+    results: list[PiiSanitizeResponse] = Field(..., description="One result per input text")
+    entity_count: int = Field(..., description="Total entities across all texts")
+
+
+class PiiCacheStats(BaseModel):
+    ruleset_version: str
+    entries: int
+    bytes: int = Field(..., description="Approximate memory held by cached results")
+    max_entries: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    hit_rate: float = Field(..., ge=0.0, le=1.0)
+
+
+class PiiDetokenizeRequest(BaseModel):
+    tenant_id: str = Field("default", min_length=1, max_length=64)
+    tokens: list[str] = Field(
+        default_factory=list,
+        max_length=10_000,
+        description="Tokens to resolve, e.g. '[IBAN_3F9A0C12B7D4]'",
+    )
+    texts: list[str] = Field(
+        default_factory=list,
+        max_length=1_000,
+        description="Tokenised texts in which every known token is restored",
+    )
+
+
+class PiiDetokenizeResponse(BaseModel):
+    resolved: dict[str, str] = Field(..., description="token → original value")
+    unresolved: list[str] = Field(
+        ..., description="Tokens that are unknown, expired, or belong to another tenant"
+    )
+    texts: list[str] = Field(..., description="Input texts with tokens restored")
+
+
 # ---------------------------------------------------------------------------
 # Image Processor
 # ---------------------------------------------------------------------------
@@ -164,7 +405,7 @@ class CSVRow(BaseModel):
     datum: str = Field(..., description="Transaction date in DD.MM.YYYY format")
     belegnummer: str = Field(..., description="Document/invoice number (Belegnummer)")
     buchungstext: str = Field(..., description="Booking description (Buchungstext)")
-    betrag: Decimal = Field(..., description="Transaction amount as Decimal")
+    betrag: GermanDecimal = Field(..., description="Transaction amount as Decimal")
     konto: str = Field(..., description="Account number (Konto)")
     gegenkonto: str = Field(..., description="Counter-account number (Gegenkonto)")
     # Optional extra fields passed through unchanged
@@ -172,43 +413,6 @@ class CSVRow(BaseModel):
         default_factory=dict, description="Any additional CSV columns"
     )
 
-    @field_validator("betrag", mode="before")
-    @classmethod
-    def parse_german_decimal(cls, v: Any) -> Decimal:
-        """
-        Accept German-locale decimal strings like '1.234,56' or English '999.99'.
-
-        Locale detection:
-          - Both comma and dot present: rightmost separator is the decimal sep.
-          - Only comma: German decimal comma (e.g. '123,45').
-          - Only dot: English decimal point (e.g. '999.99').
-        """
-        if isinstance(v, Decimal):
-            return v
-        if isinstance(v, (int, float)):
-            return Decimal(str(v))
-        s = str(v).strip()
-        has_comma = "," in s
-        has_dot = "." in s
-        if has_comma and has_dot:
-            last_comma = s.rfind(",")
-            last_dot = s.rfind(".")
-            if last_comma > last_dot:
-                # German: "1.234,56"
-                s = s.replace(".", "").replace(",", ".")
-            else:
-                # English: "1,234.56"
-                s = s.replace(",", "")
-        elif has_comma:
-            s = s.replace(",", ".")
-        # else only dot or plain integer → use as-is
-        try:
-            return Decimal(s)
-        except Exception as exc:
-            raise ValueError(
-                f"Cannot parse amount '{v}' as Decimal: {exc}"
-            ) from exc
-
 
 class ParseResult(BaseModel):
     """Response from POST /api/csv/parse."""
@@ -324,42 +528,113 @@ class InvoiceValidateRequest(BaseModel):
     datum: str = Field(..., description="Date string to validate (DD.MM.YYYY)")
     belegnummer: str = Field(..., description="Invoice/document number")
     buchungstext: str = Field(..., description="Booking description")
-    betrag: Decimal = Field(..., description="Amount")
+    betrag: GermanDecimal = Field(..., description="Amount")
     konto: str = Field(..., description="Account")
     gegenkonto: str = Field(..., description="Counter-account")
     previous_belegnummer: Optional[str] = Field(
         None, description="Previous document number for sequential gap check"
     )
 
-    @field_validator("betrag", mode="before")
-    @classmethod
-    def parse_german_decimal(cls, v: Any) -> Decimal:
-        if isinstance(v, Decimal):
-            return v
-        if isinstance(v, (int, float)):
-            return Decimal(str(v))
-        s = str(v).strip()
-        has_comma = "," in s
-        has_dot = "." in s
-        if has_comma and has_dot:
-            last_comma = s.rfind(",")
-            last_dot = s.rfind(".")
-            if last_comma > last_dot:
-                s = s.replace(".", "").replace(",", ".")
-            else:
-                s = s.replace(",", "")
-        elif has_comma:
-            s = s.replace(",", ".")
-        try:
-            return Decimal(s)
-        except Exception as exc:
-            raise ValueError(
-                f"Cannot parse amount '{v}' as Decimal: {exc}"
-            ) from exc
-
 
 class InvoiceValidateResponse(BaseModel):
     """Response from POST /api/validate/invoice."""
 
     valid: bool
     errors: list[str] = Field(default_factory=list)
+
+
+# ---------------------------------------------------------------------------
+# Reconciliation (bank CSV ↔ open invoices)
+# ---------------------------------------------------------------------------
+
+
+class OpenInvoice(BaseModel):
+    """Open invoice as stored in `rechnungen` (status not bezahlt/storniert)."""
+
+    id: str = Field(..., description="Invoice primary key")
+    rechnungsnummer: str = Field(..., description="Invoice number printed on the document")
+    brutto: Decimal = Field(..., gt=0, description="Gross invoice amount")
+    offen: Optional[Decimal] = Field(
+        None, gt=0, description="Outstanding amount if partially paid (default: brutto)"
+    )
+    rechnungsdatum: Optional[date] = Field(None, description="Invoice date (ISO)")
+    kunde_name: Optional[str] = Field(None, description="Customer name, used as a tie-breaker")
+    skonto_rate: Optional[float] = Field(
+        None, gt=0.0, lt=1.0, description="Agreed Skonto rate, overrides the request default"
+    )
+
+
+class MatchType(str, Enum):
+    REFERENCE_AMOUNT = "reference_amount"  # invoice number + exact amount
+    REFERENCE_SKONTO = "reference_skonto"  # invoice number + amount less Skonto
+    REFERENCE_PARTIAL = "reference_partial"  # invoice number + partial payment
+    REFERENCE_ONLY = "reference_only"  # invoice number, amount does not fit
+    AMOUNT = "amount"  # exact amount only
+    SKONTO = "skonto"  # amount less Skonto only
+
+
+class ReconcileRequest(BaseModel):
+    transactions: list[CSVRow] = Field(..., max_length=100_000)
+    invoices: list[OpenInvoice] = Field(..., max_length=100_000)
+    skonto_rates: list[float] = Field(
+        default_factory=lambda: [0.02, 0.03],
+        max_length=5,
+        description="Skonto rates tried when an invoice has none of its own",
+    )
+    max_alternatives: int = Field(3, ge=0, le=10)
+
+
+class ReconcileCandidate(BaseModel):
+    invoice_id: str
+    rechnungsnummer: str
+    match_type: MatchType
+    confidence: float = Field(..., ge=0.0, le=1.0)
+
+
+class ReconcileMatch(BaseModel):
+    transaction_index: int
+    belegnummer: str
+    betrag: Decimal
+    invoice_id: str
+    rechnungsnummer: str
+    match_type: MatchType
+    confidence: float = Field(..., ge=0.0, le=1.0)
+    difference: Decimal = Field(
+        ..., description="Outstanding amount minus payment (Skonto, open remainder)"
+    )
+    reasons: list[str]
+    alternatives: list[ReconcileCandidate] = Field(default_factory=list)
+
+
+class ReconcileResponse(BaseModel):
+    matches: list[ReconcileMatch] = Field(
+        ..., description="Proposed matches – require human approval before booking"
+    )
+    unmatched_transactions: list[int]
+    unmatched_invoices: list[str]
+    transaction_count: int
+    invoice_count: int
+
+
+# ---------------------------------------------------------------------------
+# Request profiling (debug)
+# ---------------------------------------------------------------------------
+
+
+class ProfileSummary(BaseModel):
+    id: str = Field(..., description="Request ID of the profiled request")
+    method: str
+    path: str
+    status_code: int
+    duration_ms: float
+    started_at: str = Field(..., description="ISO-8601 UTC start time")
+    trigger: str = Field(..., description="'header' or 'sampled'")
+    samples: int
+    threads: list[str] = Field(..., description="Threads with non-idle samples")
+
+
+class ProfileList(BaseModel):
+    profiles: list[ProfileSummary] = Field(..., description="Newest first")
+    capacity: int
+    sample_rate: float
+    interval_ms: float
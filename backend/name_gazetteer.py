@@ -0,0 +1,193 @@
+"""
+Gazetteer-based person-name detection for the PII sanitizer.
+
+Replaces the old Title-Case heuristic, which flagged every run of two or more
+capitalised words – in German that is most noun phrases ("Werkzeug
+Lieferung", "Miete Büro Januar").  A span is only reported as NAME when it is
+anchored by gazetteer evidence:
+
+  - a known first name followed by one to three further name parts
+    ("Max Mustermann", "Anna-Lena von Berg", "Hans Peter Schulz")
+  - an honorific followed by name parts ("Herr Müller", "Dr. Weber")
+
+Name parts are capitalised words that are not on the noun stop-list; the
+lowercase nobility particles von/van/de/zu are allowed between parts.
+
+Scanning is a single pass of one non-backtracking word regex plus O(1)
+hash-set lookups per capitalised word, so the cost is linear in the text
+length and independent of gazetteer size.
+
+Word lists live in ./gazetteer (one entry per line, '#' comments) and can be
+replaced with larger lists via PII_GAZETTEER_DIR.  They are loaded once per
+process on first use, or eagerly via warm().
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from pii_sanitizer import _Match
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER_DIR = os.getenv(
+    "PII_GAZETTEER_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer"),
+)
+
+_HONORIFICS = frozenset({"Herr", "Herrn", "Frau", "Dr", "Prof"})
+_PARTICLES = frozenset({"von", "van", "de", "zu", "vom", "zur", "der", "den"})
+# Maximum name parts after the anchor ("Anna Maria von der Berg" = 4)
+_MAX_PARTS = 4
+
+# Capitalised word (optionally hyphenated) or a lowercase particle.
+# No nested quantifiers → no catastrophic backtracking.
+_RE_WORD = re.compile(
+    r"\b(?:[A-ZÄÖÜ][a-zäöüß]+(?:-[A-ZÄÖÜ][a-zäöüß]+)*|von|van|de|zu|vom|zur|der|den)\b"
+)
+
+
+# ---------------------------------------------------------------------------
+# Gazetteer
+# ---------------------------------------------------------------------------
+
+
+def _load_word_list(filename: str) -> frozenset[str]:
+    path = os.path.join(GAZETTEER_DIR, filename)
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return frozenset(
+                line.strip()
+                for line in fh
+                if line.strip() and not line.startswith("#")
+            )
+    except FileNotFoundError:
+        logger.warning("Gazetteer list missing: %s", path)
+        return frozenset()
+
+
+class NameGazetteer:
+    """Immutable first-name / surname / stop-list sets with a linear scanner."""
+
+    def __init__(
+        self,
+        first_names: frozenset[str],
+        surnames: frozenset[str],
+        stoplist: frozenset[str],
+    ) -> None:
+        self.first_names = first_names
+        self.surnames = surnames
+        # Gazetteer names win over stop-list entries ("Freitag", "Rose")
+        self.stoplist = stoplist - first_names - surnames
+
+    @classmethod
+    def load(cls) -> "NameGazetteer":
+        gaz = cls(
+            _load_word_list("first_names.txt"),
+            _load_word_list("surnames.txt"),
+            _load_word_list("noun_stoplist.txt"),
+        )
+        logger.info(
+            "Name gazetteer loaded: %d first names, %d surnames, %d stop words",
+            len(gaz.first_names),
+            len(gaz.surnames),
+            len(gaz.stoplist),
+        )
+        return gaz
+
+    def _is_first_name(self, word: str) -> bool:
+        if word in self.first_names:
+            return True
+        # Double first names: "Hans-Peter", "Anna-Lena"
+        return "-" in word and word.split("-", 1)[0] in self.first_names
+
+    def _is_name_part(self, word: str) -> bool:
+        return word[0].isupper() and word not in self.stoplist and word not in _HONORIFICS
+
+    def find_names(self, text: str) -> list[tuple[int, int]]:
+        """Return (start, end) spans of person names in text."""
+        words = [(m.group(0), m.start(), m.end()) for m in _RE_WORD.finditer(text)]
+        spans: list[tuple[int, int]] = []
+
+        i = 0
+        n = len(words)
+        while i < n:
+            word, start, _ = words[i]
+            if word in _HONORIFICS:
+                anchor_start: Optional[int] = None
+            elif self._is_first_name(word) and word not in self.stoplist:
+                anchor_start = start
+            else:
+                i += 1
+                continue
+
+            # Collect adjacent name parts after the anchor
+            j = i + 1
+            last_part = -1
+            while j < n and j - i <= _MAX_PARTS and _adjacent(text, words[j - 1], words[j]):
+                part = words[j][0]
+                if part in _PARTICLES:
+                    j += 1
+                    continue
+                if not self._is_name_part(part):
+                    break
+                last_part = j
+                j += 1
+
+            if last_part == -1:
+                i += 1
+                continue
+
+            if anchor_start is None:
+                anchor_start = words[i + 1][1]
+            spans.append((anchor_start, words[last_part][2]))
+            i = last_part + 1
+
+        return spans
+
+
+def _adjacent(
+    text: str, prev: tuple[str, int, int], cur: tuple[str, int, int]
+) -> bool:
+    """Words belong to one name if separated by blanks only (or 'Dr. ')."""
+    gap = text[prev[2] : cur[1]]
+    if gap in (" ", "  ", "\t"):
+        return True
+    return prev[0] in _HONORIFICS and gap in (". ", ".")
+
+
+# ---------------------------------------------------------------------------
+# Process-wide instance + NER backend adapter
+# ---------------------------------------------------------------------------
+
+_gazetteer: Optional[NameGazetteer] = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer() -> NameGazetteer:
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = NameGazetteer.load()
+    return _gazetteer
+
+
+def warm() -> None:
+    """Load the word lists now (e.g. at startup) instead of on first request."""
+    get_gazetteer()
+
+
+def gazetteer_ner_backend(text: str) -> list["_Match"]:
+    """register_ner_backend-compatible callable emitting NAME matches."""
+    from pii_sanitizer import _Match
+
+    return [
+        _Match(entity_type="NAME", original=text[start:end], start=start, end=end)
+        for start, end in get_gazetteer().find_names(text)
+    ]
@@ -0,0 +1,119 @@
+"""
+spaCy NER backend for the PII sanitizer.
+
+Enable with PII_NER_BACKEND=spacy.  Uses a small German pipeline
+(PII_SPACY_MODEL, default de_core_news_sm) restricted to the components NER
+needs.  The model is loaded lazily on first use – never at import time – and
+shared by all requests of the worker.  PER entities are reported as NAME.
+
+Batch path: detect_batch() runs nlp.pipe() over all texts of a
+/pii/sanitize-batch request.  Texts without any capitalised or all-caps
+word ("MUELLER HANS" in bank exports) cannot contain a German person name
+and are skipped before inference.
+
+spaCy is optional: if it (or the model) is not installed the backend logs one
+warning and falls back to the gazetteer detector, so the API keeps working.
+
+Install:
+  pip install spacy && python -m spacy download de_core_news_sm
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from typing import TYPE_CHECKING, Any, Optional
+
+from name_gazetteer import gazetteer_ner_backend
+
+if TYPE_CHECKING:
+    from pii_sanitizer import _Match
+
+logger = logging.getLogger(__name__)
+
+SPACY_MODEL = os.getenv("PII_SPACY_MODEL", "de_core_news_sm")
+SPACY_BATCH_SIZE = int(os.getenv("PII_SPACY_BATCH_SIZE", "64"))
+
+# Components not needed for NER in the de_core_news_* pipelines
+_EXCLUDED_PIPES = ["parser", "lemmatizer", "morphologizer", "attribute_ruler", "tagger", "senter"]
+
+_PERSON_LABELS = frozenset({"PER", "PERSON"})
+
+# Pre-filter: a person name needs at least one capitalised or all-caps word
+_RE_CAPITALISED = re.compile(r"\b[A-ZÄÖÜ][A-ZÄÖÜa-zäöüß]")
+
+
+class SpacyNerBackend:
+    """Lazily loaded, process-shared spaCy pipeline exposed as an NER backend."""
+
+    def __init__(self, model_name: str = SPACY_MODEL, nlp: Any = None) -> None:
+        self.model_name = model_name
+        self._nlp = nlp
+        self._lock = threading.Lock()
+        self._unavailable = False
+
+    def __repr__(self) -> str:
+        return f"SpacyNerBackend(model={self.model_name!r})"
+
+    def _load(self) -> Optional[Any]:
+        if self._nlp is not None or self._unavailable:
+            return self._nlp
+        with self._lock:
+            if self._nlp is not None or self._unavailable:
+                return self._nlp
+            try:
+                import spacy
+
+                self._nlp = spacy.load(self.model_name, exclude=_EXCLUDED_PIPES)
+                logger.info(
+                    "spaCy model loaded: %s pipes=%s",
+                    self.model_name,
+                    self._nlp.pipe_names,
+                )
+            except (ImportError, OSError) as exc:
+                self._unavailable = True
+                logger.warning(
+                    "spaCy model %s unavailable (%s) – using gazetteer names",
+                    self.model_name,
+                    exc,
+                )
+        return self._nlp
+
+    def warm(self) -> None:
+        """Load the model now instead of on the first request."""
+        self._load()
+
+    @staticmethod
+    def _doc_to_matches(doc: Any) -> list["_Match"]:
+        from pii_sanitizer import _Match
+
+        return [
+            _Match(
+                entity_type="NAME",
+                original=ent.text,
+                start=ent.start_char,
+                end=ent.end_char,
+            )
+            for ent in doc.ents
+            if ent.label_ in _PERSON_LABELS
+        ]
+
+    def __call__(self, text: str) -> list["_Match"]:
+        return self.detect_batch([text])[0]
+
+    def detect_batch(self, texts: list[str]) -> list[list["_Match"]]:
+        nlp = self._load()
+        if nlp is None:
+            return [gazetteer_ner_backend(t) for t in texts]
+
+        results: list[list["_Match"]] = [[] for _ in texts]
+        todo = [i for i, t in enumerate(texts) if _RE_CAPITALISED.search(t)]
+        if not todo:
+            return results
+
+        docs = nlp.pipe((texts[i] for i in todo), batch_size=SPACY_BATCH_SIZE)
+        for i, doc in zip(todo, docs):
+            results[i] = self._doc_to_matches(doc)
+        return results
@@ -0,0 +1,119 @@
+"""
+Bounded LRU cache for PII detection results.
+
+Buchungstext strings repeat heavily across journals ("Miete Büro Januar",
+"Gehalt …"), and both the PII router and the GoBD module's log scrubbing
+run full detection on each of them.  Results are cached per worker, keyed by
+a BLAKE2b digest of the text plus the detection rule-set version, so a
+repeated text costs one hash and one dict lookup instead of ~10 regex passes.
+
+Eviction is LRU, bounded by both entry count and approximate memory size.
+Texts longer than PII_CACHE_MAX_TEXT_LEN are not cached – they rarely repeat
+and would crowd out the short hot strings.
+
+Configuration (environment):
+  PII_CACHE_MAX_ENTRIES   (default 50000)
+  PII_CACHE_MAX_BYTES     (default 32 MiB, approximate)
+  PII_CACHE_MAX_TEXT_LEN  (default 2048 characters)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+CACHE_MAX_ENTRIES = int(os.getenv("PII_CACHE_MAX_ENTRIES", "50000"))
+CACHE_MAX_BYTES = int(os.getenv("PII_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+CACHE_MAX_TEXT_LEN = int(os.getenv("PII_CACHE_MAX_TEXT_LEN", "2048"))
+
+# Rough per-object overheads used for size accounting (CPython, 64-bit)
+_ENTRY_OVERHEAD = 160
+_MATCH_OVERHEAD = 120
+
+# Cached match: (entity_type, original, start, end, confidence)
+CachedMatch = tuple[str, str, int, int, float]
+
+
+class DetectionCache:
+    """Thread-safe LRU keyed by (rule-set version, text digest)."""
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES,
+        max_text_len: int = CACHE_MAX_TEXT_LEN,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_text_len = max_text_len
+        self._data: OrderedDict[tuple[str, bytes], tuple[tuple[CachedMatch, ...], int]] = (
+            OrderedDict()
+        )
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(version: str, text: str) -> tuple[str, bytes]:
+        return version, hashlib.blake2b(
+            text.encode("utf-8", "surrogatepass"), digest_size=16
+        ).digest()
+
+    def get(self, version: str, text: str) -> Optional[tuple[CachedMatch, ...]]:
+        if len(text) > self.max_text_len:
+            return None
+        key = self._key(version, text)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, version: str, text: str, matches: tuple[CachedMatch, ...]) -> None:
+        if len(text) > self.max_text_len:
+            return
+        key = self._key(version, text)
+        size = _ENTRY_OVERHEAD + sum(_MATCH_OVERHEAD + len(m[1]) for m in matches)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (matches, size)
+            self._bytes += size
+            while self._data and (
+                len(self._data) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Process-wide instance shared by the PII router and gobd_csv log scrubbing
+detection_cache = DetectionCache()
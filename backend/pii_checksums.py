@@ -0,0 +1,163 @@
+"""
+Checksum validation for PII candidates found by the regex layer.
+
+The IBAN and tax-ID patterns in pii_sanitizer match any sufficiently long
+alphanumeric or digit run, so invoice numbers and payment references in
+Buchungstext are easily mistaken for them.  The functions here run on the
+matched candidates only and return a confidence score in [0, 1]:
+
+  IBAN    - ISO 13616: country code, per-country length table, mod-97 == 1
+  TAX_ID  - Steuer-Identifikationsnummer (IdNr, 11 digits): digit
+            distribution rule + ISO 7064 MOD 11,10 check digit
+          - Steuernummer: Bundesland layouts (10/11-digit regional format or
+            13-digit bundeseinheitliches Schema with valid Land prefix)
+
+All checks are plain integer/str operations – no regex, no allocation beyond
+the normalised candidate string.
+"""
+
+from __future__ import annotations
+
+# Entities scoring at or above this are considered validated
+VALIDATED_THRESHOLD = 0.9
+
+# ---------------------------------------------------------------------------
+# IBAN
+# ---------------------------------------------------------------------------
+
+# SWIFT IBAN registry: country → total IBAN length
+IBAN_LENGTHS: dict[str, int] = {
+    "AD": 24, "AE": 23, "AL": 28, "AT": 20, "AZ": 28, "BA": 20, "BE": 16,
+    "BG": 22, "BH": 22, "BR": 29, "BY": 28, "CH": 21, "CR": 22, "CY": 28,
+    "CZ": 24, "DE": 22, "DK": 18, "DO": 28, "EE": 20, "EG": 29, "ES": 24,
+    "FI": 18, "FO": 18, "FR": 27, "GB": 22, "GE": 22, "GI": 23, "GL": 18,
+    "GR": 27, "GT": 28, "HR": 21, "HU": 28, "IE": 22, "IL": 23, "IQ": 23,
+    "IS": 26, "IT": 27, "JO": 30, "KW": 30, "KZ": 20, "LB": 28, "LC": 32,
+    "LI": 21, "LT": 20, "LU": 20, "LV": 21, "MC": 27, "MD": 24, "ME": 22,
+    "MK": 19, "MR": 27, "MT": 31, "MU": 30, "NL": 18, "NO": 15, "PK": 24,
+    "PL": 28, "PS": 29, "PT": 25, "QA": 29, "RO": 24, "RS": 22, "SA": 24,
+    "SC": 31, "SE": 24, "SI": 19, "SK": 24, "SM": 27, "ST": 25, "SV": 28,
+    "TL": 23, "TN": 24, "TR": 26, "UA": 29, "VA": 22, "VG": 24, "XK": 20,
+}
+
+# A→10 … Z→35 for the mod-97 numeric conversion
+_IBAN_LETTERS = {chr(c): str(c - 55) for c in range(ord("A"), ord("Z") + 1)}
+_IBAN_TRANSLATE = str.maketrans(_IBAN_LETTERS)
+
+
+def iban_mod97_ok(iban: str) -> bool:
+    """True if the normalised IBAN (no spaces, upper case) satisfies mod-97 == 1."""
+    rearranged = iban[4:] + iban[:4]
+    numeric = rearranged.translate(_IBAN_TRANSLATE)
+    if not numeric.isdigit():
+        return False
+    return int(numeric) % 97 == 1
+
+
+def iban_confidence(candidate: str) -> float:
+    """
+    Score an IBAN candidate:
+      0.99  known country, correct length, checksum valid
+      0.4   known country and length, checksum wrong (likely a typo'd IBAN)
+      0.2   known country, wrong length
+      0.1   unknown country code (almost certainly not an IBAN)
+    """
+    iban = candidate.replace(" ", "").upper()
+    expected = IBAN_LENGTHS.get(iban[:2])
+    if expected is None:
+        return 0.1
+    if len(iban) != expected:
+        return 0.2
+    return 0.99 if iban_mod97_ok(iban) else 0.4
+
+
+# ---------------------------------------------------------------------------
+# Steuer-Identifikationsnummer (IdNr)
+# ---------------------------------------------------------------------------
+
+
+def steuer_idnr_ok(digits: str) -> bool:
+    """
+    Validate an 11-digit Steuer-IdNr (§ 139b AO):
+      - first digit is not 0
+      - in the first 10 digits exactly one digit occurs two or three times,
+        a triple may not be three consecutive identical digits
+      - last digit is the ISO 7064 MOD 11,10 check digit
+    """
+    if len(digits) != 11 or not digits.isdigit() or digits[0] == "0":
+        return False
+
+    body = digits[:10]
+    counts = [body.count(d) for d in "0123456789"]
+    repeated = [c for c in counts if c > 1]
+    if len(repeated) != 1 or repeated[0] > 3:
+        return False
+    if repeated[0] == 3:
+        for i in range(8):
+            if body[i] == body[i + 1] == body[i + 2]:
+                return False
+
+    product = 10
+    for ch in body:
+        total = (int(ch) + product) % 10
+        if total == 0:
+            total = 10
+        product = (total * 2) % 11
+    check = 11 - product
+    if check == 10:
+        check = 0
+    return check == int(digits[10])
+
+
+# ---------------------------------------------------------------------------
+# Steuernummer (Bundesland formats)
+# ---------------------------------------------------------------------------
+
+# 13-digit bundeseinheitliches Schema: Land prefix (first 2 digits, or 1 for
+# Bayern=9 / NRW=5), Finanzamt, a literal 0, Bezirk, Unterscheidung, Prüfziffer
+_UNIFIED_PREFIXES_2 = frozenset(
+    {"10", "11", "21", "22", "23", "24", "26", "27", "28", "30", "31", "32", "40", "41"}
+)
+_UNIFIED_PREFIXES_1 = frozenset({"5", "9"})
+
+# Regional layouts as digit-group lengths, e.g. "12/345/67890" → (2, 3, 5)
+_REGIONAL_LAYOUTS = frozenset(
+    {
+        (2, 3, 5),   # BE, HB, HH, NI, RP, SH (ff/bbb/uuuup)
+        (3, 3, 5),   # BY, BB, HE, SN, ST, MV, TH, SL (fff/bbb/uuuup)
+        (3, 4, 4),   # NW (fff/bbbb/uuup)
+        (5, 5),      # BW (fffbb/bbbbp)
+    }
+)
+
+
+def steuernummer_confidence(candidate: str) -> float:
+    """
+    Score a Steuernummer / IdNr candidate (digits with optional / or space):
+      0.99  valid 11-digit IdNr (check digit verified)
+      0.9   13-digit unified Steuernummer with valid Land prefix and 0 at pos 5
+      0.9   grouped regional layout matching a Bundesland format
+      0.5   10-11 ungrouped digits (plausible regional number, unverifiable)
+      0.2   anything else
+    """
+    compact = candidate.replace("/", "").replace(" ", "")
+    if not compact.isdigit():
+        return 0.2
+
+    if len(compact) == 11 and steuer_idnr_ok(compact):
+        return 0.99
+
+    if len(compact) == 13:
+        if compact[4] == "0" and (
+            compact[:2] in _UNIFIED_PREFIXES_2 or compact[:1] in _UNIFIED_PREFIXES_1
+        ):
+            return 0.9
+        return 0.2
+
+    groups = tuple(len(g) for g in candidate.replace("/", " ").split())
+    if len(groups) > 1:
+        return 0.9 if groups in _REGIONAL_LAYOUTS else 0.2
+
+    if len(compact) in (10, 11):
+        return 0.5
+    return 0.2
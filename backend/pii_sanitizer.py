@@ -1,11 +1,21 @@
 """
 PII Sanitizer Router
 POST /pii/sanitize
+POST /pii/sanitize-batch
+POST /pii/detokenize
+GET  /pii/cache/stats
 
-Detects and sanitizes personally identifiable information from text using
-regex patterns only (no spacy dependency). The module is structured so that
-a spacy-based NER backend can be plugged in via the _ner_backend extension
-point without changing the public API.
+Detects and sanitizes personally identifiable information from text.
+Structured identifiers are found with regex patterns (and checksums); person
+names come from a pluggable NER backend registered through the _ner_backend
+extension point (register_ner_backend):
+
+  gazetteer  name_gazetteer.py, the default; no extra dependencies
+  spacy      ner_spacy.py (PII_NER_BACKEND=spacy), a German spaCy pipeline
+             with batched inference; falls back to the gazetteer if spaCy
+             or the model is missing
+
+Swapping the backend does not change the public API.
 
 Supported entity types:
   IBAN         - German (DE + 20 digits) and generic IBAN
@@ -14,30 +24,45 @@ Supported entity types:
   EMAIL        - RFC-5321-ish email addresses
   PHONE        - German phone numbers (+49, 0xxx formats)
   DATE_OF_BIRTH - Dates formatted as DD.MM.YYYY or YYYY-MM-DD with context
-  NAME         - Heuristic: two or more consecutive capitalised words
+  NAME         - From the NER backend (gazetteer: known first name or
+                 honorific + name parts)
 """
 
 from __future__ import annotations
 
 import logging
+import os
 import re
-import uuid
 from dataclasses import dataclass, field
 from typing import Callable
 
+import anyio.to_thread
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 
+from metrics import PII_ENTITIES
 from models import (
     EntityFound,
+    PiiCacheStats,
+    PiiDetokenizeRequest,
+    PiiDetokenizeResponse,
+    PiiSanitizeBatchRequest,
+    PiiSanitizeBatchResponse,
     PiiSanitizeRequest,
     PiiSanitizeResponse,
     SanitizeMode,
 )
+from name_gazetteer import gazetteer_ner_backend, warm as warm_gazetteer
+from ner_spacy import SpacyNerBackend
+from pii_cache import CachedMatch, detection_cache
+from pii_checksums import VALIDATED_THRESHOLD, iban_confidence, steuernummer_confidence
+from rendering import ModelResponse
+from transport import NegotiatedRoute
+from token_vault import DEFAULT_TENANT, get_token_vault
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/pii", tags=["PII Sanitizer"])
+router = APIRouter(prefix="/pii", tags=["PII Sanitizer"], route_class=NegotiatedRoute)
 
 # ---------------------------------------------------------------------------
 # Internal match representation
@@ -51,6 +76,8 @@ class _Match:
     start: int
     end: int
     replacement: str = field(default="", init=False)
+    # 1.0 for pattern-only entity types; checksum-scored for IBAN / TAX_ID
+    confidence: float = 1.0
 
 
 # ---------------------------------------------------------------------------
@@ -101,56 +128,66 @@ _RE_DOB = re.compile(
     re.IGNORECASE,
 )
 
+# Tax ID with context keyword (Steuernummer / Steuer-ID / St.-Nr. / tax id)
+_RE_TAX_CONTEXT = re.compile(
+    r"(?:steuer[- ]?(?:nummer|nr|id(?:nr)?)|tax[ _]?(?:id|number|nr)|st\.?-?nr\.?)"
+    r"[\s:.]*(\d[\d/ ]{8,14}\d)",
+    re.IGNORECASE,
+)
+
+# Personal ID with context keyword
+_RE_PID_CONTEXT = re.compile(
+    r"(?:ausweis(?:nummer)?|personalausweis|reisepass|passport|id[- ]?(?:nr|number)?)"
+    r"[\s:]*([A-Z][0-9]{8}[A-Z][0-9]|[A-Z]{1,2}[0-9]{6,9})",
+    re.IGNORECASE,
+)
+
 # Standalone date pattern (less aggressive – only flagged when near PII keywords)
 _RE_DATE_STANDALONE = re.compile(
     r"\b\d{1,2}\.\d{1,2}\.\d{4}\b"
 )
 
-# Name heuristic: 2–4 consecutive Title-Case words, not all-caps abbreviations
-_RE_NAME = re.compile(
-    r"\b(?:[A-ZÜÄÖ][a-züäöß]{1,}(?:[-'][A-ZÜÄÖ][a-züäöß]+)?)"
-    r"(?:\s+(?:[A-ZÜÄÖ][a-züäöß]{1,}(?:[-'][A-ZÜÄÖ][a-züäöß]+)?)){1,3}\b"
-)
-
 # ---------------------------------------------------------------------------
-# Known German first / last name fragments to reduce false positives
-# A very small allow-list is used to *exclude* common German nouns that
-# happen to be capitalised at sentence starts.
+# NER extension point (names; spacy can replace the gazetteer without API changes)
 # ---------------------------------------------------------------------------
-_COMMON_GERMAN_NOUNS = {
-    "Die", "Der", "Das", "Ein", "Eine", "Sehr", "Geehrte", "Geehrter",
-    "Sehr Geehrte", "Mit", "Freundlichen", "Grüßen", "Bitte", "Vielen",
-    "Dank", "Danke", "Herr", "Frau", "Dr", "Prof", "Str", "Straße",
-    "GmbH", "AG", "KG", "OHG", "UG", "Gesellschaft", "Rechnung",
-    "Datum", "Betreff", "Anlage", "Anhang",
-}
 
+# Signature: (text: str) -> list[_Match]
+# A backend may additionally expose detect_batch(texts) -> list[list[_Match]],
+# which the batch endpoint uses to run inference over all texts at once.
+_NerBackend = Callable[[str], list[_Match]]
 
-def _is_likely_name(text: str) -> bool:
-    words = text.split()
-    if len(words) < 2:
-        return False
-    # Reject if any word is a known common noun
-    for w in words:
-        if w in _COMMON_GERMAN_NOUNS:
-            return False
-    return True
+# PII_NER_BACKEND: "gazetteer" (default) or "spacy" (lazy-loaded model)
+NER_BACKEND_NAME = os.getenv("PII_NER_BACKEND", "gazetteer").lower()
 
+_ner_backend: _NerBackend | None = (
+    SpacyNerBackend() if NER_BACKEND_NAME == "spacy" else gazetteer_ner_backend
+)
 
-# ---------------------------------------------------------------------------
-# Extension point for spacy NER (plug in later without API changes)
-# ---------------------------------------------------------------------------
 
-# Signature: (text: str) -> list[_Match]
-_NerBackend = Callable[[str], list[_Match]]
+# Bump whenever patterns or scoring change; part of the detection-cache key
+RULESET_VERSION = "3"
+_backend_generation = 0
+
+
+def _ruleset_key() -> str:
+    return f"{RULESET_VERSION}.{_backend_generation}"
 
-_ner_backend: _NerBackend | None = None
+
+def warm_ner_backend() -> None:
+    """Load the NER backend's data (word lists or model) now, not on first use."""
+    if _ner_backend is gazetteer_ner_backend:
+        warm_gazetteer()
+    elif hasattr(_ner_backend, "warm"):
+        _ner_backend.warm()
 
 
 def register_ner_backend(backend: _NerBackend) -> None:
     """Register an external NER backend (e.g. spacy). Thread-safe for read."""
-    global _ner_backend
+    global _ner_backend, _backend_generation
     _ner_backend = backend
+    # Cached results were produced by the previous backend
+    _backend_generation += 1
+    detection_cache.clear()
     logger.info("NER backend registered: %s", backend)
 
 
@@ -159,7 +196,62 @@ def register_ner_backend(backend: _NerBackend) -> None:
 # ---------------------------------------------------------------------------
 
 
-def _detect_entities(text: str) -> list[_Match]:
+def _freeze(matches: list[_Match]) -> tuple[CachedMatch, ...]:
+    return tuple((m.entity_type, m.original, m.start, m.end, m.confidence) for m in matches)
+
+
+def _thaw(cached: tuple[CachedMatch, ...]) -> list[_Match]:
+    # Fresh objects per call: callers assign .replacement on them
+    return [
+        _Match(entity_type=t, original=o, start=s, end=e, confidence=c)
+        for t, o, s, e, c in cached
+    ]
+
+
+def _detect_entities(
+    text: str, ner_results: list[_Match] | None = None
+) -> list[_Match]:
+    """
+    Detect all entities in text, served from the detection cache when the
+    text was seen before.  ner_results, when given, are precomputed backend
+    matches (batch path); otherwise the backend is called on a cache miss.
+    """
+    version = _ruleset_key()
+    if ner_results is None:
+        cached = detection_cache.get(version, text)
+        if cached is not None:
+            return _thaw(cached)
+
+    matches, ner_failed = _scan_entities(text, ner_results)
+    # A backend failure must not be replayed from the cache as "no names"
+    if not ner_failed:
+        detection_cache.put(version, text, _freeze(matches))
+    return matches
+
+
+def _run_ner(text: str) -> tuple[list[_Match], bool]:
+    """
+    Names from the configured backend; returns (matches, failed).  If the
+    backend raises, the gazetteer stands in so names are still masked.
+    """
+    if _ner_backend is None:
+        return [], False
+    try:
+        return list(_ner_backend(text)), False
+    except Exception as exc:
+        logger.warning("NER backend error (falling back to gazetteer): %s", exc)
+    if _ner_backend is not gazetteer_ner_backend:
+        try:
+            return list(gazetteer_ner_backend(text)), True
+        except Exception as exc:
+            logger.warning("Gazetteer fallback error (regex only): %s", exc)
+    return [], True
+
+
+def _scan_entities(
+    text: str, ner_results: list[_Match] | None
+) -> tuple[list[_Match], bool]:
+    """Regex entities plus names; returns (matches, ner_failed)."""
     matches: list[_Match] = []
     seen_spans: list[tuple[int, int]] = []
 
@@ -169,28 +261,57 @@ def _detect_entities(text: str) -> list[_Match]:
                 return True
         return False
 
-    def _add(m: re.Match, entity_type: str, group: int = 0) -> None:
+    def _add(m: re.Match, entity_type: str, group: int = 0, confidence: float = 1.0) -> None:
         start, end = m.start(group), m.end(group)
         text_slice = m.group(group)
         if _overlaps(start, end):
             return
         seen_spans.append((start, end))
-        matches.append(_Match(entity_type=entity_type, original=text_slice, start=start, end=end))
+        matches.append(
+            _Match(
+                entity_type=entity_type,
+                original=text_slice,
+                start=start,
+                end=end,
+                confidence=confidence,
+            )
+        )
 
     # Order matters: more specific patterns first to avoid overlap conflicts
 
-    # IBAN (German before generic to avoid double hits)
+    # IBAN (German before generic to avoid double hits); scored by checksum
     for m in _RE_IBAN_DE.finditer(text):
-        _add(m, "IBAN")
+        _add(m, "IBAN", confidence=iban_confidence(m.group(0)))
     for m in _RE_IBAN_GENERIC.finditer(text):
         # Only add if not already covered
         if not _overlaps(m.start(), m.end()):
-            _add(m, "IBAN")
+            _add(m, "IBAN", confidence=iban_confidence(m.group(0)))
 
     # Email (before phone to avoid partial overlap on +49 domains)
     for m in _RE_EMAIL.finditer(text):
         _add(m, "EMAIL")
 
+    # Tax ID – only match if surrounded by relevant context to cut false positives.
+    # Context-anchored IDs run before PHONE, which would otherwise claim the digits.
+    for m in _RE_TAX_CONTEXT.finditer(text):
+        if not _overlaps(m.start(), m.end()):
+            seen_spans.append((m.start(), m.end()))
+            matches.append(
+                _Match(
+                    entity_type="TAX_ID",
+                    original=m.group(0),
+                    start=m.start(),
+                    end=m.end(),
+                    confidence=steuernummer_confidence(m.group(1)),
+                )
+            )
+
+    # Personal ID – only with context
+    for m in _RE_PID_CONTEXT.finditer(text):
+        if not _overlaps(m.start(), m.end()):
+            seen_spans.append((m.start(), m.end()))
+            matches.append(_Match(entity_type="PERSONAL_ID", original=m.group(0), start=m.start(), end=m.end()))
+
     # Phone
     for m in _RE_PHONE.finditer(text):
         original = m.group(0).strip()
@@ -209,48 +330,56 @@ def _detect_entities(text: str) -> list[_Match]:
             seen_spans.append((full_start, full_end))
             matches.append(_Match(entity_type="DATE_OF_BIRTH", original=m.group(0), start=full_start, end=full_end))
 
-    # Tax ID – only match if surrounded by relevant context to cut false positives
-    tax_context = re.compile(
-        r"(?:steuer(?:nummer|nr|id)|tax[ _]?(?:id|number|nr)|st\.?-?nr\.?)"
-        r"[\s:]*(\d[\d/ ]{8,14}\d)",
-        re.IGNORECASE,
-    )
-    for m in tax_context.finditer(text):
-        if not _overlaps(m.start(), m.end()):
-            seen_spans.append((m.start(), m.end()))
-            matches.append(_Match(entity_type="TAX_ID", original=m.group(0), start=m.start(), end=m.end()))
+    # Names come from the NER backend (gazetteer by default), last so that
+    # structured entities above win on overlap
+    ner_failed = False
+    if ner_results is None:
+        ner_results, ner_failed = _run_ner(text)
+    for nm in ner_results:
+        if not _overlaps(nm.start, nm.end):
+            seen_spans.append((nm.start, nm.end))
+            matches.append(nm)
 
-    # Personal ID – only with context
-    pid_context = re.compile(
-        r"(?:ausweis(?:nummer)?|personalausweis|reisepass|passport|id[- ]?(?:nr|number)?)"
-        r"[\s:]*([A-Z][0-9]{8}[A-Z][0-9]|[A-Z]{1,2}[0-9]{6,9})",
-        re.IGNORECASE,
-    )
-    for m in pid_context.finditer(text):
-        if not _overlaps(m.start(), m.end()):
-            seen_spans.append((m.start(), m.end()))
-            matches.append(_Match(entity_type="PERSONAL_ID", original=m.group(0), start=m.start(), end=m.end()))
-
-    # Names (heuristic, last to reduce false positives)
-    for m in _RE_NAME.finditer(text):
-        candidate = m.group(0)
-        if _is_likely_name(candidate) and not _overlaps(m.start(), m.end()):
-            seen_spans.append((m.start(), m.end()))
-            matches.append(_Match(entity_type="NAME", original=candidate, start=m.start(), end=m.end()))
-
-    # Optionally merge with spacy results
-    if _ner_backend is not None:
+    matches.sort(key=lambda x: x.start)
+    return matches, ner_failed
+
+
+def _filter_validated(matches: list[_Match]) -> list[_Match]:
+    """Drop checksum-scored candidates that failed validation."""
+    return [m for m in matches if m.confidence >= VALIDATED_THRESHOLD]
+
+
+def _detect_entities_batch(texts: list[str]) -> list[list[_Match]]:
+    """
+    Detect entities in many texts.  Cache hits are served directly; NER
+    inference is batched over the misses when the backend supports it.
+    """
+    version = _ruleset_key()
+    results: list[list[_Match] | None] = []
+    misses: list[int] = []
+    for i, text in enumerate(texts):
+        cached = detection_cache.get(version, text)
+        results.append(_thaw(cached) if cached is not None else None)
+        if cached is None:
+            misses.append(i)
+
+    miss_texts = [texts[i] for i in misses]
+    ner_batch: list[list[_Match] | None] = [None] * len(miss_texts)
+    detect_batch = getattr(_ner_backend, "detect_batch", None)
+    if detect_batch is not None and miss_texts:
         try:
-            ner_results = _ner_backend(text)
-            for nm in ner_results:
-                if not _overlaps(nm.start, nm.end):
-                    seen_spans.append((nm.start, nm.end))
-                    matches.append(nm)
+            ner_batch = list(detect_batch(miss_texts))
         except Exception as exc:
-            logger.warning("NER backend error (falling back to regex): %s", exc)
+            # None: every text goes through the per-text backend / gazetteer
+            logger.warning("NER batch backend error (falling back per text): %s", exc)
+            ner_batch = [None] * len(miss_texts)
 
-    matches.sort(key=lambda x: x.start)
-    return matches
+    for i, ner in zip(misses, ner_batch):
+        matches, ner_failed = _scan_entities(texts[i], ner)
+        if not ner_failed:
+            detection_cache.put(version, texts[i], _freeze(matches))
+        results[i] = matches
+    return results  # type: ignore[return-value]
 
 
 # ---------------------------------------------------------------------------
@@ -267,21 +396,55 @@ _ENTITY_MASKS: dict[str, str] = {
     "NAME": "[NAME REDACTED]",
 }
 
-_token_store: dict[str, str] = {}  # token → original (in-memory for session)
+# Token shape produced by token_vault.TokenVault.make_token
+_RE_TOKEN = re.compile(r"\[[A-Z_]+_[0-9A-F]{12}\]")
 
 
-def _make_replacement(entity_type: str, original: str, mode: SanitizeMode) -> str:
+def _make_replacement(
+    entity_type: str,
+    original: str,
+    mode: SanitizeMode,
+    tenant_id: str = DEFAULT_TENANT,
+) -> str:
     if mode == SanitizeMode.MASK:
         return _ENTITY_MASKS.get(entity_type, "[REDACTED]")
     if mode == SanitizeMode.REMOVE:
         return ""
     if mode == SanitizeMode.TOKENIZE:
-        token = f"[{entity_type}_{uuid.uuid4().hex[:8].upper()}]"
-        _token_store[token] = original
-        return token
+        return get_token_vault().tokenize(tenant_id, entity_type, original)
     return "[REDACTED]"
 
 
+def _assign_replacements(
+    matches: list[_Match],
+    mode: SanitizeMode,
+    tenant_id: str = DEFAULT_TENANT,
+) -> None:
+    """Set m.replacement on every match; TOKENIZE hits the vault once per call."""
+    if mode == SanitizeMode.TOKENIZE:
+        tokens = get_token_vault().tokenize_many(
+            tenant_id, [(m.entity_type, m.original) for m in matches]
+        )
+        for m, token in zip(matches, tokens):
+            m.replacement = token
+        return
+    for m in matches:
+        m.replacement = _make_replacement(m.entity_type, m.original, mode)
+
+
+async def _assign_replacements_async(
+    matches: list[_Match],
+    mode: SanitizeMode,
+    tenant_id: str = DEFAULT_TENANT,
+) -> None:
+    """_assign_replacements for the endpoints: vault I/O runs in the thread pool."""
+    if mode == SanitizeMode.TOKENIZE:
+        # SQLite writes can wait up to the busy timeout for another worker
+        await anyio.to_thread.run_sync(_assign_replacements, matches, mode, tenant_id)
+    else:
+        _assign_replacements(matches, mode, tenant_id)
+
+
 # ---------------------------------------------------------------------------
 # Apply replacements (right-to-left to preserve offsets)
 # ---------------------------------------------------------------------------
@@ -294,8 +457,35 @@ def _apply_replacements(text: str, matches: list[_Match]) -> str:
     return "".join(result)
 
 
+def _count_entities(matches: list[_Match]) -> None:
+    for m in matches:
+        PII_ENTITIES.labels(m.entity_type).inc()
+
+
+def _build_response(
+    text: str, matches: list[_Match], mode: SanitizeMode
+) -> PiiSanitizeResponse:
+    entities_found = [
+        EntityFound(
+            type=m.entity_type,
+            original=m.original,
+            replacement=m.replacement,
+            start=m.start,
+            end=m.end,
+            confidence=m.confidence,
+        )
+        for m in matches
+    ]
+    return PiiSanitizeResponse(
+        sanitized_text=_apply_replacements(text, matches),
+        entities_found=entities_found,
+        entity_count=len(entities_found),
+        mode_used=mode,
+    )
+
+
 # ---------------------------------------------------------------------------
-# Router endpoint
+# Router endpoints
 # ---------------------------------------------------------------------------
 
 
@@ -309,35 +499,108 @@ def _apply_replacements(text: str, matches: list[_Match]) -> str:
         "text and a list of detected entities."
     ),
 )
-async def sanitize_pii(payload: PiiSanitizeRequest) -> PiiSanitizeResponse:
+async def sanitize_pii(payload: PiiSanitizeRequest) -> ModelResponse:
     raw_matches = _detect_entities(payload.text)
-
-    entities_found: list[EntityFound] = []
-    for m in raw_matches:
-        replacement = _make_replacement(m.entity_type, m.original, payload.mode)
-        m.replacement = replacement
-        entities_found.append(
-            EntityFound(
-                type=m.entity_type,
-                original=m.original,
-                replacement=replacement,
-                start=m.start,
-                end=m.end,
-            )
-        )
-
-    sanitized = _apply_replacements(payload.text, raw_matches)
+    if payload.validated_only:
+        raw_matches = _filter_validated(raw_matches)
+    await _assign_replacements_async(raw_matches, payload.mode, payload.tenant_id)
+    response = _build_response(payload.text, raw_matches, payload.mode)
+    _count_entities(raw_matches)
 
     logger.info(
         "pii_sanitize mode=%s length=%d entities=%d",
         payload.mode,
         len(payload.text),
-        len(entities_found),
+        response.entity_count,
     )
 
-    return PiiSanitizeResponse(
-        sanitized_text=sanitized,
-        entities_found=entities_found,
-        entity_count=len(entities_found),
-        mode_used=payload.mode,
+    return ModelResponse(response)
+
+
+@router.post(
+    "/sanitize-batch",
+    response_model=PiiSanitizeBatchResponse,
+    summary="Sanitize PII from many texts in one call",
+    description=(
+        "Same detection as /pii/sanitize applied to a list of texts. NER "
+        "backends that support batching (spacy) run one pipelined inference "
+        "pass over all texts; tokenize mode writes the vault once."
+    ),
+)
+async def sanitize_pii_batch(payload: PiiSanitizeBatchRequest) -> ModelResponse:
+    # spaCy's nlp.pipe over the whole batch is CPU-bound: keep it off the event loop
+    per_text = await anyio.to_thread.run_sync(_detect_entities_batch, payload.texts)
+    if payload.validated_only:
+        per_text = [_filter_validated(matches) for matches in per_text]
+
+    flat = [m for matches in per_text for m in matches]
+    await _assign_replacements_async(flat, payload.mode, payload.tenant_id)
+    _count_entities(flat)
+
+    results = [
+        _build_response(text, matches, payload.mode)
+        for text, matches in zip(payload.texts, per_text)
+    ]
+
+    logger.info(
+        "pii_sanitize_batch mode=%s texts=%d entities=%d",
+        payload.mode,
+        len(payload.texts),
+        len(flat),
+    )
+
+    return ModelResponse(
+        PiiSanitizeBatchResponse(results=results, entity_count=len(flat))
+    )
+
+
+@router.post(
+    "/detokenize",
+    response_model=PiiDetokenizeResponse,
+    summary="Resolve TOKENIZE-mode tokens back to original values",
+    description=(
+        "Batch lookup of tokens issued by /pii/sanitize in tokenize mode. "
+        "Tokens resolve only within the tenant that created them and only "
+        "until they expire from the token vault."
+    ),
+)
+async def detokenize_pii(payload: PiiDetokenizeRequest) -> ModelResponse:
+    wanted: list[str] = list(payload.tokens)
+    for text in payload.texts:
+        wanted.extend(_RE_TOKEN.findall(text))
+
+    resolved = await anyio.to_thread.run_sync(
+        get_token_vault().detokenize_many, payload.tenant_id, wanted
+    )
+    unresolved = [t for t in dict.fromkeys(wanted) if t not in resolved]
+
+    restored = [
+        _RE_TOKEN.sub(lambda m: resolved.get(m.group(0), m.group(0)), text)
+        for text in payload.texts
+    ]
+
+    logger.info(
+        "pii_detokenize tenant=%s requested=%d resolved=%d",
+        payload.tenant_id,
+        len(wanted),
+        len(resolved),
+    )
+
+    return ModelResponse(
+        PiiDetokenizeResponse(
+            resolved=resolved,
+            unresolved=unresolved,
+            texts=restored,
+        )
+    )
+
+
+@router.get(
+    "/cache/stats",
+    response_model=PiiCacheStats,
+    summary="PII detection cache statistics (this worker)",
+)
+async def pii_cache_stats() -> ModelResponse:
+    return ModelResponse(
+        PiiCacheStats(ruleset_version=_ruleset_key(), **detection_cache.stats())
     )
@@ -0,0 +1,379 @@
+"""
+Pre-fork server for the Zone 2 backend.
+
+`uvicorn --workers N` starts every worker as a fresh interpreter (spawn), so
+each one imports FastAPI, OpenCV, pyarrow and the PII word lists on its own
+and holds a private copy of all of it.  This launcher preloads instead:
+
+  1. the master imports main and calls main.warm_shared_assets() (image
+     backends, NER word lists / model, pyarrow, strptime cache),
+  2. gc.freeze() moves everything loaded so far out of the collector's
+     generations, so collections in the workers do not write to (and thereby
+     copy) the shared pages,
+  3. the master binds the listening socket and fork()s the workers, which
+     serve the preloaded app with uvicorn on the inherited socket.
+
+Workers share the preloaded pages copy-on-write.  The master restarts
+workers that exit, forwards SIGTERM/SIGINT for a graceful shutdown and logs
+the memory of every worker (RSS, PSS, shared, private from
+/proc/<pid>/smaps_rollup) after start-up and every PREFORK_MEMORY_REPORT_S.
+PSS summed over all processes is the real footprint of the deployment; each
+worker also exports its own numbers as process_memory_bytes on /metrics.
+
+Per-worker state (detection cache, token vault connection, metrics, log
+listener) is created after the fork.  Linux/macOS only (fork).
+
+Listeners and protocol:
+  TCP        HOST:PORT, unless --no-tcp.
+  UDS        --uds PATH additionally listens on a Unix domain socket (mode
+             UDS_MODE) for clients on the same host – n8n, the VPS scripts,
+             self-hosted Supabase functions – which skips the TCP/IP stack of
+             the loopback interface.  Containers share it through a volume.
+  HTTP       --http httptools|h11 and --loop uvloop|asyncio choose the
+             uvicorn parser and event loop ("auto" prefers httptools and
+             uvloop when installed).
+  h2c        --h2c serves HTTP/1.1 and cleartext HTTP/2 (prior knowledge or
+             Upgrade) with hypercorn instead of uvicorn; optional dependency
+             (pip install hypercorn).
+
+SERVE_PROFILE / --profile sets defaults for these; explicit options win:
+  tcp        (default) TCP only, uvicorn defaults.
+  local      also UDS_PATH, httptools + uvloop, 75 s keep-alive (co-located
+             clients hold their connections), no Server / Date headers.
+
+Configuration (environment, or the matching command-line options):
+  SERVE_PROFILE            (default tcp)
+  HOST                     (default 0.0.0.0)
+  PORT                     (default 8001)
+  UDS_PATH                 (default ./var/backend.sock; used by --uds / local)
+  UDS_MODE                 (default 660: owner and group may connect)
+  WORKERS                  (default 2)
+  PREFORK_MEMORY_REPORT_S  (default 300; 0 = only after start-up)
+  PREFORK_GRACEFUL_S       (default 30: SIGKILL workers still running after)
+
+Usage (from backend/):
+  python prefork.py [--workers 4] [--port 8001]
+  python prefork.py --profile local [--uds /run/zone2/backend.sock] [--h2c]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import importlib.util
+import logging
+import os
+import signal
+import socket
+import stat
+import time
+from typing import Any, Optional
+
+import uvicorn
+
+import logging_config
+
+logger = logging.getLogger("prefork")
+
+SERVE_PROFILE = os.getenv("SERVE_PROFILE", "tcp")
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8001"))
+UDS_PATH = os.getenv("UDS_PATH", os.path.join("var", "backend.sock"))
+UDS_MODE = int(os.getenv("UDS_MODE", "660"), 8)
+WORKERS = int(os.getenv("WORKERS", "2"))
+PREFORK_MEMORY_REPORT_S = float(os.getenv("PREFORK_MEMORY_REPORT_S", "300"))
+PREFORK_GRACEFUL_S = float(os.getenv("PREFORK_GRACEFUL_S", "30"))
+
+# Let the first memory report see workers that have finished start-up
+_FIRST_REPORT_DELAY_S = 5.0
+
+# Option defaults per SERVE_PROFILE (uvicorn.Config keyword arguments, plus
+# "uds" for the Unix socket path)
+PROFILES: dict[str, dict[str, Any]] = {
+    "tcp": {},
+    "local": {
+        "uds": UDS_PATH,
+        "http": "httptools",
+        "loop": "uvloop",
+        "timeout_keep_alive": 75,
+        "server_header": False,
+        "date_header": False,
+    },
+}
+
+
+def preload() -> Any:
+    """Import the app and build its shared assets in the master process."""
+    import main
+
+    start = time.perf_counter()
+    main.warm_shared_assets()
+    logger.info("shared assets loaded in %.0fms", (time.perf_counter() - start) * 1000)
+    gc.collect()
+    gc.freeze()
+    return main.app
+
+
+def bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    # An explicit IPPROTO_TCP, or asyncio does not set TCP_NODELAY on the
+    # accepted connections (40 ms delayed-ACK stalls on keep-alive)
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def bind_unix(path: str, mode: int = UDS_MODE) -> socket.socket:
+    """Listen on a Unix domain socket, replacing a stale one left by a crash."""
+    path = os.path.abspath(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                if probe.connect_ex(path) == 0:
+                    raise OSError(f"{path} is in use by a running server")
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    os.chmod(path, mode)
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _describe(sock: socket.socket) -> str:
+    address = sock.getsockname()
+    if sock.family == socket.AF_UNIX:
+        return f"unix:{address}"
+    return f"{address[0]}:{address[1]}"
+
+
+def memory_report(pids: dict[int, int]) -> list[str]:
+    """One line per worker (slot → pid) plus the master and the PSS total."""
+    from metrics import process_memory
+
+    mib = 1024 * 1024
+    lines = []
+    total_pss = 0
+    for name, pid in [("master", os.getpid()), *((f"worker {s}", p) for s, p in pids.items())]:
+        usage = process_memory(pid)
+        if not usage:
+            continue
+        total_pss += usage.get("pss", 0)
+        lines.append(
+            f"{name:<9} pid={pid:<7} rss={usage.get('rss', 0) / mib:6.1f}MiB "
+            f"pss={usage.get('pss', 0) / mib:6.1f}MiB "
+            f"shared={usage.get('shared', 0) / mib:6.1f}MiB "
+            f"private={usage.get('private', 0) / mib:6.1f}MiB"
+        )
+    if lines:
+        lines.append(f"total pss={total_pss / mib:.1f}MiB over {len(lines)} processes")
+    return lines
+
+
+class Master:
+    """Forks the workers, restarts them when they exit, stops them on signal."""
+
+    def __init__(
+        self,
+        app: Any,
+        sockets: list[socket.socket],
+        workers: int,
+        h2c: bool = False,
+        **uvicorn_options: Any,
+    ) -> None:
+        self.app = app
+        self.sockets = sockets
+        self.workers = workers
+        self.h2c = h2c
+        self.uvicorn_options = uvicorn_options
+        self.pids: dict[int, int] = {}  # slot → pid
+        self.stopping = False
+
+    def spawn(self, slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(slot)  # never returns
+        self.pids[slot] = pid
+        logger.info("worker %d started: pid=%d", slot, pid)
+
+    def _run_worker(self, slot: int) -> None:
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            if self.h2c:
+                self._serve_hypercorn()
+            else:
+                config = uvicorn.Config(
+                    self.app,
+                    log_config=None,  # logging_config is already set up
+                    access_log=False,  # middleware.RequestContextMiddleware logs requests
+                    **self.uvicorn_options,
+                )
+                uvicorn.Server(config).run(sockets=self.sockets)
+        except SystemExit as exc:
+            # uvicorn exits with 3 when the lifespan start-up fails
+            code = exc.code if isinstance(exc.code, int) else 1
+        except BaseException:
+            logger.exception("worker %d crashed", slot)
+            code = 1
+        finally:
+            # Never return into the master's code
+            logging_config.flush()
+            os._exit(code)
+
+    def _serve_hypercorn(self) -> None:
+        """HTTP/1.1 + h2c on the inherited sockets until SIGTERM/SIGINT."""
+        import asyncio
+
+        from hypercorn.asyncio import serve
+        from hypercorn.config import Config
+
+        config = Config()
+        config.bind = [f"fd://{sock.fileno()}" for sock in self.sockets]
+        config.keep_alive_timeout = self.uvicorn_options.get("timeout_keep_alive", 5)
+        config.include_server_header = self.uvicorn_options.get("server_header", True)
+        config.accesslog = None
+
+        async def run() -> None:
+            stop = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                loop.add_signal_handler(signum, stop.set)
+            await serve(self.app, config, shutdown_trigger=stop.wait)  # type: ignore[arg-type]
+
+        if self.uvicorn_options.get("loop", "auto") in ("auto", "uvloop") and _installed("uvloop"):
+            import uvloop
+
+            uvloop.run(run())
+        else:
+            asyncio.run(run())
+
+    def _on_signal(self, signum: int, frame: Any) -> None:
+        if not self.stopping:
+            logger.info("received %s, stopping workers", signal.Signals(signum).name)
+        self.stopping = True
+        for pid in self.pids.values():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self) -> list[int]:
+        """Collect exited workers; returns their slots."""
+        exited = []
+        for slot, pid in list(self.pids.items()):
+            try:
+                done, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done, status = pid, 0
+            if done:
+                del self.pids[slot]
+                exited.append(slot)
+                if not self.stopping:
+                    logger.warning(
+                        "worker %d (pid=%d) exited with status %d, restarting",
+                        slot, pid, os.waitstatus_to_exitcode(status),
+                    )
+        return exited
+
+    def run(self, report_every: float = PREFORK_MEMORY_REPORT_S) -> None:
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        for slot in range(self.workers):
+            self.spawn(slot)
+
+        next_report: Optional[float] = time.monotonic() + _FIRST_REPORT_DELAY_S
+        while not self.stopping:
+            time.sleep(0.2)
+            for slot in self._reap():
+                if not self.stopping:
+                    self.spawn(slot)
+            if next_report is not None and time.monotonic() >= next_report:
+                for line in memory_report(self.pids):
+                    logger.info("memory  %s", line)
+                next_report = time.monotonic() + report_every if report_every > 0 else None
+
+        deadline = time.monotonic() + PREFORK_GRACEFUL_S
+        while self.pids and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for slot, pid in self.pids.items():
+            logger.warning("worker %d (pid=%d) did not stop in time, killing", slot, pid)
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        for sock in self.sockets:
+            if sock.family == socket.AF_UNIX:
+                try:
+                    os.unlink(sock.getsockname())
+                except OSError:
+                    pass
+            sock.close()
+        logger.info("all workers stopped")
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def server_options(args: argparse.Namespace) -> dict[str, Any]:
+    """uvicorn.Config options from the profile, overridden by explicit options."""
+    if args.profile not in PROFILES:
+        raise ValueError(f"unknown profile {args.profile!r}, expected one of {', '.join(PROFILES)}")
+    options = dict(PROFILES[args.profile])
+    for name in ("uds", "http", "loop"):
+        if getattr(args, name) is not None:
+            options[name] = getattr(args, name)
+    # Fall back instead of failing where the optional speed-ups are missing
+    if options.get("http") == "httptools" and not _installed("httptools"):
+        logger.warning("httptools not installed, using h11")
+        options["http"] = "h11"
+    if options.get("loop") == "uvloop" and not _installed("uvloop"):
+        logger.warning("uvloop not installed, using asyncio")
+        options["loop"] = "asyncio"
+    return options
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--profile", default=SERVE_PROFILE, choices=sorted(PROFILES))
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--tcp", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--uds", default=None, help="Unix domain socket path")
+    parser.add_argument("--http", default=None, choices=["auto", "httptools", "h11"])
+    parser.add_argument("--loop", default=None, choices=["auto", "uvloop", "asyncio"])
+    parser.add_argument("--h2c", action="store_true", help="HTTP/2 cleartext via hypercorn")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    options = server_options(args)
+    uds = options.pop("uds", None)
+    if not args.tcp and not uds:
+        parser.error("--no-tcp needs --uds or --profile local")
+    if args.h2c and not _installed("hypercorn"):
+        parser.error("--h2c needs hypercorn: pip install hypercorn")
+
+    app = preload()
+    sockets = []
+    if args.tcp:
+        sockets.append(bind(args.host, args.port))
+    if uds:
+        sockets.append(bind_unix(uds))
+    logger.info(
+        "pre-fork master pid=%d listening on %s (%s, http=%s, loop=%s), %d workers",
+        os.getpid(), ", ".join(_describe(s) for s in sockets),
+        "hypercorn h2c" if args.h2c else "uvicorn",
+        options.get("http", "auto"), options.get("loop", "auto"), args.workers,
+    )
+    Master(app, sockets, args.workers, h2c=args.h2c, **options).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+Request profiling (debug)
+GET /debug/profiles
+GET /debug/profiles/{profile_id}
+
+Opt-in sampling profiler for single requests.  A profiled request is
+sampled by a background thread every PROFILE_INTERVAL_MS: it reads the stack
+of every thread (sys._current_frames), skips threads that are idle (waiting
+in the selector, a lock or a queue) and records the rest with the elapsed
+time as weight.  Nothing is traced per call, so overhead is only the sampler
+thread's share of the GIL while a profile is running – and nothing at all
+otherwise.
+
+A request is profiled when
+  - it carries "X-Profile: <PROFILE_TOKEN>" (in development any non-empty
+    value), or
+  - it is picked by PROFILE_SAMPLE_RATE (fraction of all requests).
+
+The worker's event loop is shared, so a profile also shows concurrent
+requests that held the loop while the profiled one was waiting – which is
+usually the reason a request was slow.  Work offloaded to the thread pool
+(sync endpoints) appears under its worker thread.
+
+Finished profiles are kept in a per-worker ring buffer of PROFILE_BUFFER_SIZE
+entries and served as speedscope JSON (https://www.speedscope.app, one
+profile per thread) or, with ?format=collapsed, as collapsed stacks for
+flamegraph.pl.  The profiled response carries "X-Profile-ID".  The endpoints
+exist in development; in production they need "X-Profile-Token:
+<PROFILE_TOKEN>" and answer 404 otherwise.
+
+Configuration (environment):
+  PROFILE_TOKEN         (default unset: header trigger and endpoints dev-only)
+  PROFILE_SAMPLE_RATE   (default 0.0)
+  PROFILE_INTERVAL_MS   (default 5)
+  PROFILE_BUFFER_SIZE   (default 50)
+"""
+
+from __future__ import annotations
+
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import PlainTextResponse
+
+from models import ProfileList, ProfileSummary
+from rendering import ModelResponse
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/debug/profiles", tags=["Debug"])
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+
+_IS_DEV = os.getenv("ENV", "production").lower() == "development"
+
+_MAX_DEPTH = 128
+
+# Top frames of a thread that is waiting rather than running Python code
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+
+# (function, file, first line) – one speedscope frame
+FrameKey = tuple[str, str, int]
+
+
+# ---------------------------------------------------------------------------
+# Sampling
+# ---------------------------------------------------------------------------
+
+
+@dataclass(eq=False)
+class Session:
+    """Samples of one profiled request, per thread."""
+
+    trigger: str
+    started: float = field(default_factory=time.perf_counter)
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    frames: dict[FrameKey, int] = field(default_factory=dict)
+    # thread id → [(root-first frame indices, weight in seconds)]
+    samples: dict[int, list[tuple[tuple[int, ...], float]]] = field(default_factory=dict)
+    last: float = field(default_factory=time.perf_counter)
+
+    def add(self, stacks: dict[int, list[FrameKey]], now: float) -> None:
+        weight = now - self.last
+        self.last = now
+        for tid, stack in stacks.items():
+            indices = tuple(self.frames.setdefault(key, len(self.frames)) for key in stack)
+            self.samples.setdefault(tid, []).append((indices, weight))
+
+
+def _stack(frame: Any) -> Optional[list[FrameKey]]:
+    """Root-first stack of a thread, or None if it is idle."""
+    if frame.f_code.co_filename.endswith(_IDLE_FILES):
+        return None
+    stack: list[FrameKey] = []
+    while frame is not None and len(stack) < _MAX_DEPTH:
+        code = frame.f_code
+        stack.append((code.co_qualname, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class _Sampler:
+    """One daemon thread per worker, running only while sessions are active."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._sessions: set[Session] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, session: Session) -> None:
+        with self._lock:
+            self._sessions.add(session)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="request-profiler", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self, session: Session) -> None:
+        with self._lock:
+            self._sessions.discard(session)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+            now = time.perf_counter()
+            stacks = {}
+            for tid, frame in sys._current_frames().items():
+                if tid == own:
+                    continue
+                stack = _stack(frame)
+                if stack:
+                    stacks[tid] = stack
+            # Under the lock, so stop() returns only once a session is final
+            with self._lock:
+                for session in self._sessions:
+                    session.add(stacks, now)
+
+
+_sampler = _Sampler(PROFILE_INTERVAL_MS / 1000)
+
+
+# ---------------------------------------------------------------------------
+# Request hooks (called by middleware.RequestContextMiddleware)
+# ---------------------------------------------------------------------------
+
+
+def _token_matches(value: str) -> bool:
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(
+        value.encode("latin-1", "replace"), PROFILE_TOKEN.encode("latin-1", "replace")
+    )
+
+
+def start_request(request: Request) -> Optional[Session]:
+    """Start a profile if the request asks for one or is sampled."""
+    if request.url.path.startswith(router.prefix):
+        return None
+    header = request.headers.get("X-Profile", "")
+    if header and (_IS_DEV or _token_matches(header)):
+        trigger = "header"
+    elif PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        trigger = "sampled"
+    else:
+        return None
+    session = Session(trigger=trigger)
+    _sampler.start(session)
+    return session
+
+
+@dataclass
+class Profile:
+    summary: ProfileSummary
+    session: Session
+
+
+_profiles: deque[Profile] = deque(maxlen=PROFILE_BUFFER_SIZE)
+_profiles_lock = threading.Lock()
+
+
+def finish_request(
+    session: Session,
+    request_id: str,
+    method: str,
+    path: str,
+    status_code: int,
+    duration_ms: float,
+) -> None:
+    """Stop sampling and store the profile in the ring buffer."""
+    _sampler.stop(session)
+    names = {t.ident: t.name for t in threading.enumerate()}
+    summary = ProfileSummary(
+        id=request_id,
+        method=method,
+        path=path,
+        status_code=status_code,
+        duration_ms=duration_ms,
+        started_at=session.started_at.isoformat(timespec="milliseconds"),
+        trigger=session.trigger,
+        samples=sum(len(s) for s in session.samples.values()),
+        threads=[names.get(tid, str(tid)) for tid in session.samples],
+    )
+    with _profiles_lock:
+        _profiles.append(Profile(summary, session))
+    logger.info(
+        "profile stored  request_id=%s  %s %s  %.1fms  %d samples",
+        request_id, method, path, duration_ms, summary.samples,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+
+def to_speedscope(profile: Profile) -> dict[str, Any]:
+    """speedscope file format, one "sampled" profile per thread."""
+    session = profile.session
+    frames = sorted(session.frames, key=session.frames.__getitem__)
+    profiles = []
+    for name, (_, samples) in zip(profile.summary.threads, session.samples.items()):
+        weights = [round(w * 1000, 3) for _, w in samples]
+        profiles.append(
+            {
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 3),
+                "samples": [list(stack) for stack, _ in samples],
+                "weights": weights,
+            }
+        )
+    s = profile.summary
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": f"{s.method} {s.path} ({s.duration_ms:.1f}ms, {s.id})",
+        "exporter": "freyai-zone2-profiling",
+        "activeProfileIndex": 0,
+        "shared": {
+            "frames": [{"name": fn, "file": file, "line": line} for fn, file, line in frames]
+        },
+        "profiles": profiles,
+    }
+
+
+def to_collapsed(profile: Profile) -> str:
+    """Collapsed stacks ("thread;outer;inner <µs>") for flamegraph.pl."""
+    session = profile.session
+    names = [fn for fn, _, _ in sorted(session.frames, key=session.frames.__getitem__)]
+    totals: dict[str, float] = {}
+    for thread, samples in zip(profile.summary.threads, session.samples.values()):
+        for stack, weight in samples:
+            line = ";".join([thread, *(names[i] for i in stack)])
+            totals[line] = totals.get(line, 0.0) + weight
+    return "".join(f"{line} {round(w * 1e6)}\n" for line, w in totals.items())
+
+
+# ---------------------------------------------------------------------------
+# Endpoints
+# ---------------------------------------------------------------------------
+
+
+def _require_access(request: Request) -> None:
+    if _IS_DEV:
+        return
+    if _token_matches(request.headers.get("X-Profile-Token", "")):
+        return
+    # Do not reveal the endpoint in production
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+
+@router.get(
+    "",
+    response_model=ProfileList,
+    summary="Stored request profiles (this worker)",
+)
+async def list_profiles(request: Request) -> ModelResponse:
+    _require_access(request)
+    with _profiles_lock:
+        summaries = [p.summary for p in reversed(_profiles)]
+    return ModelResponse(
+        ProfileList(
+            profiles=summaries,
+            capacity=PROFILE_BUFFER_SIZE,
+            sample_rate=PROFILE_SAMPLE_RATE,
+            interval_ms=PROFILE_INTERVAL_MS,
+        )
+    )
+
+
+@router.get(
+    "/{profile_id}",
+    summary="Download a profile (speedscope JSON or collapsed stacks)",
+    responses={200: {"content": {"application/json": {}, "text/plain": {}}}},
+)
+async def get_profile(
+    profile_id: str,
+    request: Request,
+    format: str = Query("speedscope", pattern="^(speedscope|collapsed)$"),
+) -> Any:
+    _require_access(request)
+    with _profiles_lock:
+        # Newest first: clients may reuse X-Request-ID values
+        profile = next((p for p in reversed(_profiles) if p.summary.id == profile_id), None)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No stored profile with id '{profile_id}'",
+        )
+    filename = f"profile-{profile_id}"
+    if format == "collapsed":
+        return PlainTextResponse(
+            to_collapsed(profile),
+            headers={"Content-Disposition": f'attachment; filename="{filename}.txt"'},
+        )
+    return ModelResponse(
+        to_speedscope(profile),
+        headers={"Content-Disposition": f'attachment; filename="{filename}.speedscope.json"'},
+    )
@@ -0,0 +1,364 @@
+"""
+Reconciliation Router
+POST /reconcile/match
+
+Matches incoming bank transactions (parsed CSVRow records, e.g. from
+/api/csv/parse) against open invoices from `rechnungen` and proposes
+invoice ↔ payment pairs with a confidence score.  Nothing is booked: every
+proposal goes to a human for approval.
+
+Matching avoids the O(transactions × invoices) comparison by building hash
+indexes over the open invoices once:
+
+  amount index     outstanding amount in cents → invoices
+  Skonto index     amount less Skonto (per agreed or default rate) → invoices
+  reference index  normalised Rechnungsnummer ("RE-2024/0042" → RE20240042)
+                   and its digit core (20240042) → invoices
+
+Each transaction then costs a few dict lookups: reference tokens extracted
+from Belegnummer and Buchungstext, plus its amount (±1 cent for Skonto
+rounding).  Partial payments are only proposed together with a reference
+match.  Candidates are assigned greedily by confidence, so each transaction
+gets at most one proposal and an invoice is only shared by partial payments.
+
+Confidence:
+  reference + exact amount     0.99   amount only, unique      0.75
+  reference + Skonto amount    0.95   Skonto only, unique      0.6
+  reference + partial payment  0.8    amount/Skonto ambiguous  ÷ candidates
+  reference only               0.5
+  -0.2 if paid before the invoice date, +0.05 if the customer name occurs
+  in the Buchungstext.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Optional
+
+import anyio.to_thread
+from fastapi import APIRouter
+
+from models import (
+    CSVRow,
+    MatchType,
+    OpenInvoice,
+    ReconcileCandidate,
+    ReconcileMatch,
+    ReconcileRequest,
+    ReconcileResponse,
+)
+from rendering import ModelResponse
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/reconcile", tags=["Reconciliation"])
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+
+_BASE_CONFIDENCE: dict[MatchType, float] = {
+    MatchType.REFERENCE_AMOUNT: 0.99,
+    MatchType.REFERENCE_SKONTO: 0.95,
+    MatchType.REFERENCE_PARTIAL: 0.8,
+    MatchType.REFERENCE_ONLY: 0.5,
+    MatchType.AMOUNT: 0.75,
+    MatchType.SKONTO: 0.6,
+}
+# Digit cores shorter than this ("42") collide across years and are not indexed
+_MIN_CORE_LEN = 4
+_EARLY_PAYMENT_PENALTY = 0.2
+_NAME_BONUS = 0.05
+_MAX_CONFIDENCE = 0.99
+
+# Reference-like words: alphanumerics joined by - / . (e.g. RE-2024/0042)
+_RE_WORD = re.compile(r"[A-Za-z0-9]+(?:[-/.][A-Za-z0-9]+)*")
+_RE_SEPARATORS = re.compile(r"[-/.]")
+# Normalised references are upper-case ASCII alphanumerics
+_DROP_LETTERS = str.maketrans("", "", "ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+# Amounts ("1.234,56") and dates ("15.03.2024") are not references
+_RE_NOISE = re.compile(r"\b\d{1,3}(?:\.\d{3})*,\d{2}\b|\b\d{1,2}\.\d{1,2}\.\d{2,4}\b")
+
+_CENT = Decimal("0.01")
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+
+def _to_cents(amount: Decimal) -> int:
+    return int((amount / _CENT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def _from_cents(cents: int) -> Decimal:
+    return Decimal(cents) * _CENT
+
+
+def _normalise_reference(token: str) -> str:
+    return _RE_SEPARATORS.sub("", token).upper()
+
+
+def _digit_core(normalised: str) -> Optional[str]:
+    """All digits of a reference without leading zeros, if long enough to be specific."""
+    core = normalised.translate(_DROP_LETTERS).lstrip("0")
+    return core if len(core) >= _MIN_CORE_LEN else None
+
+
+def _reference_tokens(text: str) -> set[str]:
+    """
+    Normalised candidate references in free text.  Adjacent words are also
+    joined (up to three) so "RE 2024 0042" yields RE20240042.
+    """
+    words = [_normalise_reference(w) for w in _RE_WORD.findall(_RE_NOISE.sub(" ", text))]
+    has_digit = [not w.isalpha() for w in words]
+    tokens: set[str] = set()
+    for i in range(len(words)):
+        joined = ""
+        digit = False
+        for j in range(i, min(i + 3, len(words))):
+            joined += words[j]
+            digit = digit or has_digit[j]
+            if digit:
+                tokens.add(joined)
+    return tokens
+
+
+def _parse_booking_date(datum: str) -> Optional[date]:
+    try:
+        return datetime.strptime(datum.strip(), "%d.%m.%Y").date()
+    except ValueError:
+        return None
+
+
+def _skonto_payment(open_cents: int, rate: float) -> int:
+    """Amount due after deducting Skonto (Skonto rounded commercially)."""
+    skonto = Decimal(open_cents) * Decimal(str(rate))
+    return open_cents - int(skonto.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+# ---------------------------------------------------------------------------
+# Invoice index
+# ---------------------------------------------------------------------------
+
+
+class InvoiceIndex:
+    """Hash indexes over open invoices, built once per reconciliation run."""
+
+    def __init__(self, invoices: list[OpenInvoice], skonto_rates: list[float]) -> None:
+        self.invoices = invoices
+        self.open_cents = [_to_cents(inv.offen or inv.brutto) for inv in invoices]
+        self.by_amount: dict[int, list[int]] = defaultdict(list)
+        self.by_skonto: dict[int, list[tuple[int, float]]] = defaultdict(list)
+        self.by_reference: dict[str, list[int]] = defaultdict(list)
+        self.by_core: dict[str, list[int]] = defaultdict(list)
+        self.names: list[Optional[str]] = [
+            inv.kunde_name.lower() if inv.kunde_name else None for inv in invoices
+        ]
+
+        for idx, inv in enumerate(invoices):
+            cents = self.open_cents[idx]
+            self.by_amount[cents].append(idx)
+            rates = [inv.skonto_rate] if inv.skonto_rate else skonto_rates
+            for rate in rates:
+                self.by_skonto[_skonto_payment(cents, rate)].append((idx, rate))
+            reference = _normalise_reference(inv.rechnungsnummer.replace(" ", ""))
+            self.by_reference[reference].append(idx)
+            core = _digit_core(reference)
+            if core is not None:
+                self.by_core[core].append(idx)
+
+    def reference_hits(self, tokens: set[str]) -> set[int]:
+        hits: set[int] = set()
+        for token in tokens:
+            hits.update(self.by_reference.get(token, ()))
+            core = _digit_core(token)
+            if core is not None:
+                hits.update(self.by_core.get(core, ()))
+        return hits
+
+    def skonto_hits(self, cents: int) -> list[tuple[int, float]]:
+        # ±1 cent: payers round the Skonto deduction either way
+        return [
+            hit
+            for c in (cents - 1, cents, cents + 1)
+            for hit in self.by_skonto.get(c, ())
+        ]
+
+
+# ---------------------------------------------------------------------------
+# Candidate generation + assignment
+# ---------------------------------------------------------------------------
+
+# (confidence, transaction index, invoice index, match type, reasons)
+_Candidate = tuple[float, int, int, MatchType, list[str]]
+
+
+def _candidates_for(
+    t_idx: int, row: CSVRow, index: InvoiceIndex
+) -> list[_Candidate]:
+    cents = _to_cents(row.betrag)
+    if cents <= 0:
+        return []  # outgoing payment – not an invoice settlement
+
+    text = f"{row.belegnummer} {row.buchungstext}"
+    found: dict[int, tuple[MatchType, list[str]]] = {}
+
+    for i_idx in index.reference_hits(_reference_tokens(text)):
+        open_cents = index.open_cents[i_idx]
+        reason = f"reference {index.invoices[i_idx].rechnungsnummer}"
+        if cents == open_cents:
+            found[i_idx] = (MatchType.REFERENCE_AMOUNT, [reason, "exact amount"])
+        elif cents < open_cents:
+            found[i_idx] = (MatchType.REFERENCE_PARTIAL, [reason, "partial payment"])
+        else:
+            found[i_idx] = (MatchType.REFERENCE_ONLY, [reason, "amount exceeds open amount"])
+
+    for i_idx, rate in index.skonto_hits(cents):
+        current = found.get(i_idx)
+        reason = f"amount less {rate:.0%} Skonto"
+        if current is None:
+            found[i_idx] = (MatchType.SKONTO, [reason])
+        elif current[0] is MatchType.REFERENCE_PARTIAL:
+            found[i_idx] = (MatchType.REFERENCE_SKONTO, [current[1][0], reason])
+
+    amount_hits = index.by_amount.get(cents, ())
+    for i_idx in amount_hits:
+        if i_idx not in found or found[i_idx][0] is MatchType.SKONTO:
+            found[i_idx] = (MatchType.AMOUNT, ["exact amount"])
+
+    # Amount-only evidence is split between all invoices it fits
+    ambiguous = sum(1 for mt, _ in found.values() if mt in (MatchType.AMOUNT, MatchType.SKONTO))
+    paid_on: Optional[date] = None
+    if any(index.invoices[i].rechnungsdatum for i in found):
+        paid_on = _parse_booking_date(row.datum)
+    text_lower = text.lower()
+
+    candidates: list[_Candidate] = []
+    for i_idx, (match_type, reasons) in found.items():
+        confidence = _BASE_CONFIDENCE[match_type]
+        if match_type in (MatchType.AMOUNT, MatchType.SKONTO) and ambiguous > 1:
+            confidence /= ambiguous
+            reasons = reasons + [f"{ambiguous} invoices fit this amount"]
+        invoiced_on = index.invoices[i_idx].rechnungsdatum
+        if paid_on and invoiced_on and paid_on < invoiced_on:
+            confidence -= _EARLY_PAYMENT_PENALTY
+            reasons = reasons + ["paid before invoice date"]
+        name = index.names[i_idx]
+        if name and name in text_lower:
+            confidence += _NAME_BONUS
+            reasons = reasons + ["customer name in booking text"]
+        confidence = round(min(max(confidence, 0.0), _MAX_CONFIDENCE), 4)
+        candidates.append((confidence, t_idx, i_idx, match_type, reasons))
+    return candidates
+
+
+def reconcile(payload: ReconcileRequest) -> ReconcileResponse:
+    """Propose matches for all transactions; see module docstring for scoring."""
+    index = InvoiceIndex(payload.invoices, payload.skonto_rates)
+
+    per_transaction: dict[int, list[_Candidate]] = {}
+    all_candidates: list[_Candidate] = []
+    for t_idx, row in enumerate(payload.transactions):
+        candidates = _candidates_for(t_idx, row, index)
+        if candidates:
+            candidates.sort(key=lambda c: (-c[0], c[2]))
+            per_transaction[t_idx] = candidates
+            all_candidates.extend(candidates)
+
+    # Greedy one-to-one assignment, best evidence first.  Partial payments
+    # may share an invoice as long as they fit into its open amount.
+    all_candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+    remaining = list(index.open_cents)
+    untouched = [True] * len(payload.invoices)
+    chosen: dict[int, _Candidate] = {}
+    for cand in all_candidates:
+        _, t_idx, i_idx, match_type, _ = cand
+        if t_idx in chosen:
+            continue
+        paid = _to_cents(payload.transactions[t_idx].betrag)
+        if match_type is MatchType.REFERENCE_PARTIAL:
+            if paid > remaining[i_idx]:
+                continue
+            remaining[i_idx] -= paid
+        elif untouched[i_idx]:
+            remaining[i_idx] = 0
+        else:
+            continue
+        untouched[i_idx] = False
+        chosen[t_idx] = cand
+
+    matches: list[ReconcileMatch] = []
+    for t_idx in sorted(chosen):
+        confidence, _, i_idx, match_type, reasons = chosen[t_idx]
+        row = payload.transactions[t_idx]
+        inv = payload.invoices[i_idx]
+        alternatives = [
+            ReconcileCandidate(
+                invoice_id=payload.invoices[c[2]].id,
+                rechnungsnummer=payload.invoices[c[2]].rechnungsnummer,
+                match_type=c[3],
+                confidence=c[0],
+            )
+            for c in per_transaction[t_idx]
+            if c[2] != i_idx
+        ][: payload.max_alternatives]
+        matches.append(
+            ReconcileMatch(
+                transaction_index=t_idx,
+                belegnummer=row.belegnummer,
+                betrag=row.betrag,
+                invoice_id=inv.id,
+                rechnungsnummer=inv.rechnungsnummer,
+                match_type=match_type,
+                confidence=confidence,
+                difference=_from_cents(index.open_cents[i_idx] - _to_cents(row.betrag)),
+                reasons=reasons,
+                alternatives=alternatives,
+            )
+        )
+
+    return ReconcileResponse(
+        matches=matches,
+        unmatched_transactions=[
+            t for t in range(len(payload.transactions)) if t not in chosen
+        ],
+        unmatched_invoices=[
+            inv.id for idx, inv in enumerate(payload.invoices) if untouched[idx]
+        ],
+        transaction_count=len(payload.transactions),
+        invoice_count=len(payload.invoices),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Endpoint
+# ---------------------------------------------------------------------------
+
+
+@router.post(
+    "/match",
+    response_model=ReconcileResponse,
+    summary="Propose bank transaction ↔ open invoice matches",
+    description=(
+        "Indexes the open invoices by amount, Skonto-reduced amount and "
+        "invoice number, then proposes at most one invoice per transaction "
+        "with a confidence score and alternatives. Proposals must be "
+        "approved by a human before booking."
+    ),
+)
+async def match_transactions(payload: ReconcileRequest) -> ModelResponse:
+    # Indexing and matching up to 100,000 × 100,000 rows: keep it off the event loop
+    result = await anyio.to_thread.run_sync(reconcile, payload)
+    # Buchungstext may contain PII – log counts only
+    logger.info(
+        "reconcile transactions=%d invoices=%d matched=%d",
+        result.transaction_count,
+        result.invoice_count,
+        len(result.matches),
+    )
+    return ModelResponse(result)
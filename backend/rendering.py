@@ -0,0 +1,56 @@
+"""
+Response rendering for the Zone 2 routers.
+
+FastAPI's default path for a returned model re-validates it against the
+route's response_model, converts it to Python primitives and only then
+encodes those with json.dumps.  Endpoints return ModelResponse(model)
+instead: FastAPI passes Response instances through untouched, and the model
+is written straight to JSON bytes by its precompiled pydantic-core
+serializer – one pass in Rust, no intermediate dicts.
+
+The JSON output matches the default rendering (compact separators, UTF-8,
+Decimal as string, enums by value); response_model on the route still
+documents the schema.  On routes using transport.NegotiatedRoute the model
+is rendered as msgpack or Arrow instead when the client asked for it.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Mapping, Optional
+
+import pydantic_core
+from fastapi.responses import Response
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+
+from transport import JSON, encode_model, response_media_type
+
+
+class ModelResponse(Response):
+    """Response rendered by pydantic-core (JSON) or the negotiated binary codec."""
+
+    media_type = JSON
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        media_type: Optional[str] = None,
+        background: Optional[BackgroundTask] = None,
+    ) -> None:
+        super().__init__(
+            content,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type or response_media_type.get(),
+            background=background,
+        )
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            if self.media_type != JSON:
+                return encode_model(content, self.media_type)
+            return content.__pydantic_serializer__.to_json(content, by_alias=True)
+        self.media_type = JSON
+        return pydantic_core.to_json(content, by_alias=True)
@@ -10,6 +10,7 @@ from __future__ import annotations
 
 import io
 import csv
+import json
 from decimal import Decimal
 
 import pytest
@@ -21,12 +22,18 @@ from fastapi.testclient import TestClient
 # We import main so that all routers are registered before tests run.
 import sys
 import os
+import tempfile
 
 # Ensure the backend directory is on sys.path so that relative imports work
 _BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
 if _BACKEND_DIR not in sys.path:
     sys.path.insert(0, _BACKEND_DIR)
 
+# Keep the PII token vault out of the source tree during tests
+os.environ.setdefault(
+    "PII_VAULT_PATH", os.path.join(tempfile.mkdtemp(prefix="pii_vault_"), "vault.sqlite3")
+)
+
 from main import app  # noqa: E402
 
 client = TestClient(app, raise_server_exceptions=True)
@@ -771,6 +778,47 @@ class TestPIISanitizer:
         # Token replacement should start with [IBAN_
         assert "[IBAN_" in body["sanitized_text"]
 
+    def test_tokenize_is_deterministic(self):
+        payload = {"text": "IBAN: DE89 3704 0044 0532 0130 00", "mode": "tokenize"}
+        first = client.post("/pii/sanitize", json=payload).json()
+        second = client.post("/pii/sanitize", json=payload).json()
+        assert first["sanitized_text"] == second["sanitized_text"]
+
+    def test_tokenize_is_tenant_scoped(self):
+        text = "Kontakt: max.mustermann@example.de"
+        a = client.post("/pii/sanitize", json={"text": text, "mode": "tokenize", "tenant_id": "a"})
+        b = client.post("/pii/sanitize", json={"text": text, "mode": "tokenize", "tenant_id": "b"})
+        assert a.json()["sanitized_text"] != b.json()["sanitized_text"]
+
+    def test_detokenize_roundtrip(self):
+        text = "Rückfragen an max.mustermann@example.de, IBAN DE89 3704 0044 0532 0130 00"
+        sanitized = client.post(
+            "/pii/sanitize", json={"text": text, "mode": "tokenize", "tenant_id": "t1"}
+        ).json()
+        token = sanitized["entities_found"][0]["replacement"]
+
+        resp = client.post(
+            "/pii/detokenize",
+            json={"tenant_id": "t1", "tokens": [token], "texts": [sanitized["sanitized_text"]]},
+        )
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["resolved"][token] == sanitized["entities_found"][0]["original"]
+        assert body["texts"] == [text]
+        assert body["unresolved"] == []
+
+    def test_detokenize_other_tenant_unresolved(self):
+        sanitized = client.post(
+            "/pii/sanitize",
+            json={"text": "Mail: a.b@example.de", "mode": "tokenize", "tenant_id": "t1"},
+        ).json()
+        token = sanitized["entities_found"][0]["replacement"]
+        body = client.post(
+            "/pii/detokenize", json={"tenant_id": "t2", "tokens": [token]}
+        ).json()
+        assert body["resolved"] == {}
+        assert body["unresolved"] == [token]
+
     def test_no_pii_returns_unchanged_text(self):
         payload = {
             "text": "Keine persoenlichen Daten hier.",
@@ -883,3 +931,2365 @@ class TestHumanApprovalInvariant:
         ]
         resp = client.post("/api/gobd/prepare", json=rows)
         assert resp.json()["requires_human_approval"] is True
+
+
+# ---------------------------------------------------------------------------
+# 13. Token vault – persistence, LRU bound, TTL eviction
+# ---------------------------------------------------------------------------
+
+
+class TestTokenVault:
+    def test_tokens_survive_reopen(self, tmp_path):
+        from token_vault import TokenVault
+
+        path = str(tmp_path / "vault.sqlite3")
+        vault = TokenVault(path=path, secret="s3cret")
+        token = vault.tokenize("acme", "IBAN", "DE89370400440532013000")
+        vault.close()
+
+        reopened = TokenVault(path=path, secret="s3cret")
+        assert reopened.detokenize_many("acme", [token]) == {token: "DE89370400440532013000"}
+
+    def test_generated_secret_is_persisted(self, tmp_path, monkeypatch):
+        from token_vault import TokenVault
+
+        monkeypatch.delenv("PII_VAULT_SECRET", raising=False)
+        path = str(tmp_path / "vault.sqlite3")
+        first = TokenVault(path=path).make_token("acme", "EMAIL", "a@b.de")
+        second = TokenVault(path=path).make_token("acme", "EMAIL", "a@b.de")
+        assert first == second
+
+    def test_generated_secret_is_kept_out_of_the_vault(self, tmp_path, monkeypatch):
+        from token_vault import TokenVault
+
+        monkeypatch.delenv("PII_VAULT_SECRET", raising=False)
+        path = str(tmp_path / "vault.sqlite3")
+        vault = TokenVault(path=path)
+        vault.tokenize("acme", "EMAIL", "a@b.de")
+        rows = vault._connection().execute("SELECT COUNT(*) FROM vault_meta").fetchone()[0]
+        assert rows == 0
+        assert os.stat(path + ".key").st_mode & 0o777 == 0o600
+
+    def test_legacy_secret_moves_to_key_file(self, tmp_path, monkeypatch):
+        import sqlite3
+
+        from token_vault import _SCHEMA, TokenVault
+
+        monkeypatch.delenv("PII_VAULT_SECRET", raising=False)
+        path = str(tmp_path / "vault.sqlite3")
+        conn = sqlite3.connect(path)
+        conn.executescript(_SCHEMA)
+        conn.execute("INSERT INTO vault_meta VALUES ('hmac_secret', 'legacy')")
+        conn.commit()
+        conn.close()
+
+        token = TokenVault(path=path).make_token("acme", "EMAIL", "a@b.de")
+        assert token == TokenVault(path=path, secret="legacy").make_token("acme", "EMAIL", "a@b.de")
+        with open(path + ".key") as fh:
+            assert fh.read() == "legacy"
+        conn = sqlite3.connect(path)
+        assert conn.execute("SELECT COUNT(*) FROM vault_meta").fetchone()[0] == 0
+        conn.close()
+
+    def test_endpoints_run_vault_io_off_the_event_loop(self, monkeypatch):
+        import asyncio
+
+        import token_vault
+
+        vault = token_vault.get_token_vault()
+        on_loop: list[bool] = []
+        for name in ("tokenize_many", "detokenize_many"):
+            original = getattr(vault, name)
+
+            def wrapped(*args, _original=original):
+                try:
+                    asyncio.get_running_loop()
+                    on_loop.append(True)
+                except RuntimeError:
+                    on_loop.append(False)
+                return _original(*args)
+
+            monkeypatch.setattr(vault, name, wrapped)
+
+        sanitized = client.post(
+            "/pii/sanitize", json={"text": "Mail an a@b.de", "mode": "tokenize"}
+        ).json()
+        client.post(
+            "/pii/sanitize-batch", json={"texts": ["Mail an c@d.de"], "mode": "tokenize"}
+        )
+        client.post("/pii/detokenize", json={"texts": [sanitized["sanitized_text"]]})
+        assert on_loop == [False, False, False]
+
+    def test_make_token_serialises_connection_setup(self, tmp_path):
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+
+        from token_vault import TokenVault
+
+        vault = TokenVault(path=str(tmp_path / "v.sqlite3"), secret="x")
+        original = vault._connection
+        active, overlaps = [0], []
+        guard = threading.Lock()
+
+        def slow_connection():
+            with guard:
+                active[0] += 1
+                overlaps.append(active[0])
+            time.sleep(0.005)
+            try:
+                return original()
+            finally:
+                with guard:
+                    active[0] -= 1
+
+        vault._connection = slow_connection
+        with ThreadPoolExecutor(8) as pool:
+            tokens = set(pool.map(lambda _: vault.make_token("acme", "EMAIL", "a@b.de"), range(16)))
+        assert len(tokens) == 1 and max(overlaps) == 1
+
+    def test_lru_is_bounded(self, tmp_path):
+        from token_vault import TokenVault
+
+        vault = TokenVault(path=str(tmp_path / "v.sqlite3"), secret="x", cache_size=3)
+        tokens = vault.tokenize_many("acme", [("EMAIL", f"user{i}@example.de") for i in range(10)])
+        assert len(vault._lru) == 3
+        # Evicted entries are still resolvable from disk
+        assert len(vault.detokenize_many("acme", tokens)) == 10
+
+    def test_expired_tokens_are_purged(self, tmp_path):
+        from token_vault import TokenVault
+
+        vault = TokenVault(path=str(tmp_path / "v.sqlite3"), secret="x", ttl_seconds=-1)
+        token = vault.tokenize("acme", "PHONE", "+49 30 12345678")
+        assert vault.detokenize_many("acme", [token]) == {}
+        vault.purge_expired()
+        count = vault._connection().execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+        assert count == 0
+
+
+# ---------------------------------------------------------------------------
+# 14. Gazetteer name detection
+# ---------------------------------------------------------------------------
+
+
+class TestNameGazetteer:
+    def _names(self, text: str) -> list[str]:
+        from pii_sanitizer import _detect_entities
+
+        return [m.original for m in _detect_entities(text) if m.entity_type == "NAME"]
+
+    def test_first_name_plus_surname(self):
+        assert self._names("Zahlung von Max Mustermann erhalten") == ["Max Mustermann"]
+
+    def test_honorific_anchors_surname(self):
+        assert self._names("Sehr geehrter Herr Müller, anbei die Rechnung") == ["Müller"]
+
+    def test_particles_and_double_first_names(self):
+        assert self._names("Dr. Anna-Lena von Berg") == ["Anna-Lena von Berg"]
+
+    def test_capitalised_nouns_are_not_names(self):
+        for text in ("Miete Büro Januar", "Werkzeug Lieferung", "Betriebskosten Strom Wasser"):
+            assert self._names(text) == []
+
+    def test_custom_gazetteer(self):
+        from name_gazetteer import NameGazetteer
+
+        gaz = NameGazetteer(frozenset({"Ole"}), frozenset(), frozenset({"Rechnung"}))
+        assert gaz.find_names("Ole Svensson, Rechnung 12") == [(0, 12)]
+        assert gaz.find_names("Ole Rechnung") == []
+
+
+# ---------------------------------------------------------------------------
+# 15. Batch sanitisation + spaCy NER backend
+# ---------------------------------------------------------------------------
+
+
+class TestPIISanitizeBatch:
+    def test_batch_matches_single(self):
+        texts = ["Kontakt: max@example.de", "Miete Büro Januar", "Herr Müller ruft an"]
+        resp = client.post("/pii/sanitize-batch", json={"texts": texts, "mode": "mask"})
+        assert resp.status_code == 200
+        body = resp.json()
+        assert len(body["results"]) == 3
+        for text, result in zip(texts, body["results"]):
+            single = client.post("/pii/sanitize", json={"text": text, "mode": "mask"}).json()
+            assert result == single
+        assert body["entity_count"] == 2
+
+    def test_empty_batch_rejected(self):
+        resp = client.post("/pii/sanitize-batch", json={"texts": []})
+        assert resp.status_code == 422
+
+    def test_batch_inference_runs_off_the_event_loop(self):
+        import asyncio
+
+        import pii_sanitizer
+
+        on_loop: list[bool] = []
+
+        class Recording:
+            def __call__(self, text):
+                return []
+
+            def detect_batch(self, texts):
+                try:
+                    asyncio.get_running_loop()
+                    on_loop.append(True)
+                except RuntimeError:
+                    on_loop.append(False)
+                return [[] for _ in texts]
+
+        original = pii_sanitizer._ner_backend
+        try:
+            pii_sanitizer.register_ner_backend(Recording())
+            resp = client.post("/pii/sanitize-batch", json={"texts": ["Erika Musterfrau"]})
+            assert resp.status_code == 200
+        finally:
+            pii_sanitizer.register_ner_backend(original)
+        assert on_loop == [False]
+
+
+class TestSpacyNerBackend:
+    def _nlp(self):
+        spacy = pytest.importorskip("spacy")
+        nlp = spacy.blank("de")
+        ruler = nlp.add_pipe("entity_ruler")
+        ruler.add_patterns(
+            [
+                {"label": "PER", "pattern": "Erika Musterfrau"},
+                {"label": "LOC", "pattern": "Berlin"},
+            ]
+        )
+        return nlp
+
+    def test_person_entities_become_names(self):
+        from ner_spacy import SpacyNerBackend
+
+        backend = SpacyNerBackend(nlp=self._nlp())
+        matches = backend("Erika Musterfrau wohnt in Berlin")
+        assert [(m.entity_type, m.original, m.start) for m in matches] == [
+            ("NAME", "Erika Musterfrau", 0)
+        ]
+
+    def test_batch_skips_lowercase_texts(self):
+        from ner_spacy import SpacyNerBackend
+
+        nlp = self._nlp()
+        seen: list[str] = []
+        original_pipe = nlp.pipe
+
+        def recording_pipe(texts, **kwargs):
+            texts = list(texts)
+            seen.extend(texts)
+            return original_pipe(texts, **kwargs)
+
+        nlp.pipe = recording_pipe
+        backend = SpacyNerBackend(nlp=nlp)
+        results = backend.detect_batch(
+            ["überweisung 123", "Erika Musterfrau", "MUSTERFRAU ERIKA MIETE"]
+        )
+        # All-caps bank export text still reaches the model
+        assert seen == ["Erika Musterfrau", "MUSTERFRAU ERIKA MIETE"]
+        assert results[0] == [] and results[1][0].original == "Erika Musterfrau"
+
+    def test_missing_model_falls_back_to_gazetteer(self):
+        from ner_spacy import SpacyNerBackend
+
+        backend = SpacyNerBackend(model_name="no_such_model_xx")
+        assert [m.original for m in backend("Max Mustermann")] == ["Max Mustermann"]
+
+
+# ---------------------------------------------------------------------------
+# 16. Checksum validation (IBAN mod-97, Steuer-IdNr, Steuernummer layouts)
+# ---------------------------------------------------------------------------
+
+
+class TestPIIChecksums:
+    def test_iban_confidence(self):
+        from pii_checksums import iban_confidence
+
+        assert iban_confidence("DE89 3704 0044 0532 0130 00") >= 0.9
+        assert iban_confidence("DE89 3704 0044 0532 0130 01") < 0.9  # bad checksum
+        assert iban_confidence("DE89 3704 0044 0532 0130") < 0.9  # wrong length
+        assert iban_confidence("RE20 2400 1234 5678") < 0.9  # not a country
+
+    def test_steuer_idnr(self):
+        from pii_checksums import steuer_idnr_ok
+
+        assert steuer_idnr_ok("86095742719")
+        assert not steuer_idnr_ok("86095742718")  # wrong check digit
+        assert not steuer_idnr_ok("01234567890")  # leading zero
+
+    def test_steuernummer_layouts(self):
+        from pii_checksums import steuernummer_confidence
+
+        assert steuernummer_confidence("12/345/67890") >= 0.9
+        assert steuernummer_confidence("2893081508152") >= 0.9
+        assert steuernummer_confidence("1234567890123") < 0.9
+        assert steuernummer_confidence("1/23/4567/89") < 0.9
+
+    def test_entities_carry_confidence(self):
+        resp = client.post(
+            "/pii/sanitize",
+            json={"text": "IBAN DE89 3704 0044 0532 0130 00, Steuer-ID: 86095742719"},
+        )
+        entities = {e["type"]: e for e in resp.json()["entities_found"]}
+        assert entities["IBAN"]["confidence"] >= 0.9
+        assert entities["TAX_ID"]["confidence"] >= 0.9
+
+    def test_validated_only_keeps_references(self):
+        text = "Zahlung Ref RE20 2400 1234 5678, IBAN DE89 3704 0044 0532 0130 00"
+        default = client.post("/pii/sanitize", json={"text": text}).json()
+        validated = client.post(
+            "/pii/sanitize", json={"text": text, "validated_only": True}
+        ).json()
+        assert default["entity_count"] == 2
+        assert validated["entity_count"] == 1
+        assert "RE20 2400 1234 5678" in validated["sanitized_text"]
+        assert "DE89" not in validated["sanitized_text"]
+
+
+# ---------------------------------------------------------------------------
+# 17. PII detection cache
+# ---------------------------------------------------------------------------
+
+
+class TestDetectionCache:
+    def test_repeated_text_hits_cache(self):
+        from pii_cache import detection_cache
+        from pii_sanitizer import _detect_entities
+
+        text = "Gehalt März Max Mustermann (cache test)"
+        before = detection_cache.stats()
+        first = _detect_entities(text)
+        second = _detect_entities(text)
+        after = detection_cache.stats()
+        assert after["hits"] == before["hits"] + 1
+        assert [(m.entity_type, m.start, m.end) for m in first] == [
+            (m.entity_type, m.start, m.end) for m in second
+        ]
+        # Returned matches are independent objects (replacement is mutated)
+        assert first[0] is not second[0]
+
+    def test_size_aware_eviction(self):
+        from pii_cache import DetectionCache
+
+        cache = DetectionCache(max_entries=100, max_bytes=1500)
+        big = tuple(("NAME", "x" * 200, 0, 200, 1.0) for _ in range(3))
+        cache.put("v", "a", big)
+        cache.put("v", "b", big)
+        stats = cache.stats()
+        assert stats["entries"] == 1 and stats["evictions"] == 1
+        assert cache.get("v", "a") is None and cache.get("v", "b") == big
+
+    def test_version_is_part_of_key(self):
+        from pii_cache import DetectionCache
+
+        cache = DetectionCache()
+        cache.put("1", "Miete Büro Januar", ())
+        assert cache.get("1", "Miete Büro Januar") == ()
+        assert cache.get("2", "Miete Büro Januar") is None
+
+    def test_registering_backend_invalidates(self):
+        import pii_sanitizer
+
+        text = "Kontakt Erika Beispiel"
+        original = pii_sanitizer._ner_backend
+        try:
+            pii_sanitizer._detect_entities(text)
+            pii_sanitizer.register_ner_backend(
+                lambda t: [pii_sanitizer._Match("NAME", "Erika Beispiel", 8, 22)]
+            )
+            assert [m.original for m in pii_sanitizer._detect_entities(text)] == ["Erika Beispiel"]
+        finally:
+            pii_sanitizer.register_ner_backend(original)
+
+    def test_backend_failure_is_not_cached(self):
+        import pii_sanitizer
+        from pii_cache import detection_cache
+
+        class Broken:
+            def __call__(self, text):
+                raise RuntimeError("model crashed")
+
+            def detect_batch(self, texts):
+                raise RuntimeError("model crashed")
+
+        text = "Überweisung an Max Mustermann (backend failure test)"
+        original = pii_sanitizer._ner_backend
+        try:
+            pii_sanitizer.register_ner_backend(Broken())
+            version = pii_sanitizer._ruleset_key()
+            # The gazetteer stands in, and the degraded result is not cached
+            single = pii_sanitizer._detect_entities(text)
+            assert "Max Mustermann" in [m.original for m in single if m.entity_type == "NAME"]
+            assert detection_cache.get(version, text) is None
+            (batch,) = pii_sanitizer._detect_entities_batch([text])
+            assert "Max Mustermann" in [m.original for m in batch if m.entity_type == "NAME"]
+            assert detection_cache.get(version, text) is None
+        finally:
+            pii_sanitizer.register_ner_backend(original)
+
+    def test_stats_endpoint(self):
+        resp = client.get("/pii/cache/stats")
+        assert resp.status_code == 200
+        body = resp.json()
+        assert {"hits", "misses", "hit_rate", "entries", "ruleset_version"} <= set(body)
+
+
+# ---------------------------------------------------------------------------
+# 18. Vectorised batch math validation
+# ---------------------------------------------------------------------------
+
+
+class TestMathValidateBatch:
+    INVOICES = [
+        # valid
+        {"netto": 100.0, "mwst_rate": 0.19, "brutto": 119.0,
+         "items": [{"qty": 2, "unit_price": 50.0, "total": 100.0}]},
+        # rounding tie: 2.5 × 423.87 = 1059.67499… → round() gives 1059.67
+        {"netto": 1059.67, "mwst_rate": 0.0, "brutto": 1059.67,
+         "items": [{"qty": 2.5, "unit_price": 423.87, "total": 1059.67}]},
+        # no line items
+        {"netto": 50.0, "mwst_rate": 0.07, "brutto": 53.5, "items": []},
+        # header error, bad item (warning), sum mismatch (error)
+        {"netto": 200.0, "mwst_rate": 0.19, "brutto": 250.0,
+         "items": [{"qty": 1, "unit_price": 100.0, "total": 100.0},
+                   {"qty": 3, "unit_price": 10.0, "total": 30.5}]},
+        # zero amounts
+        {"netto": 0.0, "mwst_rate": 0.19, "brutto": 0.0,
+         "items": [{"qty": 1, "unit_price": 0.0, "total": 0.0}]},
+    ]
+
+    def test_batch_matches_single(self):
+        resp = client.post("/math/validate-batch", json={"invoices": self.INVOICES})
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["total"] == len(self.INVOICES)
+        for inv, result in zip(self.INVOICES, body["results"]):
+            assert result == client.post("/math/validate", json=inv).json()
+        assert body["valid_count"] == sum(r["valid"] for r in body["results"])
+
+    def test_message_order_matches_single(self):
+        result = client.post(
+            "/math/validate-batch", json={"invoices": [self.INVOICES[3]]}
+        ).json()["results"][0]
+        assert result["errors"][0].startswith("Brutto mismatch")
+        assert result["errors"][1].startswith("Sum of line items")
+        assert result["warnings"][0].startswith("Line item 1:")
+
+    def test_round_vec_matches_round(self):
+        import random
+
+        import numpy as np
+        from math_guardrail import _round_vec
+
+        rng = random.Random(7)
+        values = [rng.randint(0, 10**6) / 1000 * rng.choice((1, -1)) for _ in range(5000)]
+        values += [2.5 * 423.87, 1059.675, 0.125, -0.125, 2.675]
+        assert _round_vec(np.array(values), 2).tolist() == [round(v, 2) for v in values]
+
+    def test_empty_batch_rejected(self):
+        assert client.post("/math/validate-batch", json={"invoices": []}).status_code == 422
+
+    def test_batch_runs_off_the_event_loop(self, monkeypatch):
+        import asyncio
+
+        import math_guardrail
+
+        on_loop: list[bool] = []
+        original = math_guardrail._validate_batch
+
+        def recording(invoices):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return original(invoices)
+
+        monkeypatch.setattr(math_guardrail, "_validate_batch", recording)
+        resp = client.post("/math/validate-batch", json={"invoices": self.INVOICES})
+        assert resp.status_code == 200
+        assert on_loop == [False]
+
+    def test_mixed_rounding_modes_match_single(self):
+        # Amounts whose scaled cent products leave the int64 range
+        huge = [
+            {"netto": 1e20, "mwst_rate": 0.19, "brutto": 1.19e20, "items": []},
+            {"netto": 1e17, "mwst_rate": 0.19, "brutto": 1e17,
+             "items": [{"qty": 2, "unit_price": 5e16, "total": 1e17}]},
+            {"netto": 1e20, "mwst_rate": 0.19, "brutto": 1.13e20,
+             "items": [{"qty": 1, "unit_price": 5e19, "total": 5e19},
+                       {"qty": 1, "unit_price": 5e19, "total": 5e19, "mwst_rate": 0.07}]},
+        ]
+        invoices = [dict(inv, rounding="cents") for inv in self.INVOICES + huge]
+        invoices += self.INVOICES + huge
+        body = client.post("/math/validate-batch", json={"invoices": invoices}).json()
+        for inv, result in zip(invoices, body["results"]):
+            assert result == client.post("/math/validate", json=inv).json()
+
+
+# ---------------------------------------------------------------------------
+# 19. Integer-cent arithmetic (ROUND_HALF_UP)
+# ---------------------------------------------------------------------------
+
+
+class TestMathCentsMode:
+    def _item_delta(self, qty, unit_price, total, rounding):
+        payload = {
+            "netto": abs(total), "mwst_rate": 0.0, "brutto": abs(total), "rounding": rounding,
+            "items": [{"qty": qty, "unit_price": unit_price, "total": total}],
+        }
+        result = client.post("/math/validate", json=payload).json()
+        return result["line_item_results"][0]
+
+    @pytest.mark.parametrize(
+        "qty,unit_price,total",
+        [
+            (1, 0.125, 0.13),    # exact binary tie: round() → 0.12 (half-even)
+            (1, 2.675, 2.68),    # 2.675 is 2.67499… in binary
+            (1, 1.005, 1.01),    # 1.005 is 1.00499… in binary
+            (3, 1.115, 3.35),    # 3.345 → 3.3449999… after multiplication
+            (1, -2.675, -2.68),  # credit line: half away from zero
+        ],
+    )
+    def test_half_up_line_totals(self, qty, unit_price, total):
+        floaty = self._item_delta(qty, unit_price, total, "float")
+        exact = self._item_delta(qty, unit_price, total, "cents")
+        assert floaty["delta"] != 0.0
+        assert exact["delta"] == 0.0 and exact["computed_total"] == total
+
+    def test_half_up_vat(self):
+        # 0.50 × 19 % = 0.095 → 0.10 VAT (float path: 0.595 → 0.59)
+        payload = {"netto": 0.5, "mwst_rate": 0.19, "brutto": 0.6, "items": []}
+        assert client.post("/math/validate", json=payload).json()["delta_brutto"] == 0.01
+        cents = client.post("/math/validate", json=dict(payload, rounding="cents")).json()
+        assert cents["corrected_brutto"] == 0.6 and cents["delta_brutto"] == 0.0
+
+    def test_many_small_items_sum_exactly(self):
+        items = [{"qty": 1, "unit_price": 0.1, "total": 0.1}] * 30
+        payload = {"netto": 3.0, "mwst_rate": 0.19, "brutto": 3.57,
+                   "items": items, "rounding": "cents"}
+        result = client.post("/math/validate", json=payload).json()
+        assert result["confidence"] == 1.0 and not result["warnings"]
+
+    def test_default_mode_is_float(self):
+        from models import MathValidateRequest, RoundingMode
+
+        req = MathValidateRequest(netto=1, mwst_rate=0.19, brutto=1.19)
+        assert req.rounding is RoundingMode.FLOAT
+
+    @pytest.mark.parametrize("rounding", ["float", "cents"])
+    def test_non_finite_rejected(self, rounding):
+        from models import MathValidateRequest
+
+        with pytest.raises(ValueError):
+            MathValidateRequest(netto=float("inf"), mwst_rate=0.19, brutto=1.0, rounding=rounding)
+
+    @pytest.mark.parametrize("value", ["Infinity", "NaN"])
+    def test_non_finite_with_explain_is_a_client_error(self, value):
+        body = (
+            f'{{"netto": {value}, "mwst_rate": 0.19, "brutto": 119.0, "explain": true, '
+            f'"items": [{{"qty": 1, "unit_price": 100.0, "total": {value}}}]}}'
+        )
+        headers = {"Content-Type": "application/json"}
+        assert client.post("/math/validate", content=body, headers=headers).status_code == 422
+        batch = f'{{"invoices": [{body}]}}'
+        assert client.post("/math/validate-batch", content=batch, headers=headers).status_code == 422
+
+    def test_int64_overflow_falls_back_to_python_ints(self):
+        from math_guardrail import _validate_batch
+        from models import MathValidateRequest
+
+        inv = MathValidateRequest(
+            netto=1e12, mwst_rate=0.0, brutto=1e12, rounding="cents",
+            items=[{"qty": 1000, "unit_price": 1e9, "total": 1e12}],
+        )
+        assert _validate_batch([inv])[0]["line_item_results"][0]["delta"] == 0.0
+
+
+# ---------------------------------------------------------------------------
+# 20. Multi-rate VAT, reverse charge, discount / Skonto lines
+# ---------------------------------------------------------------------------
+
+
+class TestMathVatGroups:
+    # Handwerk invoice: 19 % labour, 7 % goods, §13b subcontractor line,
+    # 2 % Skonto on the 19 % positions
+    INVOICE = {
+        "netto": 596.0,
+        "mwst_rate": 0.19,
+        "brutto": 596.0 + 37.24 + 7.0,
+        "items": [
+            {"qty": 4, "unit_price": 50.0, "total": 200.0},
+            {"qty": 1, "unit_price": 100.0, "total": 100.0, "mwst_rate": 0.07},
+            {"qty": 1, "unit_price": 300.0, "total": 300.0, "reverse_charge": True},
+            {"qty": 1, "unit_price": -4.0, "total": -4.0, "kind": "skonto", "percent": 0.02},
+        ],
+        "vat_breakdown": [
+            {"rate": 0.19, "netto": 196.0, "vat": 37.24},
+            {"rate": 0.07, "netto": 100.0, "vat": 7.0},
+            {"rate": 0.0, "reverse_charge": True, "netto": 300.0, "vat": 0.0},
+        ],
+    }
+
+    def _post(self, invoice):
+        resp = client.post("/math/validate", json=invoice)
+        assert resp.status_code == 200, resp.text
+        return resp.json()
+
+    def test_mixed_rates_green(self):
+        for rounding in ("float", "cents"):
+            result = self._post(dict(self.INVOICE, rounding=rounding))
+            assert result["valid"] and result["traffic_light"] == "green"
+            assert result["corrected_brutto"] == 640.24
+            groups = {(g["rate"], g["reverse_charge"]): g for g in result["vat_groups"]}
+            assert groups[(0.0, True)]["vat"] == 0.0
+            assert groups[(0.19, False)]["netto"] == 196.0
+            assert all(g["valid"] for g in result["vat_groups"])
+
+    def test_breakdown_mismatch_reported(self):
+        invoice = dict(self.INVOICE)
+        invoice["vat_breakdown"] = [
+            {"rate": 0.19, "netto": 196.0, "vat": 37.3},
+            {"rate": 0.07, "netto": 100.0, "vat": 7.0},
+        ]
+        result = self._post(invoice)
+        assert not result["valid"]
+        assert "VAT group 19 %: VAT 37.24 but stated 37.3 (Δ +0.0600)" in result["warnings"]
+        assert "VAT group §13b: netto 300.0 but stated 0.0 (Δ -300.0000)" in result["errors"]
+
+    def test_wrong_skonto_percentage(self):
+        invoice = dict(self.INVOICE, vat_breakdown=None)
+        invoice["items"] = self.INVOICE["items"][:3] + [
+            {"qty": 1, "unit_price": -6.0, "total": -6.0, "kind": "skonto", "percent": 0.02}
+        ]
+        result = self._post(invoice)
+        skonto = result["line_item_results"][3]
+        assert skonto["computed_total"] == -4.0 and not skonto["valid"]
+
+    def test_deduction_must_be_negative(self):
+        invoice = dict(self.INVOICE)
+        invoice["items"] = [{"qty": 1, "unit_price": 5.0, "total": 5.0, "kind": "discount"}]
+        assert client.post("/math/validate", json=invoice).status_code == 422
+
+    def test_single_rate_invoices_unchanged(self):
+        payload = {"netto": 100.0, "mwst_rate": 0.19, "brutto": 119.0,
+                   "items": [{"qty": 2, "unit_price": 50.0, "total": 100.0}]}
+        assert self._post(payload)["vat_groups"] == []
+
+    def test_batch_matches_single(self):
+        invoices = []
+        for rounding in ("float", "cents"):
+            invoices.append(dict(self.INVOICE, rounding=rounding))
+            invoices.append(dict(self.INVOICE, rounding=rounding, brutto=700.0,
+                                 vat_breakdown=[{"rate": 0.07, "netto": 1.0, "vat": 0.07}]))
+            invoices.append(dict(self.INVOICE, rounding=rounding, items=[]))
+        invoices += TestMathValidateBatch.INVOICES
+        body = client.post("/math/validate-batch", json={"invoices": invoices}).json()
+        for inv, result in zip(invoices, body["results"]):
+            assert result == self._post(inv)
+
+
+# ---------------------------------------------------------------------------
+# 21. Reconciliation (bank CSV ↔ open invoices)
+# ---------------------------------------------------------------------------
+
+
+class TestReconciliation:
+    INVOICES = [
+        {"id": "a", "rechnungsnummer": "RE-2024-0042", "brutto": "1190.00",
+         "rechnungsdatum": "2024-03-01", "kunde_name": "Schreinerei Holz"},
+        {"id": "b", "rechnungsnummer": "RE-2024-0043", "brutto": "500.00"},
+        {"id": "c", "rechnungsnummer": "RE-2024-0044", "brutto": "500.00"},
+        {"id": "d", "rechnungsnummer": "RE-2024-0045", "brutto": "1000.00", "skonto_rate": 0.03},
+        {"id": "e", "rechnungsnummer": "RE-2024-0046", "brutto": "2000.00"},
+        {"id": "f", "rechnungsnummer": "RE-2024-0047", "brutto": "333.33"},
+    ]
+
+    @staticmethod
+    def _row(betrag, text, belegnummer="BANK-1", datum="15.03.2024"):
+        return {"datum": datum, "belegnummer": belegnummer, "buchungstext": text,
+                "betrag": betrag, "konto": "1200", "gegenkonto": "10000"}
+
+    def _match(self, transactions, invoices=None):
+        resp = client.post(
+            "/reconcile/match",
+            json={"transactions": transactions, "invoices": invoices or self.INVOICES},
+        )
+        assert resp.status_code == 200, resp.text
+        body = resp.json()
+        return {m["transaction_index"]: m for m in body["matches"]}, body
+
+    def test_matching_runs_off_the_event_loop(self, monkeypatch):
+        import asyncio
+
+        import reconciliation
+
+        on_loop: list[bool] = []
+        original = reconciliation.reconcile
+
+        def recording(payload):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return original(payload)
+
+        monkeypatch.setattr(reconciliation, "reconcile", recording)
+        self._match([self._row("500,00", "Zahlung")])
+        assert on_loop == [False]
+
+    def test_reference_and_exact_amount(self):
+        matches, _ = self._match([self._row("1.190,00", "Schreinerei Holz RE 2024 0042")])
+        m = matches[0]
+        assert m["invoice_id"] == "a" and m["match_type"] == "reference_amount"
+        assert m["confidence"] == 0.99
+        assert "customer name in booking text" in m["reasons"]
+
+    def test_skonto_with_agreed_rate(self):
+        matches, _ = self._match([self._row("970,00", "Zahlung RE-2024-0045 abzgl. Skonto")])
+        assert matches[0]["match_type"] == "reference_skonto"
+        assert matches[0]["difference"] in ("30.00", "30.0000")
+
+    def test_skonto_amount_only(self):
+        # 333.33 less 2 % Skonto (6.67) = 326.66
+        matches, _ = self._match([self._row("326,66", "Überweisung")])
+        assert matches[0]["invoice_id"] == "f" and matches[0]["match_type"] == "skonto"
+
+    def test_partial_payments_share_invoice(self):
+        matches, body = self._match([
+            self._row("800,00", "Abschlag 1 RE-2024-0046"),
+            self._row("700,00", "Abschlag 2 RE20240046"),
+        ])
+        assert {m["match_type"] for m in matches.values()} == {"reference_partial"}
+        assert {m["invoice_id"] for m in matches.values()} == {"e"}
+        assert "e" not in body["unmatched_invoices"]
+
+    def test_ambiguous_amount_split_and_one_to_one(self):
+        matches, body = self._match([self._row("500,00", "Gutschrift"),
+                                     self._row("500,00", "Gutschrift")])
+        assert {m["invoice_id"] for m in matches.values()} == {"b", "c"}
+        assert all(m["confidence"] < 0.5 for m in matches.values())
+        assert matches[0]["alternatives"]
+
+    def test_amounts_and_dates_are_not_references(self):
+        # "1.190,00" and "01.03.2024" must not produce reference hits
+        matches, body = self._match([self._row("12,00", "Betrag 1.190,00 vom 01.03.2024")])
+        assert matches == {} and body["unmatched_transactions"] == [0]
+
+    def test_outgoing_payments_ignored(self):
+        matches, _ = self._match([self._row("-500,00", "Lastschrift RE-2024-0043")])
+        assert matches == {}
+
+    def test_early_payment_penalised(self):
+        matches, _ = self._match(
+            [self._row("1190,00", "RE-2024-0042", datum="01.02.2024")]
+        )
+        assert matches[0]["confidence"] == 0.79
+
+    def test_index_lookup_scales_linearly(self):
+        import time
+
+        from models import ReconcileRequest
+        from reconciliation import reconcile
+
+        n = 5000
+        invoices = [{"id": str(i), "rechnungsnummer": f"RE-{100000 + i}",
+                     "brutto": f"{100 + i}.{i % 100:02d}"} for i in range(n)]
+        rows = [self._row(f"{100 + i},{i % 100:02d}", f"RE {100000 + i}") for i in range(n)]
+        payload = ReconcileRequest(transactions=rows, invoices=invoices)
+        start = time.perf_counter()
+        result = reconcile(payload)
+        assert time.perf_counter() - start < 5.0
+        assert len(result.matches) == n
+        assert all(m.match_type == "reference_amount" for m in result.matches)
+
+
+# ---------------------------------------------------------------------------
+# 22. Error localisation (explain=true)
+# ---------------------------------------------------------------------------
+
+
+class TestMathExplain:
+    def _post(self, invoice, path="/math/validate"):
+        resp = client.post(path, json=dict(invoice, explain=True))
+        assert resp.status_code == 200, resp.text
+        return resp.json()
+
+    def test_valid_invoice_has_no_suggestions(self):
+        result = self._post({"netto": 100.0, "mwst_rate": 0.19, "brutto": 119.0})
+        assert result["suggestions"] == []
+
+    def test_swapped_digits_in_line_total(self):
+        result = self._post({
+            "netto": 223.45,
+            "mwst_rate": 0.19,
+            "brutto": 265.91,
+            "items": [
+                {"qty": 1, "unit_price": 100.0, "total": 100.0},
+                {"qty": 1, "unit_price": 123.45, "total": 132.45},
+            ],
+        })
+        best = result["suggestions"][0]
+        assert best["field"] == "items[1].total" and best["suggested"] == 123.45
+        assert best["reason"] == "adjacent digits swapped"
+        assert best["explains"] == ["line 1", "sum"]
+
+    def test_missing_decimal_comma_in_unit_price(self):
+        result = self._post({
+            "netto": 50.0,
+            "mwst_rate": 0.19,
+            "brutto": 59.5,
+            "items": [{"qty": 2, "unit_price": 2500.0, "total": 50.0}],
+        })
+        fields = {s["field"]: s for s in result["suggestions"]}
+        assert fields["items[0].unit_price"]["suggested"] == 25.0
+        assert fields["items[0].unit_price"]["reason"] == "decimal comma misplaced"
+
+    def test_wrong_quantity(self):
+        result = self._post({
+            "netto": 30.0,
+            "mwst_rate": 0.19,
+            "brutto": 35.7,
+            "items": [{"qty": 2, "unit_price": 10.0, "total": 30.0}],
+        })
+        fields = {s["field"]: s["suggested"] for s in result["suggestions"]}
+        assert fields["items[0].qty"] == 3.0
+
+    def test_wrong_vat_rate_ranked_first(self):
+        result = self._post({"netto": 100.0, "mwst_rate": 0.19, "brutto": 107.0})
+        best = result["suggestions"][0]
+        assert best["field"] == "mwst_rate" and best["suggested"] == 0.07
+
+    def test_wrong_line_rate_on_grouped_invoice(self):
+        result = self._post({
+            "netto": 200.0,
+            "mwst_rate": 0.19,
+            "brutto": 226.0,
+            "items": [
+                {"qty": 1, "unit_price": 100.0, "total": 100.0, "mwst_rate": 0.19},
+                {"qty": 1, "unit_price": 100.0, "total": 100.0, "mwst_rate": 0.07},
+            ],
+        })
+        assert not result["suggestions"] or result["suggestions"][0]["field"] != "brutto"
+        result = self._post({
+            "netto": 200.0,
+            "mwst_rate": 0.19,
+            "brutto": 226.0,
+            "items": [
+                {"qty": 1, "unit_price": 100.0, "total": 100.0, "mwst_rate": 0.19},
+                {"qty": 1, "unit_price": 100.0, "total": 100.0, "mwst_rate": 0.19},
+            ],
+        })
+        best = result["suggestions"][0]
+        assert best["field"].endswith(".mwst_rate") and best["suggested"] == 0.07
+
+    @pytest.mark.parametrize("qty,unit_price", [(1, 0.0), (1e-300, 5.0)])
+    def test_degenerate_line_emits_no_warnings(self, qty, unit_price):
+        import math
+        import warnings
+
+        invoice = {
+            "netto": 100.0,
+            "mwst_rate": 0.19,
+            "brutto": 119.0,
+            "items": [{"qty": qty, "unit_price": unit_price, "total": 100.0}],
+        }
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            result = self._post(invoice)
+        assert all(math.isfinite(s["suggested"]) for s in result["suggestions"])
+
+    def test_not_explained_without_flag(self):
+        resp = client.post(
+            "/math/validate", json={"netto": 100.0, "mwst_rate": 0.19, "brutto": 107.0}
+        )
+        assert resp.json()["suggestions"] == []
+
+    def test_batch_matches_single(self):
+        invoice = {
+            "netto": 1000.0,
+            "mwst_rate": 0.19,
+            "brutto": 119.0,
+            "items": [{"qty": 1, "unit_price": 100.0, "total": 100.0}],
+        }
+        single = self._post(invoice)
+        batch = client.post(
+            "/math/validate-batch", json={"invoices": [dict(invoice, explain=True)]}
+        ).json()["results"][0]
+        assert batch["suggestions"] == single["suggestions"]
+        assert single["suggestions"][0]["field"] == "netto"
+        assert single["suggestions"][0]["explains"] == ["sum", "brutto"]
+
+    def test_200_lines_under_5ms(self):
+        import random
+        import time
+
+        from math_guardrail import _suggest_corrections
+        from models import MathValidateRequest
+
+        rnd = random.Random(7)
+        items = []
+        for _ in range(200):
+            qty, price = rnd.randint(1, 9), round(rnd.uniform(1, 500), 2)
+            items.append({"qty": qty, "unit_price": price, "total": round(qty * price, 2)})
+        netto = round(sum(i["total"] for i in items), 2)
+        items[57]["total"] = round(items[57]["total"] * 10, 2)
+        payload = MathValidateRequest(
+            netto=netto, mwst_rate=0.19, brutto=round(netto * 1.19, 2), items=items
+        )
+        computed = [round(i.qty * i.unit_price, 2) for i in payload.items]
+        start = time.perf_counter()
+        for _ in range(20):
+            suggestions = _suggest_corrections(payload, computed, payload.brutto, False)
+        assert (time.perf_counter() - start) / 20 < 0.005
+        assert suggestions[0]["field"] == "items[57].total"
+
+
+# ---------------------------------------------------------------------------
+# 23. Shared GermanDecimal type, pydantic-core response rendering
+# ---------------------------------------------------------------------------
+
+
+class TestGermanDecimalAndRendering:
+    @pytest.mark.parametrize(
+        "raw, expected",
+        [
+            ("1.234,56", "1234.56"),
+            ("-1.234,56", "-1234.56"),
+            ("1,234.56", "1234.56"),
+            ("1234,56", "1234.56"),
+            (" 999.99 ", "999.99"),
+            (12.5, "12.5"),
+            (7, "7"),
+        ],
+    )
+    def test_parse_german_decimal(self, raw, expected):
+        from models import parse_german_decimal
+
+        assert parse_german_decimal(raw) == Decimal(expected)
+
+    def test_models_share_the_parser(self):
+        from models import CSVRow, InvoiceValidateRequest
+
+        common = {"datum": "01.01.2024", "belegnummer": "RE-1", "buchungstext": "x",
+                  "konto": "4980", "gegenkonto": "1600"}
+        assert CSVRow(**common, betrag="2.345,67").betrag == Decimal("2345.67")
+        assert InvoiceValidateRequest(**common, betrag="2.345,67").betrag == Decimal("2345.67")
+
+    def test_unparseable_amount_is_422(self):
+        resp = client.post(
+            "/api/validate/invoice",
+            json={"datum": "15.03.2024", "belegnummer": "RE-005", "buchungstext": "x",
+                  "betrag": "zwölf", "konto": "4980", "gegenkonto": "1600"},
+        )
+        assert resp.status_code == 422
+        assert "Cannot parse 'zwölf'" in resp.text
+
+    def test_rendering_matches_default_encoding(self):
+        import json
+
+        from fastapi.encoders import jsonable_encoder
+
+        from rendering import ModelResponse
+        from models import CSVRow, ParseResult
+
+        row = CSVRow(datum="01.01.2024", belegnummer="RE-1", buchungstext="Büromaterial",
+                     betrag="1.190,00", konto="4980", gegenkonto="1600")
+        model = ParseResult(rows=[row], total_rows=1, valid_rows=1, invalid_rows=0)
+        response = ModelResponse(model)
+        assert response.media_type == "application/json"
+        assert json.loads(response.body) == jsonable_encoder(model)
+        assert "Büromaterial".encode() in response.body
+
+    def test_endpoint_content_type(self):
+        resp = client.post(
+            "/math/validate", json={"netto": 100.0, "mwst_rate": 0.19, "brutto": 119.0}
+        )
+        assert resp.headers["content-type"] == "application/json"
+        assert resp.json()["traffic_light"] == "green"
+
+
+# ---------------------------------------------------------------------------
+# 24. Binary transport (msgpack / Arrow content negotiation)
+# ---------------------------------------------------------------------------
+
+
+class TestBinaryTransport:
+    ROWS = [
+        {
+            "datum": "05.03.2024",
+            "belegnummer": f"RE-00{i}",
+            "buchungstext": "Material",
+            "betrag": "1.190,00",
+            "konto": "4980",
+            "gegenkonto": "1600",
+        }
+        for i in range(1, 4)
+    ]
+
+    def test_negotiate(self):
+        from transport import ARROW, JSON, MSGPACK, negotiate
+
+        offered = (MSGPACK, ARROW)
+        assert negotiate(None, offered) == JSON
+        assert negotiate("*/*", offered) == JSON
+        assert negotiate("application/msgpack, */*;q=0.8", offered) == MSGPACK
+        assert negotiate("application/msgpack, */*", offered) == MSGPACK
+        assert negotiate("application/json, application/msgpack", offered) == JSON
+        assert negotiate(f"{ARROW};q=0.9, application/json;q=0.5", offered) == ARROW
+        assert negotiate("application/msgpack;q=0", offered) == JSON
+        assert negotiate(ARROW, (MSGPACK,)) == JSON
+
+    def test_json_default_unchanged(self):
+        resp = client.post("/api/gobd/prepare", json=self.ROWS)
+        assert resp.status_code == 200
+        assert resp.headers["content-type"] == "application/json"
+
+    def test_msgpack_roundtrip(self):
+        msgpack = pytest.importorskip("msgpack")
+        resp = client.post(
+            "/api/gobd/prepare",
+            content=msgpack.packb(self.ROWS),
+            headers={"content-type": "application/msgpack", "accept": "application/msgpack"},
+        )
+        assert resp.status_code == 200, resp.text
+        assert resp.headers["content-type"] == "application/msgpack"
+        assert "Accept" in resp.headers["vary"]
+        body = msgpack.unpackb(resp.content)
+        json_body = client.post("/api/gobd/prepare", json=self.ROWS).json()
+        assert body["valid"] is True
+        assert body["prepared_rows"] == json_body["prepared_rows"]
+
+    def test_invalid_msgpack_is_400(self):
+        pytest.importorskip("msgpack")
+        resp = client.post(
+            "/math/validate", content=b"\xc1", headers={"content-type": "application/msgpack"}
+        )
+        assert resp.status_code == 400
+
+    def test_arrow_request_and_response(self):
+        pa = pytest.importorskip("pyarrow")
+        table = pa.Table.from_pylist(
+            [dict(r, betrag=Decimal("1190.00")) for r in self.ROWS]
+        )
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        arrow = "application/vnd.apache.arrow.stream"
+        resp = client.post(
+            "/api/gobd/prepare",
+            content=sink.getvalue().to_pybytes(),
+            headers={"content-type": arrow, "accept": arrow},
+        )
+        assert resp.status_code == 200, resp.text
+        assert resp.headers["content-type"] == arrow
+        result = pa.ipc.open_stream(resp.content).read_all()
+        assert pa.types.is_decimal(result.schema.field("betrag").type)
+        assert result.column("betrag").to_pylist() == [Decimal("1190.00")] * 3
+        import json
+
+        fields = json.loads(result.schema.metadata[b"fields"])
+        assert fields["valid"] is True and fields["violations"] == []
+
+    def test_arrow_pii_batch_with_metadata_fields(self):
+        pa = pytest.importorskip("pyarrow")
+        import json
+
+        table = pa.table(
+            {"text": ["IBAN DE89370400440532013000"]},
+            metadata={b"fields": json.dumps({"mode": "remove"}).encode()},
+        )
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        resp = client.post(
+            "/pii/sanitize-batch",
+            content=sink.getvalue().to_pybytes(),
+            headers={"content-type": "application/vnd.apache.arrow.stream"},
+        )
+        assert resp.status_code == 200, resp.text
+        result = resp.json()["results"][0]
+        assert result["mode_used"] == "remove"
+        assert "DE89" not in result["sanitized_text"]
+
+    def test_arrow_falls_back_to_json_for_single_invoice(self):
+        pytest.importorskip("pyarrow")
+        resp = client.post(
+            "/math/validate",
+            json={"netto": 100.0, "mwst_rate": 0.19, "brutto": 119.0},
+            headers={"accept": "application/vnd.apache.arrow.stream"},
+        )
+        assert resp.headers["content-type"] == "application/json"
+
+
+# ---------------------------------------------------------------------------
+# 25. Benchmark suite (workload generators, baseline comparison)
+# ---------------------------------------------------------------------------
+
+
+class TestBenchmarkSuite:
+    def test_journal_parses_in_every_encoding(self):
+        from benchmarks import data
+
+        for encoding in ("utf-8", "windows-1252", "utf-8-sig"):
+            resp = _upload_csv(data.make_journal(50, encoding))
+            assert resp.status_code == 200, resp.text
+            body = resp.json()
+            assert body["valid_rows"] == 50 and body["invalid_rows"] == 0
+
+    def test_split_journal_respects_limit(self):
+        from benchmarks import data
+
+        journal = data.make_journal(2_000)
+        chunks = data.split_journal(journal, 20_000)
+        assert all(len(c) <= 20_000 for c in chunks)
+        assert all(c.startswith(data.JOURNAL_HEADER.encode()) for c in chunks)
+        assert sum(c.count(b"\r\n") - 1 for c in chunks) == 2_000
+
+    def test_run_scenario(self):
+        from benchmarks.suite import run_scenario
+
+        result = run_scenario(client, "math_validate", {"invoices": 20})
+        assert result.units == 20 and result.requests == 20
+        assert result.throughput > 0 and result.p99_ms >= result.p50_ms
+
+    def test_compare_flags_regressions(self, tmp_path):
+        from benchmarks.suite import Result, compare, load_baseline, save_baseline
+
+        base = Result("math_validate", "invoices", 100, 100, 1000.0, 1.0, 2.0, 100.0)
+        path = tmp_path / "small.json"
+        save_baseline([base], path, "small")
+        baseline = load_baseline(path)
+
+        same = Result("math_validate", "invoices", 100, 100, 900.0, 1.0, 2.2, 110.0)
+        assert compare([same], baseline, threshold=0.25) == []
+
+        slower = Result("math_validate", "invoices", 100, 100, 500.0, 2.0, 4.0, 200.0)
+        regressions = compare([slower], baseline, threshold=0.25)
+        assert len(regressions) == 3
+        assert regressions[0].startswith("math_validate: throughput")
+
+    def test_skewed_scan_preprocesses(self):
+        from benchmarks import data
+
+        resp = client.post(
+            "/image/preprocess", files={"file": ("scan.jpg", data.make_scan(1))}
+        )
+        assert resp.status_code == 200, resp.text
+        assert resp.json()["metadata"]["deskew_angle"] != 0.0
+
+
+# ---------------------------------------------------------------------------
+# 26. Load-test harness (open-loop traffic mixes)
+# ---------------------------------------------------------------------------
+
+
+class TestLoadTest:
+    def test_mixes_name_known_routes(self):
+        import random
+
+        from benchmarks.loadtest import MIXES, Payloads, _request
+
+        payloads = Payloads(b"", [], [{}], ["x"] * 200, [b""])
+        for mix in MIXES.values():
+            for route in mix:
+                method, path, _ = _request(route, payloads, random.Random(0))
+                assert method in ("GET", "POST") and path.startswith("/")
+
+    def test_run_step_in_process(self):
+        import asyncio
+
+        import httpx
+
+        from benchmarks import data
+        from benchmarks.loadtest import Payloads, run_step
+
+        payloads = Payloads(b"", [], data.make_invoices(10), [], [])
+        mix = {"health": 1, "math_validate": 1}
+
+        async def step():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+                return await run_step(c, mix, rate=50, duration=0.5, payloads=payloads)
+
+        result = asyncio.run(step())
+        assert result.errors == 0 and result.completed > 0
+        assert set(result.routes) <= set(mix)
+        for stats in result.routes.values():
+            assert all(q <= lat for q, lat in zip(stats.queue, stats.latencies))
+        assert result.loop_blocked_s is not None and result.loop_max_stall_s >= 0
+
+
+# ---------------------------------------------------------------------------
+# 27. Request profiling (sampled flamegraphs, debug endpoints)
+# ---------------------------------------------------------------------------
+
+
+class TestRequestProfiling:
+    @pytest.fixture(autouse=True)
+    def _profiling(self, monkeypatch):
+        import profiling
+
+        monkeypatch.setattr(profiling, "PROFILE_TOKEN", "s3cret")
+        monkeypatch.setattr(profiling, "_IS_DEV", False)
+        profiling._profiles.clear()
+        yield profiling
+        profiling._profiles.clear()
+
+    def _profiled_request(self, **headers):
+        from benchmarks import data
+
+        return client.post(
+            "/image/preprocess",
+            files={"file": ("scan.jpg", data.make_scan(1))},
+            headers=headers,
+        )
+
+    def test_unprofiled_by_default(self):
+        resp = client.get("/health")
+        assert "X-Profile-ID" not in resp.headers
+
+    def test_header_needs_token(self):
+        assert "X-Profile-ID" not in client.get("/health", headers={"X-Profile": "1"}).headers
+
+    def test_profile_captured_and_listed(self):
+        resp = self._profiled_request(**{"X-Profile": "s3cret", "X-Request-ID": "prof-1"})
+        assert resp.status_code == 200
+        assert resp.headers["X-Profile-ID"] == "prof-1"
+
+        listing = client.get("/debug/profiles", headers={"X-Profile-Token": "s3cret"})
+        assert listing.status_code == 200
+        summary = listing.json()["profiles"][0]
+        assert summary["id"] == "prof-1" and summary["path"] == "/image/preprocess"
+        assert summary["trigger"] == "header" and summary["samples"] > 0
+
+    def test_download_speedscope_and_collapsed(self):
+        self._profiled_request(**{"X-Profile": "s3cret", "X-Request-ID": "prof-2"})
+        auth = {"X-Profile-Token": "s3cret"}
+
+        doc = client.get("/debug/profiles/prof-2", headers=auth).json()
+        assert doc["$schema"].startswith("https://www.speedscope.app")
+        frames = doc["shared"]["frames"]
+        profile = doc["profiles"][0]
+        assert profile["type"] == "sampled"
+        assert len(profile["samples"]) == len(profile["weights"])
+        names = {frames[i]["name"] for stack in profile["samples"] for i in stack}
+        assert "_preprocess_pipeline" in names
+
+        collapsed = client.get("/debug/profiles/prof-2?format=collapsed", headers=auth)
+        assert collapsed.headers["content-type"].startswith("text/plain")
+        line = collapsed.text.splitlines()[0]
+        stack, weight = line.rsplit(" ", 1)
+        assert ";" in stack and int(weight) >= 0
+
+    def test_sample_rate(self, _profiling, monkeypatch):
+        monkeypatch.setattr(_profiling, "PROFILE_SAMPLE_RATE", 1.0)
+        resp = client.post("/math/validate", json={"netto": 100, "mwst_rate": 0.19, "brutto": 119})
+        assert "X-Profile-ID" in resp.headers
+        assert _profiling._profiles[-1].summary.trigger == "sampled"
+
+    def test_ring_buffer_is_bounded(self, _profiling, monkeypatch):
+        from collections import deque
+
+        monkeypatch.setattr(_profiling, "_profiles", deque(maxlen=2))
+        for i in range(3):
+            client.get("/health", headers={"X-Profile": "s3cret", "X-Request-ID": f"r{i}"})
+        assert [p.summary.id for p in _profiling._profiles] == ["r1", "r2"]
+
+    def test_endpoints_hidden_without_token(self):
+        assert client.get("/debug/profiles").status_code == 404
+        assert client.get("/debug/profiles", headers={"X-Profile-Token": "nope"}).status_code == 404
+
+    def test_unknown_profile_is_404(self):
+        resp = client.get("/debug/profiles/missing", headers={"X-Profile-Token": "s3cret"})
+        assert resp.status_code == 404
+
+
+# ---------------------------------------------------------------------------
+# 28. Prometheus metrics (/metrics, HTTP middleware, domain counters)
+# ---------------------------------------------------------------------------
+
+
+def _metric_value(text: str, sample: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(sample + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+class TestMetrics:
+    def _scrape(self) -> str:
+        resp = client.get("/metrics")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+        return resp.text
+
+    def test_exposition_has_help_and_type(self):
+        text = self._scrape()
+        assert "# TYPE http_request_duration_seconds histogram" in text
+        assert "# TYPE http_requests_in_flight gauge" in text
+        assert "# TYPE pii_entities_detected_total counter" in text
+
+    def test_request_counted_by_route_template(self):
+        sample = 'http_requests_total{method="GET",route="/debug/profiles/{profile_id}",status="404"}'
+        before = _metric_value(self._scrape(), sample)
+        client.get("/debug/profiles/abc")
+        client.get("/debug/profiles/def")
+        assert _metric_value(self._scrape(), sample) == before + 2
+
+    def test_latency_histogram_and_bytes(self):
+        body = {"netto": 100, "mwst_rate": 0.19, "brutto": 119}
+        count = 'http_request_duration_seconds_count{method="POST",route="/math/validate"}'
+        inf = 'http_request_duration_seconds_bucket{method="POST",route="/math/validate",le="+Inf"}'
+        received = 'http_request_bytes_total{route="/math/validate"}'
+        sent = 'http_response_bytes_total{route="/math/validate"}'
+        before = self._scrape()
+        resp = client.post("/math/validate", json=body)
+        after = self._scrape()
+        assert _metric_value(after, count) == _metric_value(before, count) + 1
+        assert _metric_value(after, inf) == _metric_value(after, count)
+        assert _metric_value(after, received) - _metric_value(before, received) == len(
+            resp.request.content
+        )
+        assert _metric_value(after, sent) - _metric_value(before, sent) == len(resp.content)
+
+    def test_domain_counters(self):
+        from benchmarks import data
+
+        before = self._scrape()
+        client.post("/pii/sanitize", json={"text": "IBAN DE89370400440532013000, a@b.de"})
+        _upload_csv(data.make_journal(30))
+        rows = data.journal_rows(3)
+        rows[1]["belegnummer"] = "RE-0000099"
+        client.post("/api/gobd/prepare", json=rows)
+        after = self._scrape()
+
+        def delta(sample: str) -> float:
+            return _metric_value(after, sample) - _metric_value(before, sample)
+
+        assert delta('pii_entities_detected_total{entity_type="IBAN"}') == 1
+        assert delta('pii_entities_detected_total{entity_type="EMAIL"}') == 1
+        assert delta('gobd_csv_rows_parsed_total{result="valid"}') == 30
+        assert delta('gobd_violations_total{violation_type="SEQUENCE_GAP"}') >= 1
+
+    def test_histogram_buckets_are_cumulative(self):
+        from metrics import Histogram
+
+        hist = Histogram("test_seconds", "test", ("kind",), buckets=(0.1, 1.0))
+        child = hist.labels("a")
+        for value in (0.05, 0.1, 0.5, 5.0):
+            child.observe(value)
+        lines = hist.samples()
+        assert 'test_seconds_bucket{kind="a",le="0.1"} 2' in lines
+        assert 'test_seconds_bucket{kind="a",le="1"} 3' in lines
+        assert 'test_seconds_bucket{kind="a",le="+Inf"} 4' in lines
+        assert 'test_seconds_count{kind="a"} 4' in lines
+        assert hist.labels("a") is child
+
+    def test_label_values_are_escaped(self):
+        from metrics import Counter
+
+        counter = Counter("test_total", "test", ("path",))
+        counter.labels('a"b\\c\nd').inc(2)
+        assert counter.samples() == ['test_total{path="a\\"b\\\\c\\nd"} 2']
+
+
+# ---------------------------------------------------------------------------
+# 29. Pure-ASGI request middleware (request ID, error envelope, access log)
+# ---------------------------------------------------------------------------
+
+
+def _asgi_app(handler):
+    """Wrap a bare ASGI callable in RequestContextMiddleware."""
+    from middleware import RequestContextMiddleware
+
+    return RequestContextMiddleware(handler)
+
+
+async def _call_asgi(app, path="/x", headers=()):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "method": "GET", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "headers": list(headers), "client": ("127.0.0.1", 1),
+        "server": ("test", 80), "scheme": "http", "root_path": "", "http_version": "1.1",
+    }
+    await app(scope, receive, send)
+    return messages
+
+
+class TestRequestContextMiddleware:
+    def test_request_id_echoed_and_timing_header(self):
+        resp = client.get("/health", headers={"X-Request-ID": "abc-123"})
+        assert resp.headers["X-Request-ID"] == "abc-123"
+        assert float(resp.headers["X-Processing-Time-MS"]) >= 0
+
+    def test_request_id_generated(self):
+        resp = client.get("/health")
+        assert len(resp.headers["X-Request-ID"]) == 36
+
+    def test_request_id_reaches_exception_handlers(self):
+        resp = client.post("/math/validate", json={}, headers={"X-Request-ID": "val-1"})
+        assert resp.status_code == 422
+        assert resp.json()["error"]["details"]["request_id"] == "val-1"
+
+    def test_unhandled_exception_becomes_envelope(self):
+        import asyncio
+
+        async def boom(scope, receive, send):
+            raise RuntimeError("kaputt")
+
+        messages = asyncio.run(_call_asgi(_asgi_app(boom), headers=[(b"x-request-id", b"e-1")]))
+        start, body = messages
+        assert start["status"] == 500
+        assert (b"x-request-id", b"e-1") in start["headers"]
+        error = json.loads(body["body"])["error"]
+        assert error["code"] == "INTERNAL_SERVER_ERROR"
+        assert error["details"]["request_id"] == "e-1"
+
+    def test_streaming_body_is_not_buffered(self):
+        import asyncio
+
+        events = []
+
+        async def stream(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            for chunk in (b"a", b"b", b"c"):
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                events.append(("app", chunk))
+            await send({"type": "http.response.body", "body": b""})
+
+        app = _asgi_app(stream)
+
+        async def run():
+            async def send(message):
+                if message["type"] == "http.response.body" and message["body"]:
+                    events.append(("server", message["body"]))
+
+            async def receive():
+                return {"type": "http.request", "body": b""}
+
+            scope = {"type": "http", "method": "GET", "path": "/s", "headers": []}
+            await app(scope, receive, send)
+
+        asyncio.run(run())
+        # Every chunk reaches the server before the app produces the next one
+        assert events == [
+            ("server", b"a"), ("app", b"a"), ("server", b"b"),
+            ("app", b"b"), ("server", b"c"), ("app", b"c"),
+        ]
+
+    def test_datev_export_streams_through(self):
+        resp = client.post("/api/datev/export", json=_datev_request_payload())
+        assert resp.status_code == 200
+        assert "X-Request-ID" in resp.headers
+        assert resp.content.startswith(b'"EXTF"')
+
+    def test_access_log_sampling(self, caplog, monkeypatch):
+        import logging
+
+        import middleware
+
+        monkeypatch.setattr(middleware, "ACCESS_LOG_SAMPLE_RATE", 0.0)
+        with caplog.at_level(logging.INFO, logger="access"):
+            client.get("/health")
+            client.get("/does-not-exist")
+        lines = [r.getMessage() for r in caplog.records if r.name == "access"]
+        assert len(lines) == 1
+        assert lines[0].startswith("GET /does-not-exist 404")
+
+
+# ---------------------------------------------------------------------------
+# 30. Structured logging pipeline (JSON, request IDs, sampling, bounded queue)
+# ---------------------------------------------------------------------------
+
+
+class TestLoggingPipeline:
+    def _record(self, msg="hello %s", args=("world",), level=20, **extra):
+        import logging
+
+        record = logging.LogRecord("zone2.test", level, __file__, 1, msg, args, None)
+        for key, value in extra.items():
+            setattr(record, key, value)
+        return record
+
+    def test_json_formatter(self):
+        from logging_config import JsonFormatter
+
+        line = JsonFormatter().format(self._record(request_id="r-1", status=200))
+        entry = json.loads(line)
+        assert entry["msg"] == "hello world"
+        assert entry["level"] == "INFO" and entry["logger"] == "zone2.test"
+        assert entry["request_id"] == "r-1" and entry["status"] == 200
+        assert entry["ts"].endswith("+00:00")
+
+    def test_json_formatter_exception(self):
+        import sys
+
+        from logging_config import JsonFormatter
+
+        try:
+            raise ValueError("kaputt")
+        except ValueError:
+            record = self._record(exc_info=sys.exc_info())
+        entry = json.loads(JsonFormatter().format(record))
+        assert "ValueError: kaputt" in entry["exc"]
+
+    def test_request_id_attached_in_request_context(self, caplog):
+        import logging
+
+        with caplog.at_level(logging.INFO, logger="access"):
+            client.get("/health", headers={"X-Request-ID": "log-1"})
+        record = next(r for r in caplog.records if r.name == "access")
+        assert record.status == 200 and record.path == "/health"
+
+        from logging_config import RequestIdFilter, request_id_var
+
+        token = request_id_var.set("ctx-7")
+        try:
+            record = self._record()
+            RequestIdFilter().filter(record)
+        finally:
+            request_id_var.reset(token)
+        assert record.request_id == "ctx-7"
+
+    def test_sampling_filter_keeps_warnings(self):
+        from logging_config import SamplingFilter, parse_sample_rates
+
+        assert parse_sample_rates("access=0.1, pii_sanitizer=0.05,bogus,x=y") == {
+            "access": 0.1,
+            "pii_sanitizer": 0.05,
+        }
+        never = SamplingFilter(0.0)
+        assert not never.filter(self._record(level=20))
+        assert never.filter(self._record(level=30))
+
+    def test_bounded_queue_drops_and_reports(self):
+        import queue
+
+        from logging_config import BoundedQueueHandler
+
+        q: queue.SimpleQueue = queue.SimpleQueue()
+        handler = BoundedQueueHandler(q, maxsize=2)
+        for i in range(5):
+            handler.handle(self._record(args=(i,)))
+        assert handler.dropped == 3 and q.qsize() == 2
+
+        q.get_nowait(), q.get_nowait()
+        handler.handle(self._record(args=("after",)))
+        queued = [q.get_nowait() for _ in range(q.qsize())]
+        assert queued[0].getMessage() == "hello after"
+        assert queued[1].getMessage() == "log queue full: dropped 3 record(s)"
+
+        text = client.get("/metrics").text
+        assert 'log_records_dropped_total{level="INFO"}' in text
+
+    def test_records_are_merged_before_queueing(self):
+        import queue
+        import sys
+
+        from logging_config import BoundedQueueHandler, JsonFormatter
+
+        q: queue.SimpleQueue = queue.SimpleQueue()
+        handler = BoundedQueueHandler(q, maxsize=10)
+        items = ["a"]
+        handler.handle(self._record(msg="items %s", args=(items,)))
+        items.append("b")  # mutated after the log call
+        assert q.get_nowait().getMessage() == "items ['a']"
+
+        try:
+            raise ValueError("kaputt")
+        except ValueError:
+            record = self._record(exc_info=sys.exc_info())
+        handler.handle(record)
+        queued = q.get_nowait()
+        assert queued.exc_info is None and queued.args is None
+        assert "ValueError: kaputt" in json.loads(JsonFormatter().format(queued))["exc"]
+        # The caller's record (seen by other handlers) is left untouched
+        assert record.exc_info is not None
+
+
+# ---------------------------------------------------------------------------
+# 31. Cold start (lazy routers and heavy dependencies)
+# ---------------------------------------------------------------------------
+
+
+class TestColdStart:
+    def test_parse_routers(self):
+        from main import ROUTER_MODULES, parse_routers
+
+        assert parse_routers("all") == list(ROUTER_MODULES)
+        assert parse_routers("") == list(ROUTER_MODULES)
+        # Mount order follows ROUTER_MODULES, not the spec
+        assert parse_routers("vision, IMAGE") == ["image", "vision"]
+        with pytest.raises(ValueError, match="ocr"):
+            parse_routers("math,ocr")
+
+    def test_role_worker_skips_heavy_imports(self):
+        import subprocess
+
+        code = (
+            "import sys, main\n"
+            "heavy = [m for m in ('cv2', 'PIL', 'pyarrow', 'chardet', 'image_processor')"
+            " if m in sys.modules]\n"
+            "from fastapi.testclient import TestClient\n"
+            "c = TestClient(main.app)\n"
+            "print(heavy, c.get('/math/validate').status_code,"
+            " c.post('/image/preprocess').status_code)\n"
+        )
+        env = dict(os.environ, ROUTERS="math", WARMUP="off", LOG_LEVEL="WARNING")
+        proc = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True,
+            cwd=_BACKEND_DIR, env=env, timeout=60,
+        )
+        assert proc.returncode == 0, proc.stderr
+        assert proc.stdout.split("\n")[-2] == "[] 405 404"
+
+    def test_image_backends_load_on_demand(self):
+        import image_processor
+
+        image_processor.load_backends()
+        image_processor.load_backends()
+        assert image_processor.Image is not None
+        assert image_processor._OPENCV_AVAILABLE == (image_processor.cv2 is not None)
+
+    def test_health_reports_backends_without_importing(self):
+        body = client.get("/health").json()
+        assert body["services"]["image_processor_pil"] == "ok"
+
+    def test_parse_importtime(self):
+        from benchmarks.coldstart import parse_importtime
+
+        trace = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       300 |        300 |     numpy._core\n"
+            "import time:       200 |        500 |   numpy\n"
+            "import time:      1000 |       1500 | main\n"
+        )
+        assert parse_importtime(trace) == {"numpy": 0.0005, "main": 0.001}
+
+
+# ---------------------------------------------------------------------------
+# 32. Pre-fork server (shared preloaded assets, per-worker memory)
+# ---------------------------------------------------------------------------
+
+
+class TestPrefork:
+    def test_warm_shared_assets(self):
+        import image_processor
+        import name_gazetteer
+        from main import warm_shared_assets
+
+        warm_shared_assets()
+        assert name_gazetteer._gazetteer is not None
+        assert image_processor.Image is not None
+
+    @pytest.mark.skipif(not os.path.exists("/proc/self/smaps_rollup"), reason="Linux only")
+    def test_process_memory(self):
+        from metrics import process_memory
+        from prefork import memory_report
+
+        usage = process_memory()
+        assert set(usage) == {"rss", "pss", "shared", "private"}
+        assert usage["rss"] == usage["shared"] + usage["private"]
+        assert process_memory(2**31 - 1) == {}
+
+        lines = memory_report({0: os.getpid()})
+        assert lines[0].startswith("master") and lines[1].startswith("worker 0")
+        assert lines[-1].startswith("total pss=")
+
+        text = client.get("/metrics").text
+        assert _metric_value(text, 'process_memory_bytes{kind="rss"}') > 0
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork()")
+    def test_logging_survives_fork(self, tmp_path):
+        # A forked child must get its own listener thread, or its records
+        # would sit in a queue nobody reads
+        import subprocess
+
+        code = (
+            "import logging, os, logging_config\n"
+            "logging_config.configure_logging('INFO')\n"
+            "pid = os.fork()\n"
+            "if pid == 0:\n"
+            "    logging.getLogger('child').info('from child')\n"
+            "    logging_config.flush()\n"
+            "    os._exit(0)\n"
+            "os.waitpid(pid, 0)\n"
+        )
+        env = dict(os.environ, LOG_FORMAT="json")
+        proc = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True,
+            cwd=_BACKEND_DIR, env=env, timeout=30,
+        )
+        assert proc.returncode == 0, proc.stderr
+        assert '"msg": "from child"' in proc.stderr
+
+    @pytest.mark.skipif(not os.path.exists("/proc/self/stat"), reason="Linux only")
+    def test_prefork_serves_and_stops(self):
+        import signal
+        import socket
+        import subprocess
+        import time
+        import urllib.request
+
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        env = dict(os.environ, LOG_LEVEL="WARNING", PREFORK_GRACEFUL_S="10")
+        proc = subprocess.Popen(
+            [sys.executable, "prefork.py", "--host", "127.0.0.1",
+             "--port", str(port), "--workers", "2"],
+            cwd=_BACKEND_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        try:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/health") as resp:
+                        assert resp.status == 200
+                    break
+                except OSError:
+                    assert proc.poll() is None and time.monotonic() < deadline
+                    time.sleep(0.2)
+
+            workers = []
+            for entry in os.listdir("/proc"):
+                if entry.isdigit():
+                    try:
+                        with open(f"/proc/{entry}/stat") as f:
+                            ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+                    except (OSError, IndexError, ValueError):
+                        continue
+                    if ppid == proc.pid:
+                        workers.append(int(entry))
+            assert len(workers) == 2
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            _, stderr = proc.communicate(timeout=30)
+        assert proc.returncode == 0, stderr
+
+
+# ---------------------------------------------------------------------------
+# 33. Admission control (weighted limiters, 429/503 with Retry-After)
+# ---------------------------------------------------------------------------
+
+
+class TestAdmissionControl:
+    def test_cost_is_weighted_by_payload(self):
+        from admission import LIMITERS
+
+        image = LIMITERS["image"]
+        assert image.cost(100_000) == 1
+        assert image.cost(12 * 1024 * 1024) == 3
+        assert image.cost(20 * 1024 * 1024) == image.capacity
+        assert image.cost(None) == image.capacity
+
+    def test_fifo_queue_and_rejections(self):
+        import asyncio
+        from collections import deque
+
+        from admission import Limiter, Rejected
+
+        async def scenario():
+            limiter = Limiter("test_fifo", capacity=4, unit_bytes=1, max_queue=2, max_wait=0.2)
+            await limiter.acquire(3)
+            order = []
+
+            async def waiter(cost, tag):
+                await limiter.acquire(cost)
+                order.append(tag)
+
+            big = asyncio.create_task(waiter(4, "big"))
+            await asyncio.sleep(0)
+            # Fits, but must not overtake the large request queued first
+            small = asyncio.create_task(waiter(1, "small"))
+            await asyncio.sleep(0)
+            with pytest.raises(Rejected) as full:
+                await limiter.acquire(1)
+            assert full.value.status_code == 429 and full.value.retry_after >= 1
+
+            limiter.release(3, held=2.0)
+            await big
+            assert order == ["big"] and not small.done()
+            limiter.release(4, held=2.0)
+            await small
+            assert order == ["big", "small"] and limiter.in_use == 1
+
+            await limiter.acquire(3)
+            with pytest.raises(Rejected) as timeout:
+                await limiter.acquire(1)
+            assert timeout.value.status_code == 503 and timeout.value.reason == "timeout"
+            assert limiter._waiters == deque() and limiter.in_use == 4
+
+        asyncio.run(scenario())
+
+    def test_middleware_rejects_before_reading_body(self):
+        import asyncio
+
+        from admission import AdmissionMiddleware, Limiter
+
+        body_read = []
+
+        async def slow(scope, receive, send):
+            body_read.append(True)
+            await asyncio.sleep(0.2)
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        limiter = Limiter("test_mw", capacity=1, unit_bytes=1024, max_queue=1, max_wait=0.05)
+        app = _asgi_app(
+            AdmissionMiddleware(slow, limiters={"t": limiter}, routes={"/upload": "t"})
+        )
+
+        async def post():
+            messages = []
+
+            async def receive():
+                return {"type": "http.request", "body": b"", "more_body": False}
+
+            async def send(message):
+                messages.append(message)
+
+            scope = {
+                "type": "http", "method": "POST", "path": "/upload", "raw_path": b"/upload",
+                "query_string": b"", "headers": [(b"content-length", b"10")],
+                "client": ("127.0.0.1", 1), "server": ("test", 80), "scheme": "http",
+                "root_path": "", "http_version": "1.1",
+            }
+            await app(scope, receive, send)
+            return messages
+
+        async def burst():
+            first = asyncio.create_task(post())
+            await asyncio.sleep(0.01)
+            return await asyncio.gather(first, post(), post())
+
+        results = asyncio.run(burst())
+        statuses = sorted(m[0]["status"] for m in results)
+        assert statuses == [200, 429, 503]
+        assert len(body_read) == 1
+        for messages in results:
+            start = messages[0]
+            if start["status"] != 200:
+                headers = dict(start["headers"])
+                assert int(headers[b"retry-after"]) >= 1
+                error = json.loads(messages[1]["body"])["error"]
+                assert error["details"]["limiter"] == "test_mw"
+        assert limiter.in_use == 0
+
+        text = client.get("/metrics").text
+        assert _metric_value(text, 'admission_rejected_total{limiter="test_mw",reason="queue_full"}') == 1
+        assert _metric_value(text, 'admission_rejected_total{limiter="test_mw",reason="timeout"}') == 1
+
+    def test_limited_route_releases_capacity(self):
+        from admission import LIMITERS
+        from benchmarks import data
+
+        resp = client.post("/image/preprocess", files={"file": ("scan.jpg", data.make_scan(1))})
+        assert resp.status_code == 200
+        assert LIMITERS["image"].in_use == 0
+        assert 'admission_in_flight{limiter="image"} 0' in client.get("/metrics").text
+
+
+# ---------------------------------------------------------------------------
+# 34. Liveness / readiness (cached background probes)
+# ---------------------------------------------------------------------------
+
+
+class TestHealthProbes:
+    def test_liveness(self):
+        resp = client.get("/health/live")
+        assert resp.status_code == 200
+        assert resp.json()["status"] == "alive"
+
+    def test_disk_probe_checks_the_vault_directory(self):
+        import health
+        import token_vault
+
+        vault_dir = os.path.dirname(os.path.abspath(token_vault.VAULT_PATH))
+        assert vault_dir in health._spool_dirs()
+
+    def test_readiness_from_background_probes(self, monkeypatch):
+        import time
+
+        import health
+
+        # Nothing listens here: Ollama is unreachable, which is not critical
+        monkeypatch.setattr(health, "OLLAMA_BASE_URL", "http://127.0.0.1:9")
+        with TestClient(app) as c:
+            deadline = time.monotonic() + 10
+            while True:
+                resp = c.get("/health/ready")
+                if resp.json()["status"] != "not_ready" or time.monotonic() > deadline:
+                    break
+                time.sleep(0.05)
+            body = resp.json()
+            assert resp.status_code == 200, body
+            assert body["status"] == "degraded"
+            assert set(body["probes"]) == {"executor", "memory", "disk", "ollama"}
+            assert body["probes"]["ollama"]["status"] == "fail"
+            assert not body["probes"]["ollama"]["critical"]
+            assert body["probes"]["disk"]["status"] == "ok"
+            # Served from the cache, not probed again
+            assert c.get("/health/ready").content == resp.content
+
+            services = c.get("/api/health").json()["services"]
+            assert services["vision"] == "fail" and services["memory"] == "ok"
+
+    def test_readiness_without_refresher(self):
+        resp = client.get("/health/ready")
+        assert resp.status_code == 503
+        assert resp.json()["probes"]["refresher"]["status"] == "fail"
+
+    def test_critical_failure_timeout_and_staleness(self, monkeypatch):
+        import asyncio
+
+        import health
+
+        async def broken():
+            return "fail", "disk full"
+
+        async def slow():
+            await asyncio.sleep(1)
+            return "ok", ""
+
+        monkeypatch.setattr(health, "HEALTH_PROBE_TIMEOUT_S", 0.05)
+        monkeypatch.setattr(health, "_cache", None)
+        monkeypatch.setattr(
+            health, "_probes",
+            [health.Probe("spool", broken, critical=True), health.Probe("slow", slow, critical=False)],
+        )
+        asyncio.run(health.refresh())
+        resp = asyncio.run(health.ready())
+        body = json.loads(resp.body)
+        assert resp.status_code == 503 and body["status"] == "not_ready"
+        assert body["probes"]["slow"]["detail"].startswith("timed out")
+
+        async def fine():
+            return "ok", ""
+
+        monkeypatch.setattr(health, "_probes", [health.Probe("spool", fine, critical=True)])
+        asyncio.run(health.refresh())
+        assert asyncio.run(health.ready()).status_code == 200
+
+        health._cache.refreshed -= health.HEALTH_PROBE_TTL_S + 1
+        resp = asyncio.run(health.ready())
+        assert resp.status_code == 503
+        assert json.loads(resp.body)["probes"]["spool"]["status"] == "stale"
+
+    @pytest.mark.skipif(not os.path.exists("/proc/meminfo"), reason="Linux only")
+    def test_available_memory(self):
+        from health import available_memory
+
+        assert available_memory() > 0
+
+
+# ---------------------------------------------------------------------------
+# 35. Response compression (negotiation, thresholds, streaming)
+# ---------------------------------------------------------------------------
+
+
+class TestCompression:
+    def test_negotiation(self):
+        from compression import negotiate_encoding
+
+        offered = ("zstd", "br", "gzip")
+        assert negotiate_encoding(None, offered) is None
+        assert negotiate_encoding("identity", offered) is None
+        assert negotiate_encoding("gzip, deflate", offered) == "gzip"
+        # Server preference at equal q, client preference otherwise
+        assert negotiate_encoding("gzip, br, zstd", offered) == "zstd"
+        assert negotiate_encoding("gzip;q=1.0, zstd;q=0.5", offered) == "gzip"
+        assert negotiate_encoding("*;q=0.1, br;q=0", offered) == "zstd"
+        assert negotiate_encoding("zstd;q=0, *", ("zstd", "gzip")) == "gzip"
+        assert negotiate_encoding("gzip;q=0", offered) is None
+
+    def test_large_json_is_compressed_small_is_not(self):
+        import asyncio
+        import gzip
+
+        from compression import CompressionMiddleware
+
+        payload = json.dumps([{"belegnummer": f"RE-{i:06d}", "betrag": "119.00"} for i in range(500)])
+
+        def handler_for(body):
+            async def handler(scope, receive, send):
+                await send({
+                    "type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode())],
+                })
+                await send({"type": "http.response.body", "body": body})
+            return handler
+
+        accept = [(b"accept-encoding", b"gzip")]
+        app = CompressionMiddleware(handler_for(payload.encode()))
+        start, body = asyncio.run(_call_asgi(app, headers=accept))
+        headers = dict(start["headers"])
+        assert headers[b"content-encoding"] == b"gzip"
+        assert headers[b"vary"] == b"Accept-Encoding"
+        assert int(headers[b"content-length"]) == len(body["body"]) < len(payload) // 5
+        assert gzip.decompress(body["body"]) == payload.encode()
+
+        app = CompressionMiddleware(handler_for(b'{"ok":true}'))
+        start, body = asyncio.run(_call_asgi(app, headers=accept))
+        assert b"content-encoding" not in dict(start["headers"])
+        assert body["body"] == b'{"ok":true}'
+
+    def test_already_compressed_content_is_skipped(self):
+        import asyncio
+
+        from compression import CompressionMiddleware
+
+        async def png(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"image/png")]})
+            await send({"type": "http.response.body", "body": b"\x89PNG" + bytes(4096)})
+
+        start, body = asyncio.run(
+            _call_asgi(CompressionMiddleware(png), headers=[(b"accept-encoding", b"gzip")])
+        )
+        assert b"content-encoding" not in dict(start["headers"])
+        assert len(body["body"]) == 4100
+
+    def test_streaming_datev_export(self):
+        import gzip
+
+        plain = client.post(
+            "/api/datev/export", json=_datev_request_payload(), headers={"Accept-Encoding": "identity"}
+        )
+        with client.stream(
+            "POST", "/api/datev/export", json=_datev_request_payload(),
+            headers={"Accept-Encoding": "gzip"},
+        ) as resp:
+            raw = b"".join(resp.iter_raw())
+        assert resp.headers["Content-Encoding"] == "gzip"
+        assert "Content-Length" not in resp.headers
+        # The EXTF header line carries a timestamp
+        assert gzip.decompress(raw).split(b"\r\n")[1:] == plain.content.split(b"\r\n")[1:]
+
+    @pytest.mark.parametrize("encoding", ["zstd", "br"])
+    def test_optional_encodings_roundtrip(self, encoding):
+        import compression
+
+        module = pytest.importorskip({"zstd": "zstandard", "br": "brotli"}[encoding])
+        data = json.dumps({"rows": list(range(5000))}).encode()
+        streamed = compression.Encoder(encoding)
+        chunks = streamed.compress(data[:7000]) + streamed.compress(data[7000:]) + streamed.finish()
+        for encoded in (compression.compress(data, encoding), chunks):
+            if encoding == "zstd":
+                decoded = module.ZstdDecompressor().decompressobj().decompress(encoded)
+            else:
+                decoded = module.decompress(encoded)
+            assert decoded == data
+
+    def test_app_compresses_and_counts_bytes(self, monkeypatch):
+        import gzip
+
+        import compression
+
+        monkeypatch.setattr(compression, "COMPRESSION_OFFLOAD_BYTES", 1)  # thread-pool path
+        with client.stream("GET", "/metrics", headers={"Accept-Encoding": "gzip"}) as resp:
+            raw = b"".join(resp.iter_raw())
+        assert resp.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in resp.headers["Vary"]
+        assert b"http_requests_total" in gzip.decompress(raw)
+        metrics_text = client.get("/metrics", headers={"Accept-Encoding": "identity"}).text
+        assert _metric_value(metrics_text, 'compression_input_bytes_total{encoding="gzip"}') > \
+            _metric_value(metrics_text, 'compression_output_bytes_total{encoding="gzip"}') > 0
+
+
+# ---------------------------------------------------------------------------
+# 36. Idempotency keys (response replay, in-flight coalescing, disk spill)
+# ---------------------------------------------------------------------------
+
+
+async def _post_asgi(app, body=b"{}", key="k-1", path="/x"):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    headers = [(b"content-type", b"application/json")]
+    if key is not None:
+        headers.append((b"idempotency-key", key.encode()))
+    scope = {
+        "type": "http", "method": "POST", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "headers": headers, "client": ("127.0.0.1", 1),
+        "server": ("test", 80), "scheme": "http", "root_path": "", "http_version": "1.1",
+    }
+    await app(scope, receive, send)
+    return messages
+
+
+def _counting_app(calls, status=200, delay=0.0):
+    import asyncio
+
+    async def handler(scope, receive, send):
+        await receive()
+        calls.append(scope["path"])
+        await asyncio.sleep(delay)
+        body = json.dumps({"call": len(calls)}).encode()
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+    return handler
+
+
+class TestIdempotency:
+    def test_replay_through_app(self):
+        payload = {"netto": 1000.0, "mwst_rate": 0.19, "brutto": 1190.0, "items": []}
+        headers = {"Idempotency-Key": f"test-replay-{os.getpid()}"}
+        first = client.post("/math/validate", json=payload, headers=headers)
+        again = client.post("/math/validate", json=payload, headers=headers)
+        assert first.status_code == again.status_code == 200
+        assert "Idempotent-Replayed" not in first.headers
+        assert again.headers["Idempotent-Replayed"] == "true"
+        assert again.content == first.content
+        assert again.headers["X-Request-ID"] != first.headers["X-Request-ID"]
+
+        changed = client.post("/math/validate", json=dict(payload, brutto=1500.0), headers=headers)
+        assert changed.status_code == 422
+        assert "different request" in changed.json()["error"]["message"]
+
+        assert client.post("/math/validate", json=payload,
+                           headers={"Idempotency-Key": "x" * 300}).status_code == 400
+
+    def test_multipart_boundary_is_not_fingerprinted(self):
+        from idempotency import _Fingerprint
+
+        def digest(boundary, chunk_size):
+            body = (
+                f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.csv\""
+                f"\r\n\r\n{VALID_CSV_CONTENT}\r\n--{boundary}--\r\n"
+            ).encode()
+            scope = {"query_string": b"", "headers": [
+                (b"content-type", f"multipart/form-data; boundary={boundary}".encode())
+            ]}
+            fingerprint = _Fingerprint(scope)
+            for i in range(0, len(body), chunk_size):
+                fingerprint.update(body[i:i + chunk_size])
+            return fingerprint.digest()
+
+        assert digest("a1b2c3d4e5", 7) == digest("f6e5d4c3b2a1f0", 1000) == digest("zz", 3)
+        assert digest("a1b2c3d4e5", 7) != _Fingerprint({"query_string": b"", "headers": []}).digest()
+
+    def test_only_final_responses_are_stored(self):
+        import asyncio
+
+        from idempotency import IdempotencyMiddleware, ResponseCache
+
+        calls = []
+        app = IdempotencyMiddleware(_counting_app(calls), cache=ResponseCache(spill_path=None))
+        asyncio.run(_post_asgi(app))
+        replay = asyncio.run(_post_asgi(app))
+        assert len(calls) == 1
+        assert (b"idempotent-replayed", b"true") in replay[0]["headers"]
+        asyncio.run(_post_asgi(app, key=None))
+        assert len(calls) == 2
+
+        for status in (503, 429):
+            calls.clear()
+            app = IdempotencyMiddleware(
+                _counting_app(calls, status=status), cache=ResponseCache(spill_path=None)
+            )
+            asyncio.run(_post_asgi(app))
+            asyncio.run(_post_asgi(app))
+            assert len(calls) == 2
+
+        calls.clear()
+        app = IdempotencyMiddleware(
+            _counting_app(calls), cache=ResponseCache(spill_path=None), max_response_bytes=4
+        )
+        asyncio.run(_post_asgi(app))
+        asyncio.run(_post_asgi(app))
+        assert len(calls) == 2
+
+    def test_concurrent_duplicates_are_coalesced(self):
+        import asyncio
+
+        from idempotency import IdempotencyMiddleware, ResponseCache
+
+        calls = []
+        app = IdempotencyMiddleware(
+            _counting_app(calls, delay=0.1), cache=ResponseCache(spill_path=None)
+        )
+
+        async def scenario():
+            return await asyncio.gather(*(_post_asgi(app) for _ in range(5)))
+
+        results = asyncio.run(scenario())
+        assert len(calls) == 1
+        assert {r[1]["body"] for r in results} == {b'{"call": 1}'}
+
+        # The first run fails: the waiting duplicate runs instead
+        attempts = []
+
+        async def flaky(scope, receive, send):
+            attempts.append(1)
+            await receive()
+            await asyncio.sleep(0.05)
+            if len(attempts) == 1:
+                raise RuntimeError("boom")
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        app = IdempotencyMiddleware(flaky, cache=ResponseCache(spill_path=None))
+
+        async def with_failure():
+            return await asyncio.gather(
+                _post_asgi(app), _post_asgi(app), return_exceptions=True
+            )
+
+        first, second = asyncio.run(with_failure())
+        assert isinstance(first, RuntimeError)
+        assert second[1]["body"] == b"ok" and len(attempts) == 2
+
+    def test_wait_timeout_answers_409(self):
+        import asyncio
+
+        from idempotency import IdempotencyMiddleware, ResponseCache
+
+        app = IdempotencyMiddleware(
+            _counting_app([], delay=0.3), cache=ResponseCache(spill_path=None), wait=0.05
+        )
+
+        async def scenario():
+            return await asyncio.gather(_post_asgi(app), _post_asgi(app))
+
+        first, second = asyncio.run(scenario())
+        assert first[0]["status"] == 200
+        assert second[0]["status"] == 409
+        assert any(k == b"retry-after" for k, _ in second[0]["headers"])
+
+    def test_disk_spill_survives_eviction_and_other_workers(self, tmp_path):
+        import time
+
+        from idempotency import ResponseCache, StoredResponse
+
+        path = str(tmp_path / "idempotency.sqlite3")
+        cache = ResponseCache(max_entries=1, spill_path=path)
+        for n in (1, 2):
+            stored = StoredResponse(
+                b"fp", 200, [(b"content-type", b"text/csv")], b"row%d" % n, time.time() + 60
+            )
+            cache.put(f"k{n}", stored)
+            cache.store(f"k{n}", stored)
+        assert cache.get("k1") is None and cache.get("k2") is not None
+        assert cache.load("k1").body == b"row1"
+
+        other = ResponseCache(spill_path=path)
+        loaded = other.load("k2")
+        assert loaded.headers == [(b"content-type", b"text/csv")] and loaded.status == 200
+        cache.close()
+        other.close()
+
+
+# ---------------------------------------------------------------------------
+# 37. Serving profiles (Unix domain socket, httptools/uvloop, h2c)
+# ---------------------------------------------------------------------------
+
+
+class TestServingProfiles:
+    def test_profile_options(self):
+        import argparse
+
+        from prefork import server_options
+
+        def options(**kwargs):
+            args = dict(profile="tcp", uds=None, http=None, loop=None)
+            args.update(kwargs)
+            return server_options(argparse.Namespace(**args))
+
+        assert options() == {}
+        local = options(profile="local")
+        assert local["uds"] and local["timeout_keep_alive"] == 75
+        assert local["http"] in ("httptools", "h11") and local["loop"] in ("uvloop", "asyncio")
+        assert options(profile="local", http="h11", uds="/tmp/x.sock")["http"] == "h11"
+        with pytest.raises(ValueError):
+            options(profile="fast")
+
+    def test_tcp_socket_gets_nodelay(self):
+        import socket
+
+        from prefork import bind
+
+        sock = bind("127.0.0.1", 0)
+        try:
+            assert sock.proto == socket.IPPROTO_TCP
+        finally:
+            sock.close()
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="needs Unix sockets")
+    def test_bind_unix_replaces_stale_socket(self, tmp_path):
+        import socket
+        import stat
+
+        from prefork import bind_unix
+
+        path = str(tmp_path / "run" / "backend.sock")
+        live = bind_unix(path, mode=0o600)
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        with pytest.raises(OSError):
+            bind_unix(path)
+        live.close()  # file left behind, as after a crash
+        replaced = bind_unix(path)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client_sock:
+            client_sock.connect(path)
+        replaced.close()
+
+    @pytest.mark.skipif(not os.path.exists("/proc/self/stat"), reason="Linux only")
+    def test_prefork_serves_over_uds(self, tmp_path):
+        import signal
+        import subprocess
+        import time
+
+        from benchmarks.uds import _connect, _exchange, build_request
+
+        path = str(tmp_path / "backend.sock")
+        env = dict(os.environ, LOG_LEVEL="WARNING", PREFORK_GRACEFUL_S="10", WARMUP="off")
+        proc = subprocess.Popen(
+            [sys.executable, "prefork.py", "--profile", "local", "--no-tcp",
+             "--uds", path, "--workers", "1"],
+            cwd=_BACKEND_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        try:
+            request = build_request("POST", "/api/validate/invoice", {
+                "datum": "15.03.2024", "belegnummer": "RE-005", "buchungstext": "Material",
+                "betrag": "595.00", "konto": "4980", "gegenkonto": "1600",
+            }, keep_alive=True)
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    sock = _connect(path)
+                    break
+                except OSError:
+                    assert proc.poll() is None and time.monotonic() < deadline
+                    time.sleep(0.2)
+            with sock:
+                buffer = bytearray()
+                assert _exchange(sock, request, buffer) == 200
+                assert _exchange(sock, request, buffer) == 200  # same connection
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            _, stderr = proc.communicate(timeout=30)
+        assert proc.returncode == 0, stderr
+        assert not os.path.exists(path)
@@ -0,0 +1,340 @@
+"""
+PII Token Vault
+Backs TOKENIZE mode of the PII sanitizer.
+
+Tokens are deterministic per (tenant, entity type, value): the token body is
+an HMAC-SHA256 of those three parts, so the same IBAN always maps to the same
+token for a tenant and repeated values do not grow the store.
+
+Storage layers:
+  1. Bounded in-memory LRU (per worker) – serves hot tokens without I/O
+  2. SQLite file in WAL mode – shared by all uvicorn workers on the host and
+     survives restarts, so detokenisation keeps working after a redeploy
+
+Entries expire after PII_VAULT_TTL_SECONDS of inactivity.  Every tokenisation
+of an existing value refreshes its expiry; expired rows are purged
+periodically by the worker that happens to write.
+
+Configuration (environment):
+  PII_VAULT_PATH         SQLite file path (default: ./var/pii_vault.sqlite3)
+  PII_VAULT_SECRET       HMAC key; if unset a random key is generated once and
+                         written to PII_VAULT_SECRET_FILE so all workers agree
+                         on it.  The key is never stored in the SQLite file: a
+                         copy of the vault alone does not allow tokens to be
+                         recomputed for guessed values.
+  PII_VAULT_SECRET_FILE  Key file for the generated secret, created with mode
+                         0600 (default: PII_VAULT_PATH + ".key")
+  PII_VAULT_TTL_SECONDS  Inactivity TTL (default: 30 days)
+  PII_VAULT_CACHE_SIZE   In-memory LRU capacity (default: 10000 entries)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+VAULT_PATH = os.getenv(
+    "PII_VAULT_PATH", os.path.join(_BACKEND_DIR, "var", "pii_vault.sqlite3")
+)
+VAULT_SECRET_FILE = os.getenv("PII_VAULT_SECRET_FILE", "")
+VAULT_TTL_SECONDS = int(os.getenv("PII_VAULT_TTL_SECONDS", str(30 * 24 * 3600)))
+VAULT_CACHE_SIZE = int(os.getenv("PII_VAULT_CACHE_SIZE", "10000"))
+
+DEFAULT_TENANT = "default"
+
+# Hex characters of the HMAC kept in the token (48 bits → collisions are
+# negligible for the number of distinct values a single tenant produces)
+_TOKEN_HEX_LEN = 12
+
+# Purge expired rows at most once per interval (seconds)
+_PURGE_INTERVAL_SECONDS = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vault_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tokens (
+    tenant      TEXT    NOT NULL,
+    token       TEXT    NOT NULL,
+    entity_type TEXT    NOT NULL,
+    original    TEXT    NOT NULL,
+    expires_at  REAL    NOT NULL,
+    PRIMARY KEY (tenant, token)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_tokens_expires ON tokens (expires_at);
+"""
+
+
+# ---------------------------------------------------------------------------
+# Key file
+# ---------------------------------------------------------------------------
+
+
+def _read_or_create_key_file(path: str, candidate: str) -> str:
+    """
+    Return the key stored at *path*, writing *candidate* there if none exists.
+
+    The key is written to a private temporary file and hard-linked into
+    place: link() fails if the name exists, so concurrent first starts of
+    several workers converge on one key and never read a partial file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return fh.read().strip()
+    except FileNotFoundError:
+        pass
+
+    fd, tmp = tempfile.mkstemp(prefix=".vault-key-", dir=directory)  # mode 0600
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(candidate)
+            fh.flush()
+            os.fsync(fh.fileno())
+        try:
+            os.link(tmp, path)
+        except FileExistsError:
+            with open(path, encoding="utf-8") as fh:
+                return fh.read().strip()
+    finally:
+        os.unlink(tmp)
+    return candidate
+
+
+# ---------------------------------------------------------------------------
+# Vault
+# ---------------------------------------------------------------------------
+
+
+class TokenVault:
+    """
+    Deterministic, bounded, persistent token store.
+
+    One SQLite connection per process, opened lazily on first use so the
+    vault is safe to construct before uvicorn forks its workers.
+    """
+
+    def __init__(
+        self,
+        path: str = VAULT_PATH,
+        secret: Optional[str] = None,
+        ttl_seconds: int = VAULT_TTL_SECONDS,
+        cache_size: int = VAULT_CACHE_SIZE,
+        secret_file: Optional[str] = None,
+    ) -> None:
+        self.path = path
+        self.secret_file = secret_file or VAULT_SECRET_FILE or (
+            None if path == ":memory:" else path + ".key"
+        )
+        self.ttl_seconds = ttl_seconds
+        self.cache_size = cache_size
+        self._secret: Optional[bytes] = secret.encode("utf-8") if secret else None
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_pid: Optional[int] = None
+        # (tenant, token) → (original, refreshed_at)
+        self._lru: OrderedDict[tuple[str, str], tuple[str, float]] = OrderedDict()
+        self._last_purge = 0.0
+
+    # -- connection ---------------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection inherited across fork() must not be reused
+        if self._conn is not None and self._conn_pid == os.getpid():
+            return self._conn
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+
+        if self._secret is None:
+            self._secret = self._load_or_create_secret(conn)
+
+        self._conn = conn
+        self._conn_pid = os.getpid()
+        self._lru.clear()
+        logger.info("Token vault opened: %s (ttl=%ds)", self.path, self.ttl_seconds)
+        return conn
+
+    def _load_or_create_secret(self, conn: sqlite3.Connection) -> bytes:
+        env_secret = os.getenv("PII_VAULT_SECRET")
+        if env_secret:
+            return env_secret.encode("utf-8")
+        # Vaults created before the key file existed kept the key in
+        # vault_meta; move it out so existing tokens stay deterministic
+        row = conn.execute(
+            "SELECT value FROM vault_meta WHERE key = 'hmac_secret'"
+        ).fetchone()
+        if self.secret_file is None:
+            return (row[0] if row else secrets.token_hex(32)).encode("utf-8")
+        secret = _read_or_create_key_file(
+            self.secret_file, row[0] if row else secrets.token_hex(32)
+        )
+        if row:
+            conn.execute("DELETE FROM vault_meta WHERE key = 'hmac_secret'")
+            conn.commit()
+            logger.info("Token vault key moved to %s", self.secret_file)
+        return secret.encode("utf-8")
+
+    # -- LRU ----------------------------------------------------------------
+
+    def _lru_put(self, key: tuple[str, str], original: str, now: float) -> None:
+        self._lru[key] = (original, now)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.cache_size:
+            self._lru.popitem(last=False)
+
+    # -- public API ---------------------------------------------------------
+
+    def make_token(self, tenant: str, entity_type: str, original: str) -> str:
+        """Compute the deterministic token for a value (no storage side effects)."""
+        with self._lock:
+            self._connection()  # ensures the secret is loaded
+            return self._token_for(tenant, entity_type, original)
+
+    def _token_for(self, tenant: str, entity_type: str, original: str) -> str:
+        # Caller holds self._lock and has opened the connection (secret loaded)
+        digest = hmac.new(
+            self._secret,  # type: ignore[arg-type]
+            f"{tenant}\x1f{entity_type}\x1f{original}".encode("utf-8"),
+            hashlib.sha256,
+        ).hexdigest()
+        return f"[{entity_type}_{digest[:_TOKEN_HEX_LEN].upper()}]"
+
+    def tokenize_many(
+        self, tenant: str, entities: Iterable[tuple[str, str]]
+    ) -> list[str]:
+        """
+        Tokenise (entity_type, original) pairs for a tenant.
+
+        All new or stale entries are written in a single transaction.  Entries
+        refreshed less than half a TTL ago are served from the LRU without I/O.
+        """
+        now = time.time()
+        tokens: list[str] = []
+        pending: list[tuple[str, str, str, str, float]] = []
+
+        with self._lock:
+            conn = self._connection()
+            for entity_type, original in entities:
+                token = self._token_for(tenant, entity_type, original)
+                tokens.append(token)
+                key = (tenant, token)
+                cached = self._lru.get(key)
+                if cached is not None and now - cached[1] < self.ttl_seconds / 2:
+                    self._lru.move_to_end(key)
+                    continue
+                pending.append(
+                    (tenant, token, entity_type, original, now + self.ttl_seconds)
+                )
+                self._lru_put(key, original, now)
+
+            if pending:
+                conn.executemany(
+                    "INSERT INTO tokens (tenant, token, entity_type, original, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (tenant, token) DO UPDATE SET expires_at = excluded.expires_at",
+                    pending,
+                )
+                conn.commit()
+                self._maybe_purge(conn, now)
+
+        return tokens
+
+    def tokenize(self, tenant: str, entity_type: str, original: str) -> str:
+        return self.tokenize_many(tenant, [(entity_type, original)])[0]
+
+    def detokenize_many(self, tenant: str, tokens: Iterable[str]) -> dict[str, str]:
+        """Resolve tokens for a tenant.  Unknown or expired tokens are omitted."""
+        now = time.time()
+        resolved: dict[str, str] = {}
+        missing: list[str] = []
+
+        with self._lock:
+            conn = self._connection()
+            for token in dict.fromkeys(tokens):
+                cached = self._lru.get((tenant, token))
+                if cached is not None and now - cached[1] < self.ttl_seconds:
+                    resolved[token] = cached[0]
+                else:
+                    missing.append(token)
+
+            # SQLite limits bound parameters per statement; query in chunks
+            for i in range(0, len(missing), 500):
+                chunk = missing[i : i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT token, original FROM tokens "
+                    f"WHERE tenant = ? AND expires_at > ? AND token IN ({placeholders})",
+                    (tenant, now, *chunk),
+                ).fetchall()
+                for token, original in rows:
+                    resolved[token] = original
+
+        return resolved
+
+    def purge_expired(self) -> int:
+        """Delete all expired rows; returns the number removed."""
+        with self._lock:
+            conn = self._connection()
+            return self._purge(conn, time.time())
+
+    def _maybe_purge(self, conn: sqlite3.Connection, now: float) -> None:
+        if now - self._last_purge >= _PURGE_INTERVAL_SECONDS:
+            self._purge(conn, now)
+
+    def _purge(self, conn: sqlite3.Connection, now: float) -> int:
+        cur = conn.execute("DELETE FROM tokens WHERE expires_at <= ?", (now,))
+        conn.commit()
+        self._last_purge = now
+        if cur.rowcount:
+            logger.info("Token vault purged %d expired entries", cur.rowcount)
+        return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._conn_pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._conn_pid = None
+            self._lru.clear()
+
+
+# ---------------------------------------------------------------------------
+# Process-wide instance
+# ---------------------------------------------------------------------------
+
+_vault: Optional[TokenVault] = None
+_vault_lock = threading.Lock()
+
+
+def get_token_vault() -> TokenVault:
+    """Return the shared vault, creating it on first use."""
+    global _vault
+    if _vault is None:
+        with _vault_lock:
+            if _vault is None:
+                _vault = TokenVault()
+    return _vault
@@ -0,0 +1,255 @@
+"""
+Binary transport for the bulk GoBD, math and PII endpoints.
+
+Routers created with route_class=NegotiatedRoute accept and produce, besides
+JSON:
+
+  application/msgpack                  same data model as the JSON body,
+                                       MessagePack framing (Decimal amounts
+                                       stay strings, as in JSON)
+  application/vnd.apache.arrow.stream  Arrow IPC stream; one table whose rows
+                                       are the endpoint's list field (see
+                                       ARROW_TABLES), Decimal amounts as
+                                       native decimal128 columns.  The other
+                                       top-level fields travel as JSON in the
+                                       schema metadata key "fields".
+
+Request bodies are decoded by Content-Type before FastAPI validates them
+(415 if the codec is not installed, 400 if the body does not decode).  The
+response type is negotiated from Accept (q-values honoured; anything
+unsupported falls back to JSON) and read by rendering.ModelResponse.
+
+msgpack and pyarrow are optional; without them the endpoints are JSON-only.
+pyarrow (~120 ms to import) is only looked up at start-up and imported by
+the first Arrow request, so workers that never see one do not pay for it.
+
+Install:
+  pip install msgpack pyarrow
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import json
+import logging
+from contextvars import ContextVar
+from typing import Any, Callable, Coroutine, Optional
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+from models import (
+    DATEVExportRequest,
+    GoBDValidationResult,
+    MathValidateBatchRequest,
+    MathValidateBatchResponse,
+    ParseResult,
+    PiiSanitizeBatchRequest,
+    PiiSanitizeBatchResponse,
+)
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+ARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+_pa: Any = None
+
+logger = logging.getLogger(__name__)
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+# Legacy / alternative spellings clients send for MessagePack
+_MSGPACK_ALIASES = frozenset({MSGPACK, "application/x-msgpack", "application/vnd.msgpack"})
+
+# Models exchanged as Arrow tables: model → list field holding the rows
+ARROW_TABLES: dict[type[BaseModel], str] = {
+    ParseResult: "rows",
+    GoBDValidationResult: "prepared_rows",
+    DATEVExportRequest: "transactions",
+    MathValidateBatchRequest: "invoices",
+    MathValidateBatchResponse: "results",
+    PiiSanitizeBatchRequest: "texts",
+    PiiSanitizeBatchResponse: "results",
+}
+
+_FIELDS_KEY = b"fields"
+
+# Media type negotiated for the response of the current request
+response_media_type: ContextVar[str] = ContextVar("response_media_type", default=JSON)
+
+
+# ---------------------------------------------------------------------------
+# Encoding
+# ---------------------------------------------------------------------------
+
+
+def pyarrow() -> Any:
+    """The pyarrow module, imported on first use (None if not installed)."""
+    global _pa
+    if _pa is None and ARROW_AVAILABLE:
+        import pyarrow as pa
+
+        _pa = pa
+    return _pa
+
+
+def encode_model(model: BaseModel, media_type: str) -> bytes:
+    """Serialise a response model as msgpack or Arrow IPC stream."""
+    if media_type == MSGPACK:
+        return msgpack.packb(model.model_dump(mode="json", by_alias=True))
+
+    key = ARROW_TABLES[type(model)]
+    # python mode keeps Decimal, so pyarrow infers decimal128 columns
+    rows = model.model_dump(mode="python", by_alias=True, include={key})[key]
+    fields = model.model_dump(mode="json", by_alias=True, exclude={key})
+    pa = pyarrow()
+    table = pa.Table.from_pylist(rows)
+    table = table.replace_schema_metadata({_FIELDS_KEY: json.dumps(fields).encode()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+# ---------------------------------------------------------------------------
+# Decoding
+# ---------------------------------------------------------------------------
+
+
+def _decode_arrow(raw: bytes, body_type: Any) -> Any:
+    table = pyarrow().ipc.open_stream(raw).read_all()
+    metadata = table.schema.metadata or {}
+    fields = json.loads(metadata.get(_FIELDS_KEY, b"{}"))
+    key = ARROW_TABLES.get(body_type) if isinstance(body_type, type) else None
+    if key == "texts":
+        # list[str] field: the table has a single string column
+        rows: list[Any] = table.column(0).to_pylist() if table.num_columns else []
+    else:
+        rows = table.to_pylist()
+    if key is None:
+        # Body is the list itself (e.g. /api/gobd/prepare)
+        return rows
+    return {**fields, key: rows}
+
+
+def decode_body(raw: bytes, content_type: str, body_type: Any) -> Any:
+    """Decode a msgpack / Arrow request body to the JSON data model."""
+    if content_type in _MSGPACK_ALIASES:
+        if msgpack is None:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="MessagePack bodies need the optional 'msgpack' package",
+            )
+        try:
+            return msgpack.unpackb(raw)
+        except Exception as exc:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Body is not valid MessagePack ({type(exc).__name__})",
+            ) from exc
+    if not ARROW_AVAILABLE:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Arrow bodies need the optional 'pyarrow' package",
+        )
+    try:
+        return _decode_arrow(raw, body_type)
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Body is not a valid Arrow IPC stream: {exc}",
+        ) from exc
+
+
+# ---------------------------------------------------------------------------
+# Negotiation
+# ---------------------------------------------------------------------------
+
+
+def negotiate(accept: Optional[str], offered: tuple[str, ...]) -> str:
+    """
+    Pick the response media type from an Accept header.
+
+    offered lists the binary types the route can produce; JSON is always
+    possible.  At equal q an explicit type beats a wildcard, and JSON beats
+    another explicit type.  Unsupported requests get JSON rather than 406,
+    matching the endpoints' behaviour before negotiation.
+    """
+    if not accept or not offered:
+        return JSON
+    best, best_rank = JSON, (0.0, 0, 0)
+    for part in accept.split(","):
+        media, _, params = part.strip().partition(";")
+        media = media.strip().lower()
+        if media in _MSGPACK_ALIASES:
+            media = MSGPACK
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media in ("*/*", "application/*"):
+            rank = (q, 0, 1)
+            media = JSON
+        elif media == JSON:
+            rank = (q, 1, 1)
+        elif media in offered:
+            rank = (q, 1, 0)
+        else:
+            continue
+        if q > 0 and rank > best_rank:
+            best, best_rank = media, rank
+    return best
+
+
+def _offered(response_model: Any) -> tuple[str, ...]:
+    offered: list[str] = []
+    if msgpack is not None:
+        offered.append(MSGPACK)
+    if ARROW_AVAILABLE and response_model in ARROW_TABLES:
+        offered.append(ARROW)
+    return tuple(offered)
+
+
+class NegotiatedRoute(APIRoute):
+    """APIRoute that decodes binary bodies and negotiates the response type."""
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        original_handler = super().get_route_handler()
+        offered = _offered(self.response_model)
+        body_type = self.body_field.field_info.annotation if self.body_field else None
+
+        async def handler(request: Request) -> Response:
+            content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type in _MSGPACK_ALIASES or content_type == ARROW:
+                raw = await request.body()
+                decoded = decode_body(raw, content_type, body_type)
+                logger.debug("decoded %s body (%d bytes)", content_type, len(raw))
+                # FastAPI reads JSON bodies through request.json(); hand it
+                # the decoded value under a JSON content type
+                scope = dict(request.scope)
+                scope["headers"] = [
+                    (k, v) for k, v in request.scope["headers"] if k != b"content-type"
+                ] + [(b"content-type", JSON.encode())]
+                request = Request(scope, request.receive)
+                request._body = raw
+                request._json = decoded
+
+            token = response_media_type.set(negotiate(request.headers.get("accept"), offered))
+            try:
+                response = await original_handler(request)
+            finally:
+                response_media_type.reset(token)
+            if offered:
+                response.headers.append("Vary", "Accept")
+            return response
+
+        return handler
@@ -1,6 +1,7 @@
 """
 Vision Analyzer – Moondream integration via Ollama.
 Provides image analysis for damage documentation, invoice OCR, and construction site photos.
+httpx is imported on the first call, not at router import.
 """
 
 from __future__ import annotations
@@ -8,12 +9,14 @@ from __future__ import annotations
 import base64
 import logging
 import os
+import time
 from typing import Optional
 
-import httpx
 from fastapi import APIRouter, File, Form, UploadFile
 from pydantic import BaseModel, Field
 
+from metrics import VISION_INFERENCE
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/vision", tags=["Vision AI"])
@@ -73,6 +76,7 @@ async def analyze_image(
     custom_prompt: Optional[str] = Form(None, description="Custom prompt (overrides mode)"),
 ):
     """Analyze an image using Moondream vision model via Ollama."""
+    import httpx
 
     content = await image.read()
     if len(content) > MAX_IMAGE_SIZE:
@@ -81,27 +85,36 @@ async def analyze_image(
     image_b64 = base64.b64encode(content).decode("utf-8")
     prompt = custom_prompt or PROMPTS.get(mode, PROMPTS["general"])
 
-    logger.info(f"Vision analysis: mode={mode}, size={len(content)//1024}KB, model={VISION_MODEL}")
+    logger.info(
+        "Vision analysis: mode=%s, size=%dKB, model=%s", mode, len(content) // 1024, VISION_MODEL
+    )
 
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        resp = await client.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
-            json={
-                "model": VISION_MODEL,
-                "prompt": prompt,
-                "images": [image_b64],
-                "stream": False,
-            },
-        )
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        async with httpx.AsyncClient(timeout=120.0) as client:
+            resp = await client.post(
+                f"{OLLAMA_BASE_URL}/api/generate",
+                json={
+                    "model": VISION_MODEL,
+                    "prompt": prompt,
+                    "images": [image_b64],
+                    "stream": False,
+                },
+            )
+        if resp.status_code == 200:
+            outcome = "ok"
+    finally:
+        VISION_INFERENCE.labels(outcome).observe(time.perf_counter() - start)
 
     if resp.status_code != 200:
-        logger.error(f"Ollama error: {resp.status_code} {resp.text[:200]}")
+        logger.error("Ollama error: %d %s", resp.status_code, resp.text[:200])
         return VisionError(error="Vision model unavailable", detail=resp.text[:200])
 
     data = resp.json()
     eval_ms = int(data.get("eval_duration", 0) / 1e6)
 
-    logger.info(f"Vision analysis complete: {eval_ms}ms")
+    logger.info("Vision analysis complete: %dms", eval_ms)
 
     return VisionAnalysisResponse(
         description=data.get("response", ""),
@@ -113,6 +126,8 @@ async def analyze_image(
 @router.get("/models")
 async def list_vision_models():
     """List available vision models from Ollama."""
+    import httpx
+
     async with httpx.AsyncClient(timeout=10.0) as client:
         resp = await client.get(f"{OLLAMA_BASE_URL}/api/tags")
 